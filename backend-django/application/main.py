@@ -3,30 +3,16 @@
 # @Author  : 臧成龙
 # @FileName: api.py
 # @Software: PyCharm
-from datetime import datetime
-
 from django.core.exceptions import ValidationError as DjangoValidationError
 from ninja.main import NinjaAPI
-from ninja.renderers import JSONRenderer
-from ninja.responses import NinjaJSONEncoder
 
 from common.fu_auth import BearerAuth, ApiKey
+from common.fu_renderer import MyJsonRenderer
 from core.router import core_router
 from scheduler.router import scheduler_router
 from problem.api import router as problem_router
 
 
-class MyJsonEncoder(NinjaJSONEncoder):
-    def default(self, o):
-        if isinstance(o, datetime):
-            return o.strftime('%Y-%m-%d %H:%M:%S')
-        return super().default(o)
-
-
-class MyJsonRenderer(JSONRenderer):
-    encoder_class = MyJsonEncoder
-
-
 api = NinjaAPI(auth=[BearerAuth(), ApiKey()], renderer=MyJsonRenderer())
 
 
@@ -49,8 +49,9 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'common.fu_query_budget.QueryBudgetMiddleware',  # SQL 查询预算（QUERY_BUDGET_ENABLE 控制）
     # 'common.middleware.SecurityHeadersMiddleware',  # 新增安全头中间件
-    # 'common.middleware.ApiLoggingMiddleware',
+    'common.middleware.ApiLoggingMiddleware',  # 操作日志（API_LOG_ENABLE 控制）
 ]
 
 ROOT_URLCONF = 'application.urls'
@@ -298,10 +299,74 @@ API_WHITE_LIST = [
     # '/api/syscoretem/server_monitor/*',  # 服务器监控
 ]
 
+# 部门闭包表（祖先-后代索引），开启后部门子树查询走索引表
+# 首次开启需调用 /api/core/dept/closure/rebuild 重建索引
+DEPT_CLOSURE_ENABLE = False
+
+# 分页总数统计策略：表行数（估算）低于阈值时精确 COUNT，超过阈值时使用数据库估算值
+# 大表的统计结果按过滤条件缓存 PAGINATION_COUNT_CACHE_TIMEOUT 秒
+PAGINATION_EXACT_COUNT_THRESHOLD = 100000
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+# 后台导入导出任务：celery 投递到 Celery（投递失败时退回进程内线程），thread 直接在进程内线程执行
+# 任务状态在 Redis 中保留 ASYNC_JOB_TIMEOUT 秒，导出文件保存在文件管理的 ASYNC_JOB_FILE_FOLDER 目录下
+ASYNC_JOB_BACKEND = 'celery'
+ASYNC_JOB_TIMEOUT = 86400
+ASYNC_JOB_FILE_FOLDER = 'async_job'
+
+# 单请求 SQL 查询预算（N+1 检测）：超出时记录告警并输出 X-DB-* 响应头
+# QUERY_BUDGET_ROUTES 按路径前缀覆盖查询次数预算（最长前缀优先），core 模块每个子路由一项
+QUERY_BUDGET_ENABLE = DEBUG
+QUERY_BUDGET_MAX_QUERIES = 30
+QUERY_BUDGET_MAX_DB_TIME_MS = 500
+QUERY_BUDGET_REPEAT_THRESHOLD = 5
+QUERY_BUDGET_ALWAYS_HEADER = False
+QUERY_BUDGET_ROUTES = {
+    # 认证
+    '/api/core/login': 10,
+    '/api/core/logout': 5,
+    '/api/core/refresh_token': 5,
+    '/api/core/userinfo': 10,
+    '/api/core/permCode': 10,
+    # 组织与权限（列表接口：计数 + 分页数据 + 预加载关联）
+    '/api/core/user': 15,
+    '/api/core/profile': 10,
+    '/api/core/role': 15,
+    '/api/core/permission': 15,
+    '/api/core/dept': 15,
+    '/api/core/post': 15,
+    '/api/core/menu': 15,
+    '/api/core/dict': 10,
+    '/api/core/dict_item': 10,
+    # 日志与监控
+    '/api/core/login-log': 10,
+    '/api/core/server_monitor': 5,
+    '/api/core/redis_monitor': 5,
+    '/api/core/redis_manager': 5,
+    '/api/core/database_monitor': 10,
+    '/api/core/database_manager': 10,
+    # 文件、OAuth、后台任务、搜索
+    '/api/core/file_manager': 15,
+    '/api/core/oauth': 10,
+    '/api/core/async-job': 5,
+    '/api/core/search': 10,
+}
+
+# 统一搜索索引（用户、部门、菜单、角色、岗位、权限），首次开启需调用 /api/core/search/rebuild 重建索引
+# SEARCH_BACKEND：auto（PostgreSQL 使用 pg_trgm，其他数据库使用二元组倒排表）、postgres、ngram
+SEARCH_INDEX_ENABLE = False
+SEARCH_BACKEND = 'auto'
+
 API_LOG_ENABLE = False
 ENABLE_LOGIN_ANALYSIS_LOG = False
 API_LOG_METHODS = ['POST', 'GET', 'DELETE', 'PUT']
 API_MODEL_MAP = {}
+# 操作日志写入缓冲区：请求线程只入队，后台线程每批 API_LOG_BATCH_SIZE 条或每 API_LOG_FLUSH_INTERVAL 秒写入一次
+# 队列超过 API_LOG_BUFFER_SIZE 条时丢弃新日志（计数并告警），不阻塞请求
+API_LOG_BUFFER_SIZE = 10000
+API_LOG_BATCH_SIZE = 200
+API_LOG_FLUSH_INTERVAL = 1.0
+API_LOG_BODY_MAX_LENGTH = 2000
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -360,6 +425,47 @@ AZURE_ACCOUNT_NAME = ''
 AZURE_ACCOUNT_KEY = ''
 AZURE_CONTAINER_NAME = ''
 
+# 分块上传（非直传）时分块的临时目录
+FILE_UPLOAD_CHUNK_DIR = os.path.join(BASE_DIR, 'media', 'chunk_uploads')
+
+# 分块直传：存储类型为 oss / minio / azure 时，初始化分块上传传入 direct=true，
+# 客户端通过预签名URL直接把分块上传到对象存储，应用服务器只负责创建和完成分块上传
+FILE_UPLOAD_DIRECT_ENABLE = True
+# 分块预签名URL有效期（秒）
+FILE_UPLOAD_PART_URL_EXPIRES = 3600
+# 初始化时一次返回的预签名URL数量，其余分块通过 /chunk/presign 获取
+FILE_UPLOAD_PART_URL_BATCH = 100
+
+# 本地存储文件下载交给前置代理发送：'' 由 Django 分块发送，'nginx' 使用 X-Accel-Redirect，
+# 'apache' 使用 X-Sendfile（Apache mod_xsendfile / lighttpd）
+FILE_DOWNLOAD_OFFLOAD = ''
+# X-Accel-Redirect 的内部路径前缀，需要在 nginx 中配置对应的 internal location，例如：
+#   location /protected-files/ { internal; alias /path/to/media/; }
+FILE_DOWNLOAD_ACCEL_PREFIX = '/protected-files/'
+# 文件内容引用计数降为 0 后保留的时间（秒），超过后由定时任务
+# scheduler.module.executor.cleanup_file_blobs 删除存储文件
+FILE_BLOB_GC_GRACE = 3600
+# Minio 预签名下载URL有效期（秒）
+FILE_PRESIGNED_URL_EXPIRES = 3600
+# 预签名URL签名时间段（秒）：同一时间段内URL相同并缓存到时间段结束，需小于有效期
+FILE_PRESIGNED_URL_BUCKET = 1800
+
+# 缩略图 / 预览图：上传完成后在后台进程池中生成（图片需安装 Pillow，PDF 第一页需同时安装 PyMuPDF）
+FILE_THUMBNAIL_ENABLE = True
+# 生成缩略图的进程数
+FILE_THUMBNAIL_WORKERS = 2
+# 缩略图、预览图的最大边长（像素）
+FILE_THUMBNAIL_SIZE = 256
+FILE_PREVIEW_SIZE = 1280
+# JPEG 质量
+FILE_THUMBNAIL_QUALITY = 80
+# 超过该大小（字节）的源文件不生成缩略图
+FILE_THUMBNAIL_MAX_SOURCE_SIZE = 100 * 1024 * 1024
+# 单个文件生成超时时间（秒）
+FILE_THUMBNAIL_TIMEOUT = 60
+# 缩略图保存目录（与源文件使用同一个存储后端）
+FILE_THUMBNAIL_FOLDER = 'thumbnails'
+
 # ================================================= #
 # ********************* AAD配置 ******************* #
 # ================================================= #
@@ -0,0 +1,27 @@
+"""
+测试配置：SQLite 内存数据库 + 本地内存缓存，不依赖 MySQL / Redis
+
+运行：python manage.py test --settings=application.test_settings
+"""
+from application.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# 迁移文件不纳入版本管理，测试时直接按模型建表
+MIGRATION_MODULES = {app: None for app in ('core', 'scheduler', 'problem')}
+
+# 后台任务在进程内执行，不连接 Celery
+ASYNC_JOB_BACKEND = 'thread'
+# 缩略图在测试中同步调用 FileThumbnailService.generate，不在请求后启动后台线程
+FILE_THUMBNAIL_ENABLE = False
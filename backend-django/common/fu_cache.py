@@ -10,6 +10,7 @@
 4. 锁定机制 - 防暴力破解
 5. 临时数据 - 验证码、临时令牌
 """
+import hashlib
 import logging
 from typing import Any, Optional, Callable
 from functools import wraps
@@ -66,6 +67,7 @@ class CacheKeyPrefix:
     DEPT = "cache:dept"  # 部门
     ROLE = "cache:role"  # 角色
     PERMISSION = "cache:permission"  # 权限
+    MENU_PERMISSION_TREE = "cache:menu_permission_tree"  # 菜单权限树骨架（与角色无关）
     
     # 会话和认证
     USER = "cache:user"  # 用户信息
@@ -88,6 +90,15 @@ class CacheKeyPrefix:
     # 系统配置
     SYSTEM_CONFIG = "cache:system_config"  # 系统配置
     WHITE_API_LIST = "cache:white_api_list"  # 白名单API
+    
+    # 分页
+    QUERY_COUNT = "cache:query_count"  # 分页总数
+    
+    # 后台任务
+    ASYNC_JOB = "cache:async_job"  # 导入导出任务状态
+    
+    # 接口响应
+    RESPONSE = "cache:response"  # 已序列化的接口响应
 
 
 # ===============================================================
@@ -172,6 +183,76 @@ def cache_list(timeout: int = 300, key_prefix: str = "cache:list"):
     return decorator
 
 
+def cache_response(
+        namespace: str,
+        schema: Any,
+        key: Optional[Callable[..., Optional[str]]] = None,
+        timeout: int = CacheStrategy.DATA_CACHE_LONG,
+):
+    """
+    接口响应缓存装饰器（缓存序列化后的 JSON 字节串）
+
+    - 命中时直接返回缓存的字节串，不再进行 Schema 校验和序列化
+    - 响应带强 ETag（数据版本号 + 内容摘要），请求头 If-None-Match 匹配时返回 304
+    - 数据变更时调用 ResponseCacheManager.invalidate(namespace) 使该命名空间下的缓存全部失效
+
+    :param namespace: 数据命名空间（如 dept、menu），用于版本号失效
+    :param schema: 接口的响应类型（与 @router.get 的 response 一致），用于未命中时序列化
+    :param key: 由视图参数生成缓存键（如 lambda code: code），返回 None 时不使用缓存
+    :param timeout: 缓存超时时间（秒）
+
+    使用示例：
+        @router.get("/dict_item/by/dict_code/{code}", response=List[DictItemSchemaOut])
+        @cache_response('dict', List[DictItemSchemaOut], key=lambda code: code)
+        def list_dict_item_by_dict_code(request, code: str):
+            ...
+    """
+    from pydantic import TypeAdapter
+
+    adapter = TypeAdapter(schema)
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(request, *args, **kwargs) -> Any:
+            from django.db.models import QuerySet
+            from django.http import HttpResponse, HttpResponseNotModified
+            from common.fu_renderer import dumps, json_bytes_response
+
+            cache_key = key(*args, **kwargs) if key else ''
+            if cache_key is None:
+                return func(request, *args, **kwargs)
+
+            version = ResponseCacheManager.get_version(namespace)
+            entry = ResponseCacheManager.get(namespace, version, cache_key)
+            if entry is None:
+                result = func(request, *args, **kwargs)
+                if isinstance(result, HttpResponse):
+                    return result
+                if isinstance(result, QuerySet):
+                    result = list(result)
+                data = adapter.dump_python(adapter.validate_python(result, context={'request': request}))
+                entry = ResponseCacheManager.set(namespace, version, cache_key, dumps(data), timeout)
+
+            etag, content = entry
+            if etag in _parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+            else:
+                response = json_bytes_response(content)
+            response['ETag'] = etag
+            # 客户端每次都需要用 ETag 向服务端确认
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return wrapper
+    return decorator
+
+
+def _parse_etags(header: str) -> set:
+    if not header:
+        return set()
+    return {etag.strip().removeprefix('W/') for etag in header.split(',')}
+
+
 # ===============================================================
 # 缓存管理工具类
 # ===============================================================
@@ -555,6 +636,12 @@ class MenuCacheManager:
         CacheManager.clear_by_prefix(f"{CacheKeyPrefix.USER_MENUS}")
         CacheManager.clear_by_prefix(f"{CacheKeyPrefix.MENU}:route")
         
+        # 菜单结构变化，菜单权限树骨架需要重建
+        PermissionCacheManager.invalidate_menu_permission_tree()
+        
+        # 菜单树接口；权限列表中包含菜单名称
+        ResponseCacheManager.invalidate('menu', 'permission')
+        
         logger.info("所有菜单缓存已清除")
     
     @staticmethod
@@ -585,6 +672,7 @@ class PermissionCacheManager:
     USER_VERSION_KEY = "user_permission_version:{}"
     ROLE_VERSION_KEY = "role_permission_version:{}"
     GLOBAL_VERSION_KEY = "global_permission_version"
+    MENU_PERMISSION_TREE_VERSION_KEY = "menu_permission_tree_version"
     VERSION_EXPIRE_TIME = 86400  # 24小时
     
     # ===============================================================
@@ -638,6 +726,43 @@ class PermissionCacheManager:
         global_version = cache.get(PermissionCacheManager.GLOBAL_VERSION_KEY, 0)
         return f"v{user_version}_{global_version}"
     
+    # ===============================================================
+    # 菜单权限树骨架（角色无关部分，按版本号缓存）
+    # ===============================================================
+    
+    @staticmethod
+    def get_menu_permission_tree_version() -> int:
+        """获取菜单权限树骨架的版本号"""
+        return cache.get(PermissionCacheManager.MENU_PERMISSION_TREE_VERSION_KEY, 0)
+    
+    @staticmethod
+    def invalidate_menu_permission_tree() -> None:
+        """
+        使菜单权限树骨架失效
+        菜单或权限发生增删改时调用，旧版本的骨架随缓存超时自然淘汰
+        """
+        key = PermissionCacheManager.MENU_PERMISSION_TREE_VERSION_KEY
+        try:
+            version = cache.incr(key)
+        except ValueError:
+            version = 1
+            # 版本号不设置超时，避免过期后回退到旧版本号命中旧骨架
+            cache.set(key, version, None)
+        logger.info(f"菜单权限树骨架已失效，版本号: {version}")
+    
+    @staticmethod
+    def get_menu_permission_tree(version: int):
+        """获取指定版本的菜单权限树骨架"""
+        cache_key = f"{CacheKeyPrefix.MENU_PERMISSION_TREE}:v{version}"
+        return CacheManager.get(cache_key)
+    
+    @staticmethod
+    def set_menu_permission_tree(version: int, skeleton) -> None:
+        """缓存指定版本的菜单权限树骨架"""
+        cache_key = f"{CacheKeyPrefix.MENU_PERMISSION_TREE}:v{version}"
+        CacheManager.set(cache_key, skeleton, CacheStrategy.MENU_CACHE)
+        logger.debug(f"菜单权限树骨架已缓存: v{version}")
+    
     # ===============================================================
     # 权限数据缓存
     # ===============================================================
@@ -706,6 +831,11 @@ class PermissionCacheManager:
         # 清除用户权限缓存（因为权限变更了）
         CacheManager.clear_by_prefix(f"{CacheKeyPrefix.USER_PERMISSION}")
         
+        # 权限目录变化，菜单权限树骨架需要重建
+        PermissionCacheManager.invalidate_menu_permission_tree()
+        
+        ResponseCacheManager.invalidate('permission')
+        
         logger.info("所有权限缓存已清除")
     
     @staticmethod
@@ -730,9 +860,72 @@ class PermissionCacheManager:
         """清除特定菜单的权限缓存"""
         cache_key = f"{CacheKeyPrefix.PERMISSION}:menu:{menu_id}"
         CacheManager.delete(cache_key)
+        PermissionCacheManager.invalidate_menu_permission_tree()
         logger.info(f"菜单权限缓存已清除: {menu_id}")
 
 
+# ===============================================================
+# 接口响应缓存管理类
+# ===============================================================
+
+class ResponseCacheManager:
+    """
+    已序列化接口响应的缓存管理（配合 cache_response 装饰器使用）
+
+    每个命名空间一个版本号，缓存键中带版本号，失效时只需递增版本号，
+    旧版本的缓存随超时自然淘汰。
+    """
+    
+    VERSION_KEY = "response_version:{}"
+    
+    @staticmethod
+    def get_version(namespace: str) -> int:
+        """获取命名空间的数据版本号"""
+        return cache.get(ResponseCacheManager.VERSION_KEY.format(namespace), 0)
+    
+    @staticmethod
+    def invalidate(*namespaces: str) -> None:
+        """使命名空间下的所有接口响应缓存失效"""
+        for namespace in namespaces:
+            key = ResponseCacheManager.VERSION_KEY.format(namespace)
+            try:
+                version = cache.incr(key)
+            except ValueError:
+                version = 1
+                # 版本号不设置超时，避免过期后回退到旧版本号命中旧缓存
+                cache.set(key, version, None)
+            logger.debug(f"接口响应缓存已失效: {namespace} (版本号: {version})")
+    
+    @staticmethod
+    def _cache_key(namespace: str, version: int, key: str) -> str:
+        return f"{CacheKeyPrefix.RESPONSE}:{namespace}:v{version}:{key}"
+    
+    @staticmethod
+    def get(namespace: str, version: int, key: str = '') -> Optional[tuple]:
+        """获取指定版本的缓存响应，返回 (etag, content) 或 None"""
+        return CacheManager.get(ResponseCacheManager._cache_key(namespace, version, key))
+    
+    @staticmethod
+    def set(
+            namespace: str,
+            version: int,
+            key: str,
+            content: bytes,
+            timeout: int = CacheStrategy.DATA_CACHE_LONG,
+    ) -> tuple:
+        """
+        缓存序列化后的响应
+        
+        version 需在查询数据之前读取：生成期间数据发生变更时，结果写入旧版本号下，不会被之后的请求命中
+        
+        :return: (etag, content)
+        """
+        etag = f'"{namespace}-{version}-{hashlib.md5(content).hexdigest()}"'
+        entry = (etag, content)
+        CacheManager.set(ResponseCacheManager._cache_key(namespace, version, key), entry, timeout)
+        return entry
+
+
 # ===============================================================
 # 缓存预热
 # ===============================================================
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+分页总数统计策略
+
+列表接口每次翻页都要执行一次带完整过滤条件的 COUNT(*)，在大表上代价很高。
+这里按表的规模选择统计方式：
+1. 小表（估算行数低于阈值）：直接精确 COUNT，不缓存
+2. 大表无过滤条件：使用数据库统计信息中的表行数（PostgreSQL pg_class.reltuples / MySQL TABLE_ROWS）
+3. 大表有过滤条件：使用 PostgreSQL 执行计划的估算行数；估算结果小于阈值时改为精确 COUNT
+4. 无法估算时精确 COUNT
+表的估算行数按表名、大表的统计结果按 "表名 + 过滤条件SQL哈希" 短时间缓存。
+"""
+import hashlib
+import json
+import logging
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import QuerySet
+
+from common.fu_cache import CacheKeyPrefix, CacheManager
+
+logger = logging.getLogger(__name__)
+
+
+def _exact_count_threshold() -> int:
+    return getattr(settings, 'PAGINATION_EXACT_COUNT_THRESHOLD', 100000)
+
+
+def _count_cache_timeout() -> int:
+    return getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60)
+
+
+def get_count_cache_key(queryset: QuerySet) -> str:
+    """
+    生成统计结果的缓存键：表名 + 去掉排序后的 SQL 及参数的哈希
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(f"{sql}|{params!r}".encode('utf-8')).hexdigest()
+    return f"{CacheKeyPrefix.QUERY_COUNT}:{queryset.model._meta.db_table}:{digest}"
+
+
+def estimate_table_rows(queryset: QuerySet) -> Optional[int]:
+    """
+    从数据库统计信息中读取表的估算行数
+
+    :return: 估算行数，数据库不支持或统计信息不可用时返回 None
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table])
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    [table],
+                )
+            else:
+                return None
+            row = cursor.fetchone()
+    except Exception as e:
+        logger.warning(f"读取表行数估算失败: {table}, {e}")
+        return None
+
+    # PostgreSQL 从未 ANALYZE 过的表 reltuples 为 -1
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def get_table_rows(queryset: QuerySet) -> Optional[int]:
+    """
+    获取表的估算行数（按表名缓存 PAGINATION_COUNT_CACHE_TIMEOUT 秒，避免每次统计前都查询统计信息）
+    """
+    if connections[queryset.db].vendor not in ('postgresql', 'mysql'):
+        return None
+    cache_key = f"{CacheKeyPrefix.QUERY_COUNT}:{queryset.model._meta.db_table}:table_rows"
+    cached = CacheManager.get(cache_key)
+    if cached is not None:
+        # 以元组缓存，估算失败（None）也会被缓存
+        return cached[0]
+    table_rows = estimate_table_rows(queryset)
+    CacheManager.set(cache_key, (table_rows,), _count_cache_timeout())
+    return table_rows
+
+
+def estimate_query_rows(queryset: QuerySet) -> Optional[int]:
+    """
+    使用执行计划估算查询结果行数（仅 PostgreSQL）
+
+    :return: 估算行数，不支持时返回 None
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    try:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f"执行计划估算失败: {queryset.model._meta.db_table}, {e}")
+        return None
+
+
+def _has_filters(queryset: QuerySet) -> bool:
+    return bool(queryset.query.where)
+
+
+def count_queryset(queryset) -> Tuple[int, bool]:
+    """
+    按统计策略获取查询结果总数
+
+    :param queryset: 查询集（也兼容列表）
+    :return: (总数, 是否为精确值)
+    """
+    if not isinstance(queryset, QuerySet):
+        return len(queryset), True
+
+    threshold = _exact_count_threshold()
+    table_rows = get_table_rows(queryset)
+    if table_rows is None or table_rows < threshold:
+        return queryset.count(), True
+
+    cache_key = get_count_cache_key(queryset)
+    cached = CacheManager.get(cache_key)
+    if cached is not None:
+        return cached[0], cached[1]
+
+    if _has_filters(queryset):
+        estimated = estimate_query_rows(queryset)
+    else:
+        estimated = table_rows
+
+    if estimated is None or estimated < threshold:
+        result = (queryset.count(), True)
+    else:
+        result = (estimated, False)
+
+    CacheManager.set(cache_key, result, _count_cache_timeout())
+    return result
@@ -7,21 +7,22 @@
 import os
 import uuid
 from datetime import datetime
-from typing import Any, Type
+from typing import Any, Callable, Dict, Optional, Sequence, Type
 
 import openpyxl
+from django.db import transaction
 from django.db.models import Model, QuerySet
-from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from ninja import Schema
-from openpyxl.reader.excel import load_workbook
 
 from application.settings import BASE_DIR, STATIC_URL
 from common.fu_auth import get_user_by_token
+from common.fu_projection import project_queryset
 from common.fu_schema import FuFilters
 from urllib.parse import unquote
 
-from common.utils.excel_utils import dict_to_excel
+from common.utils.export_utils import streaming_export_response
+from common.utils.import_utils import IMPORT_BATCH_SIZE, bulk_import
 # from system.user.user_model import User
 # from system.user.user_schema import UserSchemaGetNameIn
 
@@ -60,6 +61,98 @@ def batch_delete(ids: list[str], model: Type[Model]) -> int:
     return count
 
 
+# 批量更新时每条 UPDATE 最多包含的ID数量（避免超出数据库的参数数量限制）
+BATCH_UPDATE_CHUNK_SIZE = 1000
+
+
+def _modifier_values(request, model: Type[Model]) -> dict:
+    """QuerySet.update / bulk_update 不会触发 auto_now，这里补上修改人和修改时间"""
+    names = {field.name for field in model._meta.concrete_fields}
+    values = {}
+    if 'sys_update_datetime' in names:
+        values['sys_update_datetime'] = datetime.now()
+    user_info = getattr(request, 'auth', None)
+    if 'sys_modifier' in names and user_info is not None:
+        values['sys_modifier_id'] = user_info.id
+    return values
+
+
+def batch_update(request, model: Type[Model], ids: Optional[Sequence[str]], values: dict,
+                 queryset: QuerySet = None, on_updated: Callable[[int], None] = None,
+                 chunk_size: int = BATCH_UPDATE_CHUNK_SIZE) -> int:
+    """
+    批量更新为相同的值：UPDATE ... SET ... WHERE id IN (...)
+
+    参数:
+    - request: HttpRequest对象，用于记录修改人
+    - model: Django模型类
+    - ids: 要更新的ID列表，按 chunk_size 分段（每段一条 UPDATE）；为 None 时直接更新 queryset
+    - values: 要更新的字段值
+    - queryset: 附加过滤条件的查询集（如排除系统数据），默认 model.objects.all()
+    - on_updated: 有数据被更新时调用一次 on_updated(count)，用于清除缓存
+    - chunk_size: 每条 UPDATE 包含的ID数量
+
+    返回值:
+    - 实际更新的行数
+    """
+    if queryset is None:
+        queryset = model.objects.all()
+    values = {**_modifier_values(request, model), **values}
+
+    count = 0
+    with transaction.atomic():
+        if ids is None:
+            count = queryset.update(**values)
+        else:
+            ids = list(dict.fromkeys(str(item) for item in ids))
+            for start in range(0, len(ids), chunk_size):
+                count += queryset.filter(id__in=ids[start:start + chunk_size]).update(**values)
+
+    if count and on_updated:
+        on_updated(count)
+    return count
+
+
+def batch_update_rows(request, model: Type[Model], rows: Dict[str, dict], queryset: QuerySet = None,
+                      on_updated: Callable[[int], None] = None,
+                      chunk_size: int = BATCH_UPDATE_CHUNK_SIZE) -> int:
+    """
+    批量更新为各自不同的值：按 chunk_size 分批 bulk_update（每批一条 UPDATE ... CASE WHEN ...）
+
+    参数:
+    - rows: {ID: {字段: 值}}
+    - queryset: 附加过滤条件的查询集，不满足条件的ID会被跳过
+    - 其余参数同 batch_update
+
+    返回值:
+    - 实际更新的行数
+    """
+    if not rows:
+        return 0
+    if queryset is None:
+        queryset = model.objects.all()
+    modifier_values = _modifier_values(request, model)
+    rows = {str(key): value for key, value in rows.items()}
+
+    count = 0
+    with transaction.atomic():
+        ids = list(rows)
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            existing = queryset.filter(id__in=chunk).values_list('id', flat=True)
+            instances = [model(pk=pk, **modifier_values, **rows[str(pk)]) for pk in existing]
+            if not instances:
+                continue
+            fields = set(modifier_values)
+            for instance in instances:
+                fields.update(rows[str(instance.pk)])
+            count += model.objects.bulk_update(instances, sorted(fields))
+
+    if count and on_updated:
+        on_updated(count)
+    return count
+
+
 def update(request, id: str, data: dict | Schema, model: Type[Model]) -> Type[Model]:
     user_info = request.auth
     if not isinstance(data, dict):
@@ -72,7 +165,15 @@ def update(request, id: str, data: dict | Schema, model: Type[Model]) -> Type[Mo
     return instance
 
 
-def retrieve(request, model: Type[Model], filters: FuFilters = FuFilters()) -> QuerySet:
+def retrieve(request, model: Type[Model], filters: FuFilters = FuFilters(), projection=None,
+             projection_extra: Sequence[str] = ()) -> QuerySet:
+    """
+    查询数据
+
+    - filters: 过滤条件
+    - projection: 输出 Schema，传入时只查询 Schema 需要的列（见 common.fu_projection）
+    - projection_extra: resolver 中用到的额外字段路径
+    """
     query_set = model.objects.all()
     if filters is not None:
         # 将filters空字符串转换为None
@@ -80,6 +181,8 @@ def retrieve(request, model: Type[Model], filters: FuFilters = FuFilters()) -> Q
             if getattr(filters, attr) == '':
                 setattr(filters, attr, None)
         query_set = filters.filter(query_set)
+    if projection is not None:
+        query_set = project_queryset(query_set, projection, projection_extra)
     return query_set
 
 
@@ -90,76 +193,73 @@ def get_or_none(model: Type[Model], *args, **kwargs):
         return None
 
 
-def export_data(request, model, scheme, export_fields):
+def export_data(request, model, scheme, export_fields, queryset: QuerySet = None, file_format: str = 'xlsx',
+                filename: str = None):
     """
-    导出数据为Excel文件。
+    流式导出数据为 Excel / CSV 文件。
 
     参数:
     - request: HttpRequest对象，表示客户端请求。
     - model: Django模型类，指定要导出数据的模型。
-    - scheme: 表示数据转换规则的对象，用于将ORM对象转换为字典。
-    - export_fields: 包含要导出的字段名的列表。
+    - scheme: 保留参数（兼容旧调用），导出直接按字段读取，不再逐行转换为 Schema。
+    - export_fields: 包含要导出的字段名的列表，支持关联字段（如 dept__name），表头取字段的 help_text。
+    - queryset: 已过滤的查询集，默认导出全部数据。
+    - file_format: 导出格式 xlsx / csv / tsv。
+    - filename: 下载文件名（不含扩展名），默认使用模型名称加时间戳。
 
     返回值:
-    - FileResponse对象，提供下载Excel文件。
+    - StreamingHttpResponse对象，边查询边输出，内存占用与数据量无关。
     """
+    if queryset is None:
+        queryset = retrieve(request, model)
+    if not filename:
+        filename = f"{model._meta.verbose_name or model.__name__}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    return streaming_export_response(queryset, export_fields, filename, file_format=file_format)
 
-    title_dict = {}
-    # 根据export_fields列表获取字段的显示名称
-    for field in export_fields:
-        field_obj = getattr(model, field).field
-        title_dict[field] = field_obj.help_text
 
-    qs = retrieve(request, model)
-    list_data = []
-    # 将查询集中的每一项转换为指定格式的字典
-    for qs_item in qs:
-        qs_item = scheme.from_orm(qs_item)
-        dict_data = {}
-        for item, value in title_dict.items():
-            dict_data[value] = getattr(qs_item, item)
-        list_data.append(dict_data)
+def get_import_file_path(path: str) -> str:
+    """上传接口返回的相对路径 -> 服务器上的文件路径"""
+    return str(BASE_DIR) + '/' + unquote(path)
 
-    file_url = dict_to_excel(list_data)
-    # 返回供下载的文件响应
-    return FileResponse(open(file_url, "rb"), as_attachment=True)
 
-
-def import_data(request, model, scheme, data, import_fields):
+def import_data(request, model, scheme, data, import_fields, unique_field: str = None, upsert: bool = False,
+                batch_size: int = IMPORT_BATCH_SIZE, value_maps: dict = None, prepare=None,
+                header_aliases: dict = None):
     """
-    导入数据到指定模型
+    批量导入数据到指定模型
 
     参数:
     - request: HttpRequest对象，表示客户端请求
     - model: Django模型类，数据将被导入到这个模型
-    - scheme: 一个函数，用于根据给定的数据字典创建模型实例
+    - scheme: 用于校验每行数据的 Schema
     - data: 包含要导入文件信息的对象，比如上传的Excel文件
-    - import_fields: 一个列表，指定模型中需要导入的字段名
+    - import_fields: 一个列表，指定模型中需要导入的字段名（表头为字段的 help_text）
+    - unique_field: 自然键字段（如 code），用于识别已存在的数据
+    - upsert: 自然键已存在时是否更新，否则该行记为错误
+    - batch_size: 每批写入的行数，每批一个事务
+    - value_maps: 字段 -> {显示值: 存储值}
+    - prepare: 保存前对模型实例的处理函数 prepare(instance, is_new)
+    - header_aliases: 额外的 表头 -> 字段名 映射
 
     返回值:
-    - FuResponse对象，包含导入结果的消息
+    - dict，包含导入统计和逐行错误报告
     """
-    title_dict = {}  # 字段名与Excel列对应的字典
-    for field in import_fields:
-        field_obj = getattr(model, field).field
-        title_dict[field_obj.help_text] = field_obj.column
-    # 文件路径处理
-    file_path = str(BASE_DIR) + '/' + unquote(data.path)
-    # 加载Excel工作簿
-    wb = load_workbook(file_path)
-    ws = wb.active  # 获取活动工作表
-    title_value = []
-    for index_row, row in enumerate(ws.values):
-        if index_row == 0:
-            title_value = row  # 读取Excel表头
-        else:
-            dict_data = {}  # 存储每一行数据转换后的字典
-            for index, cell in enumerate(row):
-                title_cell = title_value[index]
-                value = title_dict.get(title_cell)  # 根据表头查找对应字段
-                if value is not None:
-                    dict_data[value] = cell
-            print(dict_data)  # 打印处理后的数据，用于调试
-            data = scheme(**dict_data)  # 根据处理后的字典创建模型实例
-            create(request, data, model)  # 在数据库中创建模型实例
-    return {"msg": "导入成功"}  # 返回成功消息
\ No newline at end of file
+    file_path = get_import_file_path(data.path)
+    defaults = {}
+    user_info = getattr(request, 'auth', None)
+    if user_info is not None and hasattr(model, 'sys_creator_id'):
+        defaults["sys_creator_id"] = user_info.id
+    result = bulk_import(
+        model,
+        scheme,
+        file_path,
+        import_fields,
+        unique_field=unique_field,
+        upsert=upsert,
+        batch_size=batch_size,
+        value_maps=value_maps,
+        defaults=defaults,
+        prepare=prepare,
+        header_aliases=header_aliases,
+    )
+    return result.to_dict()
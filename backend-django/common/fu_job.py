@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+后台导入导出任务
+
+大批量导出/导入放在 HTTP 请求中执行容易被代理超时中断，这里把它们提交为后台任务：
+1. 接口只负责创建任务并投递到 Celery（Celery 不可用时退回到进程内线程执行），立即返回任务ID
+2. 任务状态和进度保存在 Redis 中，前端可轮询 /async-job/{job_id}
+3. 状态变化和进度同时通过 NotificationConsumer（notifications_user_{user_id} 组）推送
+4. 导出结果通过 get_storage_backend() 保存，并登记为 FileManager 文件
+
+任务参数（查询条件、模型、Schema、转换函数等）与任务状态分开缓存，
+只要可以被 pickle（模块级函数、类、QuerySet.query）即可，Celery 消息中只传递任务ID。
+
+使用示例：
+    job = AsyncJobManager.submit_export(
+        request,
+        User.objects.filter(user_status=1),
+        fields=['username', 'name', 'dept__name'],
+        filename='用户数据',
+        file_format='xlsx',
+    )
+"""
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections
+from django.db.models import QuerySet
+
+from common.fu_cache import CacheKeyPrefix, CacheManager
+from common.fu_count import count_queryset
+from common.utils.export_utils import (
+    EXPORT_CONTENT_TYPES,
+    get_field_title,
+    iter_export_rows,
+    write_export_file,
+)
+from common.utils.import_utils import IMPORT_BATCH_SIZE, bulk_import, count_sheet_rows
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_STATUS_PENDING = 'pending'
+JOB_STATUS_RUNNING = 'running'
+JOB_STATUS_SUCCESS = 'success'
+JOB_STATUS_FAILED = 'failed'
+
+# 任务类型
+JOB_TYPE_EXPORT = 'export'
+JOB_TYPE_IMPORT = 'import'
+
+# 进度写入 Redis / 推送的最小间隔（秒）
+JOB_PROGRESS_INTERVAL = 1.0
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _job_timeout() -> int:
+    return getattr(settings, 'ASYNC_JOB_TIMEOUT', 86400)
+
+
+def _job_backend() -> str:
+    return getattr(settings, 'ASYNC_JOB_BACKEND', 'celery')
+
+
+def _now() -> str:
+    return datetime.now().strftime(DATETIME_FORMAT)
+
+
+class JobContext:
+    """任务执行上下文：汇报进度"""
+
+    def __init__(self, job: dict):
+        self.job_id = job['id']
+        self.user_id = job.get('user_id')
+        self.total: Optional[int] = None
+        self.processed = 0
+        self._last_report = 0.0
+
+    def set_total(self, total: Optional[int]) -> None:
+        self.total = total
+        self.report(force=True)
+
+    def advance(self, count: int = 1) -> None:
+        self.processed += count
+        self.report()
+
+    def set_processed(self, processed: int) -> None:
+        self.processed = processed
+        self.report()
+
+    def report(self, force: bool = False) -> None:
+        """按间隔写入进度，避免每行都访问 Redis"""
+        now = time.monotonic()
+        if not force and now - self._last_report < JOB_PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        progress = None
+        if self.total:
+            progress = min(int(self.processed * 100 / self.total), 99)
+        AsyncJobManager.update(
+            self.job_id,
+            notify=True,
+            processed=self.processed,
+            total=self.total,
+            progress=progress,
+        )
+
+    def track(self, rows):
+        """包装行迭代器，迭代时累计进度"""
+        for row in rows:
+            yield row
+            self.advance()
+
+
+class AsyncJobManager:
+    """后台任务管理器"""
+
+    @staticmethod
+    def get_job_key(job_id: str) -> str:
+        return f"{CacheKeyPrefix.ASYNC_JOB}:{job_id}"
+
+    @staticmethod
+    def get_params_key(job_id: str) -> str:
+        return f"{CacheKeyPrefix.ASYNC_JOB}:params:{job_id}"
+
+    # ===============================================================
+    # 任务状态
+    # ===============================================================
+
+    @staticmethod
+    def get(job_id: str) -> Optional[dict]:
+        """获取任务状态"""
+        return CacheManager.get(AsyncJobManager.get_job_key(str(job_id)))
+
+    @staticmethod
+    def save(job: dict) -> None:
+        CacheManager.set(AsyncJobManager.get_job_key(job['id']), job, _job_timeout())
+
+    @staticmethod
+    def update(job_id: str, notify: bool = False, **fields) -> Optional[dict]:
+        """
+        更新任务状态（只有执行任务的进程会写入，读-改-写无需加锁）
+
+        :param notify: 是否推送到用户的通知组
+        """
+        job = AsyncJobManager.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        AsyncJobManager.save(job)
+        if notify:
+            AsyncJobManager.notify(job)
+        return job
+
+    @staticmethod
+    def notify(job: dict) -> None:
+        """通过 NotificationConsumer 推送任务状态，推送失败不影响任务执行"""
+        if not job.get('user_id'):
+            return
+        messages = {
+            JOB_STATUS_PENDING: '任务已提交',
+            JOB_STATUS_RUNNING: '任务执行中',
+            JOB_STATUS_SUCCESS: '任务已完成',
+            JOB_STATUS_FAILED: '任务执行失败',
+        }
+        try:
+            from asgiref.sync import async_to_sync
+            from channels.layers import get_channel_layer
+
+            channel_layer = get_channel_layer()
+            if channel_layer is None:
+                return
+            async_to_sync(channel_layer.group_send)(
+                f"notifications_user_{job['user_id']}",
+                {
+                    'type': 'notification_message',
+                    'message': f"{job.get('title') or ''}{messages.get(job['status'], '')}",
+                    'data': {'category': 'async_job', 'job': job},
+                },
+            )
+        except Exception as e:
+            logger.warning(f"任务状态推送失败: {job['id']}, {e}")
+
+    # ===============================================================
+    # 提交与执行
+    # ===============================================================
+
+    @staticmethod
+    def submit(request, job_type: str, title: str, params: Dict[str, Any]) -> dict:
+        """
+        创建任务并投递执行
+
+        :param request: 当前请求（记录任务所属用户）
+        :param job_type: 任务类型 export / import
+        :param title: 任务名称，用于通知显示
+        :param params: 任务参数（需可被 pickle）
+        :return: 任务状态
+        """
+        user = getattr(request, 'auth', None)
+        job = {
+            'id': uuid.uuid4().hex,
+            'type': job_type,
+            'title': title,
+            'status': JOB_STATUS_PENDING,
+            'user_id': str(user.id) if user is not None else None,
+            'progress': 0,
+            'processed': 0,
+            'total': None,
+            'result': None,
+            'error': None,
+            'file_id': None,
+            'created_at': _now(),
+            'started_at': None,
+            'finished_at': None,
+        }
+        CacheManager.set(AsyncJobManager.get_params_key(job['id']), params, _job_timeout())
+        AsyncJobManager.save(job)
+        AsyncJobManager.enqueue(job['id'])
+        return job
+
+    @staticmethod
+    def enqueue(job_id: str) -> None:
+        """投递到 Celery；未启用或投递失败时在后台线程中执行"""
+        if _job_backend() == 'celery':
+            try:
+                from core.tasks import run_async_job
+                run_async_job.delay(job_id)
+                return
+            except Exception as e:
+                logger.warning(f"后台任务投递到 Celery 失败，改为进程内执行: {job_id}, {e}")
+        threading.Thread(target=AsyncJobManager.run_in_thread, args=(job_id,), daemon=True).start()
+
+    @staticmethod
+    def run_in_thread(job_id: str) -> None:
+        try:
+            AsyncJobManager.run(job_id)
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def run(job_id: str) -> Optional[dict]:
+        """执行任务（Celery worker 或后台线程中调用）"""
+        job = AsyncJobManager.get(job_id)
+        params = CacheManager.get(AsyncJobManager.get_params_key(job_id))
+        if job is None or params is None:
+            logger.warning(f"后台任务不存在或已过期: {job_id}")
+            return None
+        if job['status'] != JOB_STATUS_PENDING:
+            return job
+
+        runners = {
+            JOB_TYPE_EXPORT: AsyncJobManager._run_export,
+            JOB_TYPE_IMPORT: AsyncJobManager._run_import,
+        }
+        AsyncJobManager.update(job_id, notify=True, status=JOB_STATUS_RUNNING, started_at=_now())
+        context = JobContext(job)
+        try:
+            result = runners[job['type']](context, **params)
+        except Exception as e:
+            logger.exception(f"后台任务执行失败: {job_id}")
+            job = AsyncJobManager.update(
+                job_id,
+                notify=True,
+                status=JOB_STATUS_FAILED,
+                error=str(e),
+                processed=context.processed,
+                finished_at=_now(),
+            )
+        else:
+            job = AsyncJobManager.update(
+                job_id,
+                notify=True,
+                status=JOB_STATUS_SUCCESS,
+                progress=100,
+                processed=context.processed,
+                total=context.total if context.total is not None else context.processed,
+                finished_at=_now(),
+                **result,
+            )
+        CacheManager.delete(AsyncJobManager.get_params_key(job_id))
+        return job
+
+    # ===============================================================
+    # 导出
+    # ===============================================================
+
+    @staticmethod
+    def submit_export(
+            request,
+            queryset: QuerySet,
+            fields: Sequence[str],
+            filename: str,
+            file_format: str = 'xlsx',
+            titles: Optional[Sequence[str]] = None,
+            formatters: Optional[Dict[str, Callable[[Any], Any]]] = None,
+    ) -> dict:
+        """
+        提交后台导出任务
+
+        参数与 streaming_export_response 相同，formatters 需为可 pickle 的函数（如 choices_formatter）。
+
+        :raises ValueError: 不支持的导出格式
+        """
+        if file_format not in EXPORT_CONTENT_TYPES:
+            raise ValueError(f"不支持的导出格式: {file_format}")
+        params = {
+            'model': queryset.model,
+            'query': queryset.query,
+            'fields': list(fields),
+            'filename': f"{filename}.{file_format}",
+            'file_format': file_format,
+            'titles': list(titles) if titles else None,
+            'formatters': formatters,
+        }
+        return AsyncJobManager.submit(request, JOB_TYPE_EXPORT, f"导出{filename}", params)
+
+    @staticmethod
+    def _run_export(context: JobContext, model, query, fields: List[str], filename: str, file_format: str,
+                    titles: Optional[List[str]], formatters: Optional[dict]) -> dict:
+        queryset = model.objects.all()
+        queryset.query = query
+        context.set_total(count_queryset(queryset)[0])
+
+        headers = titles or [get_field_title(model, field) for field in fields]
+        rows = context.track(iter_export_rows(queryset, fields, formatters))
+        fd, file_path = tempfile.mkstemp(suffix=f'.{file_format}')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write_export_file(f, headers, rows, file_format)
+            file_obj = save_job_file(file_path, filename, context.user_id)
+        finally:
+            os.remove(file_path)
+        return {'file_id': str(file_obj.id), 'result': {'filename': filename, 'size': file_obj.size}}
+
+    # ===============================================================
+    # 导入
+    # ===============================================================
+
+    @staticmethod
+    def submit_import(
+            request,
+            model,
+            scheme,
+            file_path: str,
+            import_fields: Sequence[str],
+            title: str,
+            upsert: bool = False,
+            options: Optional[Callable[[], dict]] = None,
+            on_success: Optional[Callable[[dict], None]] = None,
+    ) -> dict:
+        """
+        提交后台导入任务
+
+        :param file_path: 服务器上的 Excel 文件路径（需 Web 与 Worker 均可访问）
+        :param options: 在任务中调用，返回 bulk_import 的其他参数（unique_field、value_maps、prepare 等），
+                        需为模块级函数；映射表在任务执行时才加载
+        :param on_success: 导入完成后的回调 on_success(result)，如清除缓存
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+        user = getattr(request, 'auth', None)
+        params = {
+            'model': model,
+            'scheme': scheme,
+            'file_path': file_path,
+            'import_fields': list(import_fields),
+            'upsert': upsert,
+            'options': options,
+            'on_success': on_success,
+            'creator_id': str(user.id) if user is not None else None,
+        }
+        return AsyncJobManager.submit(request, JOB_TYPE_IMPORT, title, params)
+
+    @staticmethod
+    def _run_import(context: JobContext, model, scheme, file_path: str, import_fields: List[str], upsert: bool,
+                    options: Optional[Callable[[], dict]], on_success: Optional[Callable[[dict], None]],
+                    creator_id: Optional[str]) -> dict:
+        context.set_total(count_sheet_rows(file_path))
+        defaults = {}
+        if creator_id and hasattr(model, 'sys_creator_id'):
+            defaults['sys_creator_id'] = creator_id
+        result = bulk_import(
+            model,
+            scheme,
+            file_path,
+            import_fields,
+            upsert=upsert,
+            batch_size=IMPORT_BATCH_SIZE,
+            defaults=defaults,
+            on_batch=lambda r: context.set_processed(r.total),
+            **(options() if options else {}),
+        ).to_dict()
+        if on_success:
+            on_success(result)
+        return {'result': result}
+
+
+def save_job_file(file_path: str, filename: str, user_id: Optional[str] = None):
+    """
+    把任务生成的文件保存到存储后端，并登记为 FileManager 文件
+
+    :return: FileManager 实例
+    """
+    from django.db import transaction
+
+    from core.file_manager.file_blob_service import FileBlobService
+    from core.file_manager.file_manager_model import FileManager
+    from core.file_manager.storage_backends import get_storage_backend
+
+    storage = get_storage_backend()
+    folder_path = getattr(settings, 'ASYNC_JOB_FILE_FOLDER', 'async_job')
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        # 写入的同时计算MD5，不再重新读取文件
+        storage_path, url, md5 = storage.save_and_hash(File(f, name=filename), filename, folder_path)
+
+    with transaction.atomic():
+        blob = FileBlobService.register(storage, md5, size, storage_path, url)
+        return FileManager.objects.create(
+            name=filename,
+            type='file',
+            parent=None,
+            path=filename,
+            size=size,
+            file_ext=os.path.splitext(filename)[1].lower(),
+            mime_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            storage_type=blob.storage_type,
+            storage_path=blob.storage_path,
+            url=blob.url,
+            md5=md5,
+            blob=blob,
+            is_public=False,
+            sys_creator_id=user_id,
+        )
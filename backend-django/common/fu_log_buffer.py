@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+日志写入缓冲区
+
+请求线程只把待写入的模型实例放入有界队列（不访问数据库），由后台线程按批 bulk_create：
+- 队列满时直接丢弃并计数（背压），不会阻塞请求
+- 队列达到一批的数量或超过刷新间隔时写入一次
+- 写入失败的批次计入 failed，不会重试，避免数据库故障时日志堆积
+- 进程退出时把剩余数据写完（atexit）
+
+配置（application/settings.py）：
+    API_LOG_BUFFER_SIZE = 10000       # 队列最大长度
+    API_LOG_BATCH_SIZE = 200          # 每批写入条数
+    API_LOG_FLUSH_INTERVAL = 1.0      # 刷新间隔（秒）
+
+使用示例：
+    buffer = LogBuffer(OperationLog, prepare=fill_user_agent)
+    buffer.submit(OperationLog(...))
+    buffer.stats()  # {'queued': 0, 'written': 10, 'dropped': 0, 'failed': 0}
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Type
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Model
+
+logger = logging.getLogger(__name__)
+
+# 丢弃告警的最小间隔（秒）
+DROP_WARNING_INTERVAL = 60
+
+
+class LogBuffer:
+    """有界异步写入缓冲区（每个进程一个后台写入线程）"""
+
+    def __init__(
+            self,
+            model: Type[Model],
+            max_size: Optional[int] = None,
+            batch_size: Optional[int] = None,
+            flush_interval: Optional[float] = None,
+            prepare: Optional[Callable[[Model], None]] = None,
+    ):
+        """
+        :param model: 写入的模型
+        :param max_size: 队列最大长度，超出后丢弃
+        :param batch_size: 每批写入条数
+        :param flush_interval: 刷新间隔（秒）
+        :param prepare: 写入前在后台线程中对实例的处理（如解析 User-Agent），避免占用请求时间
+        """
+        self.model = model
+        self.max_size = max_size or getattr(settings, 'API_LOG_BUFFER_SIZE', 10000)
+        self.batch_size = batch_size or getattr(settings, 'API_LOG_BATCH_SIZE', 200)
+        self.flush_interval = flush_interval or getattr(settings, 'API_LOG_FLUSH_INTERVAL', 1.0)
+        self.prepare = prepare
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._last_drop_warning = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, instance: Model) -> bool:
+        """
+        放入一条记录（不阻塞）
+
+        :return: 是否放入成功，队列已满时返回 False
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(instance)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                now = time.monotonic()
+                warn = now - self._last_drop_warning >= DROP_WARNING_INTERVAL
+                if warn:
+                    self._last_drop_warning = now
+            if warn:
+                logger.warning(f"{self.model.__name__} 写入缓冲区已满，累计丢弃 {self.dropped} 条")
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        """缓冲区统计"""
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    def flush(self) -> int:
+        """立即写入队列中的全部数据（进程退出、测试时使用），返回写入条数"""
+        count = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return count
+            count += self._write(batch)
+
+    def _ensure_worker(self) -> None:
+        # fork 之后子进程中的线程不存在，需要重新启动
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue(maxsize=self.max_size)
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"{self.model.__name__}LogBuffer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _drain(self, limit: int, timeout: Optional[float] = None) -> List[Model]:
+        """取出最多 limit 条；timeout 不为空时等待第一条数据"""
+        batch = []
+        try:
+            if timeout is not None:
+                batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < limit:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._drain(self.batch_size, timeout=self.flush_interval)
+            if not batch:
+                continue
+            # 数量不足一批时再等一个刷新间隔，合并为一次写入
+            if len(batch) < self.batch_size:
+                time.sleep(self.flush_interval)
+                batch.extend(self._drain(self.batch_size - len(batch)))
+            self._write(batch)
+
+    def _write(self, batch: List[Model]) -> int:
+        with self._flush_lock:
+            close_old_connections()
+            try:
+                if self.prepare:
+                    for instance in batch:
+                        self.prepare(instance)
+                self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+            except (DatabaseError, ValueError, TypeError) as e:
+                with self._lock:
+                    self.failed += len(batch)
+                logger.error(f"{self.model.__name__} 批量写入失败，丢弃 {len(batch)} 条: {e}")
+                return 0
+            finally:
+                close_old_connections()
+            with self._lock:
+                self.written += len(batch)
+            return len(batch)
+
+
+_buffers: Dict[Type[Model], LogBuffer] = {}
+_buffers_lock = threading.Lock()
+
+
+def get_log_buffer(model: Type[Model], prepare: Optional[Callable[[Model], None]] = None) -> LogBuffer:
+    """获取模型对应的写入缓冲区（进程内单例）"""
+    buffer = _buffers.get(model)
+    if buffer is None:
+        with _buffers_lock:
+            buffer = _buffers.get(model)
+            if buffer is None:
+                buffer = _buffers[model] = LogBuffer(model, prepare=prepare)
+    return buffer
+
+
+@atexit.register
+def _flush_all() -> None:
+    for buffer in list(_buffers.values()):
+        try:
+            buffer.flush()
+        except Exception as e:
+            logger.error(f"{buffer.model.__name__} 退出时写入日志失败: {e}")
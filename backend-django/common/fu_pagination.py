@@ -4,16 +4,45 @@
 # file: fu_pagination.py
 # author: 臧成龙
 # QQ: 939589097
+import base64
+import json
 from datetime import datetime, date
-from typing import Any, List
+from typing import Any, List, Optional, Sequence, Tuple
 
-from django.db.models import QuerySet
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q, QuerySet
 from ninja import Field, Schema
+from ninja.errors import HttpError
 from ninja.pagination import PaginationBase
 from ninja.types import DictStrAny
 
+from common.fu_count import count_queryset
+from common.fu_projection import project_queryset
 
-class MyPagination(PaginationBase):
+
+class ProjectionMixin:
+    """
+    按输出 Schema 裁剪分页查询的列（可选）
+
+    使用示例：
+        @paginate(MyPagination, projection=DeptUserSchema, projection_extra=('dept__name', 'post__name'))
+
+    :param projection: 输出 Schema，为空时不裁剪
+    :param projection_extra: resolver 中用到的额外字段路径
+    """
+
+    def __init__(self, *, projection: Any = None, projection_extra: Sequence[str] = (), **kwargs: Any) -> None:
+        self.projection = projection
+        self.projection_extra = tuple(projection_extra)
+        super().__init__(**kwargs)
+
+    def project(self, queryset, extra: Sequence[str] = ()):
+        if self.projection is None:
+            return queryset
+        return project_queryset(queryset, self.projection, self.projection_extra + tuple(extra))
+
+
+class MyPagination(ProjectionMixin, PaginationBase):
     class Input(Schema):
         pageSize: int = Field(10, gt=0)
         page: int = Field(1, gt=-1)
@@ -21,6 +50,8 @@ class MyPagination(PaginationBase):
     class Output(Schema):
         items: List[Any]
         total: int
+        # 大表上 total 可能为数据库估算值，此时为 False
+        total_exact: bool = True
 
     def paginate_queryset(
             self,
@@ -30,9 +61,170 @@ class MyPagination(PaginationBase):
     ) -> Any:
         offset = pagination.pageSize * (pagination.page - 1)
         limit: int = pagination.pageSize
+        total, total_exact = count_queryset(queryset)
         return {
             "page": offset,
             "limit": limit,
-            "items": queryset[offset: offset + limit],
-            "total": self._items_count(queryset),
+            "items": self.project(queryset)[offset: offset + limit],
+            "total": total,
+            "total_exact": total_exact,
         }  # noqa: E203
+
+
+class CursorPagination(ProjectionMixin, PaginationBase):
+    """
+    游标（keyset）分页
+
+    按 (排序字段..., id) 的组合值定位，翻页条件为 WHERE (排序键) > (上一页最后一条)，
+    不使用 OFFSET，深度翻页的耗时与页码无关；默认不统计总数，需要时传 includeTotal=true。
+
+    使用示例：
+        @router.get("/login-log/cursor", response=List[LoginLogSchemaOut])
+        @paginate(CursorPagination, ordering=('-sys_create_datetime',))
+        def list_login_logs_by_cursor(request, filters: LoginLogFilters = Query(...)):
+            return retrieve(request, LoginLog, filters)
+
+    注意：排序字段必须是模型上的非空字段，最好有 (排序字段, id) 联合索引。
+    同样支持 projection / projection_extra 参数按输出 Schema 裁剪列（见 ProjectionMixin）。
+    """
+
+    class Input(Schema):
+        pageSize: int = Field(10, gt=0, le=1000)
+        cursor: Optional[str] = Field(None, description="分页游标，取自上一次响应的 next_cursor / prev_cursor")
+        includeTotal: bool = Field(False, description="是否统计总数（大表上代价较高）")
+
+    class Output(Schema):
+        items: List[Any]
+        total: Optional[int] = None
+        total_exact: bool = True
+        next_cursor: Optional[str] = None
+        prev_cursor: Optional[str] = None
+        has_next: bool = False
+        has_prev: bool = False
+
+    def __init__(self, *, ordering: Sequence[str] = None, **kwargs: Any) -> None:
+        """
+        :param ordering: 排序字段（如 ('-sys_create_datetime',)），为空时取查询集或模型的默认排序；
+                         主键会自动追加为最后一个排序字段，保证排序稳定
+        """
+        self.ordering = tuple(ordering) if ordering else None
+        super().__init__(**kwargs)
+
+    def paginate_queryset(
+            self,
+            queryset: QuerySet,
+            pagination: Input,
+            **params: DictStrAny,
+    ) -> Any:
+        limit = pagination.pageSize
+        ordering = self._get_ordering(queryset)
+        fields = self._resolve_fields(queryset.model, ordering)
+
+        backward = False
+        query_set = queryset
+        if pagination.cursor:
+            values, backward = self._decode_cursor(pagination.cursor, fields)
+            query_set = query_set.filter(self._keyset_filter(ordering, values, backward))
+
+        if backward:
+            order_by = [self._reverse(item) for item in ordering]
+        else:
+            order_by = list(ordering)
+
+        # 排序字段用于生成游标，裁剪列时需要保留（同时不会退化为 .values()）
+        query_set = self.project(query_set, extra=[field.name for field in fields])
+        rows = list(query_set.order_by(*order_by)[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+            has_next, has_prev = True, has_more
+        else:
+            has_next, has_prev = has_more, bool(pagination.cursor)
+
+        total, total_exact = count_queryset(queryset) if pagination.includeTotal else (None, True)
+        return {
+            "items": rows,
+            "total": total,
+            "total_exact": total_exact,
+            "next_cursor": self._encode_cursor(rows[-1], fields, False) if rows and has_next else None,
+            "prev_cursor": self._encode_cursor(rows[0], fields, True) if rows and has_prev else None,
+            "has_next": has_next,
+            "has_prev": has_prev,
+        }
+
+    def _get_ordering(self, queryset: QuerySet) -> Tuple[str, ...]:
+        """获取排序字段，并追加主键作为唯一的兜底排序"""
+        ordering = self.ordering or tuple(queryset.query.order_by) or tuple(queryset.model._meta.ordering or ())
+        pk_name = queryset.model._meta.pk.name
+        names = {item.lstrip('-') for item in ordering}
+        if pk_name not in names and 'pk' not in names:
+            direction = '-' if ordering and ordering[0].startswith('-') else ''
+            ordering = ordering + (f"{direction}{pk_name}",)
+        return ordering
+
+    @staticmethod
+    def _resolve_fields(model, ordering: Sequence[str]) -> list:
+        """将排序字段名解析为模型字段"""
+        fields = []
+        for item in ordering:
+            name = item.lstrip('-')
+            if name == 'pk':
+                fields.append(model._meta.pk)
+                continue
+            try:
+                fields.append(model._meta.get_field(name))
+            except FieldDoesNotExist:
+                raise ValueError(f"游标分页只支持模型上的字段排序: {name}")
+        return fields
+
+    @staticmethod
+    def _reverse(item: str) -> str:
+        return item[1:] if item.startswith('-') else f"-{item}"
+
+    @staticmethod
+    def _keyset_filter(ordering: Sequence[str], values: list, backward: bool) -> Q:
+        """
+        生成 keyset 条件（支持各字段方向不同）：
+        (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        """
+        condition = Q()
+        equal = Q()
+        for item, value in zip(ordering, values):
+            name = item.lstrip('-')
+            descending = item.startswith('-') != backward
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    @staticmethod
+    def _encode_cursor(item: Any, fields: list, backward: bool) -> str:
+        """将某一行的排序键编码为不透明游标"""
+        values = []
+        for field in fields:
+            if isinstance(item, dict):
+                value = item.get(field.attname, item.get(field.name))
+            else:
+                value = getattr(item, field.attname)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            elif value is not None and not isinstance(value, (int, float, bool, str)):
+                value = str(value)
+            values.append(value)
+        raw = json.dumps({"v": values, "b": backward}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(cursor: str, fields: list) -> Tuple[list, bool]:
+        """解析游标，返回 (排序键取值, 是否向前翻页)"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            data = json.loads(raw)
+            values = data["v"]
+            if len(values) != len(fields) or any(value is None for value in values):
+                raise ValueError
+            values = [field.to_python(value) for field, value in zip(fields, values)]
+            return values, bool(data.get("b"))
+        except (ValueError, TypeError, KeyError, ValidationError):
+            raise HttpError(400, "无效的分页游标")
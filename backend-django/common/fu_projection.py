@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+按输出 Schema 裁剪查询列
+
+列表接口通常只输出模型的一小部分字段，但 model.objects.all() 会读取并实例化全部列
+（如 User 上的各类 OAuth ID、简介、地址等）。这里根据输出 Schema 推导实际需要的字段：
+1. 本表字段 -> .only()
+2. 别名中的关联字段（如 alias="dept.name"）-> select_related('dept') + only('dept__name')
+3. 多对多 / 反向关联 -> prefetch_related，关联表同样只取需要的列
+4. Schema 没有 resolver、全部字段都能映射到列时，直接使用 .values()，不再实例化模型
+
+resolver 中用到的字段无法自动推导，通过 extra 声明（如 ('dept__name', 'post__name')）。
+未声明的字段只会在访问时按需加载，结果不受影响，只是多一次查询。
+
+使用示例：
+    @router.get("/role/users/by/role_id", response=List[RoleUserSchema])
+    @paginate(MyPagination, projection=RoleUserSchema, projection_extra=('dept__name',))
+    def get_users_by_role(request, filters: RoleUserFilter = Query(...)):
+        ...
+"""
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Set, Tuple, Type
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import F, Model, Prefetch, QuerySet
+
+
+class Projection:
+    """由 Schema 推导出的查询裁剪方案"""
+
+    def __init__(self):
+        self.only: Set[str] = set()
+        self.select_related: Set[str] = set()
+        # 预加载路径 -> 关联表需要的字段（None 表示无法裁剪，读取全部列）
+        self.prefetch: Dict[str, Optional[Set[str]]] = {}
+        # .values() 的输出键 -> 查询路径；为 None 时不能使用 .values()
+        self.values: Optional[Dict[str, str]] = {}
+
+    def add_lookup(self, model: Type[Model], lookup: str, key: Optional[str] = None) -> bool:
+        """
+        添加一个查询路径
+
+        :param key: 使用 .values() 时的输出键，为 None 表示该路径只用于 .only()
+        :return: 是否为模型上存在的字段
+        """
+        parts = lookup.split('__')
+        current = model
+        for index, name in enumerate(parts):
+            try:
+                field = current._meta.get_field(name)
+            except FieldDoesNotExist:
+                return False
+            path = '__'.join(parts[:index + 1])
+            if field.many_to_many or field.one_to_many:
+                self._add_prefetch(field, path, parts[index + 1:])
+                self.values = None
+                return True
+            is_last = index == len(parts) - 1
+            if field.is_relation and not is_last:
+                self.select_related.add(path)
+                current = field.related_model
+                continue
+            if not field.concrete or isinstance(field, models.FileField):
+                self.values = None
+            if field.concrete:
+                self.only.add(path)
+            if self.values is not None and key is not None:
+                self.values[key] = path
+            return True
+        return True
+
+    def _add_prefetch(self, field, path: str, rest: Sequence[str]) -> None:
+        related_fields = self.prefetch.get(path, set())
+        if related_fields is None:
+            return
+        if not rest:
+            # 只需要关联对象本身（如多对多字段输出 ID 列表）
+            self.prefetch[path] = related_fields
+            return
+        if len(rest) == 1:
+            try:
+                related_field = field.related_model._meta.get_field(rest[0])
+            except FieldDoesNotExist:
+                related_field = None
+            if related_field is not None and related_field.concrete and not related_field.is_relation:
+                related_fields.add(rest[0])
+                self.prefetch[path] = related_fields
+                return
+        self.prefetch[path] = None
+
+    def apply(self, queryset: QuerySet) -> QuerySet:
+        """把裁剪方案应用到查询集"""
+        if self.values is not None:
+            plain = [key for key, path in self.values.items() if key == path]
+            expressions = {key: F(path) for key, path in self.values.items() if key != path}
+            return queryset.values(*plain, **expressions)
+
+        model = queryset.model
+        only = self.only | {model._meta.pk.name}
+        # 视图中已有的 select_related 路径不能被延迟加载
+        only.update(_iter_select_related(queryset.query.select_related))
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        existing = {
+            lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            for lookup in queryset._prefetch_related_lookups
+        }
+        for path, fields in sorted(self.prefetch.items(), key=lambda item: item[0]):
+            if path in existing:
+                continue
+            if fields is None:
+                queryset = queryset.prefetch_related(path)
+                continue
+            related_model = _get_related_model(model, path)
+            queryset = queryset.prefetch_related(
+                Prefetch(path, queryset=related_model._default_manager.only(*sorted(fields or {'pk'})))
+            )
+        return queryset.only(*sorted(only))
+
+
+def _iter_select_related(select_related, prefix: str = ''):
+    """展开 query.select_related 的嵌套字典为 dept、dept__parent 这样的路径"""
+    if not isinstance(select_related, dict):
+        return
+    for name, children in select_related.items():
+        path = f"{prefix}{name}"
+        yield path
+        yield from _iter_select_related(children, f"{path}__")
+
+
+def _get_related_model(model: Type[Model], path: str) -> Type[Model]:
+    for name in path.split('__'):
+        model = model._meta.get_field(name).related_model
+    return model
+
+
+def _get_field_source(name: str, field_info) -> str:
+    """Schema 字段读取模型属性时使用的名称（别名优先）"""
+    alias = field_info.validation_alias if isinstance(field_info.validation_alias, str) else None
+    return alias or field_info.alias or name
+
+
+@lru_cache(maxsize=None)
+def get_schema_projection(schema, model: Type[Model], extra: Tuple[str, ...] = ()) -> Projection:
+    """
+    根据输出 Schema 推导查询裁剪方案（按 Schema + 模型 + extra 缓存）
+
+    :param schema: 输出 Schema
+    :param model: 查询的模型
+    :param extra: resolver 中用到的额外字段路径
+    """
+    projection = Projection()
+    resolvers = getattr(schema, '_ninja_resolvers', None) or {}
+    if resolvers or extra:
+        projection.values = None
+
+    for name, field_info in schema.model_fields.items():
+        source = _get_field_source(name, field_info)
+        lookup = source.replace('.', '__')
+        if projection.add_lookup(model, lookup, key=source):
+            continue
+        if name not in resolvers:
+            # 模型属性（如 @property），依赖的字段未知，只能实例化模型
+            projection.values = None
+
+    for lookup in extra:
+        projection.add_lookup(model, lookup)
+    return projection
+
+
+def project_queryset(queryset, schema, extra: Sequence[str] = ()):
+    """
+    按输出 Schema 裁剪查询集的列
+
+    :param queryset: 查询集（非 QuerySet 或已调用 .values() 时原样返回）
+    :param schema: 输出 Schema
+    :param extra: resolver 中用到的额外字段路径，如 ('dept__name', 'post__name')
+    """
+    if not isinstance(queryset, QuerySet) or queryset._fields is not None:
+        return queryset
+    return get_schema_projection(schema, queryset.model, tuple(extra)).apply(queryset)
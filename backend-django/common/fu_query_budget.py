@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SQL 查询预算与 N+1 检测
+
+通过 connection.execute_wrapper 记录每个请求执行的 SQL（不依赖 DEBUG 模式）：
+- 查询次数、数据库总耗时
+- 查询指纹（去掉字面量后的 SQL）及重复次数，同一指纹重复多次通常就是 N+1
+
+超出预算时记录告警日志，并在响应头中给出统计（X-DB-Query-Count / X-DB-Time-Ms / X-DB-Repeated-Queries）。
+
+配置（application/settings.py）：
+    QUERY_BUDGET_ENABLE = DEBUG
+    QUERY_BUDGET_MAX_QUERIES = 30            # 单个请求最多查询次数
+    QUERY_BUDGET_MAX_DB_TIME_MS = 500        # 单个请求最多数据库耗时（毫秒）
+    QUERY_BUDGET_REPEAT_THRESHOLD = 5        # 同一指纹重复达到该次数视为 N+1
+    QUERY_BUDGET_ALWAYS_HEADER = False       # 未超预算时也输出统计响应头
+    QUERY_BUDGET_ROUTES = {'/api/core/dept': 20}  # 按路径前缀覆盖查询次数预算（最长前缀优先）
+
+测试中锁定查询次数：
+    @assert_max_queries(5)
+    def test_dept_tree(self):
+        ...
+
+    with assert_max_queries(3, max_repeats=1):
+        client.get('/api/core/dept/tree')
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ContextDecorator, ExitStack
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:''|[^'])*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r"%s|\$\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def get_sql_fingerprint(sql: str) -> str:
+    """把 SQL 归一化为指纹：字面量和参数占位符替换为 ?，IN 列表折叠为 IN (...)"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """
+    记录 SQL 执行情况的 execute_wrapper
+
+    使用示例：
+        recorder = QueryRecorder()
+        with recorder.capture():
+            ...
+        recorder.count, recorder.duration_ms, recorder.repeated()
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[get_sql_fingerprint(sql)] += 1
+
+    def capture(self, using: Optional[str] = None) -> ExitStack:
+        """在指定（默认全部）数据库连接上安装记录器"""
+        stack = ExitStack()
+        aliases = [using] if using else list(connections)
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+    @property
+    def duration_ms(self) -> float:
+        return round(self.duration * 1000, 2)
+
+    def repeated(self, threshold: int = 2) -> List[Tuple[str, int]]:
+        """重复次数达到阈值的查询指纹，按次数倒序"""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def get_route_budget(path: str) -> int:
+    """按路径前缀获取查询次数预算（最长前缀优先），没有匹配时使用全局预算"""
+    routes: Dict[str, int] = _setting('QUERY_BUDGET_ROUTES', {}) or {}
+    matched = [prefix for prefix in routes if path.startswith(prefix)]
+    if matched:
+        return routes[max(matched, key=len)]
+    return _setting('QUERY_BUDGET_MAX_QUERIES', 30)
+
+
+class QueryBudgetMiddleware:
+    """
+    单请求 SQL 预算中间件
+
+    QUERY_BUDGET_ENABLE 为 False 时不加载（MiddlewareNotUsed），不影响请求性能。
+    """
+
+    def __init__(self, get_response):
+        if not _setting('QUERY_BUDGET_ENABLE', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.max_db_time_ms = _setting('QUERY_BUDGET_MAX_DB_TIME_MS', 500)
+        self.repeat_threshold = _setting('QUERY_BUDGET_REPEAT_THRESHOLD', 5)
+        self.always_header = _setting('QUERY_BUDGET_ALWAYS_HEADER', False)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with recorder.capture():
+            response = self.get_response(request)
+
+        max_queries = get_route_budget(request.path)
+        repeated = recorder.repeated(self.repeat_threshold)
+        over_budget = (
+                recorder.count > max_queries
+                or recorder.duration_ms > self.max_db_time_ms
+                or bool(repeated)
+        )
+        if over_budget:
+            logger.warning(
+                f"SQL 超出预算: {request.method} {request.path} "
+                f"查询 {recorder.count}/{max_queries} 次, 耗时 {recorder.duration_ms}/{self.max_db_time_ms} ms, "
+                f"重复查询: {[(sql[:200], count) for sql, count in repeated[:3]]}"
+            )
+        if over_budget or self.always_header:
+            response['X-DB-Query-Count'] = str(recorder.count)
+            response['X-DB-Time-Ms'] = str(recorder.duration_ms)
+            response['X-DB-Repeated-Queries'] = str(sum(count for _, count in repeated))
+        return response
+
+
+class assert_max_queries(ContextDecorator):
+    """
+    断言代码块内的查询次数不超过上限（可用作装饰器或上下文管理器）
+
+    :param max_queries: 最多查询次数
+    :param max_repeats: 同一指纹最多重复次数，为空时不检查（用于锁定"无 N+1"）
+    :param using: 数据库别名，默认全部
+    """
+
+    def __init__(self, max_queries: int, max_repeats: Optional[int] = None, using: Optional[str] = None):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.using = using
+        self.recorder: Optional[QueryRecorder] = None
+        self._stack: Optional[ExitStack] = None
+
+    def __enter__(self) -> QueryRecorder:
+        self.recorder = QueryRecorder()
+        self._stack = self.recorder.capture(self.using)
+        self._stack.__enter__()
+        return self.recorder
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stack.__exit__(exc_type, exc, tb)
+        if exc_type is not None:
+            return False
+        recorder = self.recorder
+        if recorder.count > self.max_queries:
+            raise AssertionError(
+                f"查询次数 {recorder.count} 超过上限 {self.max_queries}:\n"
+                + "\n".join(f"{count} x {sql}" for sql, count in recorder.fingerprints.most_common())
+            )
+        if self.max_repeats is not None:
+            repeated = recorder.repeated(self.max_repeats + 1)
+            if repeated:
+                raise AssertionError(
+                    f"存在重复查询（疑似 N+1），同一查询最多允许 {self.max_repeats} 次:\n"
+                    + "\n".join(f"{count} x {sql}" for sql, count in repeated)
+                )
+        return False
+
+    def _recreate_cm(self):
+        # 作为装饰器使用时每次调用都需要新的记录器
+        return assert_max_queries(self.max_queries, self.max_repeats, self.using)
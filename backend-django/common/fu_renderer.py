@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JSON 渲染器
+
+使用 orjson 序列化 API 响应（未安装 orjson 时退回标准库 json）：
+- datetime 保持原有的 '%Y-%m-%d %H:%M:%S' 格式
+- UUID 由 orjson 原生处理，date、time、Decimal、Pydantic 模型、惰性字符串等沿用原编码器的转换规则
+- orjson 无法序列化时（如超出 64 位的整数）退回标准库编码器
+
+已序列化的数据（如缓存的部门树、菜单树）不需要再次编码：
+- 视图直接返回 json_bytes_response(content)，跳过 Schema 校验和渲染
+- 或在返回的数据中嵌入 orjson.Fragment(content)
+"""
+import json
+from datetime import datetime
+from typing import Any
+
+from django.http import HttpResponse
+from ninja.renderers import JSONRenderer
+from ninja.responses import NinjaJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
+
+
+class MyJsonEncoder(NinjaJSONEncoder):
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.strftime(DATETIME_FORMAT)
+        return super().default(o)
+
+
+_encoder = MyJsonEncoder()
+
+
+def _orjson_default(o: Any) -> Any:
+    """orjson 无法原生处理的类型（date、time、Decimal、Pydantic 模型等）沿用原编码器的转换规则"""
+    if isinstance(o, datetime):
+        return o.strftime(DATETIME_FORMAT)
+    return _encoder.default(o)
+
+
+if orjson is not None:
+    # datetime 交给 default 按原格式输出；字典允许非字符串键（与标准库行为一致）
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data: Any) -> bytes:
+    """序列化为 JSON 字节串（与 API 响应格式一致）"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=_orjson_default, option=ORJSON_OPTIONS)
+        except TypeError:
+            pass
+    return json.dumps(data, cls=MyJsonEncoder).encode()
+
+
+class MyJsonRenderer(JSONRenderer):
+    encoder_class = MyJsonEncoder
+
+    def render(self, request, data, *, response_status):
+        if isinstance(data, (bytes, bytearray)):
+            return data
+        return dumps(data)
+
+
+def json_bytes_response(content: bytes, status: int = 200, **kwargs) -> HttpResponse:
+    """直接返回已序列化的 JSON 字节串（跳过 Schema 校验和序列化）"""
+    return HttpResponse(content, status=status, content_type=JSON_CONTENT_TYPE, **kwargs)
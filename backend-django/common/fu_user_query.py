@@ -1,34 +1,172 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+
 from core.dept.dept_model import Dept
 from core.user.user_model import User
 from core.user.user_schema import UserSchemaGetNameIn
 
 
+class UserChainResolver:
+    """
+    批量解析用户的上级链和部门领导链
+
+    一次性把所需的 用户->上级、部门->父部门/领导 关系加载到字典中，
+    之后 "第 k 级" / "第 1..k 级" 的查询全部在内存中完成，
+    查询次数与请求的用户数量无关。
+    """
+
+    def __init__(self, user_ids: Iterable[str], max_level: int):
+        self.max_level = max(int(max_level), 1)
+        # 按用户默认排序保留请求用户的顺序：[(user_id, manager_id, dept_id)]
+        self.users: List[Tuple[str, Optional[str], Optional[str]]] = list(
+            User.objects.filter(id__in=list(user_ids or [])).values_list('id', 'manager_id', 'dept_id')
+        )
+        self.user_manager_ids = {user_id: manager_id for user_id, manager_id, _ in self.users}
+        # user_id -> (manager_id, name)
+        self.manager_map: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        # dept_id -> (parent_id, lead_id)
+        self.dept_map: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        # lead_id -> name
+        self.lead_names: Dict[str, Optional[str]] = {}
+
+    # ===============================================================
+    # 上级链
+    # ===============================================================
+
+    def load_managers(self) -> None:
+        """加载请求用户向上 max_level 级的上级链"""
+        start_ids = [manager_id for _, manager_id, _ in self.users if manager_id]
+        if not start_ids:
+            return
+        if self._supports_recursive_cte():
+            rows = self._load_manager_chain_cte(start_ids)
+        else:
+            rows = self._load_manager_chain_by_level(start_ids)
+        for user_id, manager_id, name in rows:
+            self.manager_map[user_id] = (manager_id, name)
+
+    @staticmethod
+    def _supports_recursive_cte() -> bool:
+        """当前数据库是否支持 WITH RECURSIVE"""
+        if connection.vendor in ('postgresql', 'sqlite'):
+            return True
+        if connection.vendor == 'mysql':
+            return not connection.mysql_is_mariadb and connection.mysql_version >= (8, 0)
+        return False
+
+    def _load_manager_chain_cte(self, start_ids: List[str]) -> List[tuple]:
+        """通过递归 CTE 单条查询加载上级链"""
+        qn = connection.ops.quote_name
+        table = qn(User._meta.db_table)
+        id_col = qn(User._meta.get_field('id').column)
+        manager_col = qn(User._meta.get_field('manager').column)
+        name_col = qn(User._meta.get_field('name').column)
+        placeholders = ', '.join(['%s'] * len(start_ids))
+        sql = (
+            f"WITH RECURSIVE chain (uid, mid, uname, depth) AS ("
+            f" SELECT {id_col}, {manager_col}, {name_col}, 1 FROM {table}"
+            f" WHERE {id_col} IN ({placeholders})"
+            f" UNION ALL"
+            f" SELECT u.{id_col}, u.{manager_col}, u.{name_col}, c.depth + 1 FROM {table} u"
+            f" INNER JOIN chain c ON u.{id_col} = c.mid"
+            f" WHERE c.depth < %s"
+            f") SELECT DISTINCT uid, mid, uname FROM chain"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*start_ids, self.max_level])
+            return cursor.fetchall()
+
+    def _load_manager_chain_by_level(self, start_ids: List[str]) -> List[tuple]:
+        """逐级批量加载上级链（每一级一条查询，与用户数量无关）"""
+        rows = []
+        loaded = set()
+        frontier = set(start_ids)
+        for _ in range(self.max_level):
+            if not frontier:
+                break
+            level_rows = list(User.objects.filter(id__in=frontier).values_list('id', 'manager_id', 'name'))
+            rows.extend(level_rows)
+            loaded.update(frontier)
+            frontier = {manager_id for _, manager_id, _ in level_rows if manager_id and manager_id not in loaded}
+        return rows
+
+    def manager_at(self, user_id: str, level: int) -> Tuple[Optional[str], Optional[str]]:
+        """
+        获取用户第 level 级上级
+
+        :return: (上级ID, 上级姓名)，不存在时为 (None, None)
+        """
+        manager_id = self.user_manager_ids.get(str(user_id))
+        for _ in range(level - 1):
+            if not manager_id:
+                break
+            manager_id = self.manager_map.get(manager_id, (None, None))[0]
+        if not manager_id:
+            return None, None
+        return manager_id, self.manager_map.get(manager_id, (None, None))[1]
+
+    # ===============================================================
+    # 部门领导链
+    # ===============================================================
+
+    def load_depts(self) -> None:
+        """
+        加载请求用户所在部门及其祖先部门
+
+        部门的 path 字段已保存全部祖先ID，无需递归，两条查询即可完成：
+        一条加载部门（含祖先），一条加载领导姓名。
+        """
+        dept_ids = {dept_id for _, _, dept_id in self.users if dept_id}
+        if not dept_ids:
+            return
+        ancestor_ids = set(dept_ids)
+        for path in Dept.objects.filter(id__in=dept_ids).values_list('path', flat=True):
+            ancestor_ids.update(item for item in (path or '').split('/') if item)
+
+        for dept_id, parent_id, lead_id in Dept.objects.filter(
+                id__in=ancestor_ids
+        ).values_list('id', 'parent_id', 'lead_id'):
+            self.dept_map[dept_id] = (parent_id, lead_id)
+
+        lead_ids = {lead_id for _, lead_id in self.dept_map.values() if lead_id}
+        if lead_ids:
+            self.lead_names = dict(User.objects.filter(id__in=lead_ids).values_list('id', 'name'))
+
+    def dept_lead_at(self, dept_id: Optional[str], level: int) -> List[dict]:
+        """
+        获取部门向上第 level - 1 级祖先部门的领导
+
+        与原有按 parent__lead 关联查询的返回格式保持一致：
+        部门不存在时返回空列表，祖先或领导不存在时返回 ID/姓名为 None 的一项。
+        """
+        if not dept_id or dept_id not in self.dept_map:
+            return []
+        current = dept_id
+        for _ in range(level - 1):
+            current = self.dept_map.get(current, (None, None))[0]
+            if not current:
+                break
+        lead_id = self.dept_map.get(current, (None, None))[1] if current else None
+        return [{"dept_lead_id": lead_id, "dept_lead_name": self.lead_names.get(lead_id) if lead_id else None}]
+
+
 def get_manager_list(data: UserSchemaGetNameIn):
-    level = data.level
-    until = data.until
-    manager_id_str = "manager__id"
-    manager_name_str = "manager__name"
-    if int(until) == 1:
-        for i in range(int(level) - 1):
-            manager_name_str = "manager__" + manager_name_str
-            manager_id_str = "manager__" + manager_id_str
-        user = User.objects.filter(id__in=data.ids).values(manager_id_str, manager_name_str)
-        user = [{"manager_id": item.get(manager_id_str), "manager_name": item.get(manager_name_str)} for item in user]
-        return user
-    else:
-        manager = User.objects.filter(id__in=data.ids).values(manager_id_str, manager_name_str)
-        manager = [{"manager_id": item.get(manager_id_str), "manager_name": item.get(manager_name_str)} for
-                   item in manager]
-        manager_list = [manager]
-        for i in range(int(until) - 1):
-            manager_name_str = "manager__" + manager_name_str
-            manager_id_str = "manager__" + manager_id_str
-            manager_info = User.objects.filter(id__in=data.ids).values(manager_id_str, manager_name_str)
-            manager_info = [{"manager_id": item.get(manager_id_str), "manager_name": item.get(manager_name_str)} for
-                            item in manager_info]
-            manager_list.append(manager_info)
+    level = int(data.level)
+    until = int(data.until)
+    resolver = UserChainResolver(data.ids, level if until == 1 else until)
+    resolver.load_managers()
 
-        return manager_list
+    def build_level(k):
+        result = []
+        for user_id, _, _ in resolver.users:
+            manager_id, manager_name = resolver.manager_at(user_id, k)
+            result.append({"manager_id": manager_id, "manager_name": manager_name})
+        return result
+
+    if until == 1:
+        return build_level(level)
+    return [build_level(k) for k in range(1, until + 1)]
 
 
 def get_dept_lead_list1(data: UserSchemaGetNameIn):
@@ -62,39 +200,14 @@ def get_dept_lead_list1(data: UserSchemaGetNameIn):
 
 
 def get_dept_lead_list(data: UserSchemaGetNameIn):
-    level = data.level
-    until = data.until
-    lead_id_str = "lead__id"
-    lead_name_str = "lead__name"
-    users_dept = User.objects.filter(id__in=data.ids).values("dept__id")
-    dept_lead_list = []
-    if int(until) == 1:
-        for item in users_dept:
-            dept_id = item.get("dept__id")
-            for i in range(int(level) - 1):
-                lead_name_str = "parent__" + lead_name_str
-                lead_id_str = "parent__" + lead_id_str
-            lead = Dept.objects.filter(id=dept_id).values(lead_id_str, lead_name_str)
-            lead = [{"dept_lead_id": item.get(lead_id_str), "dept_lead_name": item.get(lead_name_str)} for item in lead]
-            dept_lead_list.append(lead)
-    else:
-        lead_list = []
-        for item in users_dept:
-            dept_id = item.get("dept__id")
-            lead = Dept.objects.filter(id=dept_id).values(lead_id_str, lead_name_str)
-            lead = [{"dept_lead_id": item.get(lead_id_str), "dept_lead_name": item.get(lead_name_str)} for item in lead]
-            lead_list.append(lead)
-
-        dept_lead_list.append(lead_list)
-        for i in range(int(until) - 1):
-            lead_name_str = "parent__" + lead_name_str
-            lead_id_str = "parent__" + lead_id_str
-            lead_list = []
-            for item in users_dept:
-                dept_id = item.get("dept__id")
-                lead = Dept.objects.filter(id=dept_id).values(lead_id_str, lead_name_str)
-                lead = [{"dept_lead_id": item.get(lead_id_str), "dept_lead_name": item.get(lead_name_str)} for item in
-                        lead]
-                lead_list.append(lead)
-            dept_lead_list.append([*lead_list])
-    return dept_lead_list
+    level = int(data.level)
+    until = int(data.until)
+    resolver = UserChainResolver(data.ids, level if until == 1 else until)
+    resolver.load_depts()
+
+    def build_level(k):
+        return [resolver.dept_lead_at(dept_id, k) for _, _, dept_id in resolver.users]
+
+    if until == 1:
+        return build_level(level)
+    return [build_level(k) for k in range(1, until + 1)]
@@ -2,22 +2,26 @@
 日志 django中间件
 """
 import json
+import logging
+import time
+from functools import lru_cache
 
 from django.conf import settings
-from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
 from django.utils.deprecation import MiddlewareMixin
+from user_agents import parse
 from core.models import OperationLog, User
 
+from common.fu_log_buffer import get_log_buffer
 from common.utils.request_util import (
-    get_browser,
-    get_os,
     get_request_data,
     get_request_ip,
     get_request_path,
-    get_request_user,
     get_verbose_name,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class SecurityHeadersMiddleware(MiddlewareMixin):
     """
@@ -41,13 +45,23 @@ class SecurityHeadersMiddleware(MiddlewareMixin):
 class ApiLoggingMiddleware(MiddlewareMixin):
     """
     用于记录API访问日志中间件
+
+    每个请求在 request 上保存本请求的日志信息（中间件实例在线程间共享，不能保存请求状态），
+    响应后生成一条 OperationLog 放入写入缓冲区，由后台线程批量写入数据库。
+    请求线程中不访问数据库，User-Agent 解析也放到后台线程中完成。
     """
 
     def __init__(self, get_response=None):
-        super().__init__(get_response)
         self.enable = getattr(settings, 'API_LOG_ENABLE', None) or False
+        if not self.enable:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
         self.methods = getattr(settings, 'API_LOG_METHODS', None) or set()
-        self.operation_log_id = None
+        self.body_max_length = getattr(settings, 'API_LOG_BODY_MAX_LENGTH', 2000)
+        self.buffer = get_log_buffer(OperationLog, prepare=_fill_user_agent)
+
+    def _should_log(self, request):
+        return self.methods == 'ALL' or request.method in self.methods
 
     @classmethod
     def __handle_request(cls, request):
@@ -56,54 +70,45 @@ class ApiLoggingMiddleware(MiddlewareMixin):
         request.request_path = get_request_path(request)
 
     def __handle_response(self, request, response):
-        # request_data,request_ip由PermissionInterfaceMiddleware中间件中添加的属性
-        body = getattr(request, 'request_data', {})
-        # 请求含有password则用*替换掉(暂时先用于所有接口的password请求参数)
-        if isinstance(body, dict) and body.get('password', ''):
-            body['password'] = '*' * len(body['password'])
-        if not hasattr(response, 'data') or not isinstance(response.data, dict):
-            response.data = {}
-        try:
-            if not response.data and response.content:
-                content = json.loads(response.content.decode())
-                response.data = content if isinstance(content, dict) else {}
-        except Exception:
+        state = getattr(request, '_api_log', None)
+        if state is None:
             return
-        user = get_request_user(request)
-        if isinstance(user, AnonymousUser):
+        user = getattr(request, 'auth', None)
+        if not isinstance(user, User):
             return
-        info = {
-            'request_username': user.username if isinstance(user, User) else user['username'],
-            'request_ip': getattr(request, 'request_ip', 'unknown'),
-            'sys_creator_id': user.id if isinstance(user, User) else user['id'],
-            'request_method': request.method,
-            'request_path': request.request_path,
-            'request_body': body,
-            'response_code': response.data.get('code'),
-            'request_os': get_os(request),
-            'request_browser': get_browser(request),
-            'request_msg': request.session.get('request_msg'),
-            'status': True if response.data.get('code') in [2000, ] else False,
-            'json_result': {"code": response.data.get('code'), "msg": response.data.get('result')},
-        }
-        operation_log, creat = OperationLog.objects.update_or_create(defaults=info, id=self.operation_log_id)
-        if not operation_log.request_modular and settings.API_MODEL_MAP.get(request.request_path, None):
-            operation_log.request_modular = settings.API_MODEL_MAP[request.request_path]
-            operation_log.save()
+        body = _mask_password(getattr(request, 'request_data', {}))
+        if len(str(body)) > self.body_max_length:
+            body = {'_truncated': str(body)[:self.body_max_length]}
+        status_code = response.status_code
+        request_path = getattr(request, 'request_path', request.path)
+        log = OperationLog(
+            request_modular=state.get('modular') or settings.API_MODEL_MAP.get(request_path),
+            request_path=request_path,
+            request_body=body,
+            request_method=request.method,
+            request_msg=getattr(request, 'request_msg', None),
+            request_ip=getattr(request, 'request_ip', 'unknown'),
+            request_username=user.username,
+            response_code=status_code,
+            status=200 <= status_code < 400,
+            json_result={"code": status_code, "msg": _get_error_message(response)},
+            duration=int((time.perf_counter() - state['start']) * 1000),
+            sys_creator_id=user.id,
+        )
+        log._user_agent = request.META.get('HTTP_USER_AGENT', '')
+        self.buffer.submit(log)
 
-    def process_view(self, request, view_func, view_args, view_kwargs):
-        if hasattr(view_func, 'cls') and hasattr(view_func.cls, 'queryset'):
-            if self.enable:
-                if self.methods == 'ALL' or request.method in self.methods:
-                    log = OperationLog(request_modular=get_verbose_name(view_func.cls.queryset))
-                    log.save()
-                    self.operation_log_id = log.id
+    def process_request(self, request):
+        if self._should_log(request):
+            self.__handle_request(request)
+            request._api_log = {'start': time.perf_counter()}
 
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = getattr(request, '_api_log', None)
+        if state is not None and hasattr(view_func, 'cls') and hasattr(view_func.cls, 'queryset'):
+            state['modular'] = get_verbose_name(view_func.cls.queryset)
         return
 
-    def process_request(self, request):
-        self.__handle_request(request)
-
     def process_response(self, request, response):
         """
         主要请求处理完之后记录
@@ -111,7 +116,47 @@ class ApiLoggingMiddleware(MiddlewareMixin):
         :param response:
         :return:
         """
-        if self.enable:
-            if self.methods == 'ALL' or request.method in self.methods:
-                self.__handle_response(request, response)
+        try:
+            self.__handle_response(request, response)
+        except Exception as e:
+            logger.error(f"记录操作日志失败: {e}")
         return response
+
+
+def _mask_password(body):
+    """请求含有password则用*替换掉"""
+    if isinstance(body, dict):
+        return {
+            key: '*' * len(str(value)) if 'password' in str(key).lower() and value else _mask_password(value)
+            for key, value in body.items()
+        }
+    if isinstance(body, list):
+        return [_mask_password(item) for item in body]
+    return body
+
+
+def _get_error_message(response, max_length=2000):
+    """只解析错误响应的提示信息，成功响应不解析响应体"""
+    if response.status_code < 400 or getattr(response, 'streaming', False):
+        return None
+    content = getattr(response, 'content', b'')
+    if not content or len(content) > max_length:
+        return None
+    try:
+        data = json.loads(content.decode())
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data.get('detail') if isinstance(data, dict) else None
+
+
+def _fill_user_agent(log):
+    """后台线程中解析 User-Agent"""
+    browser, os_name = _parse_user_agent(getattr(log, '_user_agent', '') or '')
+    log.request_browser = browser[:64]
+    log.request_os = os_name[:64]
+
+
+@lru_cache(maxsize=1024)
+def _parse_user_agent(ua_string):
+    user_agent = parse(ua_string)
+    return user_agent.get_browser(), user_agent.get_os()
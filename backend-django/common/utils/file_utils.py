@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+文件拼接与校验工具
+
+分块上传合并时使用，内存占用与文件大小无关：
+- copy_fd：文件之间的数据复制优先走内核（copy_file_range，其次 sendfile），
+  不支持时退回固定大小缓冲区的读写
+- hash_files：按固定大小缓冲区计算多个文件顺序拼接后的摘要
+- tree_hash：按顺序的分块MD5计算整个文件的树哈希，合并时不需要再读取文件内容
+- HashingReader：读取（写入存储）的同时计算摘要，不需要保存后再读一遍
+- ConcatenatedFile：把多个文件当作一个只读、可 seek 的文件对象，
+  用于把分块直接流式写入对象存储，不生成中间合并文件
+"""
+import errno
+import hashlib
+import io
+import os
+from typing import List, Optional, Sequence
+
+# 读写缓冲区大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# 这些错误表示当前文件系统或内核不支持该复制方式，换下一种方式即可
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM, errno.EBADF}
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def _buffered_copy(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    data = os.pread(src_fd, min(count, COPY_BUFFER_SIZE), offset)
+    view = memoryview(data)
+    while view:
+        written = os.write(dst_fd, view)
+        view = view[written:]
+    return len(data)
+
+
+_COPY_METHODS = [
+    method for name, method in (('copy_file_range', _copy_file_range), ('sendfile', _sendfile))
+    if hasattr(os, name)
+] + [_buffered_copy]
+
+
+def copy_fd(src_fd: int, dst_fd: int, count: int) -> int:
+    """
+    从 src_fd 的开头复制 count 字节到 dst_fd 的当前位置
+
+    :return: 实际复制的字节数（源文件不足 count 时小于 count）
+    """
+    copied = 0
+    methods = iter(_COPY_METHODS)
+    method = next(methods)
+    while copied < count:
+        try:
+            size = method(src_fd, dst_fd, copied, count - copied)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS or method is _buffered_copy:
+                raise
+            method = next(methods)
+            continue
+        if size == 0:
+            break
+        copied += size
+    return copied
+
+
+def concatenate_files(paths: Sequence[str], dst_fd: int, digest=None) -> int:
+    """
+    按顺序把多个文件追加到 dst_fd，返回总字节数
+
+    :param digest: hashlib 摘要对象，不为空时在同一次读取中计算摘要（经用户态缓冲区复制），
+                   为空时走内核复制
+    """
+    total = 0
+    buffer = bytearray(COPY_BUFFER_SIZE) if digest is not None else None
+    for path in paths:
+        with open(path, 'rb', buffering=0) as source:
+            if digest is None:
+                total += copy_fd(source.fileno(), dst_fd, os.fstat(source.fileno()).st_size)
+                continue
+            view = memoryview(buffer)
+            while True:
+                size = source.readinto(buffer)
+                if not size:
+                    break
+                chunk = view[:size]
+                digest.update(chunk)
+                while chunk:
+                    chunk = chunk[os.write(dst_fd, chunk):]
+                total += size
+    return total
+
+
+def hash_files(paths: Sequence[str], algorithm: str = 'md5') -> str:
+    """计算多个文件顺序拼接后的摘要（固定大小缓冲区，内存占用与文件大小无关）"""
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    for path in paths:
+        with open(path, 'rb', buffering=0) as source:
+            while True:
+                size = source.readinto(buffer)
+                if not size:
+                    break
+                digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def tree_hash(chunk_digests: Sequence[str], chunk_size: int) -> str:
+    """
+    分块摘要树哈希：md5(分块大小的十进制字符串 + ":" + 按顺序拼接的各分块MD5（16 字节二进制）)
+
+    客户端按同样的 chunk_size 分块、计算每个分块的MD5即可得到相同的结果；分块大小不同时结果不同
+    """
+    digest = hashlib.md5(f'{chunk_size}:'.encode('ascii'))
+    for chunk_digest in chunk_digests:
+        digest.update(bytes.fromhex(chunk_digest))
+    return digest.hexdigest()
+
+
+class ConcatenatedFile(io.RawIOBase):
+    """
+    多个文件顺序拼接而成的只读文件对象
+
+    支持 read / readinto / seek / tell / chunks，可直接传给存储后端的 save 方法。
+    使用示例：
+        with ConcatenatedFile(chunk_paths, name='a.zip') as file:
+            storage.save(file, 'a.zip')
+    """
+
+    def __init__(self, paths: Sequence[str], name: str = None):
+        super().__init__()
+        self.paths: List[str] = list(paths)
+        self.name = name
+        self._sizes = [os.path.getsize(path) for path in self.paths]
+        self.size = sum(self._sizes)
+        self._position = 0
+        self._index = -1
+        self._file = None
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"无效的位置: {offset}")
+        self._position = offset
+        return offset
+
+    def _locate(self):
+        """返回当前位置所在的分块序号和块内偏移"""
+        start = 0
+        for index, size in enumerate(self._sizes):
+            if self._position < start + size:
+                return index, self._position - start
+            start += size
+        return None, 0
+
+    def readinto(self, buffer) -> int:
+        # 跨分块读满缓冲区（只有到达末尾时才返回不足的长度）
+        view = memoryview(buffer).cast('B')
+        total = 0
+        while total < len(view):
+            index, offset = self._locate()
+            if index is None:
+                break
+            if index != self._index:
+                self._close_part()
+                self._file = open(self.paths[index], 'rb', buffering=0)
+                self._index = index
+            self._file.seek(offset)
+            size = self._file.readinto(view[total:total + self._sizes[index] - offset])
+            if not size:
+                break
+            self._position += size
+            total += size
+        return total
+
+    def chunks(self, chunk_size: int = COPY_BUFFER_SIZE):
+        """与 Django UploadedFile.chunks 相同的分块读取接口"""
+        self.seek(0)
+        while True:
+            data = self.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+    def _close_part(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._index = -1
+
+    def close(self):
+        self._close_part()
+        super().close()
+
+
+class HashingReader:
+    """
+    读取时顺序计算摘要的文件包装
+
+    存储后端按顺序读取文件时顺带计算摘要；读取方 seek 回退后重复读取的部分不会重复计算，
+    跳过了部分内容时 hexdigest 返回 None（需要调用方另行计算）。
+    使用示例：
+        reader = HashingReader(uploaded_file)
+        storage.save(reader, uploaded_file.name)
+        md5 = reader.hexdigest()
+    """
+
+    def __init__(self, file, algorithm: str = 'md5'):
+        self.file = file
+        self._digest = hashlib.new(algorithm)
+        self._position = 0
+        self._hashed = 0
+        self._eof = False
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.file.read(size)
+        start, end = self._position, self._position + len(data)
+        if start <= self._hashed < end:
+            self._digest.update(memoryview(data)[self._hashed - start:])
+            self._hashed = end
+        if (not data or size is None or size < 0) and end == self._hashed:
+            # 读到了末尾（空读取或读取全部）
+            self._eof = True
+        self._position = end
+        return data
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        position = self.file.seek(offset, whence)
+        self._position = position if position is not None else self.file.tell()
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def chunks(self, chunk_size: int = COPY_BUFFER_SIZE):
+        """与 Django UploadedFile.chunks 相同的分块读取接口（经过摘要计算）"""
+        self.seek(0)
+        while True:
+            data = self.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+    def hexdigest(self) -> Optional[str]:
+        """完整读取过文件时返回摘要，否则返回 None"""
+        size = getattr(self.file, 'size', None)
+        if self._eof or (size is not None and self._hashed >= size):
+            return self._digest.hexdigest()
+        return None
@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+批量导入工具
+
+以只读模式逐行读取 Excel，表头只解析一次，按批校验后在事务中 bulk_create / bulk_update，
+可选按自然键（如 code、username）更新已存在的数据。单行数据出错不会中断导入，
+最终返回逐行的错误报告。
+
+使用示例：
+    result = bulk_import(
+        Post,
+        PostSchemaIn,
+        file_path,
+        import_fields=['name', 'code', 'post_type'],
+        unique_field='code',
+        upsert=True,
+    )
+"""
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from django.db import DatabaseError, models, transaction
+from django.db.models import Model
+from django.dispatch import Signal
+from openpyxl import load_workbook
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+# 每批处理的行数
+IMPORT_BATCH_SIZE = 500
+# 错误报告最多返回的条数
+IMPORT_MAX_ERRORS = 1000
+
+_TEXT_FIELDS = (models.CharField, models.TextField)
+
+# bulk_create / bulk_update 不触发 post_save，每批写入成功后发送该信号（sender=模型，ids=写入的主键列表）
+post_bulk_import = Signal()
+
+
+class ImportResult:
+    """导入结果统计与逐行错误报告"""
+
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.updated = 0
+        self.errors: List[dict] = []
+        self._failed_rows = set()
+
+    @property
+    def failed(self) -> int:
+        return len(self._failed_rows)
+
+    def add_error(self, row: int, message: str, field: Optional[str] = None) -> None:
+        """记录一条错误（同一行可以有多条错误，失败行数按行计算）"""
+        self._failed_rows.add(row)
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "field": field, "message": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "msg": f"导入完成：新增 {self.created} 条，更新 {self.updated} 条，失败 {self.failed} 条",
+            "total": self.total,
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": len(self.errors) >= IMPORT_MAX_ERRORS,
+        }
+
+
+def build_header_map(
+        model: Type[Model],
+        import_fields: Sequence[str],
+        header_aliases: Optional[Dict[str, str]] = None,
+) -> Dict[str, models.Field]:
+    """
+    生成 表头 -> 模型字段 的映射
+
+    表头可以是字段的 help_text、verbose_name 或字段名，
+    header_aliases 用于补充其他表头（如导出时关联字段 dept__name 的表头 "部门名称"）。
+    """
+    header_map = {}
+    for name in import_fields:
+        field = model._meta.get_field(name)
+        for title in (field.name, field.attname, field.verbose_name, field.help_text):
+            if title:
+                header_map[str(title).strip()] = field
+    for title, name in (header_aliases or {}).items():
+        header_map[title] = model._meta.get_field(name)
+    return header_map
+
+
+def iter_sheet_rows(file_path: str) -> Iterator[Tuple[int, tuple]]:
+    """以只读模式逐行读取活动工作表，返回 (Excel行号, 行数据)"""
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for index, row in enumerate(wb.active.iter_rows(values_only=True), start=1):
+            yield index, row
+    finally:
+        wb.close()
+
+
+def count_sheet_rows(file_path: str) -> Optional[int]:
+    """读取活动工作表的数据行数（不含表头），工作表未记录尺寸时返回 None"""
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        max_row = wb.active.max_row
+    finally:
+        wb.close()
+    return max(max_row - 1, 0) if max_row else None
+
+
+def _normalize_cell(field: models.Field, value: Any, choice_map: Optional[dict]) -> Any:
+    """把单元格的值转换为字段可接受的值"""
+    if isinstance(value, str):
+        value = value.strip()
+        if value == '':
+            return None
+    if value is None:
+        return None
+    # 导出时 choices / 关联字段写的是显示名称，这里反向转换
+    if choice_map is not None:
+        if value in choice_map:
+            return choice_map[value]
+        if field.is_relation and str(value) not in choice_map.values():
+            raise ValueError(f"未找到对应的数据: {value}")
+    # Excel 中的数字（如手机号、编码）读出来是 int/float
+    if isinstance(field, _TEXT_FIELDS) and isinstance(value, (int, float)) and not isinstance(value, bool):
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+    return value
+
+
+def _format_validation_error(error: ValidationError) -> List[Tuple[Optional[str], str]]:
+    messages = []
+    for item in error.errors():
+        field = '.'.join(str(loc) for loc in item.get('loc', ())) or None
+        messages.append((field, item.get('msg', '数据格式错误')))
+    return messages
+
+
+def bulk_import(
+        model: Type[Model],
+        scheme: Any,
+        file_path: str,
+        import_fields: Sequence[str],
+        unique_field: Optional[str] = None,
+        upsert: bool = False,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        value_maps: Optional[Dict[str, Dict[Any, Any]]] = None,
+        defaults: Optional[Dict[str, Any]] = None,
+        prepare: Optional[Callable[[Model, bool], None]] = None,
+        header_aliases: Optional[Dict[str, str]] = None,
+        on_batch: Optional[Callable[[ImportResult], None]] = None,
+) -> ImportResult:
+    """
+    批量导入 Excel 数据
+
+    :param model: 目标模型
+    :param scheme: 校验用的 Schema（每行数据实例化一次）
+    :param file_path: Excel 文件路径
+    :param import_fields: 允许导入的字段
+    :param unique_field: 自然键字段，用于识别已存在的数据
+    :param upsert: 自然键已存在时是否更新（否则记为错误）
+    :param batch_size: 每批处理的行数（每批一个事务）
+    :param value_maps: 字段 -> {显示值: 存储值}，如 {'menu_id': {'用户管理': 'xxx'}}
+    :param defaults: 新建数据时附加的字段值（如 sys_creator_id）
+    :param prepare: 保存前对模型实例的处理函数 prepare(instance, is_new)
+    :param header_aliases: 额外的 表头 -> 字段名 映射
+    :param on_batch: 每批写入后的回调 on_batch(result)，用于汇报进度
+    :return: ImportResult
+    """
+    result = ImportResult()
+    header_map = build_header_map(model, import_fields, header_aliases)
+    value_maps = dict(value_maps or {})
+    for name in import_fields:
+        field = model._meta.get_field(name)
+        if field.choices and field.attname not in value_maps:
+            value_maps[field.attname] = {str(label): value for value, label in field.choices}
+
+    columns: List[Optional[models.Field]] = []
+    batch: List[Tuple[int, dict]] = []
+    for row_number, row in iter_sheet_rows(file_path):
+        if not columns:
+            columns = [header_map.get(str(title).strip()) if title is not None else None for title in row]
+            if not any(columns):
+                raise ValueError("未识别到有效的表头，请使用导出模板")
+            continue
+        if all(cell is None or (isinstance(cell, str) and not cell.strip()) for cell in row):
+            continue
+
+        result.total += 1
+        data = {}
+        row_valid = True
+        for field, value in zip(columns, row):
+            if field is None:
+                continue
+            try:
+                value = _normalize_cell(field, value, value_maps.get(field.attname))
+            except ValueError as e:
+                result.add_error(row_number, str(e), field.attname)
+                row_valid = False
+                continue
+            # 空单元格视为未填写：新建时使用默认值，更新时保留原值
+            if value is not None:
+                data[field.attname] = value
+        if row_valid:
+            batch.append((row_number, data))
+
+        if len(batch) >= batch_size:
+            _import_batch(model, scheme, batch, unique_field, upsert, defaults, prepare, result)
+            batch = []
+            if on_batch:
+                on_batch(result)
+
+    if batch:
+        _import_batch(model, scheme, batch, unique_field, upsert, defaults, prepare, result)
+    if on_batch:
+        on_batch(result)
+
+    logger.info(
+        f"{model.__name__} 导入完成: 共 {result.total} 行，新增 {result.created}，"
+        f"更新 {result.updated}，失败 {result.failed}"
+    )
+    return result
+
+
+def _import_batch(
+        model: Type[Model],
+        scheme: Any,
+        batch: List[Tuple[int, dict]],
+        unique_field: Optional[str],
+        upsert: bool,
+        defaults: Optional[Dict[str, Any]],
+        prepare: Optional[Callable[[Model, bool], None]],
+        result: ImportResult,
+) -> None:
+    """校验并写入一批数据"""
+    concrete = {field.attname for field in model._meta.concrete_fields}
+
+    # 1. 逐行校验
+    valid: List[Tuple[int, dict]] = []
+    for row_number, data in batch:
+        try:
+            validated = scheme(**data).dict(exclude_unset=True)
+        except ValidationError as e:
+            for field, message in _format_validation_error(e):
+                result.add_error(row_number, message, field)
+            continue
+        except ValueError as e:
+            result.add_error(row_number, str(e))
+            continue
+        valid.append((row_number, {key: value for key, value in validated.items() if key in concrete}))
+
+    # 2. 按自然键区分新增和更新（同一文件中重复的键只保留第一次出现）
+    existing = {}
+    if unique_field:
+        seen = set()
+        deduplicated = []
+        for row_number, data in valid:
+            key = data.get(unique_field)
+            if key in seen:
+                result.add_error(row_number, f"文件中存在重复的 {unique_field}: {key}", unique_field)
+                continue
+            seen.add(key)
+            deduplicated.append((row_number, data))
+        valid = deduplicated
+        keys = [data.get(unique_field) for _, data in valid if data.get(unique_field) is not None]
+        # 加载已有记录：更新时只覆盖本行提供的列，其他列保持数据库中的值
+        existing = {
+            getattr(instance, unique_field): instance
+            for instance in model.objects.filter(**{f"{unique_field}__in": keys})
+        }
+
+    to_create: List[Tuple[int, Model]] = []
+    to_update: List[Tuple[int, Model]] = []
+    update_fields = set()
+    for row_number, data in valid:
+        key = data.get(unique_field) if unique_field else None
+        if unique_field and key in existing:
+            if not upsert:
+                result.add_error(row_number, f"{unique_field} 已存在: {key}", unique_field)
+                continue
+            instance = existing[key]
+            for name, value in data.items():
+                setattr(instance, name, value)
+            update_fields.update(name for name in data if name != unique_field)
+            if prepare:
+                prepare(instance, False)
+            to_update.append((row_number, instance))
+        else:
+            instance = model(**{**(defaults or {}), **data})
+            if prepare:
+                prepare(instance, True)
+            to_create.append((row_number, instance))
+
+    # 3. 批量写入；整批失败时逐行重试，定位出错的行
+    try:
+        with transaction.atomic():
+            if to_create:
+                model.objects.bulk_create([instance for _, instance in to_create])
+            if to_update and update_fields:
+                model.objects.bulk_update([instance for _, instance in to_update], list(update_fields))
+        result.created += len(to_create)
+        result.updated += len(to_update)
+        saved_ids = [instance.pk for _, instance in to_create + to_update]
+    except DatabaseError as e:
+        logger.warning(f"{model.__name__} 批量写入失败，改为逐行写入: {e}")
+        saved_ids = _save_rows_individually(model, to_create, to_update, list(update_fields), result)
+    if saved_ids:
+        post_bulk_import.send(sender=model, ids=saved_ids)
+
+
+def _save_rows_individually(
+        model: Type[Model],
+        to_create: List[Tuple[int, Model]],
+        to_update: List[Tuple[int, Model]],
+        update_fields: List[str],
+        result: ImportResult,
+) -> List[Any]:
+    """逐行写入（每行一个保存点），用于定位批量写入中出错的行，返回写入成功的主键"""
+    saved_ids = []
+    for row_number, instance in to_create:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([instance])
+            result.created += 1
+            saved_ids.append(instance.pk)
+        except DatabaseError as e:
+            result.add_error(row_number, f"保存失败: {e}")
+    for row_number, instance in to_update:
+        try:
+            with transaction.atomic():
+                if update_fields:
+                    model.objects.bulk_update([instance], update_fields)
+            result.updated += 1
+            saved_ids.append(instance.pk)
+        except DatabaseError as e:
+            result.add_error(row_number, f"保存失败: {e}")
+    return saved_ids
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+物化路径（materialized path）树工具
+
+部门、文件夹等树形数据在 path 字段中保存了祖先路径，
+子树的判断和整体移动都可以基于路径前缀完成，不需要逐层递归。
+"""
+from typing import Dict, Optional, Type
+
+from django.db.models import CharField, F, Model, QuerySet, Value
+from django.db.models.functions import Concat, Substr
+
+
+def is_path_in_subtree(candidate_path: Optional[str], subtree_prefix: str) -> bool:
+    """
+    判断某个节点是否位于以 subtree_prefix 为前缀的子树中
+
+    :param candidate_path: 待检查节点的路径
+    :param subtree_prefix: 子树的路径前缀
+    :return: 是否位于子树中
+    """
+    return bool(candidate_path) and candidate_path.startswith(subtree_prefix)
+
+
+def rewrite_subtree_prefix(
+        queryset: QuerySet,
+        old_prefix: str,
+        new_prefix: str,
+        path_field: str = 'path',
+        level_field: str = None,
+        level_delta: int = 0,
+) -> int:
+    """
+    将子树中所有节点的路径前缀从 old_prefix 替换为 new_prefix
+
+    只执行一条 UPDATE 语句：
+    UPDATE ... SET path = new_prefix || SUBSTR(path, len(old_prefix) + 1)
+    WHERE path LIKE 'old_prefix%'
+
+    :param queryset: 要更新的查询集（通常为 Model.objects.all()）
+    :param old_prefix: 移动前的子树路径前缀
+    :param new_prefix: 移动后的子树路径前缀
+    :param path_field: 路径字段名
+    :param level_field: 层级字段名（可选）
+    :param level_delta: 层级变化量
+    :return: 更新的行数
+    """
+    if old_prefix == new_prefix and not level_delta:
+        return 0
+
+    update_kwargs = {
+        path_field: Concat(
+            Value(new_prefix),
+            Substr(path_field, len(old_prefix) + 1),
+            output_field=CharField(),
+        ),
+    }
+    if level_field and level_delta:
+        update_kwargs[level_field] = F(level_field) + level_delta
+
+    return queryset.filter(**{f'{path_field}__startswith': old_prefix}).update(**update_kwargs)
+
+
+def load_parent_map(model: Type[Model], parent_field: str = 'parent_id') -> Dict[str, Optional[str]]:
+    """
+    一次查询加载整张表的 id -> parent_id 映射
+
+    适用于没有物化路径字段的小型树（如菜单），
+    用于在内存中完成祖先判断。
+    """
+    return {
+        str(node_id): str(parent_id) if parent_id else None
+        for node_id, parent_id in model.objects.values_list('id', parent_field)
+    }
+
+
+def is_descendant_in_parent_map(
+        parent_map: Dict[str, Optional[str]],
+        node_id: str,
+        ancestor_id: str,
+) -> bool:
+    """
+    基于 id -> parent_id 映射判断 node_id 是否为 ancestor_id 本身或其后代
+    """
+    node_id = str(node_id) if node_id else None
+    ancestor_id = str(ancestor_id)
+    visited = set()
+    while node_id and node_id not in visited:
+        if node_id == ancestor_id:
+            return True
+        visited.add(node_id)
+        node_id = parent_map.get(node_id)
+    return False
@@ -13,7 +13,9 @@ class CoreConfig(AppConfig):
     
     def ready(self):
         """应用初始化时执行"""
-        # 导入信号处理器（如果有）
-        # import core.signals
-        pass
+        # 导入信号处理器
+        import core.dept.dept_signals  # noqa: F401
+        import core.file_manager.file_manager_signals  # noqa: F401
+        import core.response_cache_signals  # noqa: F401
+        import core.search.search_signals  # noqa: F401
 
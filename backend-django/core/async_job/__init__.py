@@ -0,0 +1,6 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+AsyncJob 模块 - 后台导入导出任务
+任务状态保存在 Redis 中，提供轮询接口
+"""
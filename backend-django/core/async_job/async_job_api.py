@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+AsyncJob API - 后台任务接口
+任务由各模块的 */async 接口提交，这里提供状态查询
+"""
+from ninja import Router
+from ninja.errors import HttpError
+
+from common.fu_job import AsyncJobManager
+from core.async_job.async_job_schema import AsyncJobSchemaOut
+
+router = Router()
+
+
+@router.get("/async-job/{job_id}", response=AsyncJobSchemaOut, summary="获取后台任务状态")
+def get_async_job(request, job_id: str):
+    """
+    获取后台任务状态（轮询）
+    
+    任务完成后导出文件可通过文件管理接口下载；
+    任务状态变化同时会通过 ws/notifications/ 推送
+    """
+    job = AsyncJobManager.get(job_id)
+    if job is None:
+        raise HttpError(404, "任务不存在或已过期")
+    if job.get('user_id') != str(request.auth.id) and not request.auth.is_superuser:
+        raise HttpError(403, "无权查看该任务")
+    return job
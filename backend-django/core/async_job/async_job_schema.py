@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+AsyncJob Schema - 后台任务数据验证模式
+"""
+from typing import Any, Optional
+
+from ninja import Field, Schema
+
+
+class AsyncJobSchemaOut(Schema):
+    """后台任务状态输出模式"""
+    id: str = Field(..., description="任务ID")
+    type: str = Field(..., description="任务类型：export-导出，import-导入")
+    title: Optional[str] = Field(None, description="任务名称")
+    status: str = Field(..., description="状态：pending/running/success/failed")
+    progress: Optional[int] = Field(None, description="进度百分比，总数未知时为空")
+    processed: int = Field(0, description="已处理行数")
+    total: Optional[int] = Field(None, description="总行数（导出大表时可能为估算值）")
+    file_id: Optional[str] = Field(None, description="导出文件ID（文件管理）")
+    result: Optional[Any] = Field(None, description="任务结果，导入任务为导入统计与错误报告")
+    error: Optional[str] = Field(None, description="失败原因")
+    created_at: Optional[str] = Field(None, description="创建时间")
+    started_at: Optional[str] = Field(None, description="开始时间")
+    finished_at: Optional[str] = Field(None, description="完成时间")
@@ -6,7 +6,6 @@ Auth API - 认证相关接口
 """
 import logging
 from typing import List
-from django.shortcuts import get_object_or_404
 from ninja import Router
 from ninja.errors import HttpError
 
@@ -143,8 +142,8 @@ def get_userinfo(request):
     if not user_info:
         raise HttpError(message="未授权", status_code=401)
     
-    user = get_object_or_404(User, id=user_info.id)
-    print(user.avatar)
+    # BearerAuth 已查出当前用户，无需再查一次
+    user = user_info
     avatar_url = resolve_file_download_url(request, user.avatar)
 
     return UserInfoOut(
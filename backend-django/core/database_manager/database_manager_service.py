@@ -66,11 +66,12 @@ class DatabaseManagerService:
             
             config = {
                 'db_name': db_name,
-                'name': db_config.get('NAME', db_name),
+                'name': str(db_config.get('NAME') or db_name),
                 'db_type': db_type,
-                'host': db_config.get('HOST', 'localhost'),
-                'port': db_config.get('PORT', 5432),
-                'database': db_config.get('NAME', ''),
+                # Django 会把未配置的 HOST/PORT 补成空字符串（SQLite 即如此）
+                'host': db_config.get('HOST') or 'localhost',
+                'port': int(db_config.get('PORT') or 0),
+                'database': str(db_config.get('NAME') or ''),
                 'user': db_config.get('USER', ''),
                 'has_password': bool(db_config.get('PASSWORD', ''))
             }
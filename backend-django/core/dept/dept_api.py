@@ -6,17 +6,20 @@ Dept API - 部门管理接口
 """
 from typing import List
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count
-from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
 from ninja import Router, Query
 from ninja.errors import HttpError
 from ninja.pagination import paginate
 
-from common.fu_crud import create, delete, update, batch_delete
+from common.fu_cache import ResponseCacheManager, cache_response
+from common.fu_crud import create, delete, update, batch_delete, batch_update
 from common.fu_pagination import MyPagination
 from common.fu_schema import response_success
 from common.utils.list_to_tree import list_to_tree
 from core.dept.dept_model import Dept
+from core.dept.dept_service import DeptService
+from core.search.search_service import SearchService
 from core.dept.dept_schema import (
     DeptSchemaOut,
     DeptSchemaIn,
@@ -36,13 +39,12 @@ from core.dept.dept_schema import (
 
 router = Router()
 
-DEPT_CACHE_KEY = "core_dept_tree"
 DEPT_CACHE_TIMEOUT = 3600  # 1小时
 
 
 def remove_dept_cache():
     """清除部门缓存"""
-    cache.delete(DEPT_CACHE_KEY)
+    ResponseCacheManager.invalidate('dept')
 
 
 @router.post("/dept", response=DeptSchemaOut, summary="创建部门")
@@ -65,11 +67,276 @@ def create_dept(request, data: DeptSchemaIn):
         if not parent.status:
             raise HttpError(400, "父部门已被禁用，无法在其下创建子部门")
     
-    query_set = create(request, data, Dept)
+    # 闭包表记录由 post_save 信号在同一事务中写入
+    with transaction.atomic():
+        query_set = create(request, data, Dept)
     remove_dept_cache()
     return query_set
 
 
+@router.get("/dept/tree", response=List[dict], summary="获取部门树")
+@cache_response('dept', List[dict], key=lambda use_cache=True: '' if use_cache else None, timeout=DEPT_CACHE_TIMEOUT)
+def list_dept_tree(request, use_cache: bool = Query(True)):
+    """
+    获取部门树形结构
+    
+    改进点：
+    - 缓存序列化后的响应（支持 ETag / 304），use_cache=false 时直接查询
+    - 添加子部门数量和用户数量
+    """
+    # 从数据库查询（子部门数、用户数在同一条查询中计算）
+    dept_queryset = DeptService.annotate_counts(Dept.objects.all().select_related('lead'))
+    
+    # 构建部门字典列表
+    dept_list = []
+    for dept in dept_queryset:
+        dept_dict = {
+            'id': str(dept.id),
+            'name': dept.name,
+            'code': dept.code,
+            'dept_type': dept.dept_type,
+            'status': dept.status,
+            'level': dept.level,
+            'parent_id': str(dept.parent_id) if dept.parent_id else None,
+            'lead_id': str(dept.lead_id) if dept.lead_id else None,
+            'lead_name': dept.lead.name if dept.lead else None,
+            'phone': dept.phone,
+            'email': dept.email,
+            'description': dept.description,
+            'sort': dept.sort,
+            'child_count': dept.child_count,
+            'user_count': dept.user_count,
+            'dept_type_display': dept.get_dept_type_display_name(),
+        }
+        dept_list.append(dept_dict)
+    
+    # 转换为树形结构
+    return list_to_tree(dept_list)
+
+
+def _dept_tree_node(dept) -> dict:
+    """将已附加计数的部门转换为懒加载树节点"""
+    return {
+        'id': str(dept.id),
+        'name': dept.name,
+        'code': dept.code,
+        'dept_type': dept.dept_type,
+        'dept_type_display': dept.get_dept_type_display_name(),
+        'status': dept.status,
+        'level': dept.level,
+        'parent_id': str(dept.parent_id) if dept.parent_id else None,
+        'lead_id': str(dept.lead_id) if dept.lead_id else None,
+        'lead_name': dept.lead.name if dept.lead else None,
+        'sort': dept.sort,
+        'child_count': dept.child_count,
+        'user_count': dept.user_count,
+        'has_children': dept.child_count > 0,
+    }
+
+
+@router.get("/dept/tree/lazy", response=List[dict], summary="懒加载部门树（按层级）")
+def list_dept_tree_lazy(
+        request,
+        parent_id: str = Query(None),
+        depth: int = Query(1, ge=1, le=10),
+):
+    """
+    从指定部门开始返回 depth 层部门树
+    
+    - parent_id 为空时从根部门开始
+    - 子部门数、用户数和 has_children 在同一条查询中计算
+    - 最底层节点不返回 children，由前端根据 has_children 按需展开
+    """
+    if parent_id == "null":
+        parent_id = None
+    
+    try:
+        query_set = DeptService.get_levels_queryset(parent_id, depth)
+    except Dept.DoesNotExist:
+        raise HttpError(404, "部门不存在")
+    
+    node_map = {}
+    for dept in query_set:
+        node_map[str(dept.id)] = _dept_tree_node(dept)
+    
+    roots = []
+    for node in node_map.values():
+        parent = node_map.get(node['parent_id'])
+        if parent is None:
+            roots.append(node)
+        else:
+            parent.setdefault('children', []).append(node)
+    
+    return roots
+
+
+@router.get("/dept/tree/expand", response=dict, summary="批量展开部门节点")
+def expand_dept_tree(request, ids: str):
+    """
+    批量获取多个部门的直接子部门
+    
+    返回格式：{部门ID: [子部门节点, ...]}，一次查询完成
+    """
+    dept_ids = [id.strip() for id in ids.split(',') if id.strip()]
+    result = {dept_id: [] for dept_id in dept_ids}
+    if not dept_ids:
+        return result
+    
+    for dept in DeptService.get_children_queryset(dept_ids):
+        result.setdefault(str(dept.parent_id), []).append(_dept_tree_node(dept))
+    
+    return result
+
+
+@router.get("/dept/list", response=List[DeptSchemaOut], summary="获取部门列表（分页）")
+@paginate(MyPagination)
+def list_dept(request, filters: DeptFilters = Query(...)):
+    """
+    获取部门列表（分页）
+    
+    改进点：
+    - 支持多种过滤条件
+    - 预加载关联数据，子部门数、用户数在同一条查询中计算
+    """
+    from common.fu_crud import retrieve
+    query_set = retrieve(request, Dept, filters)
+    query_set = DeptService.annotate_counts(query_set.select_related('parent', 'lead'))
+    return query_set
+
+
+@router.get("/dept/all", response=List[DeptSchemaSimple], summary="获取所有部门（简化版）")
+def list_all_dept(request):
+    """
+    获取所有启用的部门（不分页，简化版）
+    
+    用于部门选择器等场景
+    """
+    query_set = Dept.objects.filter(status=True).order_by('level', 'sort')
+    return query_set
+
+
+@router.get("/dept/search", response=List[dict], summary="搜索部门")
+def search_dept(request, keyword: str):
+    """
+    搜索部门（模糊匹配部门名称或编码）
+    
+    改进点：
+    - 支持名称和编码搜索
+    - 返回匹配部门及其完整的层级路径
+    """
+    if not keyword:
+        return []
+    
+    # 搜索部门
+    matched_depts = SearchService.filter_queryset(Dept.objects.all(), 'dept', keyword)
+    
+    # 收集所有需要的部门ID（包括匹配部门和其所有祖先）
+    dept_ids_to_include = set()
+    
+    for dept in matched_depts:
+        dept_ids_to_include.add(dept.id)
+        # 添加所有祖先
+        for ancestor in dept.get_ancestors():
+            dept_ids_to_include.add(ancestor.id)
+    
+    # 获取所有需要的部门
+    all_depts = Dept.objects.filter(id__in=dept_ids_to_include).select_related('lead')
+    
+    # 构建部门字典
+    dept_dict_map = {}
+    for dept in all_depts:
+        dept_dict = {
+            'id': str(dept.id),
+            'name': dept.name,
+            'code': dept.code,
+            'dept_type': dept.dept_type,
+            'dept_type_display': dept.get_dept_type_display_name(),
+            'status': dept.status,
+            'level': dept.level,
+            'path': dept.path,
+            'parent_id': str(dept.parent_id) if dept.parent_id else None,
+            'lead_id': str(dept.lead_id) if dept.lead_id else None,
+            'lead_name': dept.lead.name if dept.lead else None,
+            'phone': dept.phone,
+            'email': dept.email,
+            'description': dept.description,
+            'sort': dept.sort,
+            'child_count': Dept.objects.filter(
+                parent_id=dept.id,
+                id__in=dept_ids_to_include
+            ).count(),
+            'user_count': dept.get_user_count(),
+        }
+        dept_dict_map[str(dept.id)] = dept_dict
+    
+    # 构建树形结构
+    roots = []
+    for dept_id, dept in dept_dict_map.items():
+        parent_id = dept['parent_id']
+        if parent_id is None:
+            roots.append(dept)
+        elif parent_id in dept_dict_map:
+            parent = dept_dict_map[parent_id]
+            if 'children' not in parent:
+                parent['children'] = []
+            parent['children'].append(dept)
+    
+    return roots
+
+
+@router.get("/dept/stats", summary="获取部门统计信息")
+def get_dept_stats(request):
+    """
+    获取部门统计信息
+    
+    改进点：
+    - 提供全局统计数据
+    """
+    total_count = Dept.objects.count()
+    active_count = Dept.objects.filter(status=True).count()
+    root_count = Dept.objects.filter(parent__isnull=True).count()
+    
+    # 按类型统计
+    type_stats = {}
+    for type_code, type_name in Dept.DEPT_TYPE_CHOICES:
+        count = Dept.objects.filter(dept_type=type_code).count()
+        type_stats[type_name] = count
+    
+    return {
+        'total_count': total_count,
+        'active_count': active_count,
+        'inactive_count': total_count - active_count,
+        'root_count': root_count,
+        'type_stats': type_stats,
+        'max_level': Dept.objects.aggregate(max_level=Max('level'))['max_level'] or 0,
+    }
+
+
+@router.post("/dept/move", summary="移动部门")
+def move_dept(request, dept_id: str, new_parent_id: str = None):
+    """
+    移动部门到新的父部门下
+    
+    改进点：
+    - 支持移动到根节点
+    - 基于路径前缀校验循环引用
+    - 整个子树的层级和路径通过一条 UPDATE 批量更新
+    """
+    if new_parent_id == "null":
+        new_parent_id = None
+    
+    try:
+        DeptService.move_dept(dept_id, new_parent_id)
+    except Dept.DoesNotExist:
+        raise HttpError(404, "部门不存在")
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    
+    remove_dept_cache()
+    
+    return response_success("移动成功")
+
+
 @router.delete("/dept/{dept_id}", response=DeptSchemaOut, summary="删除部门")
 def delete_dept(request, dept_id: str):
     """
@@ -144,10 +411,16 @@ def update_dept(request, dept_id: str, data: DeptSchemaIn):
         
         # 检查是否会形成循环引用
         parent = get_object_or_404(Dept, id=data.parent_id)
-        if dept in parent.get_ancestors():
+        if DeptService.is_in_subtree(dept, parent):
             raise HttpError(400, "不能将子部门设置为父部门，会形成循环引用")
     
-    instance = update(request, dept_id, data, Dept)
+    old_prefix = DeptService.get_subtree_prefix(dept)
+    old_level = dept.level
+    
+    with transaction.atomic():
+        instance = update(request, dept_id, data, Dept)
+        # 父部门变更时批量更新整个子树的路径和层级
+        DeptService.rewrite_descendants(instance, old_prefix, old_level)
     remove_dept_cache()
     return instance
 
@@ -184,97 +457,25 @@ def patch_dept(request, dept_id: str, data: DeptSchemaPatch):
         
         # 检查是否会形成循环引用
         parent = get_object_or_404(Dept, id=update_data['parent_id'])
-        if dept in parent.get_ancestors():
+        if DeptService.is_in_subtree(dept, parent):
             raise HttpError(400, "不能将子部门设置为父部门，会形成循环引用")
     
+    old_prefix = DeptService.get_subtree_prefix(dept)
+    old_level = dept.level
+    
     # 更新字段
     for field, value in update_data.items():
         setattr(dept, field, value)
     
-    dept.save()
+    with transaction.atomic():
+        dept.save()
+        # 父部门变更时批量更新整个子树的路径和层级
+        DeptService.rewrite_descendants(dept, old_prefix, old_level)
     remove_dept_cache()
     
     return dept
 
 
-@router.get("/dept/tree", response=List[dict], summary="获取部门树")
-def list_dept_tree(request, use_cache: bool = Query(True)):
-    """
-    获取部门树形结构
-    
-    改进点：
-    - 支持缓存
-    - 添加子部门数量和用户数量
-    """
-    # 尝试从缓存获取
-    if use_cache:
-        cached_tree = cache.get(DEPT_CACHE_KEY)
-        if cached_tree:
-            return cached_tree
-    
-    # 从数据库查询
-    dept_queryset = Dept.objects.all().select_related('lead')
-    
-    # 构建部门字典列表
-    dept_list = []
-    for dept in dept_queryset:
-        dept_dict = {
-            'id': str(dept.id),
-            'name': dept.name,
-            'code': dept.code,
-            'dept_type': dept.dept_type,
-            'status': dept.status,
-            'level': dept.level,
-            'parent_id': str(dept.parent_id) if dept.parent_id else None,
-            'lead_id': str(dept.lead_id) if dept.lead_id else None,
-            'lead_name': dept.lead.name if dept.lead else None,
-            'phone': dept.phone,
-            'email': dept.email,
-            'description': dept.description,
-            'sort': dept.sort,
-            'child_count': dept.get_child_count(),
-            'user_count': dept.get_user_count(),
-            'dept_type_display': dept.get_dept_type_display_name(),
-        }
-        dept_list.append(dept_dict)
-    
-    # 转换为树形结构
-    dept_tree = list_to_tree(dept_list)
-    
-    # 缓存结果
-    if use_cache:
-        cache.set(DEPT_CACHE_KEY, dept_tree, DEPT_CACHE_TIMEOUT)
-    
-    return dept_tree
-
-
-@router.get("/dept/list", response=List[DeptSchemaOut], summary="获取部门列表（分页）")
-@paginate(MyPagination)
-def list_dept(request, filters: DeptFilters = Query(...)):
-    """
-    获取部门列表（分页）
-    
-    改进点：
-    - 支持多种过滤条件
-    - 预加载关联数据
-    """
-    from common.fu_crud import retrieve
-    query_set = retrieve(request, Dept, filters)
-    query_set = query_set.select_related('parent', 'lead')
-    return query_set
-
-
-@router.get("/dept/all", response=List[DeptSchemaSimple], summary="获取所有部门（简化版）")
-def list_all_dept(request):
-    """
-    获取所有启用的部门（不分页，简化版）
-    
-    用于部门选择器等场景
-    """
-    query_set = Dept.objects.filter(status=True).order_by('level', 'sort')
-    return query_set
-
-
 @router.get("/dept/{dept_id}", response=DeptSchemaOut, summary="获取部门详情")
 def get_dept(request, dept_id: str):
     """获取单个部门的详细信息"""
@@ -325,77 +526,6 @@ def get_dept_by_parent(request, parent_id: str):
     return result
 
 
-@router.get("/dept/search", response=List[dict], summary="搜索部门")
-def search_dept(request, keyword: str):
-    """
-    搜索部门（模糊匹配部门名称或编码）
-    
-    改进点：
-    - 支持名称和编码搜索
-    - 返回匹配部门及其完整的层级路径
-    """
-    if not keyword:
-        return []
-    
-    # 搜索部门
-    matched_depts = Dept.objects.filter(
-        Q(name__icontains=keyword) | Q(code__icontains=keyword)
-    )
-    
-    # 收集所有需要的部门ID（包括匹配部门和其所有祖先）
-    dept_ids_to_include = set()
-    
-    for dept in matched_depts:
-        dept_ids_to_include.add(dept.id)
-        # 添加所有祖先
-        for ancestor in dept.get_ancestors():
-            dept_ids_to_include.add(ancestor.id)
-    
-    # 获取所有需要的部门
-    all_depts = Dept.objects.filter(id__in=dept_ids_to_include).select_related('lead')
-    
-    # 构建部门字典
-    dept_dict_map = {}
-    for dept in all_depts:
-        dept_dict = {
-            'id': str(dept.id),
-            'name': dept.name,
-            'code': dept.code,
-            'dept_type': dept.dept_type,
-            'dept_type_display': dept.get_dept_type_display_name(),
-            'status': dept.status,
-            'level': dept.level,
-            'path': dept.path,
-            'parent_id': str(dept.parent_id) if dept.parent_id else None,
-            'lead_id': str(dept.lead_id) if dept.lead_id else None,
-            'lead_name': dept.lead.name if dept.lead else None,
-            'phone': dept.phone,
-            'email': dept.email,
-            'description': dept.description,
-            'sort': dept.sort,
-            'child_count': Dept.objects.filter(
-                parent_id=dept.id,
-                id__in=dept_ids_to_include
-            ).count(),
-            'user_count': dept.get_user_count(),
-        }
-        dept_dict_map[str(dept.id)] = dept_dict
-    
-    # 构建树形结构
-    roots = []
-    for dept_id, dept in dept_dict_map.items():
-        parent_id = dept['parent_id']
-        if parent_id is None:
-            roots.append(dept)
-        elif parent_id in dept_dict_map:
-            parent = dept_dict_map[parent_id]
-            if 'children' not in parent:
-                parent['children'] = []
-            parent['children'].append(dept)
-    
-    return roots
-
-
 @router.get("/dept/by/ids", response=List[dict], summary="根据ID列表获取部门")
 def get_depts_by_ids(request, ids: str):
     """
@@ -502,44 +632,43 @@ def batch_update_dept_status(request, data: DeptBatchUpdateStatusIn):
     
     改进点：
     - 禁用部门时同时禁用所有子部门
-    """
-    count = 0
-    for dept_id in data.ids:
-        try:
-            dept = Dept.objects.get(id=dept_id)
-            dept.status = data.status
-            dept.save()
-            count += 1
-            
-            # 如果禁用，同时禁用所有子部门
-            if not data.status:
-                for descendant in dept.get_descendants():
-                    descendant.status = False
-                    descendant.save()
-                    count += 1
-        except Dept.DoesNotExist:
-            continue
-    
-    remove_dept_cache()
+    - 单条 UPDATE 完成，不再逐个查询和保存
+    """
+    ids = list(data.ids)
+    if not data.status and ids:
+        # 禁用时连同子部门一起：先查出子树内的ID（一条查询）再分段 UPDATE，
+        # MySQL 不允许 UPDATE 的子查询中读取同一张表（错误 1093）
+        ids = [next(iter(row.values())) for row in DeptService.subtrees_ids_queryset(ids)]
+    
+    count = batch_update(
+        request,
+        Dept,
+        ids,
+        {"status": data.status},
+        on_updated=lambda _: remove_dept_cache(),
+    )
     return DeptBatchUpdateStatusOut(count=count)
 
 
 @router.get("/dept/users/{dept_id}", response=List[DeptUserSchema], summary="获取部门用户列表")
-@paginate(MyPagination)
+@paginate(MyPagination, projection=DeptUserSchema, projection_extra=('dept__name', 'post__name'))
 def get_dept_users(request, dept_id: str, include_children: bool = Query(False)):
     """
     获取部门下的用户列表
     
     改进点：
     - 支持包含子部门用户的选项
+    - 子部门通过闭包表/路径前缀子查询过滤，无需递归
     """
     dept = get_object_or_404(Dept, id=dept_id)
     
     if include_children:
         # 获取部门及其所有子部门的用户
-        dept_ids = [dept.id] + [d.id for d in dept.get_descendants()]
         from core.user.user_model import User
-        users = User.objects.filter(dept_id__in=dept_ids, user_status=1)
+        users = DeptService.filter_by_dept_subtree(
+            User.objects.filter(user_status=1),
+            dept.id,
+        )
     else:
         # 只获取当前部门的用户
         users = dept.core_users.filter(user_status=1)
@@ -611,59 +740,12 @@ def add_user_to_dept(request, dept_id: str, data: DeptUserIn):
     return response_success(f"成功添加 {added_count} 个用户")
 
 
-@router.get("/dept/stats", summary="获取部门统计信息")
-def get_dept_stats(request):
+@router.post("/dept/closure/rebuild", summary="重建部门闭包表")
+def rebuild_dept_closure(request):
     """
-    获取部门统计信息
+    根据部门路径全量重建部门闭包表
     
-    改进点：
-    - 提供全局统计数据
+    用于首次开启 DEPT_CLOSURE_ENABLE 或修复索引数据
     """
-    total_count = Dept.objects.count()
-    active_count = Dept.objects.filter(status=True).count()
-    root_count = Dept.objects.filter(parent__isnull=True).count()
-    
-    # 按类型统计
-    type_stats = {}
-    for type_code, type_name in Dept.DEPT_TYPE_CHOICES:
-        count = Dept.objects.filter(dept_type=type_code).count()
-        type_stats[type_name] = count
-    
-    return {
-        'total_count': total_count,
-        'active_count': active_count,
-        'inactive_count': total_count - active_count,
-        'root_count': root_count,
-        'type_stats': type_stats,
-        'max_level': Dept.objects.aggregate(max_level=models.Max('level'))['max_level'] or 0,
-    }
-
-
-@router.post("/dept/move", summary="移动部门")
-def move_dept(request, dept_id: str, new_parent_id: str = None):
-    """
-    移动部门到新的父部门下
-    
-    改进点：
-    - 支持移动到根节点
-    - 自动更新层级和路径
-    """
-    dept = get_object_or_404(Dept, id=dept_id)
-    
-    # 检查新父部门
-    if new_parent_id and new_parent_id != "null":
-        new_parent = get_object_or_404(Dept, id=new_parent_id)
-        
-        # 防止循环引用
-        if dept in new_parent.get_ancestors() or dept.id == new_parent.id:
-            raise HttpError(400, "不能移动到自己或子部门下")
-        
-        dept.parent = new_parent
-    else:
-        dept.parent = None
-    
-    dept.save()
-    remove_dept_cache()
-    
-    return response_success("移动成功")
-
+    count = DeptService.rebuild_closure()
+    return response_success(f"部门闭包表重建完成，共 {count} 条记录")
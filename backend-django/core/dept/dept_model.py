@@ -208,3 +208,49 @@ class Dept(RootModel):
         """判断是否可以删除（没有子部门和用户）"""
         return self.is_leaf() and self.get_user_count() == 0
 
+
+class DeptClosure(models.Model):
+    """
+    部门闭包表 - 部门层级索引（可选，由 DEPT_CLOSURE_ENABLE 开启）
+    
+    为每一对（祖先, 后代）保存一行记录（包含自身，depth=0），
+    "本部门及下级部门" 这类子树查询可以直接通过索引完成，无需递归。
+    由 DeptService 在部门创建、移动时维护，删除部门时级联删除。
+    """
+    
+    # 祖先部门
+    ancestor = models.ForeignKey(
+        to=Dept,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        help_text="祖先部门",
+        related_name="descendant_links",
+    )
+    
+    # 后代部门
+    descendant = models.ForeignKey(
+        to=Dept,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        help_text="后代部门",
+        related_name="ancestor_links",
+    )
+    
+    # 祖先到后代的距离（自身为0）
+    depth = models.IntegerField(
+        default=0,
+        help_text="层级距离",
+    )
+    
+    class Meta:
+        db_table = "core_dept_closure"
+        verbose_name = "部门闭包表"
+        verbose_name_plural = verbose_name
+        unique_together = (('ancestor', 'descendant'),)
+        indexes = [
+            models.Index(fields=['ancestor', 'depth']),
+            models.Index(fields=['descendant', 'depth']),
+        ]
+    
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
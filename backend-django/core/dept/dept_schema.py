@@ -129,12 +129,16 @@ class DeptSchemaOut(ModelSchema):
     
     @staticmethod
     def resolve_child_count(obj):
-        """解析子部门数量"""
+        """解析子部门数量（列表查询已 annotate 时直接使用）"""
+        if hasattr(obj, 'child_count'):
+            return obj.child_count
         return obj.get_child_count()
     
     @staticmethod
     def resolve_user_count(obj):
-        """解析用户数量"""
+        """解析用户数量（列表查询已 annotate 时直接使用）"""
+        if hasattr(obj, 'user_count'):
+            return obj.user_count
         return obj.get_user_count()
     
     @staticmethod
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Dept Service - 部门服务层
+处理部门树结构相关的业务逻辑（移动、路径维护、闭包表维护、子树过滤）
+"""
+import logging
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from common.utils.tree_path import is_path_in_subtree, rewrite_subtree_prefix
+from core.dept.dept_model import Dept, DeptClosure
+
+logger = logging.getLogger(__name__)
+
+# 闭包表批量写入的分批大小
+CLOSURE_BATCH_SIZE = 1000
+
+
+class DeptService:
+    """部门服务类 - 提供部门树的结构性操作"""
+
+    @staticmethod
+    def get_subtree_prefix(dept: Dept) -> str:
+        """
+        获取部门子树的路径前缀
+
+        部门的 path 只包含祖先（格式：/1/2/），
+        其所有后代的 path 都以 "{path}{id}/" 开头。
+        """
+        return f"{dept.path or '/'}{dept.id}/"
+
+    @staticmethod
+    def is_in_subtree(dept: Dept, candidate: Dept) -> bool:
+        """
+        判断 candidate 是否为 dept 本身或其后代（基于路径前缀，无需递归查询）
+        """
+        if str(candidate.id) == str(dept.id):
+            return True
+        return is_path_in_subtree(candidate.path, DeptService.get_subtree_prefix(dept))
+
+    @staticmethod
+    def rewrite_descendants(dept: Dept, old_prefix: str, old_level: int) -> int:
+        """
+        部门自身的 path/level 已更新后，批量改写其所有后代的 path/level
+
+        Args:
+            dept: 已保存的部门
+            old_prefix: 移动前的子树路径前缀
+            old_level: 移动前的部门层级
+
+        Returns:
+            int: 更新的后代数量
+        """
+        new_prefix = DeptService.get_subtree_prefix(dept)
+        if new_prefix == old_prefix:
+            return 0
+
+        count = rewrite_subtree_prefix(
+            Dept.objects.all(),
+            old_prefix,
+            new_prefix,
+            level_field='level',
+            level_delta=dept.level - old_level,
+        )
+        if count:
+            logger.info(f"部门 {dept.id} 子树路径已更新: {count} 个后代")
+
+        if DeptService.closure_enabled():
+            DeptService.relink_closure(dept)
+        return count
+
+    @staticmethod
+    def move_dept(dept_id: str, new_parent_id: Optional[str] = None) -> Dept:
+        """
+        移动部门（连同整个子树）到新的父部门下
+
+        - 使用路径前缀校验循环引用
+        - 后代的 path/level 通过一条 UPDATE 语句批量改写
+        - 整个过程在事务中执行
+
+        Args:
+            dept_id: 要移动的部门ID
+            new_parent_id: 新父部门ID，为空表示移动到根节点
+
+        Returns:
+            Dept: 移动后的部门
+
+        Raises:
+            Dept.DoesNotExist: 部门或新父部门不存在
+            ValueError: 移动会形成循环引用
+        """
+        with transaction.atomic():
+            dept = Dept.objects.select_for_update().get(id=dept_id)
+
+            new_parent = None
+            if new_parent_id:
+                new_parent = Dept.objects.get(id=new_parent_id)
+                if DeptService.is_in_subtree(dept, new_parent):
+                    raise ValueError("不能移动到自己或子部门下")
+
+            old_prefix = DeptService.get_subtree_prefix(dept)
+            old_level = dept.level
+
+            dept.parent = new_parent
+            dept.save()
+            DeptService.rewrite_descendants(dept, old_prefix, old_level)
+
+        return dept
+
+    # ===============================================================
+    # 部门闭包表维护
+    # ===============================================================
+
+    @staticmethod
+    def closure_enabled() -> bool:
+        """是否启用部门闭包表"""
+        return getattr(settings, 'DEPT_CLOSURE_ENABLE', False)
+
+    @staticmethod
+    def insert_closure(dept: Dept) -> int:
+        """
+        为新建部门写入闭包记录：自身一行 + 父部门的每个祖先各一行
+
+        Returns:
+            int: 写入的记录数
+        """
+        links = [DeptClosure(ancestor_id=dept.id, descendant_id=dept.id, depth=0)]
+        if dept.parent_id:
+            parent_links = DeptClosure.objects.filter(
+                descendant_id=dept.parent_id
+            ).values_list('ancestor_id', 'depth')
+            links.extend(
+                DeptClosure(ancestor_id=ancestor_id, descendant_id=dept.id, depth=depth + 1)
+                for ancestor_id, depth in parent_links
+            )
+        DeptClosure.objects.bulk_create(links, ignore_conflicts=True)
+        return len(links)
+
+    @staticmethod
+    def relink_closure(dept: Dept) -> int:
+        """
+        部门移动后重建子树与外部祖先之间的闭包记录
+
+        子树内部的记录保持不变，只需：
+        1. 删除（旧祖先, 子树节点）记录
+        2. 插入（新祖先, 子树节点）记录，depth = 祖先到新父部门的距离 + 1 + 节点在子树中的深度
+
+        Returns:
+            int: 新插入的记录数
+        """
+        with transaction.atomic():
+            subtree = list(
+                DeptClosure.objects.filter(ancestor_id=dept.id).values_list('descendant_id', 'depth')
+            )
+            subtree_ids = [descendant_id for descendant_id, _ in subtree]
+
+            DeptClosure.objects.filter(
+                descendant_id__in=subtree_ids
+            ).exclude(
+                ancestor_id__in=subtree_ids
+            ).delete()
+
+            if not dept.parent_id:
+                return 0
+
+            new_ancestors = list(
+                DeptClosure.objects.filter(
+                    descendant_id=dept.parent_id
+                ).values_list('ancestor_id', 'depth')
+            )
+            links = [
+                DeptClosure(
+                    ancestor_id=ancestor_id,
+                    descendant_id=descendant_id,
+                    depth=ancestor_depth + 1 + descendant_depth,
+                )
+                for ancestor_id, ancestor_depth in new_ancestors
+                for descendant_id, descendant_depth in subtree
+            ]
+            DeptClosure.objects.bulk_create(links, batch_size=CLOSURE_BATCH_SIZE)
+        return len(links)
+
+    @staticmethod
+    def rebuild_closure() -> int:
+        """
+        根据部门的物化路径全量重建闭包表
+
+        用于首次开启闭包表或修复数据，路径格式为 /祖先1/祖先2/.../
+
+        Returns:
+            int: 写入的记录数
+        """
+        links = []
+        for dept_id, path in Dept.objects.values_list('id', 'path'):
+            ancestor_ids = [item for item in (path or '').split('/') if item]
+            links.append(DeptClosure(ancestor_id=dept_id, descendant_id=dept_id, depth=0))
+            for index, ancestor_id in enumerate(ancestor_ids):
+                links.append(DeptClosure(
+                    ancestor_id=ancestor_id,
+                    descendant_id=dept_id,
+                    depth=len(ancestor_ids) - index,
+                ))
+
+        with transaction.atomic():
+            DeptClosure.objects.all().delete()
+            DeptClosure.objects.bulk_create(links, batch_size=CLOSURE_BATCH_SIZE)
+
+        logger.info(f"部门闭包表已重建: {len(links)} 条记录")
+        return len(links)
+
+    # ===============================================================
+    # 子树查询
+    # ===============================================================
+
+    @staticmethod
+    def subtree_ids_queryset(dept_id: str, include_self: bool = True) -> QuerySet:
+        """
+        返回部门子树内所有部门ID的查询集（可直接作为 __in 子查询使用）
+
+        - 启用闭包表时：按 ancestor 索引查询闭包表
+        - 未启用时：按物化路径前缀查询部门表（LIKE 'prefix%' 同样可以走索引）
+        """
+        if DeptService.closure_enabled():
+            query_set = DeptClosure.objects.filter(ancestor_id=dept_id)
+            if not include_self:
+                query_set = query_set.filter(depth__gt=0)
+            return query_set.values('descendant_id')
+
+        dept = Dept.objects.only('id', 'path').get(id=dept_id)
+        condition = Q(path__startswith=DeptService.get_subtree_prefix(dept))
+        if include_self:
+            condition |= Q(id=dept.id)
+        return Dept.objects.filter(condition).values('id')
+
+    @staticmethod
+    def subtrees_ids_queryset(dept_ids: List[str]) -> QuerySet:
+        """
+        返回多个部门子树（含自身）内所有部门ID的查询集
+
+        - 启用闭包表时：一条 ancestor IN (...) 子查询
+        - 未启用时：先读取这些部门的 path（一条查询），再按路径前缀 OR 过滤
+        """
+        if DeptService.closure_enabled():
+            return DeptClosure.objects.filter(ancestor_id__in=dept_ids).values('descendant_id')
+
+        condition = Q(id__in=dept_ids)
+        for dept in Dept.objects.filter(id__in=dept_ids).only('id', 'path'):
+            condition |= Q(path__startswith=DeptService.get_subtree_prefix(dept))
+        return Dept.objects.filter(condition).values('id')
+
+    @staticmethod
+    def get_subtree_ids(dept_id: str, include_self: bool = True) -> List[str]:
+        """获取部门子树内所有部门ID"""
+        return [
+            str(next(iter(row.values())))
+            for row in DeptService.subtree_ids_queryset(dept_id, include_self)
+        ]
+
+    @staticmethod
+    def filter_by_dept_subtree(
+            queryset: QuerySet,
+            dept_id: str,
+            dept_field: str = 'dept',
+            include_self: bool = True,
+    ) -> QuerySet:
+        """
+        将任意带部门外键的查询集过滤到某个部门子树内（"本部门及下级部门"）
+
+        生成单条 SQL：... WHERE dept_id IN (SELECT descendant_id FROM core_dept_closure WHERE ancestor_id = %s)
+
+        Args:
+            queryset: 待过滤的查询集
+            dept_id: 子树根部门ID
+            dept_field: 查询集模型上的部门外键字段名
+            include_self: 是否包含根部门本身
+
+        Returns:
+            QuerySet: 过滤后的查询集
+        """
+        return queryset.filter(**{
+            f'{dept_field}_id__in': DeptService.subtree_ids_queryset(dept_id, include_self)
+        })
+
+    # ===============================================================
+    # 树形查询（懒加载）
+    # ===============================================================
+
+    @staticmethod
+    def annotate_counts(queryset: QuerySet) -> QuerySet:
+        """
+        在同一条查询中附加子部门数量和用户数量
+
+        使用相关子查询而不是 JOIN + COUNT，避免子部门与用户两张表相乘放大结果集。
+        """
+        from core.user.user_model import User
+
+        child_count = Dept.objects.filter(
+            parent_id=OuterRef('pk')
+        ).order_by().values('parent_id').annotate(c=Count('id')).values('c')
+        user_count = User.objects.filter(
+            dept_id=OuterRef('pk')
+        ).order_by().values('dept_id').annotate(c=Count('id')).values('c')
+
+        return queryset.annotate(
+            child_count=Coalesce(Subquery(child_count, output_field=IntegerField()), 0),
+            user_count=Coalesce(Subquery(user_count, output_field=IntegerField()), 0),
+        )
+
+    @staticmethod
+    def get_levels_queryset(parent_id: Optional[str] = None, depth: int = 1) -> QuerySet:
+        """
+        获取某个部门下 depth 层以内的所有部门（单条查询，已附加计数）
+
+        Args:
+            parent_id: 起始部门ID，为空表示从根节点开始
+            depth: 向下展开的层数
+
+        Returns:
+            QuerySet: 部门查询集
+
+        Raises:
+            Dept.DoesNotExist: 起始部门不存在
+        """
+        if parent_id:
+            parent = Dept.objects.only('id', 'path', 'level').get(id=parent_id)
+            query_set = Dept.objects.filter(
+                path__startswith=DeptService.get_subtree_prefix(parent),
+                level__lte=parent.level + depth,
+            )
+        else:
+            query_set = Dept.objects.filter(level__lt=depth)
+        return DeptService.annotate_counts(query_set.select_related('lead'))
+
+    @staticmethod
+    def get_children_queryset(parent_ids: List[str]) -> QuerySet:
+        """批量获取多个部门的直接子部门（单条查询，已附加计数）"""
+        query_set = Dept.objects.filter(parent_id__in=parent_ids).select_related('lead')
+        return DeptService.annotate_counts(query_set)
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Dept Signals - 部门信号处理
+新建部门时维护部门闭包表（移动由 DeptService 维护，删除由外键级联完成）
+"""
+import logging
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core.dept.dept_model import Dept
+from core.dept.dept_service import DeptService
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Dept)
+def dept_post_save(sender, instance: Dept, created: bool, raw: bool = False, **kwargs):
+    """部门创建后写入闭包记录"""
+    if raw or not created or not DeptService.closure_enabled():
+        return
+    DeptService.insert_closure(instance)
@@ -14,7 +14,7 @@ from ninja.pagination import paginate
 
 from common.fu_crud import create, retrieve, delete, update
 from common.fu_pagination import MyPagination
-from common.fu_cache import DictCacheManager, CacheStrategy, CacheManager, CacheKeyPrefix
+from common.fu_cache import DictCacheManager, CacheStrategy, cache_response
 from core.dict.dict_schema import DictSchemaOut, DictSchemaIn, DictFilters
 from core.dict.dict_model import Dict
 
@@ -126,26 +126,13 @@ def list_dict(request, filters: DictFilters = Query(...)):
 
 
 @router.get("/dict/get/all", response=List[DictSchemaOut], tags=["字典管理"])
+@cache_response('dict', List[DictSchemaOut], timeout=CacheStrategy.DICT_CACHE)
 def list_all_dict(request):
     """
     获取所有字典 (不分页，有缓存)
     
     返回所有字典，不进行分页处理，用于前端下拉框等场景。
-    此接口结果会被缓存 1 小时，以提高性能。
+    此接口缓存序列化后的响应（支持 ETag / 304），字典或字典项变更时失效。
     """
-    # 尝试从缓存获取
-    cache_key = f"{CacheKeyPrefix.DICT}:all:list"
-    cached_result = CacheManager.get(cache_key)
-    if cached_result is not None:
-        logger.debug("从缓存返回所有字典")
-        return cached_result
-    
-    # 从数据库查询
-    query_set = list(retrieve(request, Dict))
-    
-    # 缓存结果
-    CacheManager.set(cache_key, query_set, CacheStrategy.DICT_CACHE)
-    logger.debug(f"字典列表已缓存: {len(query_set)} 项")
-    
-    return query_set
+    return list(retrieve(request, Dict))
 
@@ -14,7 +14,7 @@ from ninja.pagination import paginate
 
 from common.fu_crud import create, retrieve, delete, update
 from common.fu_pagination import MyPagination
-from common.fu_cache import DictCacheManager, CacheStrategy, CacheManager, CacheKeyPrefix
+from common.fu_cache import DictCacheManager, CacheStrategy, CacheManager, CacheKeyPrefix, cache_response
 from core.dict_item.dict_item_model import DictItem
 from core.dict_item.dict_item_schema import (
     DictItemSchemaOut,
@@ -178,6 +178,7 @@ def list_all_dict_item(request):
 
 
 @router.get("/dict_item/by/dict_code/{code}", response=List[DictItemSchemaOut], tags=["字典项管理"])
+@cache_response('dict', List[DictItemSchemaOut], key=lambda code: code, timeout=CacheStrategy.DICT_CACHE)
 def list_dict_item_by_dict_code(request, code: str):
     """
     按字典编码获取字典项 (有缓存)
@@ -186,27 +187,13 @@ def list_dict_item_by_dict_code(request, code: str):
     - code: 字典编码
     
     返回指定字典编码下的所有字典项。
-    此接口结果会被缓存 1 小时，以提高性能。
+    此接口缓存序列化后的响应（支持 ETag / 304），字典或字典项变更时失效。
     """
     from django.http import Http404
     
-    # 尝试从缓存获取
-    cache_key = DictCacheManager.get_dict_items_cache_key(dict_code=code)
-    cached_result = CacheManager.get(cache_key)
-    if cached_result is not None:
-        logger.debug(f"从缓存返回字典项: {code}")
-        return cached_result
-    
-    # 从数据库查询
     dict_obj = Dict.objects.filter(code=code).first()
     if not dict_obj:
         raise Http404(f"字典编码 '{code}' 不存在")
     
-    query_set = list(dict_obj.dictitem_set.all())
-    
-    # 缓存结果
-    CacheManager.set(cache_key, query_set, CacheStrategy.DICT_CACHE)
-    logger.debug(f"字典项已缓存: {code} ({len(query_set)} 项)")
-    
-    return query_set
+    return list(dict_obj.dictitem_set.all())
 
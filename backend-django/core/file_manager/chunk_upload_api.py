@@ -8,48 +8,99 @@ import hashlib
 import mimetypes
 import uuid
 import shutil
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import List
 
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse
-from django.core.cache import cache
 from ninja import Router, File, Form
 
 from ninja.files import UploadedFile
 from common.fu_schema import response_success
-from core.file_manager.file_manager_model import FileManager
+from common.utils.file_utils import tree_hash
+from core.file_manager.file_blob_service import FileBlobService, get_storage_type
+from core.file_manager.file_manager_model import FileBlob, FileManager
+from core.file_manager.file_thumbnail_service import FileThumbnailService
 from core.file_manager.file_manager_schema import (
     FileManagerSchemaOut,
     InitChunkUploadSchemaIn,
     InitChunkUploadSchemaOut,
     UploadChunkSchemaOut,
+    PresignedPartSchemaOut,
+    PresignPartsSchemaIn,
     MergeChunksSchemaIn,
     ChunkUploadStatusSchemaOut,
 )
+from core.file_manager.chunk_upload_service import ChunkUploadService
 from core.file_manager.storage_backends import get_storage_backend
 
 router = Router()
 
-# 分块上传临时目录
-CHUNK_UPLOAD_DIR = os.path.join('media', 'chunk_uploads')
-os.makedirs(CHUNK_UPLOAD_DIR, exist_ok=True)
+def get_chunk_root() -> str:
+    """分块上传临时目录（绝对路径，不依赖进程工作目录）"""
+    return os.path.realpath(settings.FILE_UPLOAD_CHUNK_DIR)
 
 
-def get_chunk_upload_key(upload_id: str) -> str:
-    """获取分块上传的缓存键"""
-    return f'chunk_upload:{upload_id}'
-
+def get_chunk_dir(upload_id: str, create: bool = False) -> str:
+    """
+    获取分块存储目录
 
-def get_chunk_dir(upload_id: str) -> str:
-    """获取分块存储目录"""
-    chunk_dir = os.path.join(CHUNK_UPLOAD_DIR, upload_id)
-    os.makedirs(chunk_dir, exist_ok=True)
+    upload_id 由服务端生成（UUID），这里仍校验解析后的路径位于临时目录之内，
+    防止拼接出临时目录以外的路径
+    """
+    root = get_chunk_root()
+    chunk_dir = os.path.realpath(os.path.join(root, str(uuid.UUID(str(upload_id)))))
+    if os.path.dirname(chunk_dir) != root:
+        raise ValueError(f'无效的上传ID: {upload_id}')
+    if create:
+        os.makedirs(chunk_dir, exist_ok=True)
     return chunk_dir
 
 
-def get_chunk_path(upload_id: str, chunk_index: int) -> str:
+def get_chunk_path(upload_id: str, chunk_index: int, create: bool = False) -> str:
     """获取分块文件路径"""
-    return os.path.join(get_chunk_dir(upload_id), f'chunk_{chunk_index}')
+    return os.path.join(get_chunk_dir(upload_id, create), f'chunk_{chunk_index}')
+
+
+def presign_parts(storage, upload_info: dict, chunk_indexes) -> List[dict]:
+    """生成直传分块的预签名URL（分块编号从1开始）"""
+    expires = timedelta(seconds=getattr(settings, 'FILE_UPLOAD_PART_URL_EXPIRES', 3600))
+    return [
+        {
+            'chunk_index': chunk_index,
+            'part_number': chunk_index + 1,
+            'url': storage.presign_upload_part(
+                upload_info['storage_path'], upload_info['multipart_id'], chunk_index + 1, expires
+            ),
+        }
+        for chunk_index in chunk_indexes
+    ]
+
+
+def create_file_record(filename: str, parent, folder_path: str, blob: FileBlob,
+                       is_public: bool, user_id) -> FileManager:
+    """为上传完成（或秒传命中）的文件内容创建当前用户的文件记录，并在后台生成缩略图"""
+    file_obj = FileManager.objects.create(
+        name=filename,
+        type='file',
+        parent=parent,
+        path=os.path.join(folder_path, filename).replace('\\', '/'),
+        size=blob.size,
+        file_ext=os.path.splitext(filename)[1].lower(),
+        mime_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        storage_type=blob.storage_type,
+        storage_path=blob.storage_path,
+        url=blob.url,
+        md5=blob.md5,
+        blob=blob,
+        thumbnail_url=blob.thumbnail_url,
+        is_public=is_public,
+        sys_creator_id=user_id,
+    )
+    FileThumbnailService.schedule(file_obj)
+    return file_obj
 
 
 @router.post("/chunk/init", response=InitChunkUploadSchemaOut)
@@ -57,133 +108,223 @@ def init_chunk_upload(request, data: InitChunkUploadSchemaIn):
     """
     初始化分块上传
     
-    - 检查文件是否已存在（秒传功能）
+    - 检查文件是否已存在（秒传功能，按文件MD5或分块摘要树哈希）
     - 生成上传ID
     - 计算分块数量
+    - 直传模式（direct=true 且存储后端支持）：创建对象存储的分块上传并返回预签名URL
     - 返回上传配置信息
     """
-    # 检查文件是否已存在（秒传）
-    if data.file_hash:
-        existing_file = FileManager.objects.filter(
-            md5=data.file_hash,
-            size=data.total_size
-        ).first()
-        
-        if existing_file:
-            # 文件已存在，秒传
+    parent = None
+    folder_path = ''
+    if data.parent_id:
+        parent = get_object_or_404(FileManager, id=data.parent_id, type='folder')
+        folder_path = parent.path
+    
+    storage = get_storage_backend()
+    
+    # 检查文件内容是否已存在（秒传）：引用已有内容，为当前用户创建新的文件记录
+    if data.file_hash or data.tree_hash:
+        file_obj = None
+        storage_type = get_storage_type(storage)
+        with transaction.atomic():
+            blob = (
+                FileBlobService.acquire(data.file_hash, data.total_size, storage_type)
+                or FileBlobService.acquire_by_tree_hash(data.tree_hash, data.total_size, storage_type)
+            )
+            if blob is not None:
+                file_obj = create_file_record(
+                    data.filename, parent, folder_path, blob, data.is_public, request.auth.id
+                )
+
+        if file_obj:
             return {
                 'upload_id': str(uuid.uuid4()),
                 'chunk_size': data.chunk_size,
                 'total_chunks': 0,
                 'uploaded_chunks': [],
                 'file_exists': True,
-                'file_id': existing_file.id,
+                'file_id': file_obj.id,
             }
     
     # 生成上传ID
     upload_id = str(uuid.uuid4())
     
+    direct = (
+        data.direct
+        and storage.supports_multipart
+        and getattr(settings, 'FILE_UPLOAD_DIRECT_ENABLE', True)
+    )
+    
+    # 直传模式的分块大小需满足对象存储的限制（最小分块大小、最多分块数）
+    chunk_size = data.chunk_size
+    if direct:
+        chunk_size = max(
+            chunk_size,
+            storage.multipart_min_part_size,
+            -(-data.total_size // storage.multipart_max_parts),
+        )
+    
     # 计算总分块数
-    total_chunks = (data.total_size + data.chunk_size - 1) // data.chunk_size
+    total_chunks = (data.total_size + chunk_size - 1) // chunk_size
     
-    # 在缓存中保存上传信息（7天过期）
+    # 在缓存中保存上传信息（7天过期），上传进度单独记录
     upload_info = {
         'upload_id': upload_id,
         'filename': data.filename,
         'total_size': data.total_size,
-        'chunk_size': data.chunk_size,
+        'chunk_size': chunk_size,
         'total_chunks': total_chunks,
-        'uploaded_chunks': [],
         'parent_id': str(data.parent_id) if data.parent_id else None,
         'is_public': data.is_public,
-        'user_id': request.user.id,
+        'user_id': request.auth.id,
         'created_at': datetime.now().isoformat(),
+        'direct': direct,
     }
     
-    cache_key = get_chunk_upload_key(upload_id)
-    cache.set(cache_key, upload_info, timeout=7 * 24 * 3600)  # 7天
+    part_urls = []
+    if direct:
+        mime_type = mimetypes.guess_type(data.filename)[0] or 'application/octet-stream'
+        try:
+            storage_path, multipart_id = storage.create_multipart_upload(data.filename, folder_path, mime_type)
+        except Exception as e:
+            return HttpResponse(f'创建分块上传失败: {str(e)}', status=500)
+        upload_info['storage_path'] = storage_path
+        upload_info['multipart_id'] = multipart_id
+        batch = getattr(settings, 'FILE_UPLOAD_PART_URL_BATCH', 100)
+        part_urls = presign_parts(storage, upload_info, range(min(total_chunks, batch)))
+    
+    ChunkUploadService.create_session(upload_id, upload_info)
     
     return {
         'upload_id': upload_id,
-        'chunk_size': data.chunk_size,
+        'chunk_size': chunk_size,
         'total_chunks': total_chunks,
         'uploaded_chunks': [],
         'file_exists': False,
         'file_id': None,
+        'direct': direct,
+        'part_urls': part_urls,
     }
 
 
+@router.post("/chunk/presign", response=List[PresignedPartSchemaOut])
+def presign_chunk_parts(request, data: PresignPartsSchemaIn):
+    """
+    获取直传分块的预签名URL
+    
+    - 用于获取初始化时未返回的分块URL，或刷新已过期的URL
+    """
+    upload_info = ChunkUploadService.get_session(str(data.upload_id))
+    
+    if not upload_info:
+        return HttpResponse('上传会话不存在或已过期', status=404)
+    if not upload_info.get('direct'):
+        return HttpResponse('该上传不是直传模式', status=400)
+    
+    invalid = [i for i in data.chunk_indexes if i < 0 or i >= upload_info['total_chunks']]
+    if invalid:
+        return HttpResponse(f'无效的分块索引: {invalid}', status=400)
+    
+    return presign_parts(get_storage_backend(), upload_info, data.chunk_indexes)
+
+
 @router.post("/chunk/upload", response=UploadChunkSchemaOut)
 def upload_chunk(
     request,
-    upload_id: str = Form(...),
+    upload_id: uuid.UUID = Form(...),
     chunk_index: int = Form(...),
     chunk: UploadedFile = File(...),
+    chunk_md5: str | None = Form(None),
 ):
     """
     上传单个分块
     
     - 接收分块数据
-    - 保存到临时目录
-    - 更新上传进度
+    - 保存到临时目录（写入的同时计算分块MD5，传入 chunk_md5 时校验）
+    - 原子更新上传进度（支持并行上传多个分块）
     """
+    upload_id = str(upload_id)
+    
     # 获取上传信息
-    cache_key = get_chunk_upload_key(upload_id)
-    upload_info = cache.get(cache_key)
+    upload_info = ChunkUploadService.get_session(upload_id)
     
     if not upload_info:
         return HttpResponse('上传会话不存在或已过期', status=404)
     
+    if upload_info.get('direct'):
+        return HttpResponse('直传模式请通过预签名URL上传分块', status=400)
+    
     # 验证分块索引
     if chunk_index < 0 or chunk_index >= upload_info['total_chunks']:
         return HttpResponse(f'无效的分块索引: {chunk_index}', status=400)
     
-    # 保存分块文件
-    chunk_path = get_chunk_path(upload_id, chunk_index)
+    # 保存分块文件（先写临时文件再重命名，同一分块被重复上传时不会读到写了一半的文件）
+    chunk_path = get_chunk_path(upload_id, chunk_index, create=True)
+    temp_path = f'{chunk_path}.{uuid.uuid4().hex}.tmp'
     
     try:
-        with open(chunk_path, 'wb') as f:
+        md5_hash = hashlib.md5()
+        with open(temp_path, 'wb') as f:
             for chunk_data in chunk.chunks():
                 f.write(chunk_data)
+                md5_hash.update(chunk_data)
+        
+        digest = md5_hash.hexdigest()
+        if chunk_md5 and chunk_md5.lower() != digest:
+            os.remove(temp_path)
+            return HttpResponse(f'分块 {chunk_index} 校验失败', status=400)
+        os.replace(temp_path, chunk_path)
         
-        # 更新已上传分块列表
-        if chunk_index not in upload_info['uploaded_chunks']:
-            upload_info['uploaded_chunks'].append(chunk_index)
-            upload_info['uploaded_chunks'].sort()
-            cache.set(cache_key, upload_info, timeout=7 * 24 * 3600)
+        # 记录已上传分块和分块MD5
+        uploaded_count = ChunkUploadService.mark_uploaded(upload_id, chunk_index, digest)
         
         return {
             'chunk_index': chunk_index,
             'uploaded': True,
+            'md5': digest,
+            'uploaded_count': uploaded_count,
+            'completed': uploaded_count >= upload_info['total_chunks'],
         }
     
     except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
         return HttpResponse(f'分块上传失败: {str(e)}', status=500)
 
 
 @router.get("/chunk/status", response=ChunkUploadStatusSchemaOut)
-def get_chunk_upload_status(request, upload_id: str):
+def get_chunk_upload_status(request, upload_id: uuid.UUID):
     """
     获取分块上传状态
     
     - 查询已上传的分块
     - 返回上传进度
     """
-    cache_key = get_chunk_upload_key(upload_id)
-    upload_info = cache.get(cache_key)
+    upload_id = str(upload_id)
+    upload_info = ChunkUploadService.get_session(upload_id)
     
     if not upload_info:
         return HttpResponse('上传会话不存在或已过期', status=404)
     
-    completed = len(upload_info['uploaded_chunks']) == upload_info['total_chunks']
+    if upload_info.get('direct'):
+        # 直传模式以对象存储记录的分块为准（chunk_hashes 为分块 ETag）
+        try:
+            parts = get_storage_backend().list_uploaded_parts(upload_info['storage_path'], upload_info['multipart_id'])
+        except Exception as e:
+            return HttpResponse(f'获取分块信息失败: {str(e)}', status=500)
+        uploaded_chunks = sorted(part.part_number - 1 for part in parts)
+        chunk_hashes = {str(part.part_number - 1): part.etag.strip('"') for part in parts}
+    else:
+        uploaded_chunks, chunk_hashes = ChunkUploadService.get_progress(upload_id, upload_info['total_chunks'])
     
     return {
         'upload_id': upload_id,
         'filename': upload_info['filename'],
         'total_size': upload_info['total_size'],
         'total_chunks': upload_info['total_chunks'],
-        'uploaded_chunks': upload_info['uploaded_chunks'],
-        'completed': completed,
+        'uploaded_chunks': uploaded_chunks,
+        'chunk_hashes': chunk_hashes,
+        'completed': len(uploaded_chunks) == upload_info['total_chunks'],
     }
 
 
@@ -193,30 +334,36 @@ def merge_chunks(request, data: MergeChunksSchemaIn):
     合并分块文件
     
     - 验证所有分块已上传
-    - 按顺序合并分块
-    - 计算文件MD5
-    - 保存到存储后端
+    - 由上传时记录的分块MD5计算分块摘要树哈希，已有相同内容时直接引用，不再拼接分块
+    - 按顺序拼接分块并保存到存储后端（本地存储走内核复制）
     - 创建数据库记录
     - 清理临时文件
+    - 直传模式只完成对象存储的分块上传并创建数据库记录
     """
-    upload_id = data.upload_id
-    cache_key = get_chunk_upload_key(upload_id)
-    upload_info = cache.get(cache_key)
+    upload_id = str(data.upload_id)
+    upload_info = ChunkUploadService.get_session(upload_id)
     
     if not upload_info:
         return HttpResponse('上传会话不存在或已过期', status=404)
     
+    total_chunks = upload_info['total_chunks']
+    
+    if upload_info.get('direct'):
+        return complete_direct_upload(upload_id, upload_info)
+    
     # 验证所有分块已上传
-    if len(upload_info['uploaded_chunks']) != upload_info['total_chunks']:
-        missing_chunks = [
-            i for i in range(upload_info['total_chunks']) 
-            if i not in upload_info['uploaded_chunks']
-        ]
+    if not ChunkUploadService.is_completed(upload_id, total_chunks):
+        uploaded_chunks, _ = ChunkUploadService.get_progress(upload_id, total_chunks)
+        missing_chunks = sorted(set(range(total_chunks)) - set(uploaded_chunks))
         return HttpResponse(
             f'分块上传未完成，缺少分块: {missing_chunks}',
             status=400
         )
     
+    # 同一上传同时只允许一个合并请求
+    if not ChunkUploadService.acquire_merge_lock(upload_id):
+        return HttpResponse('文件正在合并中，请稍后', status=409)
+    
     try:
         # 获取父文件夹
         parent = None
@@ -225,115 +372,147 @@ def merge_chunks(request, data: MergeChunksSchemaIn):
             parent = get_object_or_404(FileManager, id=upload_info['parent_id'], type='folder')
             folder_path = parent.path
         
-        # 创建临时合并文件
-        temp_merged_path = os.path.join(get_chunk_dir(upload_id), 'merged_file')
-        md5_hash = hashlib.md5()
-        
-        # 按顺序合并分块
-        with open(temp_merged_path, 'wb') as merged_file:
-            for chunk_index in range(upload_info['total_chunks']):
-                chunk_path = get_chunk_path(upload_id, chunk_index)
-                
-                if not os.path.exists(chunk_path):
-                    return HttpResponse(f'分块 {chunk_index} 不存在', status=500)
-                
-                with open(chunk_path, 'rb') as chunk_file:
-                    chunk_data = chunk_file.read()
-                    merged_file.write(chunk_data)
-                    md5_hash.update(chunk_data)
-        
-        # 计算MD5
-        file_md5 = md5_hash.hexdigest()
-        
-        # 检查是否已存在相同文件（合并后的秒传检查）
-        existing_file = FileManager.objects.filter(
-            md5=file_md5,
-            size=upload_info['total_size']
-        ).first()
-        
-        if existing_file:
-            # 清理临时文件
-            shutil.rmtree(get_chunk_dir(upload_id), ignore_errors=True)
-            cache.delete(cache_key)
-            
-            # 返回已存在的文件
-            return existing_file
+        # 按顺序收集分块并校验总大小
+        chunk_paths = [
+            get_chunk_path(upload_id, chunk_index)
+            for chunk_index in range(total_chunks)
+        ]
+        for chunk_index, chunk_path in enumerate(chunk_paths):
+            if not os.path.exists(chunk_path):
+                return HttpResponse(f'分块 {chunk_index} 不存在', status=500)
+        merged_size = sum(os.path.getsize(chunk_path) for chunk_path in chunk_paths)
+        if merged_size != upload_info['total_size']:
+            return HttpResponse(
+                f'分块总大小 {merged_size} 与文件大小 {upload_info["total_size"]} 不一致',
+                status=400
+            )
         
         # 获取存储后端
         storage = get_storage_backend()
-        
-        # 计算文件信息
         filename = upload_info['filename']
-        file_ext = os.path.splitext(filename)[1].lower()
-        mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
         
-        # 保存到存储后端
-        with open(temp_merged_path, 'rb') as merged_file:
-            # 创建一个类似 UploadedFile 的对象
-            class TempUploadedFile:
-                def __init__(self, file_obj, name, size):
-                    self.file = file_obj
-                    self.name = name
-                    self.size = size
-                
-                def chunks(self, chunk_size=64 * 1024):
-                    self.file.seek(0)
-                    while True:
-                        chunk = self.file.read(chunk_size)
-                        if not chunk:
-                            break
-                        yield chunk
-            
-            temp_file = TempUploadedFile(merged_file, filename, upload_info['total_size'])
-            storage_path, url = storage.save(temp_file, filename, folder_path)
+        # 分块MD5在上传时已由服务端计算，按顺序计算树哈希，不需要再读取文件内容
+        _, chunk_hashes = ChunkUploadService.get_progress(upload_id, total_chunks)
+        file_tree_hash = tree_hash(
+            [chunk_hashes[str(chunk_index)] for chunk_index in range(total_chunks)], upload_info['chunk_size']
+        )
         
-        # 构建完整路径
-        full_path = os.path.join(folder_path, filename).replace('\\', '/')
+        # 已有相同内容时直接引用（合并时的秒传），不拼接分块
+        file_obj = None
+        with transaction.atomic():
+            blob = FileBlobService.acquire_by_tree_hash(
+                file_tree_hash, upload_info['total_size'], get_storage_type(storage)
+            )
+            if blob is not None:
+                file_obj = create_file_record(
+                    filename, parent, folder_path, blob, upload_info['is_public'], upload_info['user_id']
+                )
         
-        # 创建数据库记录
-        file_obj = FileManager.objects.create(
-            name=filename,
-            type='file',
-            parent=parent,
-            path=full_path,
-            size=upload_info['total_size'],
-            file_ext=file_ext,
-            mime_type=mime_type,
-            storage_type=storage.__class__.__name__.replace('StorageBackend', '').lower(),
-            storage_path=storage_path,
-            url=url,
-            md5=file_md5,
-            is_public=upload_info['is_public'],
-            sys_creator_id=upload_info['user_id'],
-        )
+        if file_obj is None:
+            # 保存到存储后端（直接由分块拼接；对象存储上传的同时计算MD5，本地存储走内核复制不计算MD5）
+            storage_path, url, file_md5 = storage.save_parts(chunk_paths, filename, folder_path)
+            
+            with transaction.atomic():
+                # 登记文件内容（并发合并了相同内容时共享已有内容，删除刚保存的重复文件）
+                blob = FileBlobService.register(
+                    storage, file_md5, upload_info['total_size'], storage_path, url, tree_hash=file_tree_hash
+                )
+                
+                # 创建数据库记录
+                file_obj = create_file_record(
+                    filename, parent, folder_path, blob, upload_info['is_public'], upload_info['user_id']
+                )
         
         # 清理临时文件
         shutil.rmtree(get_chunk_dir(upload_id), ignore_errors=True)
-        cache.delete(cache_key)
+        ChunkUploadService.clear(upload_id, total_chunks)
+        
+        return file_obj
+    
+    except Exception as e:
+        return HttpResponse(f'合并文件失败: {str(e)}', status=500)
+    
+    finally:
+        ChunkUploadService.release_merge_lock(upload_id)
+
+
+def complete_direct_upload(upload_id: str, upload_info: dict):
+    """
+    完成直传分块上传
+
+    - 以对象存储记录的分块为准校验分块数量和总大小
+    - 完成对象存储的分块上传（数据不经过应用服务器）
+    - 创建数据库记录（应用服务器未读取文件内容，不记录MD5，不参与秒传）
+    """
+    total_chunks = upload_info['total_chunks']
+    storage = get_storage_backend()
+    storage_path = upload_info['storage_path']
+    multipart_id = upload_info['multipart_id']
+    
+    if not ChunkUploadService.acquire_merge_lock(upload_id):
+        return HttpResponse('文件正在合并中，请稍后', status=409)
+    
+    try:
+        parent = None
+        folder_path = ''
+        if upload_info['parent_id']:
+            parent = get_object_or_404(FileManager, id=upload_info['parent_id'], type='folder')
+            folder_path = parent.path
+        
+        parts = storage.list_uploaded_parts(storage_path, multipart_id)
+        missing_chunks = sorted(set(range(total_chunks)) - {part.part_number - 1 for part in parts})
+        if missing_chunks:
+            return HttpResponse(f'分块上传未完成，缺少分块: {missing_chunks}', status=400)
+        parts = [part for part in parts if part.part_number <= total_chunks]
+        merged_size = sum(part.size for part in parts)
+        if merged_size != upload_info['total_size']:
+            return HttpResponse(
+                f'分块总大小 {merged_size} 与文件大小 {upload_info["total_size"]} 不一致',
+                status=400
+            )
+        
+        url = storage.complete_multipart_upload(storage_path, multipart_id, parts)
         
+        with transaction.atomic():
+            blob = FileBlobService.register(storage, None, upload_info['total_size'], storage_path, url)
+            file_obj = create_file_record(
+                upload_info['filename'], parent, folder_path, blob, upload_info['is_public'], upload_info['user_id']
+            )
+        
+        ChunkUploadService.clear(upload_id, total_chunks)
         return file_obj
     
     except Exception as e:
         return HttpResponse(f'合并文件失败: {str(e)}', status=500)
+    
+    finally:
+        ChunkUploadService.release_merge_lock(upload_id)
 
 
 @router.delete("/chunk/cancel")
-def cancel_chunk_upload(request, upload_id: str):
+def cancel_chunk_upload(request, upload_id: uuid.UUID):
     """
     取消分块上传
     
+    - 只处理存在的上传会话
     - 清理临时文件
     - 删除缓存信息
     """
+    upload_id = str(upload_id)
+    upload_info = ChunkUploadService.get_session(upload_id)
+    
+    if not upload_info:
+        return HttpResponse('上传会话不存在或已过期', status=404)
+    
     try:
-        # 清理临时文件
-        shutil.rmtree(get_chunk_dir(upload_id), ignore_errors=True)
-        
-        # 删除缓存
-        cache_key = get_chunk_upload_key(upload_id)
-        cache.delete(cache_key)
+        # 删除上传会话及进度（直传模式同时取消对象存储中的分块上传）
+        if upload_info.get('direct'):
+            get_storage_backend().abort_multipart_upload(upload_info['storage_path'], upload_info['multipart_id'])
+        else:
+            shutil.rmtree(get_chunk_dir(upload_id), ignore_errors=True)
+        ChunkUploadService.clear(upload_id, upload_info['total_chunks'])
         
-        return response_success(message='上传已取消')
+        return response_success('上传已取消')
     
     except Exception as e:
         return HttpResponse(f'取消上传失败: {str(e)}', status=500)
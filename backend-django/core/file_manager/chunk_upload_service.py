@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Chunk Upload Service - 分块上传进度记录
+并行上传分块时，各请求对进度的更新必须是原子操作，不能读取-修改-写回整个上传信息：
+- Redis：已上传分块记录在位图中（SETBIT / BITCOUNT），分块MD5记录在哈希表中（HSET），
+  同一个 MULTI 事务中完成，完成判断只需一次 BITCOUNT
+- 其他缓存后端（开发、测试环境）：每个分块一个缓存键（cache.add），已上传数量用 cache.incr 计数
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# 上传会话过期时间（秒）
+CHUNK_UPLOAD_TIMEOUT = 7 * 24 * 3600
+# 合并锁过期时间（秒），防止并发合并同一个上传
+CHUNK_MERGE_LOCK_TIMEOUT = 30 * 60
+
+
+def _get_redis():
+    """默认缓存为 django_redis 时返回 Redis 连接，否则返回 None"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+class ChunkUploadService:
+    """分块上传进度服务类"""
+
+    @staticmethod
+    def session_key(upload_id: str) -> str:
+        """上传会话信息的缓存键"""
+        return f'chunk_upload:{upload_id}'
+
+    @staticmethod
+    def _key(upload_id: str, name: str) -> str:
+        return f'chunk_upload:{upload_id}:{name}'
+
+    # ===============================================================
+    # 会话
+    # ===============================================================
+
+    @staticmethod
+    def create_session(upload_id: str, upload_info: dict) -> None:
+        """保存上传会话信息（初始化后不再修改）"""
+        cache.set(ChunkUploadService.session_key(upload_id), upload_info, timeout=CHUNK_UPLOAD_TIMEOUT)
+
+    @staticmethod
+    def get_session(upload_id: str) -> Optional[dict]:
+        """获取上传会话信息，不存在或已过期时返回 None"""
+        return cache.get(ChunkUploadService.session_key(upload_id))
+
+    @staticmethod
+    def clear(upload_id: str, total_chunks: int = 0) -> None:
+        """删除上传会话及进度记录"""
+        keys = [
+            ChunkUploadService.session_key(upload_id),
+            ChunkUploadService._key(upload_id, 'merging'),
+        ]
+        redis = _get_redis()
+        if redis is not None:
+            redis.delete(
+                cache.make_key(ChunkUploadService._key(upload_id, 'chunks')),
+                cache.make_key(ChunkUploadService._key(upload_id, 'hashes')),
+            )
+        else:
+            keys.append(ChunkUploadService._key(upload_id, 'count'))
+            keys.extend(ChunkUploadService._key(upload_id, f'chunk:{index}') for index in range(total_chunks))
+        cache.delete_many(keys)
+
+    # ===============================================================
+    # 进度
+    # ===============================================================
+
+    @staticmethod
+    def mark_uploaded(upload_id: str, chunk_index: int, digest: str) -> int:
+        """
+        记录分块已上传（原子操作，同一分块重复上传只计一次）
+
+        :return: 已上传的分块数
+        """
+        redis = _get_redis()
+        if redis is not None:
+            chunks_key = cache.make_key(ChunkUploadService._key(upload_id, 'chunks'))
+            hashes_key = cache.make_key(ChunkUploadService._key(upload_id, 'hashes'))
+            pipe = redis.pipeline(transaction=True)
+            pipe.setbit(chunks_key, chunk_index, 1)
+            pipe.hset(hashes_key, chunk_index, digest)
+            pipe.bitcount(chunks_key)
+            pipe.expire(chunks_key, CHUNK_UPLOAD_TIMEOUT)
+            pipe.expire(hashes_key, CHUNK_UPLOAD_TIMEOUT)
+            return pipe.execute()[2]
+
+        chunk_key = ChunkUploadService._key(upload_id, f'chunk:{chunk_index}')
+        count_key = ChunkUploadService._key(upload_id, 'count')
+        if cache.add(chunk_key, digest, timeout=CHUNK_UPLOAD_TIMEOUT):
+            cache.add(count_key, 0, timeout=CHUNK_UPLOAD_TIMEOUT)
+            return cache.incr(count_key)
+        cache.set(chunk_key, digest, timeout=CHUNK_UPLOAD_TIMEOUT)
+        return ChunkUploadService.uploaded_count(upload_id)
+
+    @staticmethod
+    def uploaded_count(upload_id: str) -> int:
+        """已上传的分块数"""
+        redis = _get_redis()
+        if redis is not None:
+            return redis.bitcount(cache.make_key(ChunkUploadService._key(upload_id, 'chunks')))
+        return cache.get(ChunkUploadService._key(upload_id, 'count'), 0)
+
+    @staticmethod
+    def get_progress(upload_id: str, total_chunks: int) -> Tuple[List[int], Dict[str, str]]:
+        """
+        获取已上传的分块索引及其MD5（用于断点续传和合并前检查）
+
+        :return: (已上传分块索引列表, {分块索引: MD5})
+        """
+        redis = _get_redis()
+        if redis is not None:
+            bitmap = redis.get(cache.make_key(ChunkUploadService._key(upload_id, 'chunks'))) or b''
+            uploaded = [
+                index for index in range(min(total_chunks, len(bitmap) * 8))
+                if bitmap[index >> 3] & (0x80 >> (index & 7))
+            ]
+            hashes = redis.hgetall(cache.make_key(ChunkUploadService._key(upload_id, 'hashes')))
+            return uploaded, {
+                (key.decode() if isinstance(key, bytes) else str(key)):
+                    (value.decode() if isinstance(value, bytes) else str(value))
+                for key, value in hashes.items()
+            }
+
+        keys = {ChunkUploadService._key(upload_id, f'chunk:{index}'): index for index in range(total_chunks)}
+        values = cache.get_many(list(keys))
+        uploaded = sorted(keys[key] for key in values)
+        return uploaded, {str(keys[key]): digest for key, digest in values.items()}
+
+    @staticmethod
+    def is_completed(upload_id: str, total_chunks: int) -> bool:
+        """所有分块是否都已上传"""
+        return ChunkUploadService.uploaded_count(upload_id) >= total_chunks
+
+    # ===============================================================
+    # 合并锁
+    # ===============================================================
+
+    @staticmethod
+    def acquire_merge_lock(upload_id: str) -> bool:
+        """获取合并锁，同一上传同时只允许一个合并请求"""
+        return cache.add(ChunkUploadService._key(upload_id, 'merging'), 1, timeout=CHUNK_MERGE_LOCK_TIMEOUT)
+
+    @staticmethod
+    def release_merge_lock(upload_id: str) -> None:
+        cache.delete(ChunkUploadService._key(upload_id, 'merging'))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+File Blob Service - 文件内容去重与引用计数
+相同内容（MD5 + 大小 + 存储类型）只保存一份 FileBlob，文件记录通过 blob 外键共享：
+- 秒传 / 上传后去重：找到已有内容时引用计数 +1，为当前用户创建新的文件记录，不返回他人的文件记录
+- 分块上传按分块摘要树哈希（tree_hash）去重，合并时不需要读取整个文件计算MD5
+- 删除文件记录：引用计数 -1（post_delete 信号，包括删除文件夹时级联删除的文件），不直接删除存储文件
+- 回收：引用计数为 0 且超过保留时间（FILE_BLOB_GC_GRACE）的内容由定时任务删除存储文件
+- 旧文件记录（没有 blob）在首次被秒传命中时接管为 FileBlob，不需要单独迁移
+"""
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.file_manager.file_manager_model import FileBlob, FileManager
+from core.file_manager.storage_backends import StorageBackend, get_storage_backend
+
+logger = logging.getLogger(__name__)
+
+
+def get_storage_type(storage: StorageBackend) -> str:
+    """存储后端对应的存储类型（local / oss / minio / azure）"""
+    return storage.__class__.__name__.replace('StorageBackend', '').lower()
+
+
+class FileBlobService:
+    """文件内容服务类"""
+
+    @staticmethod
+    def _lock_content(md5: str, size: int, storage_type: str) -> Optional[FileBlob]:
+        """锁定相同内容的 FileBlob（需在事务中调用），不存在时尝试接管旧文件记录"""
+        blob = FileBlob.objects.select_for_update().filter(md5=md5, size=size, storage_type=storage_type).first()
+        if blob is not None:
+            return blob
+
+        legacy = FileManager.objects.filter(
+            type='file', md5=md5, size=size, storage_type=storage_type, blob__isnull=True,
+        ).order_by('sys_create_datetime').first()
+        if legacy is None:
+            return None
+        try:
+            with transaction.atomic():
+                blob = FileBlob.objects.create(
+                    md5=md5, size=size, storage_type=storage_type,
+                    storage_path=legacy.storage_path, url=legacy.url, ref_count=1,
+                )
+                # 旧文件记录已被删除时放弃接管（其存储文件已随记录删除）
+                if not FileManager.objects.filter(id=legacy.id, blob__isnull=True).update(blob=blob):
+                    raise IntegrityError(f'文件记录 {legacy.id} 已变更')
+        except IntegrityError:
+            return FileBlob.objects.select_for_update().filter(md5=md5, size=size, storage_type=storage_type).first()
+        return blob
+
+    @staticmethod
+    def acquire(md5: Optional[str], size: int, storage_type: str) -> Optional[FileBlob]:
+        """
+        引用已有内容（秒传），引用计数 +1
+
+        :return: 已有内容，不存在时返回 None
+        """
+        if not md5:
+            return None
+        with transaction.atomic():
+            blob = FileBlobService._lock_content(md5, size, storage_type)
+            if blob is None:
+                return None
+            blob.ref_count += 1
+            blob.save(update_fields=['ref_count', 'sys_update_datetime'])
+            return blob
+
+    @staticmethod
+    def acquire_by_tree_hash(tree_hash: Optional[str], size: int, storage_type: str) -> Optional[FileBlob]:
+        """
+        按分块摘要树哈希引用已有内容（分块上传秒传），引用计数 +1
+
+        :return: 已有内容，不存在时返回 None
+        """
+        if not tree_hash:
+            return None
+        with transaction.atomic():
+            blob = FileBlob.objects.select_for_update().filter(
+                tree_hash=tree_hash, size=size, storage_type=storage_type,
+            ).first()
+            if blob is None:
+                return None
+            blob.ref_count += 1
+            blob.save(update_fields=['ref_count', 'sys_update_datetime'])
+            return blob
+
+    @staticmethod
+    def register(storage: StorageBackend, md5: Optional[str], size: int,
+                 storage_path: str, url: Optional[str], tree_hash: Optional[str] = None) -> FileBlob:
+        """
+        登记刚保存到存储后端的内容，引用计数 +1
+
+        已有相同内容（MD5 或分块摘要树哈希相同）时引用已有内容，并在事务提交后删除刚保存的重复文件；
+        md5、tree_hash 都为空（直传文件）时不参与去重。
+        """
+        storage_type = get_storage_type(storage)
+        for _ in range(2):
+            blob = (
+                FileBlobService.acquire(md5, size, storage_type)
+                or FileBlobService.acquire_by_tree_hash(tree_hash, size, storage_type)
+            )
+            if blob is not None:
+                transaction.on_commit(lambda: FileBlobService._delete_storage(storage, storage_path))
+                return blob
+            try:
+                with transaction.atomic():
+                    return FileBlob.objects.create(
+                        md5=md5 or None, tree_hash=tree_hash or None, size=size, storage_type=storage_type,
+                        storage_path=storage_path, url=url, ref_count=1,
+                    )
+            except IntegrityError:
+                # 并发上传了相同内容，重新引用已有内容
+                continue
+        raise IntegrityError(f'登记文件内容失败: {md5 or tree_hash}')
+
+    @staticmethod
+    def release(blob_id: str) -> None:
+        """取消引用，引用计数 -1（存储文件由 collect_garbage 回收）"""
+        FileBlob.objects.filter(id=blob_id, ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1,
+            sys_update_datetime=timezone.now(),
+        )
+
+    @staticmethod
+    def _delete_storage(storage: StorageBackend, storage_path: str) -> None:
+        try:
+            storage.delete(storage_path)
+        except Exception as e:
+            logger.warning(f"删除存储文件失败 {storage_path}: {e}")
+
+    @staticmethod
+    def collect_garbage(grace_seconds: int = None, limit: int = 1000) -> int:
+        """
+        回收没有引用的内容及其缩略图（先删除 FileBlob 记录再删除存储文件，删除记录后不会再被秒传引用）
+
+        :param grace_seconds: 引用计数降为 0 后的保留时间，默认 FILE_BLOB_GC_GRACE
+        :param limit: 单次回收的最大数量
+        :return: 回收的数量
+        """
+        if grace_seconds is None:
+            grace_seconds = getattr(settings, 'FILE_BLOB_GC_GRACE', 3600)
+        storage = get_storage_backend()
+        cutoff = timezone.now() - timedelta(seconds=grace_seconds)
+        blob_ids = list(FileBlob.objects.filter(
+            ref_count__lte=0,
+            storage_type=get_storage_type(storage),
+            sys_update_datetime__lt=cutoff,
+        ).values_list('id', flat=True)[:limit])
+
+        collected = 0
+        for blob_id in blob_ids:
+            with transaction.atomic():
+                blob = FileBlob.objects.select_for_update().filter(id=blob_id, ref_count__lte=0).first()
+                if blob is None:
+                    continue
+                # 引用计数与实际引用不一致时以文件记录为准
+                ref_count = FileManager.objects.filter(blob_id=blob_id).count()
+                if ref_count:
+                    logger.warning(f"文件内容 {blob_id} 引用计数不一致，修正为 {ref_count}")
+                    FileBlob.objects.filter(id=blob_id).update(ref_count=ref_count)
+                    continue
+                blob.delete()
+            for storage_path in (blob.storage_path, blob.thumbnail_path, blob.preview_path):
+                if storage_path:
+                    FileBlobService._delete_storage(storage, storage_path)
+            collected += 1
+        return collected
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+File Download Service - 文件下载响应
+统一处理文件下载、预览的 HTTP 语义：
+- If-None-Match / ETag（文件MD5）返回 304
+- Range 返回 206（单个范围，支持 bytes=start-end、bytes=start-、bytes=-suffix），无法满足时返回 416
+- If-Range 与当前 ETag / Last-Modified 不一致时忽略 Range，返回完整文件
+- 按范围分块读取存储后端（本地文件、Minio 对象），内存占用与文件大小无关
+- 本地文件可交给前置代理发送（FILE_DOWNLOAD_OFFLOAD）：nginx 使用 X-Accel-Redirect，
+  Apache / lighttpd 使用 X-Sendfile，由代理处理 Range，Django 只返回响应头
+- 缩略图、预览图按存储路径生成 ETag，整个返回，不处理 Range
+"""
+import hashlib
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from core.file_manager.file_manager_model import FileManager
+from core.file_manager.storage_backends import LocalStorageBackend, StorageBackend
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileDownloadService:
+    """文件下载服务类"""
+
+    @staticmethod
+    def get_etag(file_obj: FileManager) -> str:
+        """ETag：有MD5时使用MD5，否则使用文件ID和大小"""
+        if file_obj.md5:
+            return f'"{file_obj.md5}"'
+        return f'"{file_obj.id}-{file_obj.size}"'
+
+    @staticmethod
+    def get_last_modified(file_obj: FileManager) -> int:
+        return int(file_obj.sys_create_datetime.timestamp())
+
+    @staticmethod
+    def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+        """
+        解析 Range 请求头
+
+        :return: (起始位置, 结束位置)，不是单个字节范围时返回 None（按完整文件处理）
+        :raises ValueError: 范围无法满足
+        """
+        if not header:
+            return None
+        match = _RANGE_RE.match(header.strip().replace(' ', ''))
+        if not match or match.group(0) == 'bytes=-':
+            return None
+        start, end = match.groups()
+        if not start:
+            # bytes=-500：最后 500 个字节
+            suffix = int(end)
+            if suffix == 0 or size == 0:
+                raise ValueError(header)
+            return max(size - suffix, 0), size - 1
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+        if start >= size or start > end:
+            raise ValueError(header)
+        return start, end
+
+    @staticmethod
+    def _etag_matches(header: str, etag: str) -> bool:
+        tags = [tag.strip() for tag in header.split(',')]
+        # If-None-Match 使用弱比较
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+    @staticmethod
+    def _if_range_matches(header: Optional[str], etag: str, last_modified: int) -> bool:
+        if not header:
+            return True
+        header = header.strip()
+        if header.startswith('"') or header.startswith('W/'):
+            # If-Range 使用强比较
+            return header == etag
+        return parse_http_date_safe(header) == last_modified
+
+    @staticmethod
+    def build_response(request, file_obj: FileManager, storage: StorageBackend,
+                       as_attachment: bool = False) -> HttpResponse:
+        """构建文件下载响应（200 / 206 / 304 / 416）"""
+        etag = FileDownloadService.get_etag(file_obj)
+        last_modified = FileDownloadService.get_last_modified(file_obj)
+        size = file_obj.size
+        content_type = file_obj.mime_type or 'application/octet-stream'
+
+        def finalize(response: HttpResponse) -> HttpResponse:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            response['Accept-Ranges'] = 'bytes'
+            response['Cache-Control'] = 'public, max-age=3600'
+            if response.status_code not in (304, 416):
+                response['Content-Disposition'] = content_disposition_header(as_attachment, file_obj.name)
+            return response
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and FileDownloadService._etag_matches(if_none_match, etag):
+            return finalize(HttpResponse(status=304))
+
+        # 本地文件交给前置代理发送（代理自行处理 Range）
+        offload = getattr(settings, 'FILE_DOWNLOAD_OFFLOAD', '')
+        if offload and isinstance(storage, LocalStorageBackend):
+            response = HttpResponse(content_type=content_type)
+            if offload == 'nginx':
+                prefix = getattr(settings, 'FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-files/')
+                response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(file_obj.storage_path.lstrip('/'))
+            else:
+                response['X-Sendfile'] = storage.get_full_path(file_obj.storage_path)
+            return finalize(response)
+
+        byte_range = None
+        if FileDownloadService._if_range_matches(request.META.get('HTTP_IF_RANGE'), etag, last_modified):
+            try:
+                byte_range = FileDownloadService.parse_range(request.META.get('HTTP_RANGE'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return finalize(response)
+
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                storage.iter_content(file_obj.storage_path, start, length),
+                status=206,
+                content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        else:
+            length = size
+            response = StreamingHttpResponse(
+                storage.iter_content(file_obj.storage_path),
+                content_type=content_type,
+            )
+        response['Content-Length'] = str(length)
+        return finalize(response)
+
+    @staticmethod
+    def build_derivative_response(request, storage: StorageBackend, storage_path: str,
+                                  content_type: str = 'image/jpeg') -> HttpResponse:
+        """
+        构建缩略图、预览图响应（200 / 304）
+
+        缩略图生成后不再修改，重新生成时存储路径也会变化，以存储路径作为 ETag 并允许长期缓存
+
+        :raises FileNotFoundError: 本地文件不存在
+        :raises NotImplementedError: 存储后端不支持读取内容
+        """
+        etag = f'"{hashlib.md5(storage_path.encode("utf-8")).hexdigest()}"'
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and FileDownloadService._etag_matches(if_none_match, etag):
+            response = HttpResponse(status=304)
+        else:
+            response = StreamingHttpResponse(storage.iter_content(storage_path), content_type=content_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=86400'
+        return response
+
+    @staticmethod
+    def counts_as_download(request) -> bool:
+        """是否计入下载次数（视频拖动、断点续传产生的后续范围请求不重复计数）"""
+        header = request.META.get('HTTP_RANGE', '')
+        match = _RANGE_RE.match(header.strip().replace(' ', ''))
+        return not match or match.group(1) != '' and int(match.group(1)) == 0
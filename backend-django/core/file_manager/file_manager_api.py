@@ -21,6 +21,7 @@ from ninja.pagination import paginate
 from common.fu_crud import retrieve
 from common.fu_pagination import MyPagination
 from common.fu_schema import response_success
+from common.utils.tree_path import is_path_in_subtree, rewrite_subtree_prefix
 from core.file_manager.file_manager_model import FileManager
 from core.file_manager.file_manager_schema import (
     FileManagerSchemaOut,
@@ -32,6 +33,10 @@ from core.file_manager.file_manager_schema import (
     FileStorageConfigSchema,
     FileManagerSimpleSchemaOut,
 )
+from core.file_manager.file_blob_service import FileBlobService, get_storage_type
+from core.file_manager.file_download_service import FileDownloadService
+from core.file_manager.file_thumbnail_service import FileThumbnailService
+from core.file_manager.file_url_service import FileUrlService
 from core.file_manager.storage_backends import get_storage_backend
 
 router = Router()
@@ -59,31 +64,37 @@ def upload_file(
     file_ext = os.path.splitext(file.name)[1].lower()
     mime_type = mimetypes.guess_type(file.name)[0] or 'application/octet-stream'
     
-    # 保存文件
-    storage_path, url = storage.save(file, file.name, folder_path)
-    
-    # 计算MD5
-    md5 = storage.calculate_md5(file)
+    # 保存文件（写入的同时计算MD5，不再重新读取文件）
+    storage_path, url, md5 = storage.save_and_hash(file, file.name, folder_path)
     
     # 构建完整路径
     full_path = os.path.join(folder_path, file.name).replace('\\', '/')
     
-    # 创建数据库记录
-    file_obj = FileManager.objects.create(
-        name=file.name,
-        type='file',
-        parent=parent,
-        path=full_path,
-        size=file.size,
-        file_ext=file_ext,
-        mime_type=mime_type,
-        storage_type=storage.__class__.__name__.replace('StorageBackend', '').lower(),
-        storage_path=storage_path,
-        url=url,
-        md5=md5,
-        is_public=is_public,
-        sys_creator_id=request.auth.id,
-    )
+    with transaction.atomic():
+        # 登记文件内容（已有相同内容时共享已有内容，删除刚保存的重复文件）
+        blob = FileBlobService.register(storage, md5, file.size, storage_path, url)
+        
+        # 创建数据库记录
+        file_obj = FileManager.objects.create(
+            name=file.name,
+            type='file',
+            parent=parent,
+            path=full_path,
+            size=file.size,
+            file_ext=file_ext,
+            mime_type=mime_type,
+            storage_type=blob.storage_type,
+            storage_path=blob.storage_path,
+            url=blob.url,
+            md5=md5,
+            blob=blob,
+            thumbnail_url=blob.thumbnail_url,
+            is_public=is_public,
+            sys_creator_id=request.auth.id,
+        )
+        
+        # 事务提交后在后台生成缩略图
+        FileThumbnailService.schedule(file_obj)
     
     return file_obj
 
@@ -131,7 +142,7 @@ def list_files(request, filters: FileManagerFilters = Query(...)):
         query_set = query_set.filter(parent_id=None)
     
     # 文件夹排在前面
-    query_set = query_set.order_by('type', '-sys_create_datetime')
+    query_set = query_set.select_related('parent', 'blob').order_by('type', '-sys_create_datetime')
     
     return query_set
 
@@ -163,13 +174,14 @@ def rename_item(request, file_id: UUID, data: RenameItemSchemaIn):
     else:
         new_path = data.name
     
-    item.name = data.name
-    item.path = new_path
-    item.save()
-    
-    # 如果是文件夹，递归更新子项路径
-    if item.type == 'folder':
-        _update_children_paths(item, old_path, new_path)
+    with transaction.atomic():
+        item.name = data.name
+        item.path = new_path
+        item.save()
+        
+        # 如果是文件夹，批量更新子项路径
+        if item.type == 'folder':
+            _update_children_paths(item, old_path, new_path)
     
     return item
 
@@ -212,7 +224,7 @@ def move_items(request, data: MoveItemsSchemaIn):
             item.path = os.path.join(target_path, item.name).replace('\\', '/')
             item.save()
             
-            # 如果是文件夹，递归更新子项路径
+            # 如果是文件夹，批量更新子项路径
             if item.type == 'folder':
                 _update_children_paths(item, old_path, item.path)
     
@@ -224,13 +236,14 @@ def delete_item(request, file_id: UUID):
     """删除文件/文件夹"""
     item = get_object_or_404(FileManager, id=file_id)
     
-    # 如果是文件，删除实际文件
-    if item.type == 'file':
+    # 未登记文件内容的旧文件直接删除实际文件（其他文件取消引用，由定时任务回收）
+    if item.type == 'file' and not item.blob_id:
         storage = get_storage_backend()
         storage.delete(item.storage_path)
     
     # 删除数据库记录（会级联删除子项）
-    item.delete()
+    with transaction.atomic():
+        item.delete()
     
     return response_success()
 
@@ -244,8 +257,8 @@ def batch_delete(request, data: BatchDeleteSchemaIn):
         for item_id in data.ids:
             item = FileManager.objects.filter(id=item_id).first()
             if item:
-                # 如果是文件，删除实际文件
-                if item.type == 'file':
+                # 未登记文件内容的旧文件直接删除实际文件
+                if item.type == 'file' and not item.blob_id:
                     storage.delete(item.storage_path)
                 # 删除数据库记录
                 item.delete()
@@ -312,23 +325,19 @@ def update_storage_config(request, data: FileStorageConfigSchema):
 
 
 def _is_subfolder(folder: FileManager, potential_parent: FileManager) -> bool:
-    """检查folder是否是potential_parent的子文件夹"""
-    current = folder
-    while current.parent:
-        if current.parent_id == potential_parent.id:
-            return True
-        current = current.parent
-    return False
-
-
-def _update_children_paths(folder: FileManager, old_path: str, new_path: str):
-    """递归更新子项路径"""
-    children = folder.children.all()
-    for child in children:
-        child.path = child.path.replace(old_path, new_path, 1)
-        child.save()
-        if child.type == 'folder':
-            _update_children_paths(child, old_path, new_path)
+    """检查folder是否是potential_parent本身或其子文件夹（基于路径前缀）"""
+    if folder.id == potential_parent.id:
+        return True
+    return is_path_in_subtree(folder.path, f"{potential_parent.path}/")
+
+
+def _update_children_paths(folder: FileManager, old_path: str, new_path: str) -> int:
+    """批量更新子项路径（单条 UPDATE 改写整个子树的路径前缀）"""
+    return rewrite_subtree_prefix(
+        FileManager.objects.all(),
+        f"{old_path}/",
+        f"{new_path}/",
+    )
 
 
 @router.get("/file_manager/url/{file_id}", auth=None)
@@ -336,16 +345,13 @@ def get_file_url(request, file_id: UUID):
     """通过文件ID获取文件访问URL"""
     file_obj = get_object_or_404(FileManager, id=file_id, type='file')
     
-    # Minio存储，返回临时URL
+    # Minio存储，返回临时URL（按时间段缓存）
     if file_obj.storage_type == 'minio':
         storage = get_storage_backend()
-        if hasattr(storage, 'get_presigned_url'):
-            try:
-                temp_url = storage.get_presigned_url(file_obj.storage_path)
+        if hasattr(storage, 'get_presigned_urls'):
+            temp_url = FileUrlService.get_presigned_url(storage, file_obj.storage_path)
+            if temp_url:
                 return {'url': temp_url}
-            except Exception:
-                # 如果获取临时URL失败，返回直接URL
-                pass
 
     # 如果文件有直接的URL（云存储）
     if file_obj.url:
@@ -353,11 +359,7 @@ def get_file_url(request, file_id: UUID):
     
     # 本地存储，构建访问URL
     if file_obj.storage_type == 'local':
-        from django.conf import settings
-        # 构建本地文件的访问URL
-        base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
-        file_url = f"{base_url}/api/system/file_manager/download?path={file_obj.storage_path}"
-        return response_success(data={'url': file_url})
+        return response_success(data={'url': FileUrlService.get_local_url(file_obj.storage_path)})
     
     # 其他情况返回存储路径
     return response_success(data={'url': file_obj.storage_path})
@@ -365,200 +367,75 @@ def get_file_url(request, file_id: UUID):
 
 @router.get("/file_manager/batch/urls", auth=None)
 def get_batch_file_urls(request, ids: str = Query(...)):
-    """批量获取文件访问URL"""
+    """批量获取文件访问URL（Minio 临时URL一次读取缓存、批量签名）"""
     file_ids = [UUID(id_str.strip()) for id_str in ids.split(',') if id_str.strip()]
     
-    files = FileManager.objects.filter(id__in=file_ids, type='file')
-    
-    # 获取存储后端（用于Minio临时URL）
-    storage = get_storage_backend()
-    has_presigned_method = hasattr(storage, 'get_presigned_url')
-
-    result = {}
-    for file_obj in files:
-        # Minio存储，返回临时URL
-        if file_obj.storage_type == 'minio' and has_presigned_method:
-            try:
-                temp_url = storage.get_presigned_url(file_obj.storage_path)
-                result[str(file_obj.id)] = temp_url
-                continue
-            except Exception:
-                # 如果获取临时URL失败，继续使用其他方式
-                pass
-
-        if file_obj.url:
-            result[str(file_obj.id)] = file_obj.url
-        elif file_obj.storage_type == 'local':
-            from django.conf import settings
-            base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
-            file_url = f"{base_url}/api/system/file_manager/download?path={file_obj.storage_path}"
-            result[str(file_obj.id)] = file_url
-        else:
-            result[str(file_obj.id)] = file_obj.storage_path
+    files = FileManager.objects.filter(id__in=file_ids, type='file').only(
+        'id', 'storage_type', 'storage_path', 'url'
+    )
     
-    return result
+    return FileUrlService.get_file_urls(get_storage_backend(), files)
 
 
-@router.get("/file_manager/stream/{file_id}")
-def stream_file(request, file_id: UUID):
-    """通过后端流式传输文件（支持所有存储类型）"""
+def _serve_file(request, file_id: UUID, as_attachment: bool):
+    """通过后端传输文件（支持 Range / 断点续传、If-None-Match 缓存校验）"""
     file_obj = get_object_or_404(FileManager, id=file_id, type='file')
 
-    # 更新下载次数
-    file_obj.download_count = F('download_count') + 1
-    file_obj.save(update_fields=['download_count'])
-
     # 获取存储后端
     storage = get_storage_backend()
 
-    try:
-        if file_obj.storage_type == 'local':
-            # 本地存储直接读取文件
-            full_path = os.path.join(
-                storage.base_path,
-                file_obj.storage_path
-            )
-            if not os.path.exists(full_path):
-                return HttpResponse("文件不存在", status=404)
-
-            response = FileResponse(
-                open(full_path, 'rb'),
-                content_type=file_obj.mime_type or 'application/octet-stream'
-            )
-
-        elif file_obj.storage_type == 'minio' and hasattr(storage, 'get_file_content'):
-            # Minio存储，通过后端转发
-            try:
-                file_response = storage.get_file_content(file_obj.storage_path)
-
-                # 创建流式响应
-                response = HttpResponse(
-                    file_response.data,
-                    content_type=file_obj.mime_type or 'application/octet-stream'
-                )
-                response['Content-Length'] = file_obj.size
-
-            except Exception as e:
-                return HttpResponse(f"获取文件失败: {str(e)}", status=500)
-
-        else:
-            # 其他存储类型，重定向到原URL
-            if file_obj.url:
-                return HttpResponse(status=302, headers={'Location': file_obj.url})
-            else:
-                return HttpResponse("不支持的存储类型", status=400)
-
-        # 设置文件下载相关的响应头
-        response['Content-Disposition'] = f'inline; filename*=UTF-8\'\'{file_obj.name}'
-        response['Cache-Control'] = 'public, max-age=3600'  # 缓存1小时
-        response['ETag'] = f'"{file_obj.md5}"'
-
-        return response
+    if file_obj.storage_type == 'local':
+        if not os.path.exists(storage.get_full_path(file_obj.storage_path)):
+            return HttpResponse("文件不存在", status=404)
+    elif file_obj.storage_type != 'minio':
+        # 其他存储类型，重定向到原URL
+        if file_obj.url:
+            return HttpResponse(status=302, headers={'Location': file_obj.url})
+        return HttpResponse("不支持的存储类型", status=400)
 
+    try:
+        response = FileDownloadService.build_response(request, file_obj, storage, as_attachment)
     except Exception as e:
         return HttpResponse(f"文件传输失败: {str(e)}", status=500)
 
+    # 更新下载次数（缓存命中和续传的后续范围请求不计数）
+    if response.status_code in (200, 206) and FileDownloadService.counts_as_download(request):
+        file_obj.download_count = F('download_count') + 1
+        file_obj.save(update_fields=['download_count'])
 
-@router.get("/file_manager/proxy/{file_id}", auth=None)
-def proxy_file(request, file_id: UUID, download: bool = Query(False)):
-    """代理文件访问（强制通过后端转发，支持断点续传）"""
-    file_obj = get_object_or_404(FileManager, id=file_id, type='file')
+    return response
 
-    # 更新下载次数
-    file_obj.download_count = F('download_count') + 1
-    file_obj.save(update_fields=['download_count'])
 
-    # 获取存储后端
+@router.get("/file_manager/thumbnail/{file_id}", auth=None)
+def get_thumbnail(request, file_id: UUID, preview: bool = Query(False)):
+    """获取缩略图（preview=true 时获取预览图），从生成缩略图的存储后端读取"""
+    file_obj = get_object_or_404(FileManager.objects.select_related('blob'), id=file_id, type='file')
+    blob = file_obj.blob
+    storage_path = blob and (blob.preview_path if preview else blob.thumbnail_path)
+    if not storage_path:
+        return HttpResponse("缩略图不存在", status=404)
+
     storage = get_storage_backend()
+    if get_storage_type(storage) != blob.storage_type:
+        return HttpResponse("缩略图所在的存储后端未启用", status=404)
 
-    # 处理Range请求（断点续传）
-    range_header = request.META.get('HTTP_RANGE')
-    start = 0
-    end = file_obj.size - 1
+    try:
+        return FileDownloadService.build_derivative_response(request, storage, storage_path)
+    except FileNotFoundError:
+        return HttpResponse("缩略图不存在", status=404)
+    except NotImplementedError:
+        # 不支持读取内容的存储后端，重定向到存储返回的URL
+        url = blob.preview_url if preview else blob.thumbnail_url
+        return HttpResponse(status=302, headers={'Location': url})
 
-    if range_header:
-        # 解析Range头
-        range_match = range_header.replace('bytes=', '').split('-')
-        if len(range_match) == 2:
-            if range_match[0]:
-                start = int(range_match[0])
-            if range_match[1]:
-                end = int(range_match[1])
 
-    try:
-        if file_obj.storage_type == 'local':
-            # 本地文件处理
-            full_path = os.path.join(storage.base_path, file_obj.storage_path)
-            if not os.path.exists(full_path):
-                return HttpResponse("文件不存在", status=404)
-
-            # 创建范围响应
-            with open(full_path, 'rb') as f:
-                f.seek(start)
-                chunk_size = min(8192, end - start + 1)
-                content = f.read(chunk_size)
-
-                if range_header:
-                    response = HttpResponse(
-                        content,
-                        status=206,  # Partial Content
-                        content_type=file_obj.mime_type or 'application/octet-stream'
-                    )
-                    response['Content-Range'] = f'bytes {start}-{end}/{file_obj.size}'
-                    response['Accept-Ranges'] = 'bytes'
-                else:
-                    response = HttpResponse(
-                        content,
-                        content_type=file_obj.mime_type or 'application/octet-stream'
-                    )
-
-        elif file_obj.storage_type == 'minio' and hasattr(storage, 'get_file_content'):
-            # Minio存储处理
-            try:
-                if range_header:
-                    # 对于范围请求，可以考虑使用预签名URL重定向
-                    # 或者获取完整文件后切片（适用于小文件）
-                    file_response = storage.get_file_content(file_obj.storage_path)
-                    file_data = file_response.read()
-
-                    content = file_data[start:end+1]
-                    response = HttpResponse(
-                        content,
-                        status=206,
-                        content_type=file_obj.mime_type or 'application/octet-stream'
-                    )
-                    response['Content-Range'] = f'bytes {start}-{end}/{file_obj.size}'
-                    response['Accept-Ranges'] = 'bytes'
-                else:
-                    # 完整文件
-                    file_response = storage.get_file_content(file_obj.storage_path)
-                    response = HttpResponse(
-                        file_response.data,
-                        content_type=file_obj.mime_type or 'application/octet-stream'
-                    )
-
-            except Exception as e:
-                return HttpResponse(f"获取文件失败: {str(e)}", status=500)
-
-        else:
-            # 其他存储类型重定向
-            if file_obj.url:
-                return HttpResponse(status=302, headers={'Location': file_obj.url})
-            else:
-                return HttpResponse("不支持的存储类型", status=400)
-
-        # 设置响应头
-        if download:
-            response['Content-Disposition'] = f'attachment; filename*=UTF-8\'\'{file_obj.name}'
-        else:
-            response['Content-Disposition'] = f'inline; filename*=UTF-8\'\'{file_obj.name}'
-
-        response['Content-Length'] = len(response.content)
-        response['Cache-Control'] = 'public, max-age=3600'
-        response['ETag'] = f'"{file_obj.md5}"'
-        response['Last-Modified'] = file_obj.sys_create_datetime.strftime('%a, %d %b %Y %H:%M:%S GMT')
-
-        return response
+@router.get("/file_manager/stream/{file_id}")
+def stream_file(request, file_id: UUID):
+    """通过后端流式传输文件（支持所有存储类型）"""
+    return _serve_file(request, file_id, as_attachment=False)
 
-    except Exception as e:
-        return HttpResponse(f"文件传输失败: {str(e)}", status=500)
+
+@router.get("/file_manager/proxy/{file_id}", auth=None)
+def proxy_file(request, file_id: UUID, download: bool = Query(False)):
+    """代理文件访问（强制通过后端转发，支持断点续传）"""
+    return _serve_file(request, file_id, as_attachment=download)
@@ -10,6 +10,43 @@ from django.db import models
 from common.fu_model import RootModel
 
 
+class FileBlob(RootModel):
+    """
+    文件内容模型（按内容寻址）
+
+    相同内容（MD5 + 大小 + 存储类型，或分块摘要树哈希 + 大小 + 存储类型）只保存一份，
+    多个文件记录通过 blob 共享（缩略图、预览图也按内容生成一份），
+    ref_count 为引用该内容的文件记录数，降为 0 后由定时任务回收存储文件。
+    """
+    md5 = models.CharField(max_length=32, null=True, blank=True, help_text="内容MD5（直传、本地分块合并的文件为空）")
+    tree_hash = models.CharField(
+        max_length=32, null=True, blank=True,
+        help_text="分块摘要树哈希（分块上传合并时由各分块MD5计算，见 common.utils.file_utils.tree_hash）",
+    )
+    size = models.BigIntegerField(default=0, help_text="内容大小(字节)")
+    storage_type = models.CharField(max_length=20, default='local', help_text="存储类型")
+    storage_path = models.TextField(help_text="存储路径")
+    url = models.TextField(null=True, blank=True, help_text="访问URL")
+    ref_count = models.IntegerField(default=0, help_text="引用计数")
+    thumbnail_path = models.TextField(null=True, blank=True, help_text="缩略图存储路径")
+    thumbnail_url = models.TextField(null=True, blank=True, help_text="缩略图URL")
+    preview_path = models.TextField(null=True, blank=True, help_text="预览图存储路径")
+    preview_url = models.TextField(null=True, blank=True, help_text="预览图URL")
+
+    class Meta:
+        db_table = "core_file_blob"
+        constraints = [
+            models.UniqueConstraint(fields=['md5', 'size', 'storage_type'], name='uniq_core_file_blob_content'),
+            models.UniqueConstraint(fields=['tree_hash', 'size', 'storage_type'], name='uniq_core_file_blob_tree_hash'),
+        ]
+        indexes = [
+            models.Index(fields=['ref_count', 'sys_update_datetime']),
+        ]
+
+    def __str__(self):
+        return f'{self.md5 or self.tree_hash}:{self.size}'
+
+
 class FileManager(RootModel):
     """文件管理模型"""
     STORAGE_TYPE_CHOICES = (
@@ -38,6 +75,7 @@ class FileManager(RootModel):
     md5 = models.CharField(max_length=32, null=True, blank=True, help_text="文件MD5")
     is_public = models.BooleanField(default=False, help_text="是否公开")
     download_count = models.IntegerField(default=0, help_text="下载次数")
+    blob = models.ForeignKey(FileBlob, on_delete=models.SET_NULL, null=True, blank=True, related_name='files', help_text="文件内容")
     
     class Meta:
         db_table = "core_file_manager"
@@ -5,13 +5,14 @@
 # author: 臧成龙
 # QQ: 939589097
 
-from typing import List
+from typing import Dict, List
 from ninja import ModelSchema, Schema, Field
 from pydantic import UUID4
 
 from common.fu_model import exclude_fields
 from common.fu_schema import FuFilters
 from core.file_manager.file_manager_model import FileManager
+from core.file_manager.file_url_service import FileUrlService
 
 
 class FileManagerFilters(FuFilters):
@@ -30,7 +31,7 @@ class FileManagerSchemaIn(ModelSchema):
     
     class Config:
         model = FileManager
-        model_exclude = exclude_fields + ('parent', 'url', 'thumbnail_url', 'download_count')
+        model_exclude = exclude_fields + ('parent', 'url', 'thumbnail_url', 'download_count', 'blob')
 
 
 class FileManagerSimpleSchemaOut(Schema):
@@ -49,10 +50,11 @@ class FileManagerSchemaOut(ModelSchema):
     file_type: str = Field(None)
     file_size: int = Field(None)
     updated_time: str = Field(None)
+    preview_url: str | None = Field(None)
     
     class Config:
         model = FileManager
-        model_exclude = ['parent', 'type', 'size', 'sys_create_datetime', 'sys_update_datetime']
+        model_exclude = ['parent', 'type', 'size', 'blob', 'sys_create_datetime', 'sys_update_datetime']
         
     @staticmethod
     def resolve_parent_id(obj):
@@ -74,6 +76,16 @@ class FileManagerSchemaOut(ModelSchema):
     def resolve_file_size(obj):
         return obj.size
         
+    @staticmethod
+    def resolve_thumbnail_url(obj):
+        return FileUrlService.get_thumbnail_url(obj.id) if obj.thumbnail_url else None
+        
+    @staticmethod
+    def resolve_preview_url(obj):
+        if obj.blob_id and obj.blob.preview_path:
+            return FileUrlService.get_thumbnail_url(obj.id, preview=True)
+        return None
+        
     @staticmethod
     def resolve_updated_time(obj):
         return obj.sys_update_datetime.isoformat() if obj.sys_update_datetime else obj.sys_create_datetime.isoformat()
@@ -128,6 +140,17 @@ class InitChunkUploadSchemaIn(Schema):
     parent_id: UUID4 | None = Field(None, description="父文件夹ID")
     is_public: bool = Field(False, description="是否公开")
     file_hash: str | None = Field(None, description="文件MD5哈希，用于秒传")
+    tree_hash: str | None = Field(
+        None, description="分块摘要树哈希（按 chunk_size 分块计算，见 common.utils.file_utils.tree_hash），用于秒传"
+    )
+    direct: bool = Field(False, description="是否直传对象存储（存储后端支持时生效）")
+
+
+class PresignedPartSchemaOut(Schema):
+    """直传分块的预签名URL"""
+    chunk_index: int = Field(..., description="分块索引")
+    part_number: int = Field(..., description="对象存储分块编号（从1开始）")
+    url: str = Field(..., description="预签名上传URL（PUT）")
 
 
 class InitChunkUploadSchemaOut(Schema):
@@ -138,17 +161,28 @@ class InitChunkUploadSchemaOut(Schema):
     uploaded_chunks: List[int] = Field([], description="已上传的分块索引列表")
     file_exists: bool = Field(False, description="文件是否已存在（秒传）")
     file_id: UUID4 | None = Field(None, description="如果文件已存在，返回文件ID")
+    direct: bool = Field(False, description="是否直传对象存储")
+    part_urls: List[PresignedPartSchemaOut] = Field([], description="直传分块的预签名URL（前 FILE_UPLOAD_PART_URL_BATCH 个）")
 
 
 class UploadChunkSchemaOut(Schema):
     """上传分块输出Schema"""
     chunk_index: int = Field(..., description="分块索引")
     uploaded: bool = Field(..., description="是否上传成功")
+    md5: str | None = Field(None, description="分块MD5")
+    uploaded_count: int = Field(0, description="已上传的分块数")
+    completed: bool = Field(False, description="是否所有分块都已上传")
+
+
+class PresignPartsSchemaIn(Schema):
+    """获取直传分块预签名URL输入Schema"""
+    upload_id: UUID4 = Field(..., description="上传ID")
+    chunk_indexes: List[int] = Field(..., description="分块索引列表")
 
 
 class MergeChunksSchemaIn(Schema):
     """合并分块输入Schema"""
-    upload_id: str = Field(..., description="上传ID")
+    upload_id: UUID4 = Field(..., description="上传ID")
 
 
 class ChunkUploadStatusSchemaOut(Schema):
@@ -158,4 +192,5 @@ class ChunkUploadStatusSchemaOut(Schema):
     total_size: int = Field(..., description="文件总大小")
     total_chunks: int = Field(..., description="总分块数")
     uploaded_chunks: List[int] = Field(..., description="已上传的分块索引")
+    chunk_hashes: Dict[str, str] = Field({}, description="已上传分块的MD5（键为分块索引），用于断点续传时比对")
     completed: bool = Field(..., description="是否完成上传") 
\ No newline at end of file
@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+File Manager Signals - 文件内容引用计数
+删除文件记录（包括删除文件夹时级联删除的文件）时取消对文件内容的引用，与删除在同一事务中
+"""
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from core.file_manager.file_blob_service import FileBlobService
+from core.file_manager.file_manager_model import FileManager
+
+
+@receiver(post_delete, sender=FileManager)
+def file_manager_post_delete(sender, instance: FileManager, **kwargs):
+    """文件记录删除后引用计数 -1"""
+    if instance.blob_id:
+        FileBlobService.release(instance.blob_id)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+File Thumbnail Service - 缩略图与预览图
+上传、合并、秒传完成后（事务提交后）在后台生成缩略图和预览图：
+- 解码、缩放在进程池（FILE_THUMBNAIL_WORKERS 个子进程）中执行，不占用请求线程和 GIL
+- 按文件内容（FileBlob）生成一份，相同内容的文件共享，保存在同一个存储后端的 FILE_THUMBNAIL_FOLDER 目录下
+- 生成后写入引用该内容的所有文件记录的 thumbnail_url，文件列表返回 /file_manager/thumbnail/{file_id}，由该接口从存储后端读取
+- 图片需安装 Pillow，PDF（第一页）需同时安装 PyMuPDF，未安装时跳过
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from common.utils.thumbnail_utils import can_render, render_derivatives
+from core.file_manager.file_blob_service import get_storage_type
+from core.file_manager.file_manager_model import FileBlob, FileManager
+from core.file_manager.storage_backends import LocalStorageBackend, StorageBackend, get_storage_backend
+
+logger = logging.getLogger(__name__)
+
+# 生成锁过期时间（秒），防止同一内容被并发生成
+THUMBNAIL_LOCK_TIMEOUT = 10 * 60
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """进程池（spawn 方式启动，子进程不继承数据库连接和线程状态）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'FILE_THUMBNAIL_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+class FileThumbnailService:
+    """缩略图服务类"""
+
+    @staticmethod
+    def enabled() -> bool:
+        return getattr(settings, 'FILE_THUMBNAIL_ENABLE', True)
+
+    @staticmethod
+    def schedule(file_obj: FileManager) -> None:
+        """事务提交后在后台生成缩略图（已有缩略图、类型不支持或文件过大时跳过）"""
+        if not FileThumbnailService.enabled() or not file_obj.blob_id or file_obj.thumbnail_url:
+            return
+        if not can_render(file_obj.mime_type):
+            return
+        if file_obj.size > getattr(settings, 'FILE_THUMBNAIL_MAX_SOURCE_SIZE', 100 * 1024 * 1024):
+            return
+
+        blob_id, mime_type = file_obj.blob_id, file_obj.mime_type
+        transaction.on_commit(lambda: threading.Thread(
+            target=FileThumbnailService.run_in_thread, args=(blob_id, mime_type), daemon=True,
+        ).start())
+
+    @staticmethod
+    def run_in_thread(blob_id: str, mime_type: str) -> None:
+        try:
+            FileThumbnailService.generate(blob_id, mime_type)
+        except Exception:
+            logger.exception(f"生成缩略图失败: {blob_id}")
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def generate(blob_id: str, mime_type: str) -> Optional[str]:
+        """
+        为文件内容生成缩略图和预览图，并同步到引用该内容的文件记录
+
+        :return: 缩略图URL，未生成时返回 None
+        """
+        blob = FileBlob.objects.filter(id=blob_id).first()
+        if blob is None:
+            return None
+
+        if not blob.thumbnail_url:
+            lock_key = f'file_thumbnail:{blob_id}'
+            # 其他请求正在生成，生成完成后会同步所有文件记录
+            if not cache.add(lock_key, 1, timeout=THUMBNAIL_LOCK_TIMEOUT):
+                return None
+            try:
+                FileThumbnailService._render(blob, mime_type)
+            finally:
+                cache.delete(lock_key)
+            if not blob.thumbnail_url:
+                return None
+
+        FileManager.objects.filter(blob_id=blob_id, thumbnail_url__isnull=True).update(thumbnail_url=blob.thumbnail_url)
+        return blob.thumbnail_url
+
+    @staticmethod
+    def _render(blob: FileBlob, mime_type: str) -> None:
+        storage = get_storage_backend()
+        if get_storage_type(storage) != blob.storage_type:
+            return
+
+        sizes = [
+            getattr(settings, 'FILE_THUMBNAIL_SIZE', 256),
+            getattr(settings, 'FILE_PREVIEW_SIZE', 1280),
+        ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            if isinstance(storage, LocalStorageBackend):
+                source_path = storage.get_full_path(blob.storage_path)
+            else:
+                # 对象存储先下载到临时文件
+                source_path = os.path.join(temp_dir, 'source')
+                try:
+                    content = storage.iter_content(blob.storage_path)
+                except NotImplementedError:
+                    return
+                with open(source_path, 'wb') as f:
+                    for chunk in content:
+                        f.write(chunk)
+
+            future = _get_pool().submit(
+                render_derivatives, source_path, mime_type, sizes,
+                getattr(settings, 'FILE_THUMBNAIL_QUALITY', 80),
+            )
+            thumbnail, preview = future.result(timeout=getattr(settings, 'FILE_THUMBNAIL_TIMEOUT', 60))
+
+        name = blob.md5 or blob.id
+        folder_path = getattr(settings, 'FILE_THUMBNAIL_FOLDER', 'thumbnails')
+        thumbnail_path, thumbnail_url = storage.save(ContentFile(thumbnail), f'{name}_thumb.jpg', folder_path)
+        preview_path, preview_url = storage.save(ContentFile(preview), f'{name}_preview.jpg', folder_path)
+
+        updated = FileBlob.objects.filter(id=blob.id, thumbnail_url__isnull=True).update(
+            thumbnail_path=thumbnail_path,
+            thumbnail_url=thumbnail_url,
+            preview_path=preview_path,
+            preview_url=preview_url,
+        )
+        if not updated:
+            # 已由其他进程生成
+            FileThumbnailService.delete_derivatives(storage, thumbnail_path, preview_path)
+            blob.refresh_from_db()
+            return
+        blob.thumbnail_path, blob.thumbnail_url = thumbnail_path, thumbnail_url
+        blob.preview_path, blob.preview_url = preview_path, preview_url
+
+    @staticmethod
+    def delete_derivatives(storage: StorageBackend, *paths: Optional[str]) -> None:
+        """删除缩略图、预览图存储文件"""
+        for path in paths:
+            if not path:
+                continue
+            try:
+                storage.delete(path)
+            except Exception as e:
+                logger.warning(f"删除缩略图失败 {path}: {e}")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+File Url Service - 文件访问URL
+预签名URL按时间段缓存：
+- 签名时间取当前时间段的开始（FILE_PRESIGNED_URL_BUCKET 秒一段），同一时间段内同一文件的URL完全相同，
+  浏览器可以直接命中缓存
+- URL 有效期为 FILE_PRESIGNED_URL_EXPIRES，缓存到时间段结束，返回的URL至少还有（有效期 - 时间段）秒可用
+- 批量获取时一次 get_many 读取缓存，未命中的文件批量签名后一次 set_many 写入
+"""
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.file_manager.file_manager_model import FileManager
+from core.file_manager.storage_backends import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+
+class FileUrlService:
+    """文件访问URL服务类"""
+
+    @staticmethod
+    def _cache_key(storage: StorageBackend, storage_path: str, bucket_start: int) -> str:
+        digest = hashlib.md5(storage_path.encode('utf-8')).hexdigest()
+        bucket_name = getattr(storage, 'bucket_name', '')
+        return f'presigned_url:{bucket_name}:{digest}:{bucket_start}'
+
+    @staticmethod
+    def get_presigned_urls(storage: StorageBackend, storage_paths: Sequence[str]) -> Dict[str, str]:
+        """
+        批量获取预签名URL（优先读取缓存）
+
+        :return: {存储路径: 预签名URL}
+        """
+        expires = getattr(settings, 'FILE_PRESIGNED_URL_EXPIRES', 3600)
+        bucket = min(getattr(settings, 'FILE_PRESIGNED_URL_BUCKET', 1800), expires)
+        now = time.time()
+        bucket_start = int(now // bucket * bucket)
+
+        keys = {
+            FileUrlService._cache_key(storage, storage_path, bucket_start): storage_path
+            for storage_path in storage_paths
+        }
+        cached = cache.get_many(list(keys))
+        result = {keys[key]: url for key, url in cached.items()}
+
+        missing = [storage_path for key, storage_path in keys.items() if key not in cached]
+        if missing:
+            urls = storage.get_presigned_urls(
+                missing,
+                expires=timedelta(seconds=expires),
+                request_date=datetime.fromtimestamp(bucket_start, timezone.utc),
+            )
+            cache.set_many(
+                {FileUrlService._cache_key(storage, path, bucket_start): url for path, url in urls.items()},
+                timeout=max(1, int(bucket_start + bucket - now)),
+            )
+            result.update(urls)
+        return result
+
+    @staticmethod
+    def get_presigned_url(storage: StorageBackend, storage_path: str) -> Optional[str]:
+        """获取单个文件的预签名URL，失败时返回 None"""
+        try:
+            return FileUrlService.get_presigned_urls(storage, [storage_path]).get(storage_path)
+        except Exception as e:
+            logger.warning(f"获取预签名URL失败 {storage_path}: {e}")
+            return None
+
+    @staticmethod
+    def get_local_url(storage_path: str) -> str:
+        """本地存储文件的访问URL"""
+        base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
+        return f"{base_url}/api/system/file_manager/download?path={storage_path}"
+
+    @staticmethod
+    def get_thumbnail_url(file_id, preview: bool = False) -> str:
+        """缩略图（preview 为 True 时为预览图）的访问URL，由 /file_manager/thumbnail/{file_id} 读取存储后端返回"""
+        url = f"/api/core/file_manager/thumbnail/{file_id}"
+        return f"{url}?preview=true" if preview else url
+
+    @staticmethod
+    def get_file_urls(storage: StorageBackend, files: Iterable[FileManager]) -> Dict[str, str]:
+        """
+        批量获取文件访问URL：Minio 返回预签名URL，其他返回文件URL或本地访问URL
+
+        :return: {文件ID: 访问URL}
+        """
+        files = list(files)
+        presigned = {}
+        minio_paths = [file_obj.storage_path for file_obj in files if file_obj.storage_type == 'minio']
+        if minio_paths and hasattr(storage, 'get_presigned_urls'):
+            try:
+                presigned = FileUrlService.get_presigned_urls(storage, minio_paths)
+            except Exception as e:
+                # 获取临时URL失败时使用其他方式
+                logger.warning(f"批量获取预签名URL失败: {e}")
+
+        result = {}
+        for file_obj in files:
+            if file_obj.storage_type == 'minio' and file_obj.storage_path in presigned:
+                result[str(file_obj.id)] = presigned[file_obj.storage_path]
+            elif file_obj.url:
+                result[str(file_obj.id)] = file_obj.url
+            elif file_obj.storage_type == 'local':
+                result[str(file_obj.id)] = FileUrlService.get_local_url(file_obj.storage_path)
+            else:
+                result[str(file_obj.id)] = file_obj.storage_path
+        return result
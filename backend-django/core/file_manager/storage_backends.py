@@ -6,20 +6,37 @@
 # QQ: 939589097
 
 import os
+import base64
 import hashlib
+import uuid
 from abc import ABC, abstractmethod
-from datetime import datetime, timedelta
-from typing import BinaryIO, Tuple
-from urllib.parse import urljoin
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import quote, urljoin
 
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 
+from common.utils.file_utils import COPY_BUFFER_SIZE, ConcatenatedFile, HashingReader, concatenate_files, hash_files
+
+
+class UploadedPart(NamedTuple):
+    """直传分块上传中已上传的分块"""
+    part_number: int
+    etag: str
+    size: int
+
 
 class StorageBackend(ABC):
     """存储后端抽象基类"""
     
+    # 是否支持客户端通过预签名URL直传分块（Multipart Upload）
+    supports_multipart = False
+    # 直传分块限制（S3 协议：除最后一块外每块不小于 5MB，最多 10000 块）
+    multipart_min_part_size = 5 * 1024 * 1024
+    multipart_max_parts = 10000
+    
     @abstractmethod
     def save(self, file: BinaryIO, filename: str, folder_path: str = '') -> Tuple[str, str]:
         """
@@ -31,6 +48,31 @@ class StorageBackend(ABC):
         """
         pass
     
+    def save_and_hash(self, file: BinaryIO, filename: str, folder_path: str = '') -> Tuple[str, str, str]:
+        """
+        保存文件并在写入的同时计算MD5（不需要保存后再读一遍）
+        :return: (存储路径, 访问URL, MD5)
+        """
+        reader = HashingReader(file)
+        storage_path, url = self.save(reader, filename, folder_path)
+        md5 = reader.hexdigest() or self.calculate_md5(file)
+        return storage_path, url, md5
+    
+    def save_parts(self, part_paths: Sequence[str], filename: str, folder_path: str = '') -> Tuple[str, str, Optional[str]]:
+        """
+        按顺序拼接多个本地分块文件并保存（分块上传合并时使用）
+        默认把分块作为一个连续的文件对象流式上传，不生成中间合并文件，上传的同时计算MD5
+        :param part_paths: 分块文件路径（按顺序）
+        :param filename: 文件名
+        :param folder_path: 文件夹路径
+        :return: (存储路径, 访问URL, MD5)，不经过用户态读取时MD5为 None（以分块摘要树哈希去重）
+        """
+        with ConcatenatedFile(part_paths, name=filename) as file:
+            reader = HashingReader(file)
+            storage_path, url = self.save(reader, filename, folder_path)
+        md5 = reader.hexdigest() or hash_files(part_paths)
+        return storage_path, url, md5
+    
     @abstractmethod
     def delete(self, file_path: str) -> bool:
         """删除文件"""
@@ -51,6 +93,16 @@ class StorageBackend(ABC):
         """获取文件大小"""
         pass
     
+    def iter_content(self, file_path: str, offset: int = 0, length: int = None,
+                     chunk_size: int = COPY_BUFFER_SIZE) -> Iterator[bytes]:
+        """
+        按范围分块读取文件内容（下载、断点续传时使用，内存占用与文件大小无关）
+        文件不存在等错误在调用时立即抛出，而不是在开始迭代后
+        :param offset: 起始位置
+        :param length: 读取长度，为空时读取到文件末尾
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} 不支持按范围读取")
+    
     def calculate_md5(self, file: BinaryIO) -> str:
         """计算文件MD5"""
         md5_hash = hashlib.md5()
@@ -65,6 +117,41 @@ class StorageBackend(ABC):
         timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
         name, ext = os.path.splitext(original_filename)
         return f"{timestamp}_{name}{ext}"
+    
+    def generate_object_key(self, filename: str, folder_path: str = '') -> str:
+        """生成对象存储中的唯一路径"""
+        return os.path.join('file_manager', folder_path, self.generate_filename(filename)).replace('\\', '/')
+    
+    # ---------------------------------------------------------------
+    # 分块直传：应用服务器只创建、完成分块上传，数据由客户端直接上传到对象存储
+    # ---------------------------------------------------------------
+    
+    def create_multipart_upload(self, filename: str, folder_path: str = '', content_type: str = None) -> Tuple[str, str]:
+        """
+        创建分块上传
+        :return: (存储路径, 分块上传ID)
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} 不支持分块直传")
+    
+    def presign_upload_part(self, file_path: str, multipart_id: str, part_number: int,
+                            expires: timedelta = None) -> str:
+        """获取上传指定分块（part_number 从 1 开始）的预签名URL，客户端使用 PUT 上传"""
+        raise NotImplementedError(f"{self.__class__.__name__} 不支持分块直传")
+    
+    def list_uploaded_parts(self, file_path: str, multipart_id: str) -> List[UploadedPart]:
+        """列出已上传的分块（以对象存储的记录为准）"""
+        raise NotImplementedError(f"{self.__class__.__name__} 不支持分块直传")
+    
+    def complete_multipart_upload(self, file_path: str, multipart_id: str, parts: List[UploadedPart]) -> str:
+        """
+        完成分块上传（按 part_number 顺序拼接）
+        :return: 访问URL
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} 不支持分块直传")
+    
+    def abort_multipart_upload(self, file_path: str, multipart_id: str) -> None:
+        """取消分块上传，释放已上传的分块"""
+        raise NotImplementedError(f"{self.__class__.__name__} 不支持分块直传")
 
 
 class LocalStorageBackend(StorageBackend):
@@ -94,6 +181,31 @@ class LocalStorageBackend(StorageBackend):
         url = f"{relative_path}"
         return relative_path, url
     
+    def save_parts(self, part_paths: Sequence[str], filename: str, folder_path: str = '') -> Tuple[str, str, Optional[str]]:
+        """
+        直接在目标目录中拼接分块（内核复制，不读入用户态，不计算MD5），完成后原子重命名为最终文件名
+
+        分块内容已在上传时逐块计算过MD5，合并后的去重使用分块摘要树哈希
+        """
+        unique_filename = self.generate_filename(filename)
+        relative_path = os.path.join(folder_path, unique_filename)
+        full_path = os.path.join(self.base_path, relative_path)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        
+        # 临时文件与目标文件在同一目录（同一文件系统），保证 os.replace 是原子操作
+        temp_path = os.path.join(directory, f".{unique_filename}.{uuid.uuid4().hex}.part")
+        try:
+            with open(temp_path, 'xb') as destination:
+                concatenate_files(part_paths, destination.fileno())
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        return relative_path, f"{relative_path}", None
+    
     def delete(self, file_path: str) -> bool:
         full_path = os.path.join(self.base_path, file_path)
         if os.path.exists(full_path):
@@ -111,11 +223,35 @@ class LocalStorageBackend(StorageBackend):
     def get_size(self, file_path: str) -> int:
         full_path = os.path.join(self.base_path, file_path)
         return os.path.getsize(full_path) if os.path.exists(full_path) else 0
+    
+    def get_full_path(self, file_path: str) -> str:
+        """获取文件的本地绝对路径"""
+        return os.path.join(self.base_path, file_path)
+    
+    def iter_content(self, file_path: str, offset: int = 0, length: int = None,
+                     chunk_size: int = COPY_BUFFER_SIZE) -> Iterator[bytes]:
+        file = open(self.get_full_path(file_path), 'rb')
+        file.seek(offset)
+        
+        def iterator():
+            remaining = length
+            with file:
+                while remaining is None or remaining > 0:
+                    data = file.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                    if not data:
+                        break
+                    if remaining is not None:
+                        remaining -= len(data)
+                    yield data
+        
+        return iterator()
 
 
 class OSSStorageBackend(StorageBackend):
     """阿里云OSS存储后端"""
     
+    supports_multipart = True
+    
     def __init__(self, endpoint: str, access_key_id: str, access_key_secret: str, bucket_name: str):
         self.endpoint = endpoint
         self.access_key_id = access_key_id
@@ -165,11 +301,50 @@ class OSSStorageBackend(StorageBackend):
             return result.content_length
         except:
             return 0
+    
+    def create_multipart_upload(self, filename: str, folder_path: str = '', content_type: str = None) -> Tuple[str, str]:
+        key = self.generate_object_key(filename, folder_path)
+        result = self.client.init_multipart_upload(
+            key, headers={'Content-Type': content_type or 'application/octet-stream'}
+        )
+        return key, result.upload_id
+    
+    def presign_upload_part(self, file_path: str, multipart_id: str, part_number: int,
+                            expires: timedelta = None) -> str:
+        # 签名不包含 Content-Type，客户端上传分块时不要设置该请求头
+        expires = expires or timedelta(hours=1)
+        return self.client.sign_url(
+            'PUT',
+            file_path,
+            int(expires.total_seconds()),
+            params={'uploadId': multipart_id, 'partNumber': str(part_number)},
+        )
+    
+    def list_uploaded_parts(self, file_path: str, multipart_id: str) -> List[UploadedPart]:
+        import oss2
+        return [
+            UploadedPart(part.part_number, part.etag, part.size)
+            for part in oss2.PartIterator(self.client, file_path, multipart_id)
+        ]
+    
+    def complete_multipart_upload(self, file_path: str, multipart_id: str, parts: List[UploadedPart]) -> str:
+        from oss2.models import PartInfo
+        self.client.complete_multipart_upload(
+            file_path,
+            multipart_id,
+            [PartInfo(part.part_number, part.etag) for part in sorted(parts)],
+        )
+        return self.get_url(file_path)
+    
+    def abort_multipart_upload(self, file_path: str, multipart_id: str) -> None:
+        self.client.abort_multipart_upload(file_path, multipart_id)
 
 
 class MinioStorageBackend(StorageBackend):
     """Minio存储后端"""
     
+    supports_multipart = True
+    
     def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket_name: str, secure: bool = False):
         # 处理endpoint，确保没有协议前缀
         if endpoint.startswith('http://'):
@@ -247,11 +422,12 @@ class MinioStorageBackend(StorageBackend):
         except:
             return 0
 
-    def get_presigned_url(self, file_path: str, expires: timedelta = None) -> str:
+    def get_presigned_url(self, file_path: str, expires: timedelta = None, request_date: datetime = None) -> str:
         """
         获取预签名临时URL
         :param file_path: 文件路径
         :param expires: 过期时间，默认为1小时
+        :param request_date: 签名时间（UTC），相同签名时间生成的URL相同，默认为当前时间
         :return: 预签名URL
         """
         if expires is None:
@@ -261,12 +437,25 @@ class MinioStorageBackend(StorageBackend):
             url = self.client.presigned_get_object(
                 self.bucket_name,
                 file_path,
-                expires=expires
+                expires=expires,
+                request_date=request_date,
             )
             return url
         except Exception as e:
             raise Exception(f"Failed to generate presigned URL: {str(e)}")
 
+    def get_presigned_urls(self, file_paths: Sequence[str], expires: timedelta = None,
+                           request_date: datetime = None) -> Dict[str, str]:
+        """
+        批量获取预签名临时URL（使用同一签名时间）
+        :return: {文件路径: 预签名URL}
+        """
+        request_date = request_date or datetime.now(timezone.utc)
+        return {
+            file_path: self.get_presigned_url(file_path, expires, request_date)
+            for file_path in dict.fromkeys(file_paths)
+        }
+
     def get_presigned_upload_url(self, file_path: str, expires: timedelta = None) -> str:
         """
         获取预签名上传URL
@@ -287,6 +476,66 @@ class MinioStorageBackend(StorageBackend):
         except Exception as e:
             raise Exception(f"Failed to generate presigned upload URL: {str(e)}")
 
+    # minio-py 没有公开的分块上传接口，以下使用客户端内部方法，requirements.txt 固定了 minio 版本，
+    # 由 core/tests/test_minio_multipart.py 覆盖
+    def create_multipart_upload(self, filename: str, folder_path: str = '', content_type: str = None) -> Tuple[str, str]:
+        object_name = self.generate_object_key(filename, folder_path)
+        upload_id = self.client._create_multipart_upload(
+            self.bucket_name,
+            object_name,
+            {'Content-Type': content_type or 'application/octet-stream'},
+        )
+        return object_name, upload_id
+    
+    def presign_upload_part(self, file_path: str, multipart_id: str, part_number: int,
+                            expires: timedelta = None) -> str:
+        return self.client.get_presigned_url(
+            'PUT',
+            self.bucket_name,
+            file_path,
+            expires=expires or timedelta(hours=1),
+            extra_query_params={'uploadId': multipart_id, 'partNumber': str(part_number)},
+        )
+    
+    def list_uploaded_parts(self, file_path: str, multipart_id: str) -> List[UploadedPart]:
+        parts = []
+        marker = None
+        while True:
+            result = self.client._list_parts(
+                self.bucket_name, file_path, multipart_id, part_number_marker=marker
+            )
+            parts.extend(UploadedPart(part.part_number, part.etag, part.size) for part in result.parts)
+            if not result.is_truncated:
+                return parts
+            marker = result.next_part_number_marker
+    
+    def complete_multipart_upload(self, file_path: str, multipart_id: str, parts: List[UploadedPart]) -> str:
+        from minio.datatypes import Part
+        self.client._complete_multipart_upload(
+            self.bucket_name,
+            file_path,
+            multipart_id,
+            [Part(part.part_number, part.etag) for part in sorted(parts)],
+        )
+        return f"{self.bucket_name}/{file_path}"
+    
+    def abort_multipart_upload(self, file_path: str, multipart_id: str) -> None:
+        self.client._abort_multipart_upload(self.bucket_name, file_path, multipart_id)
+
+    def iter_content(self, file_path: str, offset: int = 0, length: int = None,
+                     chunk_size: int = COPY_BUFFER_SIZE) -> Iterator[bytes]:
+        # 只向 Minio 请求需要的范围（length 为 0 表示读取到末尾）
+        response = self.client.get_object(self.bucket_name, file_path, offset=offset, length=length or 0)
+        
+        def iterator():
+            try:
+                yield from response.stream(chunk_size)
+            finally:
+                response.close()
+                response.release_conn()
+        
+        return iterator()
+
     def get_file_content(self, file_path: str):
         """
         获取文件内容
@@ -321,6 +570,11 @@ class MinioStorageBackend(StorageBackend):
 class AzureBlobStorageBackend(StorageBackend):
     """Azure Blob存储后端"""
     
+    # Azure 使用块 Blob：分块即 Put Block，完成即 Put Block List，没有单独的上传会话
+    supports_multipart = True
+    multipart_min_part_size = 1
+    multipart_max_parts = 50000
+    
     def __init__(self, account_name: str, account_key: str, container_name: str):
         self.account_name = account_name
         self.account_key = account_key
@@ -392,6 +646,49 @@ class AzureBlobStorageBackend(StorageBackend):
             return properties.size
         except:
             return 0
+    
+    @staticmethod
+    def _block_id(part_number: int) -> str:
+        # 同一个 Blob 的块ID长度必须一致；SDK 读写块列表时自动做 Base64 编解码，直接调用 REST 接口时需自行编码
+        return f"{part_number:06d}"
+    
+    def create_multipart_upload(self, filename: str, folder_path: str = '', content_type: str = None) -> Tuple[str, str]:
+        blob_name = self.generate_object_key(filename, folder_path)
+        return blob_name, blob_name
+    
+    def presign_upload_part(self, file_path: str, multipart_id: str, part_number: int,
+                            expires: timedelta = None) -> str:
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+        sas_token = generate_blob_sas(
+            account_name=self.account_name,
+            container_name=self.container_name,
+            blob_name=file_path,
+            account_key=self.account_key,
+            permission=BlobSasPermissions(write=True),
+            expiry=datetime.utcnow() + (expires or timedelta(hours=1)),
+        )
+        block_id = quote(base64.b64encode(self._block_id(part_number).encode()).decode(), safe='')
+        return f"{self.get_url(file_path)}?comp=block&blockid={block_id}&{sas_token}"
+    
+    def list_uploaded_parts(self, file_path: str, multipart_id: str) -> List[UploadedPart]:
+        blob_client = self.client.get_blob_client(container=self.container_name, blob=file_path)
+        _, uncommitted = blob_client.get_block_list('uncommitted')
+        return [
+            UploadedPart(int(block.id), block.id, block.size)
+            for block in uncommitted
+        ]
+    
+    def complete_multipart_upload(self, file_path: str, multipart_id: str, parts: List[UploadedPart]) -> str:
+        from azure.storage.blob import BlobBlock
+        blob_client = self.client.get_blob_client(container=self.container_name, blob=file_path)
+        blob_client.commit_block_list([
+            BlobBlock(block_id=self._block_id(part.part_number)) for part in sorted(parts)
+        ])
+        return self.get_url(file_path)
+    
+    def abort_multipart_upload(self, file_path: str, multipart_id: str) -> None:
+        # 未提交的块 7 天后由 Azure 自动清理
+        pass
 
 
 def get_storage_backend(config: dict = None) -> StorageBackend:
@@ -13,8 +13,11 @@ from ninja.pagination import paginate
 from django.utils import timezone
 
 from common.fu_crud import retrieve
-from common.fu_pagination import MyPagination
+from common.fu_pagination import MyPagination, CursorPagination
 from common.fu_schema import response_success
+from common.fu_job import AsyncJobManager
+from common.utils.export_utils import choices_formatter, streaming_export_response
+from core.async_job.async_job_schema import AsyncJobSchemaOut
 from core.login_log.login_log_model import LoginLog
 from core.login_log.login_log_schema import (
     LoginLogFilters,
@@ -30,6 +33,17 @@ from core.login_log.login_log_service import LoginLogService
 
 router = Router()
 
+# 导出字段与转换（同步导出和后台导出共用）
+LOGIN_LOG_EXPORT_FIELDS = [
+    "username", "login_type", "status", "failure_reason", "login_ip", "ip_location",
+    "browser_type", "os_type", "device_type", "sys_create_datetime",
+]
+LOGIN_LOG_EXPORT_FORMATTERS = {
+    "login_type": choices_formatter(LoginLog.LOGIN_TYPE_CHOICES),
+    "status": choices_formatter(LoginLog.STATUS_CHOICES),
+    "failure_reason": choices_formatter(LoginLog.FAILURE_REASON_CHOICES),
+}
+
 
 @router.get("/login-log", response=List[LoginLogSchemaOut], summary="获取登录日志列表（分页）")
 @paginate(MyPagination)
@@ -53,26 +67,64 @@ def list_login_logs(request, filters: LoginLogFilters = Query(...)):
     return query_set.order_by('-sys_create_datetime')
 
 
-@router.get("/login-log/{log_id}", response=LoginLogSchemaOut, summary="获取登录日志详情")
-def get_login_log(request, log_id: str):
-    """获取单条登录日志的详细信息"""
-    log = get_object_or_404(LoginLog, id=log_id)
-    return log
-
-
-@router.delete("/login-log/{log_id}", summary="删除登录日志")
-def delete_login_log(request, log_id: str):
-    """删除单条登录日志"""
-    log = get_object_or_404(LoginLog, id=log_id)
-    log.delete()
-    return response_success("登录日志已删除")
+@router.get("/login-log/cursor", response=List[LoginLogSchemaOut], summary="获取登录日志列表（游标分页）")
+@paginate(CursorPagination, ordering=('-sys_create_datetime',))
+def list_login_logs_by_cursor(request, filters: LoginLogFilters = Query(...)):
+    """
+    获取登录日志列表（游标分页）
+    
+    适用于数据量很大的场景：
+    - 按 (创建时间, ID) 定位，深度翻页不再随页码变慢
+    - 通过 next_cursor / prev_cursor 前后翻页
+    - 默认不统计总数，需要时传 includeTotal=true
+    """
+    return retrieve(request, LoginLog, filters)
 
 
-@router.delete("/login-log/batch/delete", summary="批量删除登录日志")
-def batch_delete_login_logs(request, ids: List[str] = Query(...)):
-    """批量删除登录日志"""
-    deleted_count, _ = LoginLog.objects.filter(id__in=ids).delete()
-    return response_success(f"成功删除 {deleted_count} 条登录日志", data={"deleted_count": deleted_count})
+@router.post("/login-log/export", summary="导出登录日志")
+def export_login_logs(request, filters: LoginLogFilters = Query(...), file_format: str = Query('csv')):
+    """
+    导出登录日志为 CSV 或 Excel
+    
+    用于数据备份和审计
+    
+    改进点：
+    - 支持与列表相同的过滤条件
+    - 流式输出，百万级日志导出时内存占用恒定
+    """
+    query_set = retrieve(request, LoginLog, filters).order_by('-sys_create_datetime')
+    try:
+        return streaming_export_response(
+            query_set,
+            LOGIN_LOG_EXPORT_FIELDS,
+            filename=f"登录日志_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            file_format=file_format,
+            formatters=LOGIN_LOG_EXPORT_FORMATTERS,
+        )
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+
+@router.post("/login-log/export/async", response=AsyncJobSchemaOut, summary="后台导出登录日志")
+def export_login_logs_async(request, filters: LoginLogFilters = Query(...), file_format: str = Query('csv')):
+    """
+    提交后台导出任务
+    
+    日志量大时使用，立即返回任务ID；
+    通过 /async-job/{job_id} 或通知 WebSocket 获取进度，完成后文件保存在文件管理中
+    """
+    query_set = retrieve(request, LoginLog, filters).order_by('-sys_create_datetime')
+    try:
+        return AsyncJobManager.submit_export(
+            request,
+            query_set,
+            LOGIN_LOG_EXPORT_FIELDS,
+            filename=f"登录日志_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            file_format=file_format,
+            formatters=LOGIN_LOG_EXPORT_FORMATTERS,
+        )
+    except ValueError as e:
+        raise HttpError(400, str(e))
 
 
 @router.post("/login-log/record", response=LoginLogSchemaOut, summary="记录登录日志")
@@ -100,6 +152,68 @@ def record_login_log(request, data: LoginLogRecordIn):
     return log
 
 
+@router.get("/login-log/suspicious", summary="获取可疑登录记录")
+def get_suspicious_logins(
+    request,
+    failed_threshold: int = Query(5, description="失败次数阈值"),
+    hours: int = Query(1, description="小时范围"),
+):
+    """
+    获取可疑登录记录
+    
+    显示短时间内失败次数过多的登录尝试
+    """
+    suspicious = LoginLogService.get_suspicious_logins(
+        max_failed_attempts=failed_threshold,
+        hours=hours,
+    )
+    return {
+        "detail": "获取成功",
+        "suspicious_count": len(suspicious),
+        "records": suspicious,
+    }
+
+
+@router.post("/login-log/clean", summary="清理旧的登录日志")
+def clean_old_logs(
+    request,
+    days: int = Query(90, description="保留天数"),
+):
+    """
+    清理旧的登录日志
+    
+    删除指定天数前的登录日志记录
+    """
+    # TODO: 添加权限检查，仅管理员可操作
+    deleted_count = LoginLogService.clean_old_logs(days=days)
+    return {
+        "detail": f"成功清理 {deleted_count} 条旧登录日志",
+        "deleted_count": deleted_count,
+    }
+
+
+@router.get("/login-log/{log_id}", response=LoginLogSchemaOut, summary="获取登录日志详情")
+def get_login_log(request, log_id: str):
+    """获取单条登录日志的详细信息"""
+    log = get_object_or_404(LoginLog, id=log_id)
+    return log
+
+
+@router.delete("/login-log/{log_id}", summary="删除登录日志")
+def delete_login_log(request, log_id: str):
+    """删除单条登录日志"""
+    log = get_object_or_404(LoginLog, id=log_id)
+    log.delete()
+    return response_success("登录日志已删除")
+
+
+@router.delete("/login-log/batch/delete", summary="批量删除登录日志")
+def batch_delete_login_logs(request, ids: List[str] = Query(...)):
+    """批量删除登录日志"""
+    deleted_count, _ = LoginLog.objects.filter(id__in=ids).delete()
+    return {"detail": f"成功删除 {deleted_count} 条登录日志", "deleted_count": deleted_count}
+
+
 @router.get("/login-log/stats/overview", response=LoginLogStatsOut, summary="获取登录统计概览")
 def get_login_stats(request, days: int = Query(30, description="统计天数")):
     """
@@ -200,15 +314,13 @@ def get_user_login_count(
     """获取用户登录次数（最近N天）"""
     count = LoginLogService.get_user_login_count(user_id=user_id, days=days)
     failed_count = LoginLogService.get_failed_login_count(user_id=user_id, days=days)
-    return response_success(
-        "获取成功",
-        data={
-            "user_id": user_id,
-            "total_logins": count,
-            "failed_logins": failed_count,
-            "success_logins": count - failed_count,
-        }
-    )
+    return {
+        "detail": "获取成功",
+        "user_id": user_id,
+        "total_logins": count,
+        "failed_logins": failed_count,
+        "success_logins": count - failed_count,
+    }
 
 
 @router.get("/login-log/user/{user_id}/last", response=LoginLogSchemaOut, summary="获取用户最后一次登录")
@@ -228,67 +340,12 @@ def get_user_login_ips(
 ):
     """获取用户最近登录过的IP地址列表"""
     ips = LoginLogService.get_login_ips(user_id=user_id, days=days)
-    return response_success(
-        "获取成功",
-        data={
-            "user_id": user_id,
-            "ips": ips,
-            "ip_count": len(ips),
-        }
-    )
-
-
-@router.get("/login-log/suspicious", summary="获取可疑登录记录")
-def get_suspicious_logins(
-    request,
-    failed_threshold: int = Query(5, description="失败次数阈值"),
-    hours: int = Query(1, description="小时范围"),
-):
-    """
-    获取可疑登录记录
-    
-    显示短时间内失败次数过多的登录尝试
-    """
-    suspicious = LoginLogService.get_suspicious_logins(
-        max_failed_attempts=failed_threshold,
-        hours=hours,
-    )
-    return response_success(
-        "获取成功",
-        data={
-            "suspicious_count": len(suspicious),
-            "records": suspicious,
-        }
-    )
-
-
-@router.post("/login-log/clean", summary="清理旧的登录日志")
-def clean_old_logs(
-    request,
-    days: int = Query(90, description="保留天数"),
-):
-    """
-    清理旧的登录日志
-    
-    删除指定天数前的登录日志记录
-    """
-    # TODO: 添加权限检查，仅管理员可操作
-    deleted_count = LoginLogService.clean_old_logs(days=days)
-    return response_success(
-        f"成功清理 {deleted_count} 条旧登录日志",
-        data={"deleted_count": deleted_count}
-    )
-
-
-@router.post("/login-log/export", summary="导出登录日志")
-def export_login_logs(request):
-    """
-    导出登录日志为CSV或Excel
-    
-    用于数据备份和审计
-    """
-    # TODO: 实现导出功能
-    return response_success("导出功能待实现")
+    return {
+        "detail": "获取成功",
+        "user_id": user_id,
+        "ips": ips,
+        "ip_count": len(ips),
+    }
 
 
 @router.get("/login-log/username/{username}", response=List[LoginLogSchemaOut], summary="根据用户名获取登录日志")
@@ -351,12 +408,10 @@ def get_failed_attempts(
         hours=hours,
     )
     
-    return response_success(
-        "获取成功",
-        data={
-            "username": username,
-            "failed_attempts": failed_count,
-            "should_lock": should_lock,
-        }
-    )
+    return {
+        "detail": "获取成功",
+        "username": username,
+        "failed_attempts": failed_count,
+        "should_lock": should_lock,
+    }
 
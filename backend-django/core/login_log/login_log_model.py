@@ -186,6 +186,7 @@ class LoginLog(RootModel):
             models.Index(fields=['login_ip', 'sys_create_datetime']),
             models.Index(fields=['login_type', 'sys_create_datetime']),
             models.Index(fields=['user_id', 'login_type']),
+            models.Index(fields=['sys_create_datetime', 'id']),
         ]
     
     def __str__(self):
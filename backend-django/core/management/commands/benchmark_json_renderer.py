@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JSON 渲染器基准测试
+
+对比标准库 json（原 MyJsonEncoder）与 orjson 渲染部门树、菜单树的耗时：
+    python manage.py benchmark_json_renderer
+    python manage.py benchmark_json_renderer --nodes 5000 --repeat 50
+"""
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from common.fu_renderer import MyJsonEncoder, dumps
+
+
+def _build_tree(nodes, fanout, make_node):
+    """按广度优先生成 nodes 个节点、每个节点最多 fanout 个子节点的树"""
+    root = make_node(0, None)
+    queue = [root]
+    count = 1
+    while queue and count < nodes:
+        parent = queue.pop(0)
+        parent['children'] = []
+        for _ in range(min(fanout, nodes - count)):
+            child = make_node(count, parent['id'])
+            parent['children'].append(child)
+            queue.append(child)
+            count += 1
+    return [root]
+
+
+def _dept_node(index, parent_id):
+    return {
+        'id': str(uuid.uuid4()),
+        'name': f'部门{index}',
+        'code': f'dept_{index}',
+        'dept_type': 1,
+        'status': True,
+        'level': 0,
+        'parent_id': parent_id,
+        'lead_id': str(uuid.uuid4()),
+        'lead_name': f'负责人{index}',
+        'phone': '13800000000',
+        'email': f'dept{index}@example.com',
+        'description': '部门描述' * 4,
+        'sort': index,
+        'child_count': 0,
+        'user_count': index % 50,
+        'dept_type_display': '部门',
+    }
+
+
+def _menu_node(index, parent_id):
+    now = datetime(2024, 1, 1, 8, 0, 0) + timedelta(minutes=index)
+    return {
+        'id': uuid.uuid4(),
+        'parent_id': parent_id,
+        'name': f'Menu{index}',
+        'path': f'/menu/{index}',
+        'component': f'views/menu/{index}/index',
+        'redirect': None,
+        'type': 1,
+        'meta': {
+            'title': f'菜单{index}',
+            'icon': 'ant-design:appstore-outlined',
+            'orderNo': index,
+            'hideMenu': False,
+            'ignoreKeepAlive': True,
+        },
+        'child_count': 0,
+        'sys_create_datetime': now,
+        'sys_update_datetime': now,
+    }
+
+
+class Command(BaseCommand):
+    help = "对比标准库 json 与 orjson 渲染部门树、菜单树的耗时"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nodes', type=int, default=2000, help='每棵树的节点数')
+        parser.add_argument('--fanout', type=int, default=8, help='每个节点的子节点数')
+        parser.add_argument('--repeat', type=int, default=20, help='重复次数')
+
+    def handle(self, *args, **options):
+        payloads = {
+            'dept_tree': _build_tree(options['nodes'], options['fanout'], _dept_node),
+            'menu_tree': _build_tree(options['nodes'], options['fanout'], _menu_node),
+        }
+        repeat = options['repeat']
+        for name, payload in payloads.items():
+            stdlib_seconds, stdlib_size = self._measure(
+                lambda: json.dumps(payload, cls=MyJsonEncoder).encode(), repeat
+            )
+            fast_seconds, fast_size = self._measure(lambda: dumps(payload), repeat)
+            self.stdout.write(
+                f"{name}: {options['nodes']} 节点 x {repeat} 次 | "
+                f"json {stdlib_seconds * 1000:.2f} ms/次 ({stdlib_size} 字节) | "
+                f"renderer {fast_seconds * 1000:.2f} ms/次 ({fast_size} 字节) | "
+                f"{stdlib_seconds / fast_seconds:.1f}x"
+            )
+
+    @staticmethod
+    def _measure(func, repeat):
+        content = func()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat, len(content)
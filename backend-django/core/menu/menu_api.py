@@ -8,7 +8,8 @@ Menu API - 菜单管理接口
 from typing import List
 import logging
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Sum
+from django.db.models import Sum, Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.core.cache import cache
 from ninja import Router, Query
 from ninja.errors import HttpError
@@ -18,8 +19,10 @@ from common.fu_crud import create, delete, update
 from common.fu_pagination import MyPagination
 from common.fu_schema import response_success
 from common.utils.list_to_tree import list_to_route_v5
-from common.fu_cache import MenuCacheManager, CacheManager, CacheKeyPrefix
+from common.utils.tree_path import load_parent_map, is_descendant_in_parent_map
+from common.fu_cache import MenuCacheManager, CacheManager, CacheKeyPrefix, CacheStrategy, cache_response
 from core.menu.menu_model import Menu
+from core.search.search_service import SearchService
 
 logger = logging.getLogger(__name__)
 from core.menu.menu_schema import (
@@ -74,6 +77,169 @@ def create_menu(request, data: MenuSchemaIn):
     return query_set
 
 
+@router.get("/menu/list", response=List[MenuSchemaOut], summary="获取菜单列表（分页）")
+@paginate(MyPagination)
+def list_menu(request, filters: MenuFilters = Query(...)):
+    """
+    获取菜单列表（分页）
+    
+    改进点：
+    - 支持多种过滤条件
+    - 预加载关联数据
+    """
+    from common.fu_crud import retrieve
+    query_set = retrieve(request, Menu, filters)
+    query_set = _annotate_child_count(query_set.select_related('parent'))
+    return query_set
+
+
+@router.get("/menu/all", response=List[MenuSchemaSimple], summary="获取所有菜单（简化版）")
+def list_all_menu(request):
+    """
+    获取所有菜单（不分页，简化版）
+    
+    用于菜单选择器等场景
+    """
+    menus = list(Menu.objects.all().order_by('order'))
+    
+    # 在内存中计算层级，不逐级查询父菜单
+    parent_map = {str(menu.id): str(menu.parent_id) if menu.parent_id else None for menu in menus}
+    for menu in menus:
+        level = 0
+        current = parent_map.get(str(menu.id))
+        while current and level < len(parent_map):
+            level += 1
+            current = parent_map.get(current)
+        menu.level = level
+    return menus
+
+
+@router.get("/menu/search", response=List[dict], summary="搜索菜单")
+def search_menu(request, keyword: str):
+    """
+    搜索菜单（模糊匹配菜单名称或标题）
+    
+    改进点：
+    - 支持名称和标题搜索
+    - 返回匹配菜单及其完整的层级路径
+    """
+    if not keyword:
+        return []
+    
+    # 搜索菜单
+    matched_menus = SearchService.filter_queryset(Menu.objects.all(), 'menu', keyword)
+    
+    # 收集所有需要的菜单ID（包括匹配菜单和其所有祖先）
+    menu_ids_to_include = set()
+    
+    for menu in matched_menus:
+        menu_ids_to_include.add(str(menu.id))
+        # 添加所有祖先
+        for ancestor in menu.get_ancestors():
+            menu_ids_to_include.add(str(ancestor.id))
+    
+    # 获取所有需要的菜单
+    all_menus = Menu.objects.filter(id__in=menu_ids_to_include)
+    
+    # 构建菜单字典
+    menu_dict_map = {}
+    for menu in all_menus:
+        menu_dict = {
+            'id': str(menu.id),
+            'name': menu.name,
+            'title': menu.title,
+            'path': menu.path,
+            'type': menu.type,
+            'icon': menu.icon,
+            'order': menu.order,
+            'level': menu.get_level(),
+            'parent_id': str(menu.parent_id) if menu.parent_id else None,
+            'child_count': Menu.objects.filter(
+                parent_id=menu.id,
+                id__in=menu_ids_to_include
+            ).count(),
+        }
+        menu_dict_map[str(menu.id)] = menu_dict
+    
+    # 构建树形结构
+    roots = []
+    for menu_id, menu in menu_dict_map.items():
+        parent_id = menu['parent_id']
+        if parent_id is None:
+            roots.append(menu)
+        elif parent_id in menu_dict_map:
+            parent = menu_dict_map[parent_id]
+            if 'children' not in parent:
+                parent['children'] = []
+            parent['children'].append(menu)
+    
+    return roots
+
+
+@router.get("/menu/stats", response=MenuStatsOut, summary="获取菜单统计信息")
+def get_menu_stats(request):
+    """
+    获取菜单统计信息
+    
+    改进点：
+    - 提供全局统计数据
+    """
+    total_count = Menu.objects.count()
+    
+    # 按类型统计
+    type_stats = {}
+    type_choices = [
+        ('catalog', '目录'),
+        ('menu', '菜单'),
+        ('external', '外部链接'),
+    ]
+    for type_code, type_name in type_choices:
+        count = Menu.objects.filter(type=type_code).count()
+        type_stats[type_name] = count
+    
+    # 计算最大层级
+    max_level = 0
+    for menu in Menu.objects.all():
+        level = menu.get_level()
+        if level > max_level:
+            max_level = level
+    
+    return MenuStatsOut(
+        total_count=total_count,
+        type_stats=type_stats,
+        max_level=max_level,
+    )
+
+
+@router.post("/menu/move", summary="移动菜单")
+def move_menu(request, menu_id: str, new_parent_id: str = None):
+    """
+    移动菜单到新的父菜单下
+    
+    改进点：
+    - 支持移动到根节点
+    - 自动更新层级（层级由父菜单实时计算，子菜单无需改写）
+    """
+    menu = get_object_or_404(Menu, id=menu_id)
+    
+    # 检查新父菜单
+    if new_parent_id and new_parent_id != "null":
+        new_parent = get_object_or_404(Menu, id=new_parent_id)
+        
+        # 防止循环引用（一次查询加载父子映射，在内存中判断）
+        if is_descendant_in_parent_map(load_parent_map(Menu), new_parent.id, menu.id):
+            raise HttpError(400, "不能移动到自己或子菜单下")
+        
+        menu.parent = new_parent
+    else:
+        menu.parent = None
+    
+    menu.save()
+    remove_menu_cache()
+    
+    return response_success("移动成功")
+
+
 @router.delete("/menu/{menu_id}", response=MenuSchemaOut, summary="删除菜单")
 def delete_menu(request, menu_id: str):
     """
@@ -223,38 +389,125 @@ def patch_menu(request, menu_id: str, data: MenuSchemaPatch):
 
 
 @router.get("/menu/get/tree", response=List[dict], summary="获取菜单树（有缓存）")
+@cache_response('menu', List[dict], timeout=CacheStrategy.MENU_CACHE)
 def list_menu_tree(request):
     """
     获取菜单树形结构
     
     改进点：
-    - 支持缓存（1小时）
-    - 添加子菜单数量
-    - 使用统一的缓存管理器
+    - 缓存序列化后的响应（1小时，支持 ETag / 304）
+    - 添加子菜单数量（同一条查询中计算）
     """
-    # 尝试从缓存获取
-    cached_tree = MenuCacheManager.get_menu_tree()
-    if cached_tree is not None:
-        logger.debug("从缓存返回菜单树")
-        return cached_tree
-    
     # 从数据库查询
     from common.fu_crud import retrieve
-    menu_list = list(retrieve(request, Menu, MenuFilters()).values())
-    
-    # 为每个菜单添加额外信息
-    for menu in menu_list:
-        menu_obj = Menu.objects.get(id=menu['id'])
-        menu['child_count'] = menu_obj.get_child_count()
+    menu_list = list(_annotate_child_count(retrieve(request, Menu, MenuFilters())).values())
     
     # 转换为树形结构
-    menu_tree = list_to_route_v5(menu_list)
+    return list_to_route_v5(menu_list)
+
+
+def _annotate_child_count(queryset):
+    """在同一条查询中附加直接子菜单数量"""
+    child_count = Menu.objects.filter(
+        parent_id=OuterRef('pk')
+    ).order_by().values('parent_id').annotate(c=Count('id')).values('c')
+    return queryset.annotate(
+        child_count=Coalesce(Subquery(child_count, output_field=IntegerField()), 0)
+    )
+
+
+def _menu_tree_node(menu, level: int) -> dict:
+    """将已附加计数的菜单转换为懒加载树节点"""
+    return {
+        'id': str(menu.id),
+        'name': menu.name,
+        'title': menu.title,
+        'path': menu.path,
+        'type': menu.type,
+        'icon': menu.icon,
+        'order': menu.order,
+        'level': level,
+        'parent_id': str(menu.parent_id) if menu.parent_id else None,
+        'child_count': menu.child_count,
+        'has_children': menu.child_count > 0,
+    }
+
+
+@router.get("/menu/get/tree/lazy", response=List[dict], summary="懒加载菜单树（按层级）")
+def list_menu_tree_lazy(
+        request,
+        parent_id: str = Query(None),
+        depth: int = Query(1, ge=1, le=10),
+):
+    """
+    从指定菜单开始返回 depth 层菜单树
+    
+    - parent_id 为空时从根菜单开始
+    - 菜单没有物化路径，按层查询（每层一条查询，子菜单数量在同一条查询中计算）
+    - 只继续展开 has_children 为真的节点
+    """
+    if parent_id == "null":
+        parent_id = None
     
-    # 缓存结果
-    MenuCacheManager.set_menu_tree(menu_tree)
-    logger.debug(f"菜单树已缓存（共 {len(menu_list)} 个菜单）")
+    base_level = 0
+    if parent_id:
+        parent = get_object_or_404(Menu, id=parent_id)
+        base_level = parent.get_level() + 1
     
-    return menu_tree
+    roots = []
+    frontier = {}
+    for offset in range(depth):
+        if offset == 0:
+            query_set = Menu.objects.filter(parent_id=parent_id)
+        else:
+            query_set = Menu.objects.filter(parent_id__in=list(frontier.keys()))
+        
+        next_frontier = {}
+        for menu in _annotate_child_count(query_set):
+            node = _menu_tree_node(menu, base_level + offset)
+            if offset == 0:
+                roots.append(node)
+            else:
+                frontier[node['parent_id']].setdefault('children', []).append(node)
+            if node['has_children']:
+                next_frontier[node['id']] = node
+        
+        frontier = next_frontier
+        if not frontier:
+            break
+    
+    return roots
+
+
+@router.get("/menu/get/tree/expand", response=dict, summary="批量展开菜单节点")
+def expand_menu_tree(request, ids: str):
+    """
+    批量获取多个菜单的直接子菜单
+    
+    返回格式：{菜单ID: [子菜单节点, ...]}
+    """
+    menu_ids = [id.strip() for id in ids.split(',') if id.strip()]
+    result = {menu_id: [] for menu_id in menu_ids}
+    if not menu_ids:
+        return result
+    
+    # 一次加载父子映射，在内存中计算层级
+    parent_map = load_parent_map(Menu)
+    
+    def get_level(menu_id):
+        level = 0
+        current = parent_map.get(menu_id)
+        while current and level < len(parent_map):
+            level += 1
+            current = parent_map.get(current)
+        return level
+    
+    query_set = _annotate_child_count(Menu.objects.filter(parent_id__in=menu_ids))
+    for menu in query_set:
+        node = _menu_tree_node(menu, get_level(str(menu.id)))
+        result.setdefault(node['parent_id'], []).append(node)
+    
+    return result
 
 
 @router.get("/menu/route/tree", response=List[dict], summary="获取用户路由树（有缓存）")
@@ -306,33 +559,6 @@ def route_menu_tree(request):
     return menu_tree
 
 
-@router.get("/menu/list", response=List[MenuSchemaOut], summary="获取菜单列表（分页）")
-@paginate(MyPagination)
-def list_menu(request, filters: MenuFilters = Query(...)):
-    """
-    获取菜单列表（分页）
-    
-    改进点：
-    - 支持多种过滤条件
-    - 预加载关联数据
-    """
-    from common.fu_crud import retrieve
-    query_set = retrieve(request, Menu, filters)
-    query_set = query_set.select_related('parent')
-    return query_set
-
-
-@router.get("/menu/all", response=List[MenuSchemaSimple], summary="获取所有菜单（简化版）")
-def list_all_menu(request):
-    """
-    获取所有菜单（不分页，简化版）
-    
-    用于菜单选择器等场景
-    """
-    query_set = Menu.objects.all().order_by('order')
-    return query_set
-
-
 @router.get("/menu/{menu_id}", response=MenuSchemaOut, summary="获取菜单详情")
 def get_menu(request, menu_id: str):
     """获取单个菜单的详细信息"""
@@ -376,70 +602,6 @@ def get_menu_by_parent(request, parent_id: str):
     return result
 
 
-@router.get("/menu/search", response=List[dict], summary="搜索菜单")
-def search_menu(request, keyword: str):
-    """
-    搜索菜单（模糊匹配菜单名称或标题）
-    
-    改进点：
-    - 支持名称和标题搜索
-    - 返回匹配菜单及其完整的层级路径
-    """
-    if not keyword:
-        return []
-    
-    # 搜索菜单
-    matched_menus = Menu.objects.filter(
-        Q(name__icontains=keyword) | Q(title__icontains=keyword)
-    )
-    
-    # 收集所有需要的菜单ID（包括匹配菜单和其所有祖先）
-    menu_ids_to_include = set()
-    
-    for menu in matched_menus:
-        menu_ids_to_include.add(str(menu.id))
-        # 添加所有祖先
-        for ancestor in menu.get_ancestors():
-            menu_ids_to_include.add(str(ancestor.id))
-    
-    # 获取所有需要的菜单
-    all_menus = Menu.objects.filter(id__in=menu_ids_to_include)
-    
-    # 构建菜单字典
-    menu_dict_map = {}
-    for menu in all_menus:
-        menu_dict = {
-            'id': str(menu.id),
-            'name': menu.name,
-            'title': menu.title,
-            'path': menu.path,
-            'type': menu.type,
-            'icon': menu.icon,
-            'order': menu.order,
-            'level': menu.get_level(),
-            'parent_id': str(menu.parent_id) if menu.parent_id else None,
-            'child_count': Menu.objects.filter(
-                parent_id=menu.id,
-                id__in=menu_ids_to_include
-            ).count(),
-        }
-        menu_dict_map[str(menu.id)] = menu_dict
-    
-    # 构建树形结构
-    roots = []
-    for menu_id, menu in menu_dict_map.items():
-        parent_id = menu['parent_id']
-        if parent_id is None:
-            roots.append(menu)
-        elif parent_id in menu_dict_map:
-            parent = menu_dict_map[parent_id]
-            if 'children' not in parent:
-                parent['children'] = []
-            parent['children'].append(menu)
-    
-    return roots
-
-
 @router.get("/menu/path/{menu_id}", response=MenuPathOut, summary="获取菜单路径")
 def get_menu_path(request, menu_id: str):
     """
@@ -481,41 +643,6 @@ def get_menu_path(request, menu_id: str):
     )
 
 
-@router.get("/menu/stats", response=MenuStatsOut, summary="获取菜单统计信息")
-def get_menu_stats(request):
-    """
-    获取菜单统计信息
-    
-    改进点：
-    - 提供全局统计数据
-    """
-    total_count = Menu.objects.count()
-    
-    # 按类型统计
-    type_stats = {}
-    type_choices = [
-        ('catalog', '目录'),
-        ('menu', '菜单'),
-        ('external', '外部链接'),
-    ]
-    for type_code, type_name in type_choices:
-        count = Menu.objects.filter(type=type_code).count()
-        type_stats[type_name] = count
-    
-    # 计算最大层级
-    max_level = 0
-    for menu in Menu.objects.all():
-        level = menu.get_level()
-        if level > max_level:
-            max_level = level
-    
-    return MenuStatsOut(
-        total_count=total_count,
-        type_stats=type_stats,
-        max_level=max_level,
-    )
-
-
 @router.post("/menu/check/name", response=MenuCheckOut, summary="检查菜单名称是否存在")
 def check_menu_name(request, data: MenuCheckNameIn):
     """
@@ -556,33 +683,4 @@ def check_menu_path(request, data: MenuCheckPathIn):
     )
 
 
-@router.post("/menu/move", summary="移动菜单")
-def move_menu(request, menu_id: str, new_parent_id: str = None):
-    """
-    移动菜单到新的父菜单下
-    
-    改进点：
-    - 支持移动到根节点
-    - 自动更新层级
-    """
-    menu = get_object_or_404(Menu, id=menu_id)
-    
-    # 检查新父菜单
-    if new_parent_id and new_parent_id != "null":
-        new_parent = get_object_or_404(Menu, id=new_parent_id)
-        
-        # 防止循环引用
-        if menu in new_parent.get_ancestors() or menu.id == new_parent.id:
-            raise HttpError(400, "不能移动到自己或子菜单下")
-        
-        menu.parent = new_parent
-    else:
-        menu.parent = None
-    
-    menu.save()
-    remove_menu_cache()
-    
-    return response_success("移动成功")
-
-
 
@@ -141,7 +141,9 @@ class MenuSchemaOut(ModelSchema):
     
     @staticmethod
     def resolve_child_count(obj):
-        """解析子菜单数量"""
+        """解析子菜单数量（列表查询已 annotate 时直接使用）"""
+        if hasattr(obj, 'child_count'):
+            return obj.child_count
         return obj.get_child_count()
     
     @staticmethod
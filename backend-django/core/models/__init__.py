@@ -7,11 +7,13 @@
 from core.permission.permission_model import Permission
 from core.user.user_model import User
 from core.role.role_model import Role
-from core.dept.dept_model import Dept
+from core.dept.dept_model import Dept, DeptClosure
 from core.post.post_model import Post
 from core.menu.menu_model import Menu
 from core.dict.dict_model import Dict
 from core.dict_item.dict_item_model import DictItem
+from core.operation_log.operation_log_model import OperationLog
+from core.search.search_model import SearchDocument, SearchGram
 
 
 
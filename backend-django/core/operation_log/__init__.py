@@ -0,0 +1,6 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+操作日志模块 - Operation Log Module
+由 ApiLoggingMiddleware 记录接口访问日志
+"""
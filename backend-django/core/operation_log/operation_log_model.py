@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+操作日志模型 - Operation Log Model
+记录 API 访问日志（由 common.middleware.ApiLoggingMiddleware 经缓冲区批量写入）
+"""
+from django.db import models
+from common.fu_model import RootModel
+
+
+class OperationLog(RootModel):
+    """
+    操作日志模型
+
+    每个请求只生成一条记录，写入由后台线程批量完成，不阻塞请求。
+    """
+
+    request_modular = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="请求模块",
+    )
+
+    request_path = models.CharField(
+        max_length=400,
+        null=True,
+        blank=True,
+        help_text="请求地址",
+        db_index=True,
+    )
+
+    request_body = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="请求参数",
+    )
+
+    request_method = models.CharField(
+        max_length=8,
+        null=True,
+        blank=True,
+        help_text="请求方式",
+    )
+
+    request_msg = models.TextField(
+        null=True,
+        blank=True,
+        help_text="操作说明",
+    )
+
+    request_ip = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="请求IP地址",
+        db_index=True,
+    )
+
+    request_username = models.CharField(
+        max_length=150,
+        null=True,
+        blank=True,
+        help_text="请求用户名",
+        db_index=True,
+    )
+
+    request_browser = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="请求浏览器",
+    )
+
+    request_os = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="操作系统",
+    )
+
+    response_code = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="响应状态码",
+    )
+
+    json_result = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="返回信息",
+    )
+
+    status = models.BooleanField(
+        default=False,
+        help_text="响应状态",
+    )
+
+    duration = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="请求耗时（毫秒）",
+    )
+
+    class Meta:
+        db_table = "core_operation_log"
+        ordering = ("-sys_create_datetime",)
+        verbose_name = "操作日志"
+        verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=['sys_creator', 'sys_create_datetime']),
+            models.Index(fields=['request_path', 'sys_create_datetime']),
+        ]
+
+    def __str__(self):
+        return f"{self.request_username} - {self.request_method} {self.request_path}"
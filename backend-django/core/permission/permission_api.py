@@ -5,20 +5,27 @@ Permission API - 权限管理接口
 提供权限的 CRUD 操作和高级功能
 集成缓存机制，优化权限查询性能
 """
+from datetime import datetime
 from typing import List
 import logging
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Prefetch
+from django.db.models import Prefetch
 from ninja import Router, Query
 from ninja.errors import HttpError
 from ninja.pagination import paginate
 
-from common.fu_crud import create, delete, update, retrieve, batch_delete
+from common.fu_crud import (
+    create, delete, update, retrieve, batch_delete, batch_update, import_data, get_import_file_path, ImportSchema,
+)
+from common.fu_job import AsyncJobManager
 from common.fu_pagination import MyPagination
 from common.fu_schema import response_success
-from common.fu_cache import PermissionCacheManager, CacheManager, CacheKeyPrefix
+from common.fu_cache import PermissionCacheManager, CacheManager, CacheKeyPrefix, CacheStrategy, cache_response
+from common.utils.export_utils import choices_formatter, streaming_export_response
+from core.async_job.async_job_schema import AsyncJobSchemaOut
 from core.permission.permission_model import Permission
 from core.permission.permission_service import PermissionGenerator
+from core.search.search_service import SearchService
 
 logger = logging.getLogger(__name__)
 from core.permission.permission_schema import (
@@ -67,6 +74,150 @@ def create_permission(request, data: PermissionSchemaIn):
     return query_set
 
 
+@router.get("/permission/export", summary="导出权限数据")
+def export_permission(request, filters: PermissionFilters = Query(...), file_format: str = Query('xlsx')):
+    """
+    导出权限数据为 Excel / CSV
+    
+    改进点：
+    - 支持与列表相同的过滤条件
+    - 流式输出，导出大量数据时内存占用恒定
+    """
+    export_fields = [
+        "name", "code", "menu__name", "permission_type", "api_path", "http_method", "description", "is_active",
+    ]
+    formatters = {
+        "permission_type": choices_formatter(Permission.PERMISSION_TYPE_CHOICES),
+        "http_method": choices_formatter(Permission.HTTP_METHOD_CHOICES),
+    }
+    query_set = retrieve(request, Permission, filters).order_by('sort', '-sys_create_datetime')
+    try:
+        return streaming_export_response(
+            query_set,
+            export_fields,
+            filename=f"权限数据_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            file_format=file_format,
+            formatters=formatters,
+        )
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+
+PERMISSION_IMPORT_FIELDS = ["name", "code", "menu", "permission_type", "api_path", "http_method", "description",
+                            "is_active"]
+
+
+def _permission_import_options() -> dict:
+    """权限导入参数：以权限编码为自然键，菜单按名称匹配"""
+    from core.menu.menu_model import Menu
+    
+    menu_map = {name: menu_id for menu_id, name in Menu.objects.values_list('id', 'name')}
+    return {
+        "unique_field": "code",
+        "value_maps": {"menu_id": menu_map},
+        "header_aliases": {"菜单名称": "menu"},
+    }
+
+
+def _after_permission_import(result: dict) -> None:
+    """有数据写入时清除权限缓存"""
+    if result["created"] or result["updated"]:
+        PermissionCacheManager.invalidate_permission_cache()
+
+
+@router.post("/permission/import", summary="导入权限")
+def import_permission(request, data: ImportSchema, upsert: bool = Query(False)):
+    """
+    批量导入权限
+    
+    从Excel文件导入权限数据
+    
+    改进点：
+    - 分批校验、分批写入（每批一个事务）
+    - 以权限编码为自然键，upsert=true 时更新已存在的权限
+    - 菜单按名称匹配，返回逐行错误报告
+    """
+    try:
+        result = import_data(
+            request,
+            Permission,
+            PermissionSchemaIn,
+            data,
+            PERMISSION_IMPORT_FIELDS,
+            upsert=upsert,
+            **_permission_import_options(),
+        )
+    except (ValueError, FileNotFoundError) as e:
+        raise HttpError(400, str(e))
+    
+    _after_permission_import(result)
+    return result
+
+
+@router.post("/permission/import/async", response=AsyncJobSchemaOut, summary="后台导入权限")
+def import_permission_async(request, data: ImportSchema, upsert: bool = Query(False)):
+    """
+    提交后台导入任务
+    
+    导入规则与 /permission/import 相同，完成后清除权限缓存；
+    通过 /async-job/{job_id} 或通知 WebSocket 获取进度和导入报告
+    """
+    try:
+        return AsyncJobManager.submit_import(
+            request,
+            Permission,
+            PermissionSchemaIn,
+            get_import_file_path(data.path),
+            PERMISSION_IMPORT_FIELDS,
+            title="导入权限",
+            upsert=upsert,
+            options=_permission_import_options,
+            on_success=_after_permission_import,
+        )
+    except FileNotFoundError as e:
+        raise HttpError(400, str(e))
+
+
+@router.get("/permission/all", response=List[PermissionSchemaOut], summary="获取所有权限（有缓存）")
+@cache_response('permission', List[PermissionSchemaOut], timeout=CacheStrategy.DATA_CACHE_MEDIUM)
+def list_all_permission(request):
+    """
+    获取所有权限（不分页，有缓存）
+    
+    用于权限选择器等场景
+    缓存序列化后的响应 30 分钟（支持 ETag / 304），权限或菜单变更时失效
+    """
+    return list(Permission.objects.filter(is_active=True).select_related('menu'))
+
+
+@router.get("/permission/search", response=List[PermissionSchemaOut], summary="搜索权限")
+@paginate(MyPagination)
+def search_permission(request, keyword: str = Query(None)):
+    """
+    搜索权限
+    
+    改进点：
+    - 支持关键词搜索（名称、编码、描述）
+    """
+    query_set = Permission.objects.all()
+    
+    query_set = SearchService.filter_queryset(query_set, 'permission', keyword)
+    
+    query_set = query_set.select_related('menu').order_by('sort', '-sys_create_datetime')
+    return query_set
+
+
+@router.get("/permission/export-template", summary="导出权限模板")
+def export_permission_template(request):
+    """
+    导出权限Excel模板
+    
+    用于批量导入权限
+    """
+    # TODO: 实现导出功能
+    return response_success("导出模板功能待实现")
+
+
 @router.delete("/permission/{permission_id}", response=PermissionSchemaOut, summary="删除权限")
 def delete_permission(request, permission_id: str):
     """
@@ -182,7 +333,7 @@ def patch_permission(request, permission_id: str, data: PermissionSchemaPatch):
 
 
 @router.get("/permission", response=List[PermissionSchemaOut], summary="获取权限列表（分页）")
-@paginate(MyPagination)
+@paginate(MyPagination, projection=PermissionSchemaOut)
 def list_permission(request, filters: PermissionFilters = Query(...)):
     """
     获取权限列表（分页）
@@ -196,30 +347,6 @@ def list_permission(request, filters: PermissionFilters = Query(...)):
     return query_set
 
 
-@router.get("/permission/all", response=List[PermissionSchemaOut], summary="获取所有权限（有缓存）")
-def list_all_permission(request):
-    """
-    获取所有权限（不分页，有缓存）
-    
-    用于权限选择器等场景
-    缓存时间: 30分钟（权限变更不频繁）
-    """
-    # 尝试从缓存获取
-    cached_permissions = PermissionCacheManager.get_all_permissions()
-    if cached_permissions is not None:
-        logger.debug("从缓存返回所有权限")
-        return cached_permissions
-    
-    # 从数据库查询
-    query_set = list(Permission.objects.filter(is_active=True).select_related('menu'))
-    
-    # 缓存结果
-    PermissionCacheManager.set_all_permissions(query_set)
-    logger.debug(f"权限列表已缓存: {len(query_set)} 个权限")
-    
-    return query_set
-
-
 @router.get("/permission/{permission_id}", response=PermissionSchemaDetail, summary="获取权限详情")
 def get_permission(request, permission_id: str):
     """获取单个权限的详细信息"""
@@ -272,52 +399,16 @@ def batch_update_permission_status(request, data: PermissionBatchUpdateStatusIn)
     改进点：
     - 支持批量状态管理
     """
-    count = Permission.objects.filter(id__in=data.ids).update(is_active=data.is_active)
-    return PermissionBatchUpdateStatusOut(count=count)
-
-
-@router.get("/permission/search", response=List[PermissionSchemaOut], summary="搜索权限")
-@paginate(MyPagination)
-def search_permission(request, keyword: str = Query(None)):
-    """
-    搜索权限
-    
-    改进点：
-    - 支持关键词搜索（名称、编码、描述）
-    """
-    query_set = Permission.objects.all()
-    
-    if keyword:
-        query_set = query_set.filter(
-            Q(name__icontains=keyword) |
-            Q(code__icontains=keyword) |
-            Q(description__icontains=keyword)
-        )
-    
-    query_set = query_set.select_related('menu').order_by('sort', '-sys_create_datetime')
-    return query_set
-
-
-@router.get("/permission/export-template", summary="导出权限模板")
-def export_permission_template(request):
-    """
-    导出权限Excel模板
-    
-    用于批量导入权限
-    """
-    # TODO: 实现导出功能
-    return response_success("导出模板功能待实现")
-
-
-@router.post("/permission/import", summary="导入权限")
-def import_permission(request):
-    """
-    批量导入权限
+    # 启用状态影响角色配置界面的权限树，有数据变更时清除一次缓存
+    count = batch_update(
+        request,
+        Permission,
+        data.ids,
+        {"is_active": data.is_active},
+        on_updated=lambda _: PermissionCacheManager.invalidate_permission_cache(),
+    )
     
-    从Excel文件导入权限数据
-    """
-    # TODO: 实现导入功能
-    return response_success("导入功能待实现")
+    return PermissionBatchUpdateStatusOut(count=count)
 
 
 @router.get("/permission/all/routes", summary="获取所有可用的 API 路由")
@@ -4,17 +4,24 @@
 Post API - 岗位管理接口
 提供岗位的 CRUD 操作和用户管理
 """
+from datetime import datetime
 from typing import List
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db.models import Count, Q
 from ninja import Router, Query
 from ninja.errors import HttpError
 from ninja.pagination import paginate
 
-from common.fu_crud import create, retrieve, delete, update, batch_delete, export_data, import_data, ImportSchema
+from common.fu_crud import (
+    create, retrieve, delete, update, batch_delete, batch_update, export_data, import_data, ImportSchema,
+)
+from common.fu_cache import ResponseCacheManager, cache_response
+from common.fu_job import AsyncJobManager
 from common.fu_pagination import MyPagination
 from common.fu_schema import response_success
+from core.async_job.async_job_schema import AsyncJobSchemaOut
 from core.post.post_model import Post
+from core.search.search_service import SearchService
 from core.post.post_schema import (
     PostSchemaOut,
     PostSchemaIn,
@@ -33,6 +40,8 @@ from core.post.post_schema import (
 
 router = Router()
 
+POST_EXPORT_FIELDS = ["name", "code", "post_type", "post_level", "status", "sort"]
+
 
 @router.post("/post", response=PostSchemaOut, summary="创建岗位")
 def create_post(request, data: PostSchemaIn):
@@ -51,6 +60,130 @@ def create_post(request, data: PostSchemaIn):
     return query_set
 
 
+@router.get("/post/export", summary="导出岗位数据")
+def export_post(request, filters: PostFilters = Query(...), file_format: str = Query('xlsx')):
+    """
+    导出岗位数据为 Excel / CSV
+    
+    用于数据备份和报表
+    
+    改进点：
+    - 支持与列表相同的过滤条件
+    - 流式输出，导出大量数据时内存占用恒定
+    """
+    query_set = retrieve(request, Post, filters).order_by('sort')
+    try:
+        return export_data(request, Post, PostSchemaOut, POST_EXPORT_FIELDS, queryset=query_set,
+                           file_format=file_format)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+
+@router.post("/post/export/async", response=AsyncJobSchemaOut, summary="后台导出岗位数据")
+def export_post_async(request, filters: PostFilters = Query(...), file_format: str = Query('xlsx')):
+    """
+    提交后台导出任务
+    
+    立即返回任务ID，通过 /async-job/{job_id} 或通知 WebSocket 获取进度，完成后文件保存在文件管理中
+    """
+    query_set = retrieve(request, Post, filters).order_by('sort')
+    try:
+        return AsyncJobManager.submit_export(
+            request,
+            query_set,
+            POST_EXPORT_FIELDS,
+            filename=f"岗位数据_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            file_format=file_format,
+        )
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+
+@router.post("/post/import", summary="导入岗位数据")
+def import_post(request, data: ImportSchema, upsert: bool = Query(False)):
+    """
+    批量导入岗位数据
+    
+    从Excel文件导入岗位数据
+    
+    改进点：
+    - 分批校验、分批写入（每批一个事务）
+    - 以岗位编码为自然键，upsert=true 时更新已存在的岗位
+    - 返回逐行错误报告，单行出错不影响其他行
+    """
+    import_fields = ["name", "code", "post_type", "post_level", "status", "sort"]
+    try:
+        result = import_data(request, Post, PostSchemaIn, data, import_fields, unique_field="code", upsert=upsert)
+    except (ValueError, FileNotFoundError) as e:
+        raise HttpError(400, str(e))
+    # 批量写入不触发模型信号，需要手动使岗位列表缓存失效
+    ResponseCacheManager.invalidate('post')
+    return result
+
+
+@router.get("/post/all", response=List[PostSchemaSimple], summary="获取所有岗位（简化版）")
+@cache_response('post', List[PostSchemaSimple])
+def list_all_post(request):
+    """
+    获取所有启用的岗位（不分页，简化版）
+    
+    用于岗位选择器等场景
+    """
+    query_set = Post.objects.filter(status=True).order_by('post_level', 'name')
+    return query_set
+
+
+@router.get("/post/search", response=List[PostSchemaOut], summary="搜索岗位")
+@paginate(MyPagination)
+def search_post(request, keyword: str = Query(None)):
+    """
+    搜索岗位
+    
+    改进点：
+    - 支持关键词搜索（名称、编码、描述）
+    """
+    query_set = Post.objects.all()
+    
+    query_set = SearchService.filter_queryset(query_set, 'post', keyword)
+    
+    query_set = query_set.select_related('dept').annotate(
+        user_count=Count('core_users')
+    ).order_by('-sys_create_datetime')
+    return query_set
+
+
+@router.get("/post/stats", response=PostStatsOut, summary="获取岗位统计信息")
+def get_post_stats(request):
+    """
+    获取岗位统计信息
+    
+    改进点：
+    - 提供全局统计数据
+    """
+    total_count = Post.objects.count()
+    active_count = Post.objects.filter(status=True).count()
+    
+    # 按类型统计
+    type_stats = {}
+    for type_code, type_name in Post.POST_TYPE_CHOICES:
+        count = Post.objects.filter(post_type=type_code).count()
+        type_stats[type_name] = count
+    
+    # 按级别统计
+    level_stats = {}
+    for level_code, level_name in Post.POST_LEVEL_CHOICES:
+        count = Post.objects.filter(post_level=level_code).count()
+        level_stats[level_name] = count
+    
+    return PostStatsOut(
+        total_count=total_count,
+        active_count=active_count,
+        inactive_count=total_count - active_count,
+        type_stats=type_stats,
+        level_stats=level_stats,
+    )
+
+
 @router.delete("/post/{post_id}", response=PostSchemaOut, summary="删除岗位")
 def delete_post(request, post_id: str):
     """
@@ -146,7 +279,7 @@ def patch_post(request, post_id: str, data: PostSchemaPatch):
 
 
 @router.get("/post", response=List[PostSchemaOut], summary="获取岗位列表（分页）")
-@paginate(MyPagination)
+@paginate(MyPagination, projection=PostSchemaOut)
 def list_post(request, filters: PostFilters = Query(...)):
     """
     获取岗位列表（分页）
@@ -156,18 +289,7 @@ def list_post(request, filters: PostFilters = Query(...)):
     - 预加载关联数据
     """
     query_set = retrieve(request, Post, filters)
-    query_set = query_set.select_related('dept')
-    return query_set
-
-
-@router.get("/post/all", response=List[PostSchemaSimple], summary="获取所有岗位（简化版）")
-def list_all_post(request):
-    """
-    获取所有启用的岗位（不分页，简化版）
-    
-    用于岗位选择器等场景
-    """
-    query_set = Post.objects.filter(status=True).order_by('post_level', 'name')
+    query_set = query_set.select_related('dept').annotate(user_count=Count('core_users'))
     return query_set
 
 
@@ -218,28 +340,6 @@ def get_posts_by_dept(request, dept_id: str):
     return posts
 
 
-@router.get("/post/search", response=List[PostSchemaOut], summary="搜索岗位")
-@paginate(MyPagination)
-def search_post(request, keyword: str = Query(None)):
-    """
-    搜索岗位
-    
-    改进点：
-    - 支持关键词搜索（名称、编码、描述）
-    """
-    query_set = Post.objects.all()
-    
-    if keyword:
-        query_set = query_set.filter(
-            Q(name__icontains=keyword) |
-            Q(code__icontains=keyword) |
-            Q(description__icontains=keyword)
-        )
-    
-    query_set = query_set.select_related('dept').order_by('-sys_create_datetime')
-    return query_set
-
-
 @router.post("/post/batch/update-status", response=PostBatchUpdateStatusOut, summary="批量更新岗位状态")
 def batch_update_post_status(request, data: PostBatchUpdateStatusIn):
     """
@@ -248,12 +348,15 @@ def batch_update_post_status(request, data: PostBatchUpdateStatusIn):
     改进点：
     - 支持批量状态管理
     """
-    count = Post.objects.filter(id__in=data.ids).update(status=data.status)
+    count = batch_update(
+        request, Post, data.ids, {"status": data.status},
+        on_updated=lambda _: ResponseCacheManager.invalidate('post'),
+    )
     return PostBatchUpdateStatusOut(count=count)
 
 
 @router.get("/post/users/by/post_id", response=List[PostUserSchema], summary="获取岗位的用户列表")
-@paginate(MyPagination)
+@paginate(MyPagination, projection=PostUserSchema, projection_extra=('dept__name',))
 def get_users_by_post(request, filters: PostUserFilter = Query(...)):
     """
     获取指定岗位下的所有用户列表
@@ -337,60 +440,6 @@ def add_user_to_post(request, data: PostUserIn):
     return response_success(f"成功添加 {added_count} 个用户")
 
 
-@router.get("/post/stats", response=PostStatsOut, summary="获取岗位统计信息")
-def get_post_stats(request):
-    """
-    获取岗位统计信息
-    
-    改进点：
-    - 提供全局统计数据
-    """
-    total_count = Post.objects.count()
-    active_count = Post.objects.filter(status=True).count()
-    
-    # 按类型统计
-    type_stats = {}
-    for type_code, type_name in Post.POST_TYPE_CHOICES:
-        count = Post.objects.filter(post_type=type_code).count()
-        type_stats[type_name] = count
-    
-    # 按级别统计
-    level_stats = {}
-    for level_code, level_name in Post.POST_LEVEL_CHOICES:
-        count = Post.objects.filter(post_level=level_code).count()
-        level_stats[level_name] = count
-    
-    return PostStatsOut(
-        total_count=total_count,
-        active_count=active_count,
-        inactive_count=total_count - active_count,
-        type_stats=type_stats,
-        level_stats=level_stats,
-    )
-
-
-@router.get("/post/export", summary="导出岗位数据")
-def export_post(request):
-    """
-    导出岗位数据为Excel
-    
-    用于数据备份和报表
-    """
-    export_fields = ["name", "code", "post_type", "post_level", "status", "sort"]
-    return export_data(request, Post, PostSchemaOut, export_fields)
-
-
-@router.post("/post/import", summary="导入岗位数据")
-def import_post(request, data: ImportSchema):
-    """
-    批量导入岗位数据
-    
-    从Excel文件导入岗位数据
-    """
-    import_fields = ["name", "code", "post_type", "post_level", "sort"]
-    return import_data(request, Post, PostSchemaIn, data, import_fields)
-
-
 @router.get("/post/by/type/{post_type}", response=List[PostSchemaSimple], summary="根据类型获取岗位")
 def get_posts_by_type(request, post_type: int):
     """
@@ -129,7 +129,9 @@ class PostSchemaOut(ModelSchema):
     
     @staticmethod
     def resolve_user_count(obj):
-        """解析用户数量"""
+        """解析用户数量（列表查询已 annotate 时直接使用）"""
+        if hasattr(obj, 'user_count'):
+            return obj.user_count
         return obj.get_user_count()
 
 
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Response Cache Signals - 接口响应缓存失效
+字典、字典项、角色、岗位增删改时使对应命名空间的接口响应缓存失效
+（部门、菜单、权限在各自的缓存清除方法中处理；批量 update / bulk_create 不触发信号，需在调用处手动失效）
+"""
+from django.db.models.signals import post_delete, post_save
+
+from common.fu_cache import ResponseCacheManager
+from core.dict.dict_model import Dict
+from core.dict_item.dict_item_model import DictItem
+from core.post.post_model import Post
+from core.role.role_model import Role
+
+RESPONSE_CACHE_NAMESPACES = {
+    Dict: 'dict',
+    DictItem: 'dict',
+    Role: 'role',
+    Post: 'post',
+}
+
+
+def invalidate_response_cache(sender, raw: bool = False, **kwargs):
+    """模型变更后使接口响应缓存失效"""
+    if raw:
+        return
+    ResponseCacheManager.invalidate(RESPONSE_CACHE_NAMESPACES[sender])
+
+
+for model in RESPONSE_CACHE_NAMESPACES:
+    post_save.connect(invalidate_response_cache, sender=model, dispatch_uid=f"response_cache_save_{model.__name__}")
+    post_delete.connect(invalidate_response_cache, sender=model, dispatch_uid=f"response_cache_delete_{model.__name__}")
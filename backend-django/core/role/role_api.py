@@ -11,10 +11,13 @@ from ninja import Router, Query
 from ninja.errors import HttpError
 from ninja.pagination import paginate
 
-from common.fu_crud import create, retrieve, delete
+from common.fu_cache import ResponseCacheManager, cache_response
+from common.fu_crud import create, retrieve, delete, batch_update
 from common.fu_pagination import MyPagination
 from common.fu_schema import response_success
 from core.role.role_model import Role
+from core.role.role_service import RoleMenuPermissionService
+from core.search.search_service import SearchService
 from core.role.role_schema import (
     RoleSchemaOut,
     RoleSchemaIn,
@@ -72,6 +75,40 @@ def create_role(request, data: RoleSchemaIn):
     return role
 
 
+@router.get("/role/all", response=List[RoleSimpleOut], summary="获取所有角色（简化版）")
+@cache_response('role', List[RoleSimpleOut])
+def list_all_role(request):
+    """
+    获取所有可用角色（不分页，简化版）
+    
+    用于角色选择器等场景
+    """
+    query_set = Role.objects.filter(status=True).order_by('-priority', 'name')
+    return query_set
+
+
+@router.get("/role/search", response=List[RoleSchemaOut], summary="搜索角色")
+@paginate(MyPagination)
+def search_role(request, keyword: str = Query(None)):
+    """
+    搜索角色
+    
+    改进点：
+    - 支持关键词搜索（名称、编码、描述）
+    """
+    query_set = Role.objects.all()
+    
+    query_set = SearchService.filter_queryset(query_set, 'role', keyword)
+    
+    query_set = query_set.annotate(
+        user_count=Count('core_users', distinct=True),
+        menu_count=Count('menu', distinct=True),
+        permission_count=Count('permission', distinct=True)
+    ).prefetch_related('dept', 'menu', 'permission').order_by('-priority', '-sys_update_datetime')
+    
+    return query_set
+
+
 @router.delete("/role/{role_id}", response=RoleSchemaOut, summary="删除角色")
 def delete_role(request, role_id: str):
     """
@@ -243,23 +280,12 @@ def list_role(request, filters: RoleFilters = Query(...)):
     - 支持多种过滤条件
     """
     query_set = retrieve(request, Role, filters)
-    # 优化查询：添加统计信息
+    # 优化查询：添加统计信息，预加载多对多字段（输出包含 dept / menu / permission 的ID列表）
     query_set = query_set.annotate(
         user_count=Count('core_users', distinct=True),
         menu_count=Count('menu', distinct=True),
         permission_count=Count('permission', distinct=True)
-    )
-    return query_set
-
-
-@router.get("/role/all", response=List[RoleSimpleOut], summary="获取所有角色（简化版）")
-def list_all_role(request):
-    """
-    获取所有可用角色（不分页，简化版）
-    
-    用于角色选择器等场景
-    """
-    query_set = Role.objects.filter(status=True).order_by('-priority', 'name')
+    ).prefetch_related('dept', 'menu', 'permission')
     return query_set
 
 
@@ -303,7 +329,7 @@ def get_role(request, role_id: str):
 
 
 @router.get("/role/users/by/role_id", response=List[RoleUserSchema], summary="获取角色下的用户列表")
-@paginate(MyPagination)
+@paginate(MyPagination, projection=RoleUserSchema, projection_extra=('dept__name',))
 def get_users_by_role(request, filters: RoleUserFilter = Query(...)):
     """
     获取指定角色下的所有用户
@@ -385,38 +411,23 @@ def batch_update_role_status(request, data: RoleBatchUpdateStatusIn):
     - 支持批量状态管理
     - 系统角色不能禁用
     """
-    # 过滤掉系统角色
-    roles = Role.objects.filter(id__in=data.ids, role_type=1)
-    count = roles.update(status=data.status)
-    
-    return RoleBatchUpdateStatusOut(count=count)
-
-
-@router.get("/role/search", response=List[RoleSchemaOut], summary="搜索角色")
-@paginate(MyPagination)
-def search_role(request, keyword: str = Query(None)):
-    """
-    搜索角色
-    
-    改进点：
-    - 支持关键词搜索（名称、编码、描述）
-    """
-    query_set = Role.objects.all()
-    
-    if keyword:
-        query_set = query_set.filter(
-            Q(name__icontains=keyword) |
-            Q(code__icontains=keyword) |
-            Q(description__icontains=keyword)
-        )
+    from common.fu_cache import PermissionCacheManager
     
-    query_set = query_set.annotate(
-        user_count=Count('core_users', distinct=True),
-        menu_count=Count('menu', distinct=True),
-        permission_count=Count('permission', distinct=True)
-    ).order_by('-priority', '-sys_update_datetime')
+    def on_updated(_):
+        # 过滤掉系统角色；角色启停影响用户的有效权限，整批只递增一次全局权限版本号
+        PermissionCacheManager.invalidate_global_permissions()
+        ResponseCacheManager.invalidate('role')
+    
+    count = batch_update(
+        request,
+        Role,
+        data.ids,
+        {"status": data.status},
+        queryset=Role.objects.filter(role_type=1),
+        on_updated=on_updated,
+    )
     
-    return query_set
+    return RoleBatchUpdateStatusOut(count=count)
 
 
 @router.get("/role/menu-permission-tree/{role_id}", summary="获取角色的菜单权限树")
@@ -425,94 +436,21 @@ def get_role_menu_permission_tree(request, role_id: str):
     获取角色的菜单和权限树形结构
     
     用于角色权限配置界面
-    """
-    from core.menu.menu_model import Menu
-    from core.permission.permission_model import Permission
     
+    改进点：
+    - 与角色无关的菜单权限树骨架按版本号缓存，菜单/权限变更时自动失效
+    - 角色只需查询已选菜单/权限ID，响应时叠加 checked 标记
+    """
     role = get_object_or_404(Role, id=role_id)
     
-    # 获取所有菜单
-    all_menus = Menu.objects.all().values('id', 'name', 'title', 'parent_id')
-    
-    # 获取该角色已分配的权限ID集合
-    role_permission_ids = set(str(p.id) for p in role.permission.all())
-    role_menu_ids = set(str(m.id) for m in role.menu.all())
-    
-    # 获取所有权限，按菜单分组
-    all_permissions = Permission.objects.filter(is_active=True).values('id', 'name', 'code', 'menu_id', 'permission_type')
-    
-    # 权限类型映射
-    PERMISSION_TYPE_MAP = {
-        0: '按钮权限',
-        1: 'API权限',
-        2: '数据权限',
-        3: '其他权限',
-    }
-    
-    permissions_by_menu = {}
-    for perm in all_permissions:
-        menu_id = str(perm['menu_id'])
-        if menu_id not in permissions_by_menu:
-            permissions_by_menu[menu_id] = []
-        
-        # 获取权限类型显示名称
-        permission_type = perm.get('permission_type')
-        if permission_type is None:
-            permission_type = 3  # 默认为其他权限
-        permission_type = int(permission_type)  # 确保是整数
-        permission_type_display = PERMISSION_TYPE_MAP.get(permission_type, '其他权限')
-        
-        permissions_by_menu[menu_id].append({
-            'id': str(perm['id']),
-            'label': f"{perm['name']}",
-            'name': perm['name'],
-            'code': perm['code'],
-            'permission_type': permission_type,
-            'permission_type_display': permission_type_display,
-            'checked': str(perm['id']) in role_permission_ids,
-        })
-    
-    # 构建菜单树（包含权限）- 使用树形结构
-    menu_map = {}
-    root_menus = []
-    
-    # 第一步：创建所有菜单节点（包含权限作为 children 的一部分）
-    for menu in all_menus:
-        menu_id = str(menu['id'])
-        parent_id = str(menu['parent_id']) if menu['parent_id'] else None
-        
-        # 初始化菜单节点，children 为空，稍后填充
-        menu_node = {
-            'id': menu_id,
-            'label': menu['title'] or menu['name'],
-            'name': menu['name'],
-            'parent_id': parent_id,
-            'checked': menu_id in role_menu_ids,
-            'children': [],
-        }
-        menu_map[menu_id] = menu_node
-    
-    # 第二步：建立树形关系（子菜单作为 children）
-    for menu in all_menus:
-        menu_id = str(menu['id'])
-        parent_id = str(menu['parent_id']) if menu['parent_id'] else None
-        
-        if parent_id and parent_id in menu_map:
-            # 有父菜单，添加到父菜单的 children
-            parent_node = menu_map[parent_id]
-            parent_node['children'].append(menu_map[menu_id])
-        else:
-            # 根菜单
-            root_menus.append(menu_map[menu_id])
-    
-    # 第三步：为叶子菜单（没有子菜单的菜单）添加权限
-    for menu_id, menu_node in menu_map.items():
-        # 如果菜单没有子菜单，添加该菜单的权限
-        if not menu_node['children']:
-            menu_node['children'] = permissions_by_menu.get(menu_id, [])
+    skeleton = RoleMenuPermissionService.get_skeleton()
+    role_menu_ids = RoleMenuPermissionService.get_role_menu_ids(role)
+    role_permission_ids = RoleMenuPermissionService.get_role_permission_ids(role)
     
     return {
-        'menu_tree': root_menus,
+        'menu_tree': RoleMenuPermissionService.render_menu_permission_tree(
+            skeleton, role_menu_ids, role_permission_ids
+        ),
         'permission_tree': [],  # 保持兼容性
         'selected_menu_ids': list(role_menu_ids),
         'selected_permission_ids': list(role_permission_ids),
@@ -594,58 +532,13 @@ def get_role_menus(request, role_id: str):
         menu_tree: 菜单树结构
         selected_menu_ids: 已选中的菜单ID列表
     """
-    from core.menu.menu_model import Menu
-    from core.permission.permission_model import Permission
-    
     role = get_object_or_404(Role, id=role_id)
     
-    # 获取该角色已选中的菜单ID
-    role_menu_ids = set(str(m.id) for m in role.menu.all())
-    
-    # 获取所有菜单
-    all_menus = Menu.objects.all().values(
-        'id', 'name', 'title', 'parent_id'
-    )
-    
-    # 统计每个菜单的权限数量
-    permission_counts = {}
-    for menu in all_menus:
-        menu_id = str(menu['id'])
-        count = Permission.objects.filter(menu_id=menu_id, is_active=True).count()
-        permission_counts[menu_id] = count
-    
-    # 构建菜单树
-    menu_map = {}
-    root_menus = []
-    
-    # 第一步：创建所有菜单节点
-    for menu in all_menus:
-        menu_id = str(menu['id'])
-        parent_id = str(menu['parent_id']) if menu['parent_id'] else None
-        
-        menu_node = {
-            'id': menu_id,
-            'label': menu['title'] or menu['name'],
-            'name': menu['name'],
-            'parent_id': parent_id,
-            'checked': menu_id in role_menu_ids,
-            'permission_count': permission_counts.get(menu_id, 0),
-            'children': [],
-        }
-        
-        menu_map[menu_id] = menu_node
-        
-        if not parent_id:
-            root_menus.append(menu_node)
-    
-    # 第二步：建立父子关系
-    for menu_id, menu_node in menu_map.items():
-        parent_id = menu_node['parent_id']
-        if parent_id and parent_id in menu_map:
-            menu_map[parent_id]['children'].append(menu_node)
+    skeleton = RoleMenuPermissionService.get_skeleton()
+    role_menu_ids = RoleMenuPermissionService.get_role_menu_ids(role)
     
     return {
-        'menu_tree': root_menus,
+        'menu_tree': RoleMenuPermissionService.render_menu_tree(skeleton, role_menu_ids),
         'selected_menu_ids': list(role_menu_ids),
     }
 
@@ -663,48 +556,14 @@ def get_menu_permissions(request, role_id: str, menu_id: str):
         menu_id: 菜单ID
         permissions: 该菜单的权限列表
     """
-    from core.permission.permission_model import Permission
-    
     role = get_object_or_404(Role, id=role_id)
     
-    # 获取该角色已选中的权限ID
-    role_permission_ids = set(str(p.id) for p in role.permission.all())
-    
-    # 权限类型映射
-    PERMISSION_TYPE_MAP = {
-        0: '按钮权限',
-        1: 'API权限',
-        2: '数据权限',
-        3: '其他权限',
-    }
-    
-    # 获取该菜单的所有权限
-    permissions = Permission.objects.filter(
-        menu_id=menu_id,
-        is_active=True
-    ).values('id', 'name', 'code', 'permission_type')
-    
-    permission_list = []
-    for perm in permissions:
-        permission_type = perm.get('permission_type')
-        if permission_type is None:
-            permission_type = 3
-        permission_type = int(permission_type)
-        permission_type_display = PERMISSION_TYPE_MAP.get(permission_type, '其他权限')
-        
-        permission_list.append({
-            'id': str(perm['id']),
-            'label': perm['name'],
-            'name': perm['name'],
-            'code': perm['code'],
-            'permission_type': permission_type,
-            'permission_type_display': permission_type_display,
-            'checked': str(perm['id']) in role_permission_ids,
-        })
+    skeleton = RoleMenuPermissionService.get_skeleton()
+    role_permission_ids = RoleMenuPermissionService.get_role_permission_ids(role)
     
     return {
         'menu_id': menu_id,
-        'permissions': permission_list,
+        'permissions': RoleMenuPermissionService.render_permissions(skeleton, menu_id, role_permission_ids),
     }
 
 
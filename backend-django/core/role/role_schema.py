@@ -141,17 +141,23 @@ class RoleSchemaOut(ModelSchema):
     
     @staticmethod
     def resolve_user_count(obj):
-        """解析用户数量"""
+        """解析用户数量（列表查询已 annotate 时直接使用）"""
+        if hasattr(obj, 'user_count'):
+            return obj.user_count
         return obj.get_user_count()
     
     @staticmethod
     def resolve_menu_count(obj):
-        """解析菜单数量"""
+        """解析菜单数量（列表查询已 annotate 时直接使用）"""
+        if hasattr(obj, 'menu_count'):
+            return obj.menu_count
         return obj.get_menu_count()
     
     @staticmethod
     def resolve_permission_count(obj):
-        """解析权限数量"""
+        """解析权限数量（列表查询已 annotate 时直接使用）"""
+        if hasattr(obj, 'permission_count'):
+            return obj.permission_count
         return obj.get_permission_count()
     
     @staticmethod
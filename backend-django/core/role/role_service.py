@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Role Service - 角色服务层
+处理角色菜单权限树相关的业务逻辑
+
+菜单权限树中只有 checked 标记与角色有关，其余结构（菜单层级、每个菜单下的权限）
+对所有角色都一样。这里把与角色无关的部分作为"骨架"按版本号缓存，
+菜单或权限变更时版本号递增；响应时只需加载角色已选的菜单/权限ID集合，
+再把骨架渲染成带 checked 标记的树。
+"""
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from common.fu_cache import CacheStrategy, PermissionCacheManager
+from core.role.role_model import Role
+
+logger = logging.getLogger(__name__)
+
+# 权限类型映射
+PERMISSION_TYPE_MAP = {
+    0: '按钮权限',
+    1: 'API权限',
+    2: '数据权限',
+    3: '其他权限',
+}
+
+# 进程内的骨架副本：(版本号, 加载时间, 骨架)，避免每次请求都反序列化整棵树
+_local_skeleton: Optional[Tuple[int, float, dict]] = None
+
+
+class RoleMenuPermissionService:
+    """角色菜单权限树服务类"""
+
+    @staticmethod
+    def build_skeleton() -> dict:
+        """
+        从数据库构建与角色无关的菜单权限树骨架（两条查询）
+
+        Returns:
+            dict: {
+                'menus': {menu_id: {id, label, name, parent_id}},
+                'children': {menu_id: [子菜单ID]},
+                'roots': [父菜单为空的菜单ID],
+                'tops': [父菜单为空或不存在的菜单ID],
+                'permissions': {menu_id: [权限（不含 checked）]},
+            }
+        """
+        from core.menu.menu_model import Menu
+        from core.permission.permission_model import Permission
+
+        menus = {}
+        order = []
+        for menu in Menu.objects.all().values('id', 'name', 'title', 'parent_id'):
+            menu_id = str(menu['id'])
+            menus[menu_id] = {
+                'id': menu_id,
+                'label': menu['title'] or menu['name'],
+                'name': menu['name'],
+                'parent_id': str(menu['parent_id']) if menu['parent_id'] else None,
+            }
+            order.append(menu_id)
+
+        children: Dict[str, List[str]] = {}
+        roots = []
+        tops = []
+        for menu_id in order:
+            parent_id = menus[menu_id]['parent_id']
+            if parent_id in menus:
+                children.setdefault(parent_id, []).append(menu_id)
+            else:
+                tops.append(menu_id)
+                if not parent_id:
+                    roots.append(menu_id)
+
+        permissions: Dict[str, List[dict]] = {}
+        for perm in Permission.objects.filter(is_active=True).values(
+                'id', 'name', 'code', 'menu_id', 'permission_type'
+        ):
+            permission_type = perm.get('permission_type')
+            if permission_type is None:
+                permission_type = 3  # 默认为其他权限
+            permission_type = int(permission_type)
+            permissions.setdefault(str(perm['menu_id']), []).append({
+                'id': str(perm['id']),
+                'label': perm['name'],
+                'name': perm['name'],
+                'code': perm['code'],
+                'permission_type': permission_type,
+                'permission_type_display': PERMISSION_TYPE_MAP.get(permission_type, '其他权限'),
+            })
+
+        return {
+            'menus': menus,
+            'children': children,
+            'roots': roots,
+            'tops': tops,
+            'permissions': permissions,
+        }
+
+    @staticmethod
+    def get_skeleton() -> dict:
+        """
+        获取菜单权限树骨架
+
+        优先使用进程内副本（版本号一致时），其次使用共享缓存，最后才查库重建。
+        """
+        global _local_skeleton
+
+        version = PermissionCacheManager.get_menu_permission_tree_version()
+        if _local_skeleton is not None:
+            local_version, loaded_at, skeleton = _local_skeleton
+            if local_version == version and time.monotonic() - loaded_at < CacheStrategy.MENU_CACHE:
+                return skeleton
+
+        skeleton = PermissionCacheManager.get_menu_permission_tree(version)
+        if skeleton is None:
+            skeleton = RoleMenuPermissionService.build_skeleton()
+            PermissionCacheManager.set_menu_permission_tree(version, skeleton)
+            logger.debug(f"菜单权限树骨架已重建: v{version}, {len(skeleton['menus'])} 个菜单")
+
+        _local_skeleton = (version, time.monotonic(), skeleton)
+        return skeleton
+
+    @staticmethod
+    def get_role_menu_ids(role: Role) -> Set[str]:
+        """获取角色已分配的菜单ID集合（只查关联表）"""
+        return {str(menu_id) for menu_id in role.menu.values_list('id', flat=True)}
+
+    @staticmethod
+    def get_role_permission_ids(role: Role) -> Set[str]:
+        """获取角色已分配的权限ID集合（只查关联表）"""
+        return {str(permission_id) for permission_id in role.permission.values_list('id', flat=True)}
+
+    @staticmethod
+    def render_permissions(skeleton: dict, menu_id: str, permission_ids: Set[str]) -> List[dict]:
+        """渲染某个菜单下的权限列表，并标记角色已选中的权限"""
+        return [
+            {**perm, 'checked': perm['id'] in permission_ids}
+            for perm in skeleton['permissions'].get(menu_id, [])
+        ]
+
+    @staticmethod
+    def render_menu_permission_tree(skeleton: dict, menu_ids: Set[str], permission_ids: Set[str]) -> List[dict]:
+        """
+        渲染菜单权限树：子菜单作为 children，叶子菜单的 children 为其权限列表
+
+        父菜单不存在的菜单按根菜单处理，与原有逻辑保持一致。
+        """
+        menus = skeleton['menus']
+        children = skeleton['children']
+
+        def render(menu_id: str) -> dict:
+            child_ids = children.get(menu_id)
+            return {
+                **menus[menu_id],
+                'checked': menu_id in menu_ids,
+                'children': (
+                    [render(child_id) for child_id in child_ids] if child_ids
+                    else RoleMenuPermissionService.render_permissions(skeleton, menu_id, permission_ids)
+                ),
+            }
+
+        return [render(menu_id) for menu_id in skeleton['tops']]
+
+    @staticmethod
+    def render_menu_tree(skeleton: dict, menu_ids: Set[str]) -> List[dict]:
+        """渲染菜单树（不含权限），附带每个菜单的有效权限数量"""
+        menus = skeleton['menus']
+        children = skeleton['children']
+        permissions = skeleton['permissions']
+
+        def render(menu_id: str) -> dict:
+            return {
+                **menus[menu_id],
+                'checked': menu_id in menu_ids,
+                'permission_count': len(permissions.get(menu_id, ())),
+                'children': [render(child_id) for child_id in children.get(menu_id, ())],
+            }
+
+        return [render(menu_id) for menu_id in skeleton['roots']]
@@ -22,7 +22,10 @@ from core.redis_manager.redis_manager_api import router as redis_manager_router
 from core.database_monitor.database_monitor_api import router as database_monitor_router
 from core.database_manager.database_manager_api import router as database_manager_router
 from core.file_manager.file_manager_api import router as file_manager_router
+from core.file_manager.chunk_upload_api import router as chunk_upload_router
 from core.oauth.oauth_api import router as oauth_router
+from core.async_job.async_job_api import router as async_job_router
+from core.search.search_api import router as search_router
 
 # 创建核心模块的总路由
 core_router = Router()
@@ -44,4 +47,7 @@ core_router.add_router("", redis_manager_router, tags=["Core-RedisManager"])
 core_router.add_router("", database_monitor_router, tags=["Core-DatabaseMonitor"])
 core_router.add_router("", database_manager_router, tags=["Core-DatabaseManager"])
 core_router.add_router("", file_manager_router, tags=["Core-FileManager"])
-core_router.add_router("/oauth", oauth_router, tags=["Core-OAuth"])
\ No newline at end of file
+core_router.add_router("/file_manager", chunk_upload_router, tags=["Core-FileManager"])
+core_router.add_router("/oauth", oauth_router, tags=["Core-OAuth"])
+core_router.add_router("", async_job_router, tags=["Core-AsyncJob"])
+core_router.add_router("", search_router, tags=["Core-Search"])
\ No newline at end of file
@@ -0,0 +1,6 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+全局搜索模块 - Search Module
+为用户、部门、菜单、角色、岗位、权限维护统一的搜索索引
+"""
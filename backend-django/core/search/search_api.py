@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Search API - 统一搜索接口
+在用户、部门、菜单、角色、岗位、权限中按关键词搜索，结果按相关度排序
+"""
+from typing import List
+
+from ninja import Router, Query
+from ninja.errors import HttpError
+from ninja.pagination import paginate
+
+from common.fu_pagination import MyPagination
+from common.fu_schema import response_success
+from core.search.search_schema import SearchResultSchemaOut
+from core.search.search_service import SearchService
+
+router = Router()
+
+
+@router.get("/search", response=List[SearchResultSchemaOut], summary="统一搜索")
+@paginate(MyPagination)
+def search(request, keyword: str = Query(None), types: str = Query(None)):
+    """
+    统一搜索
+
+    - keyword：关键词（匹配名称、编码、描述等字段，不区分大小写和全半角）
+    - types：搜索类型，逗号分隔（user,dept,menu,role,post,permission），为空时搜索全部
+    """
+    if not SearchService.index_enabled():
+        raise HttpError(400, "搜索索引未开启")
+    try:
+        entity_types = SearchService.parse_entity_types(types)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    return SearchService.search(keyword, entity_types)
+
+
+@router.post("/search/rebuild", summary="重建搜索索引")
+def rebuild_search_index(request, types: str = Query(None)):
+    """
+    全量重建搜索索引
+
+    用于首次开启 SEARCH_INDEX_ENABLE、切换 SEARCH_BACKEND 或修复索引数据
+    """
+    try:
+        entity_types = SearchService.parse_entity_types(types)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    result = SearchService.rebuild(entity_types)
+    detail = '，'.join(f"{entity_type} {count} 条" for entity_type, count in result.items())
+    return response_success(f"搜索索引重建完成：{detail}")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Search Models - 搜索索引模型
+"""
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    搜索文档 - 每个被索引的对象一条记录
+
+    content 为归一化（NFKC、小写、合并空白）后的可搜索字段，字段之间用换行分隔，
+    由模型 post_save / post_delete 信号维护，可通过 /search/rebuild 全量重建。
+    """
+
+    # 对象类型（user、dept、menu、role、post、permission）
+    entity_type = models.CharField(
+        max_length=20,
+        help_text="对象类型",
+    )
+
+    # 对象ID
+    object_id = models.CharField(
+        max_length=36,
+        help_text="对象ID",
+    )
+
+    # 展示标题（如用户姓名、部门名称）
+    title = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="标题",
+    )
+
+    # 展示副标题（如用户名、编码）
+    subtitle = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="副标题",
+    )
+
+    # 归一化后的标题，用于排序（完全匹配、前缀匹配优先）
+    search_title = models.CharField(
+        max_length=255,
+        default='',
+        help_text="归一化标题",
+    )
+
+    # 归一化后的可搜索内容
+    content = models.TextField(
+        default='',
+        help_text="归一化内容",
+    )
+
+    update_datetime = models.DateTimeField(
+        auto_now=True,
+        help_text="索引更新时间",
+    )
+
+    class Meta:
+        db_table = "core_search_document"
+        verbose_name = "搜索文档"
+        verbose_name_plural = verbose_name
+        unique_together = (('entity_type', 'object_id'),)
+        indexes = [
+            models.Index(fields=['entity_type', 'search_title']),
+        ]
+
+    def __str__(self):
+        return f"{self.entity_type}:{self.title}"
+
+
+class SearchGram(models.Model):
+    """
+    搜索二元组倒排索引（通用后端）
+
+    每个文档的每个字段按两个字符切分（末尾补空格，单字符查询也能命中），
+    查询时要求文档包含关键词的全部二元组，再用 content 做精确子串校验。
+    所有数据库都可以用普通 B 树索引完成查询，不依赖全文检索扩展。
+    """
+
+    gram = models.CharField(
+        max_length=2,
+        help_text="二元组",
+    )
+
+    document = models.ForeignKey(
+        to=SearchDocument,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        help_text="搜索文档",
+        related_name="grams",
+    )
+
+    class Meta:
+        db_table = "core_search_gram"
+        verbose_name = "搜索二元组"
+        verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=['gram', 'document']),
+        ]
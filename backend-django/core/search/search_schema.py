@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Search Schema - 统一搜索数据模式
+"""
+from typing import Optional
+
+from ninja import Schema
+
+
+class SearchResultSchemaOut(Schema):
+    """搜索结果"""
+    entity_type: str
+    object_id: str
+    title: Optional[str] = None
+    subtitle: Optional[str] = None
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Search Service - 搜索索引服务层
+维护用户、部门、菜单、角色、岗位、权限的统一搜索索引，并提供排序后的搜索结果
+
+索引后端（SEARCH_BACKEND）：
+- postgres：PostgreSQL 使用 pg_trgm GIN 索引加速 content 的子串匹配
+- ngram：通用后端，二元组倒排表（SearchGram），任何数据库都只走普通 B 树索引
+- auto（默认）：PostgreSQL 使用 postgres，其他数据库使用 ngram
+"""
+import logging
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Type
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, Count, IntegerField, Model, Q, QuerySet, Value, When
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from core.search.search_model import SearchDocument, SearchGram
+
+logger = logging.getLogger(__name__)
+
+# 重建索引、批量写入的分批大小
+SEARCH_BATCH_SIZE = 1000
+# 关键词最大长度（超出部分忽略）
+SEARCH_MAX_KEYWORD_LENGTH = 50
+# content 中字段之间的分隔符（归一化后的关键词不会包含换行，不会跨字段匹配）
+FIELD_SEPARATOR = '\n'
+
+
+class SearchEntity:
+    """可搜索对象的配置"""
+
+    def __init__(self, model_label: str, fields: Sequence[str], title: str, subtitle: Optional[str] = None):
+        """
+        :param model_label: 模型标识，如 'core.User'
+        :param fields: 可搜索字段（同时用于未开启索引时的 icontains 查询）
+        :param title: 展示标题字段
+        :param subtitle: 展示副标题字段
+        """
+        self.model_label = model_label
+        self.fields = tuple(fields)
+        self.title = title
+        self.subtitle = subtitle
+
+    @property
+    def model(self) -> Type[Model]:
+        return apps.get_model(self.model_label)
+
+    @property
+    def load_fields(self) -> List[str]:
+        """构建索引需要读取的字段"""
+        names = ['pk', *self.fields, self.title]
+        if self.subtitle:
+            names.append(self.subtitle)
+        return list(dict.fromkeys(names))
+
+
+SEARCH_ENTITIES: Dict[str, SearchEntity] = {
+    'user': SearchEntity('core.User', ('username', 'name', 'email', 'mobile'), title='name', subtitle='username'),
+    'dept': SearchEntity('core.Dept', ('name', 'code'), title='name', subtitle='code'),
+    'menu': SearchEntity('core.Menu', ('name', 'title'), title='title', subtitle='path'),
+    'role': SearchEntity('core.Role', ('name', 'code', 'description'), title='name', subtitle='code'),
+    'post': SearchEntity('core.Post', ('name', 'code', 'description'), title='name', subtitle='code'),
+    'permission': SearchEntity('core.Permission', ('name', 'code', 'description'), title='name', subtitle='code'),
+}
+
+
+def normalize_text(value) -> str:
+    """归一化：全角转半角（NFKC）、小写、合并空白"""
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKC', str(value)).lower()
+    return ' '.join(text.split())
+
+
+def build_grams(values: Iterable[str]) -> Set[str]:
+    """按字段切分二元组，末尾补空格使每个字符都是某个二元组的首字符"""
+    grams = set()
+    for value in values:
+        padded = f"{value} "
+        grams.update(padded[index:index + 2] for index in range(len(value)))
+    return grams
+
+
+class SearchService:
+    """搜索服务类 - 索引维护与查询"""
+
+    # ===============================================================
+    # 配置
+    # ===============================================================
+
+    @staticmethod
+    def index_enabled() -> bool:
+        """是否开启搜索索引"""
+        return getattr(settings, 'SEARCH_INDEX_ENABLE', False)
+
+    @staticmethod
+    def backend() -> str:
+        """当前使用的索引后端：postgres 或 ngram"""
+        backend = getattr(settings, 'SEARCH_BACKEND', 'auto')
+        if backend == 'auto':
+            return 'postgres' if connection.vendor == 'postgresql' else 'ngram'
+        return backend
+
+    @staticmethod
+    def get_entity(entity_type: str) -> SearchEntity:
+        entity = SEARCH_ENTITIES.get(entity_type)
+        if entity is None:
+            raise ValueError(f"不支持的搜索类型: {entity_type}")
+        return entity
+
+    @staticmethod
+    def parse_entity_types(types: Optional[str]) -> List[str]:
+        """解析逗号分隔的搜索类型，为空时返回全部类型"""
+        if not types:
+            return list(SEARCH_ENTITIES)
+        entity_types = [item.strip() for item in types.split(',') if item.strip()]
+        for entity_type in entity_types:
+            SearchService.get_entity(entity_type)
+        return entity_types
+
+    # ===============================================================
+    # 索引维护
+    # ===============================================================
+
+    @staticmethod
+    def _build_document(entity: SearchEntity, instance: Model) -> Tuple[dict, Set[str]]:
+        values = [normalize_text(getattr(instance, name, None)) for name in entity.fields]
+        title = getattr(instance, entity.title, None)
+        subtitle = getattr(instance, entity.subtitle, None) if entity.subtitle else None
+        data = {
+            'title': str(title)[:255] if title is not None else None,
+            'subtitle': str(subtitle)[:255] if subtitle is not None else None,
+            'search_title': normalize_text(title)[:255],
+            'content': FIELD_SEPARATOR.join(values),
+        }
+        return data, build_grams(value for value in values if value)
+
+    @staticmethod
+    def index_objects(entity_type: str, objects: Iterable[Model], replace: bool = False) -> int:
+        """
+        写入或更新一批对象的索引（内容未变化的对象跳过）
+
+        :param replace: 为 True 时不查询已有文档（重建索引时使用）
+        :return: 写入的文档数
+        """
+        entity = SearchService.get_entity(entity_type)
+        use_grams = SearchService.backend() == 'ngram'
+        built = {str(instance.pk): SearchService._build_document(entity, instance) for instance in objects}
+        if not built:
+            return 0
+
+        existing = {}
+        if not replace:
+            existing = {
+                document.object_id: document
+                for document in SearchDocument.objects.filter(entity_type=entity_type, object_id__in=list(built))
+            }
+
+        now = timezone.now()
+        to_create, to_update = [], []
+        for object_id, (data, _) in built.items():
+            document = existing.get(object_id)
+            if document is None:
+                to_create.append(SearchDocument(entity_type=entity_type, object_id=object_id, **data))
+            elif any(getattr(document, key) != value for key, value in data.items()):
+                for key, value in data.items():
+                    setattr(document, key, value)
+                document.update_datetime = now
+                to_update.append(document)
+        if not to_create and not to_update:
+            return 0
+
+        with transaction.atomic():
+            SearchDocument.objects.bulk_create(to_create, batch_size=SEARCH_BATCH_SIZE)
+            SearchDocument.objects.bulk_update(
+                to_update,
+                ['title', 'subtitle', 'search_title', 'content', 'update_datetime'],
+                batch_size=SEARCH_BATCH_SIZE,
+            )
+            if use_grams:
+                if to_update:
+                    SearchGram.objects.filter(document__in=[document.pk for document in to_update]).delete()
+                if to_create and to_create[0].pk is None:
+                    # 部分数据库 bulk_create 不回填自增主键
+                    ids = dict(SearchDocument.objects.filter(
+                        entity_type=entity_type,
+                        object_id__in=[document.object_id for document in to_create],
+                    ).values_list('object_id', 'pk'))
+                    for document in to_create:
+                        document.pk = ids[document.object_id]
+                SearchGram.objects.bulk_create(
+                    [
+                        SearchGram(gram=gram, document_id=document.pk)
+                        for document in [*to_create, *to_update]
+                        for gram in built[document.object_id][1]
+                    ],
+                    batch_size=SEARCH_BATCH_SIZE,
+                )
+        return len(to_create) + len(to_update)
+
+    @staticmethod
+    def index_ids(entity_type: str, ids: Sequence[str]) -> int:
+        """按ID重新索引（从数据库读取最新数据，已不存在的对象移除索引）"""
+        entity = SearchService.get_entity(entity_type)
+        ids = [str(pk) for pk in ids]
+        count = 0
+        for start in range(0, len(ids), SEARCH_BATCH_SIZE):
+            chunk = ids[start:start + SEARCH_BATCH_SIZE]
+            objects = list(entity.model.objects.filter(pk__in=chunk).only(*entity.load_fields[1:]))
+            count += SearchService.index_objects(entity_type, objects)
+            missing = set(chunk) - {str(instance.pk) for instance in objects}
+            if missing:
+                SearchService.remove(entity_type, missing)
+        return count
+
+    @staticmethod
+    def remove(entity_type: str, ids: Iterable[str]) -> int:
+        """移除对象的索引"""
+        documents = SearchDocument.objects.filter(entity_type=entity_type, object_id__in=[str(pk) for pk in ids])
+        with transaction.atomic():
+            SearchGram.objects.filter(document__in=documents.values('pk')).delete()
+            return documents.delete()[0]
+
+    @staticmethod
+    def rebuild(entity_types: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """
+        全量重建索引
+
+        用于首次开启 SEARCH_INDEX_ENABLE、切换后端或修复索引数据
+        :return: {类型: 文档数}
+        """
+        SearchService.ensure_backend()
+        result = {}
+        for entity_type in entity_types or SEARCH_ENTITIES:
+            entity = SearchService.get_entity(entity_type)
+            documents = SearchDocument.objects.filter(entity_type=entity_type)
+            SearchGram.objects.filter(document__in=documents.values('pk')).delete()
+            documents.delete()
+
+            count = 0
+            batch = []
+            queryset = entity.model.objects.only(*entity.load_fields[1:]).order_by('pk')
+            for instance in queryset.iterator(chunk_size=SEARCH_BATCH_SIZE):
+                batch.append(instance)
+                if len(batch) >= SEARCH_BATCH_SIZE:
+                    count += SearchService.index_objects(entity_type, batch, replace=True)
+                    batch = []
+            count += SearchService.index_objects(entity_type, batch, replace=True)
+            result[entity_type] = count
+            logger.info(f"搜索索引已重建: {entity_type} {count} 条")
+        return result
+
+    @staticmethod
+    def ensure_backend() -> None:
+        """PostgreSQL 后端：创建 pg_trgm 扩展和 content 的 GIN 索引（已存在时跳过）"""
+        if SearchService.backend() != 'postgres':
+            return
+        table = SearchDocument._meta.db_table
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_content_trgm "
+                    f"ON {table} USING gin (content gin_trgm_ops)"
+                )
+        except DatabaseError as e:
+            logger.error(f"创建 pg_trgm 索引失败（需要数据库扩展权限）: {e}")
+
+    # ===============================================================
+    # 查询
+    # ===============================================================
+
+    @staticmethod
+    def _normalize_keyword(keyword: Optional[str]) -> str:
+        return normalize_text(keyword)[:SEARCH_MAX_KEYWORD_LENGTH].strip()
+
+    @staticmethod
+    def _match(keyword: str, entity_types: Sequence[str]) -> QuerySet:
+        """匹配关键词的文档（未排序）"""
+        documents = SearchDocument.objects.filter(entity_type__in=list(entity_types))
+        if SearchService.backend() == 'ngram':
+            if len(keyword) == 1:
+                candidates = SearchGram.objects.filter(gram__startswith=keyword).values('document_id')
+            else:
+                grams = {keyword[index:index + 2] for index in range(len(keyword) - 1)}
+                candidates = SearchGram.objects.filter(gram__in=grams).values('document_id').annotate(
+                    matched=Count('gram', distinct=True)
+                ).filter(matched=len(grams)).values('document_id')
+            documents = documents.filter(pk__in=candidates)
+        # 二元组只能筛选候选文档，最终以子串匹配为准；PostgreSQL 下由 trigram 索引完成
+        return documents.filter(content__contains=keyword)
+
+    @staticmethod
+    def search(keyword: Optional[str], entity_types: Optional[Sequence[str]] = None) -> QuerySet:
+        """
+        搜索并按相关度排序：标题完全匹配 > 标题前缀匹配 > 标题包含 > 其他字段包含，
+        同级按标题长度、标题排序
+        """
+        keyword = SearchService._normalize_keyword(keyword)
+        if not keyword:
+            return SearchDocument.objects.none()
+        documents = SearchService._match(keyword, entity_types or list(SEARCH_ENTITIES))
+        return documents.annotate(
+            rank=Case(
+                When(search_title=keyword, then=Value(0)),
+                When(search_title__startswith=keyword, then=Value(1)),
+                When(search_title__contains=keyword, then=Value(2)),
+                default=Value(3),
+                output_field=IntegerField(),
+            ),
+            title_length=Length('search_title'),
+        ).order_by('rank', 'title_length', 'search_title', 'pk')
+
+    @staticmethod
+    def match_ids(entity_type: str, keyword: str) -> QuerySet:
+        """匹配关键词的对象ID查询集（可直接作为 __in 子查询使用）"""
+        SearchService.get_entity(entity_type)
+        keyword = SearchService._normalize_keyword(keyword)
+        return SearchService._match(keyword, [entity_type]).values('object_id')
+
+    @staticmethod
+    def filter_queryset(queryset: QuerySet, entity_type: str, keyword: Optional[str]) -> QuerySet:
+        """
+        按关键词过滤查询集
+
+        开启索引时通过索引匹配，否则对可搜索字段做 icontains 查询
+        """
+        if not keyword or not SearchService._normalize_keyword(keyword):
+            return queryset
+        if SearchService.index_enabled():
+            return queryset.filter(pk__in=SearchService.match_ids(entity_type, keyword))
+        condition = Q()
+        for name in SearchService.get_entity(entity_type).fields:
+            condition |= Q(**{f"{name}__icontains": keyword})
+        return queryset.filter(condition)
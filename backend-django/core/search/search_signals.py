@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Search Signals - 搜索索引同步
+用户、部门、菜单、角色、岗位、权限增删改及批量导入时同步搜索索引（SEARCH_INDEX_ENABLE 开启时）
+（批量 update 不触发信号，只修改状态等非搜索字段时无需同步）
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_save
+
+from common.utils.import_utils import post_bulk_import
+from core.search.search_service import SEARCH_ENTITIES, SearchService
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODELS = {entity.model: entity_type for entity_type, entity in SEARCH_ENTITIES.items()}
+
+
+def _entity_type(sender) -> str:
+    return SEARCH_MODELS[sender]
+
+
+def search_post_save(sender, instance, raw: bool = False, update_fields=None, **kwargs):
+    """保存后更新索引（只更新了非搜索字段时跳过）"""
+    if raw or not SearchService.index_enabled():
+        return
+    entity_type = _entity_type(sender)
+    entity = SEARCH_ENTITIES[entity_type]
+    if update_fields is not None and not set(update_fields) & set(entity.load_fields):
+        return
+    SearchService.index_objects(entity_type, [instance])
+
+
+def search_post_delete(sender, instance, **kwargs):
+    """删除后移除索引"""
+    if not SearchService.index_enabled():
+        return
+    SearchService.remove(_entity_type(sender), [instance.pk])
+
+
+def search_post_bulk_import(sender, ids, **kwargs):
+    """批量导入后按ID重新索引"""
+    if sender not in SEARCH_MODELS or not SearchService.index_enabled():
+        return
+    SearchService.index_ids(_entity_type(sender), ids)
+
+
+for model, entity_type in SEARCH_MODELS.items():
+    post_save.connect(search_post_save, sender=model, dispatch_uid=f"search_save_{entity_type}")
+    post_delete.connect(search_post_delete, sender=model, dispatch_uid=f"search_delete_{entity_type}")
+post_bulk_import.connect(search_post_bulk_import, dispatch_uid="search_bulk_import")
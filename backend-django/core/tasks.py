@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Core Tasks - Celery 后台任务
+"""
+from application.celery import app
+from common.fu_job import AsyncJobManager
+
+
+@app.task(name='core.run_async_job', ignore_result=True)
+def run_async_job(job_id: str):
+    """执行后台导入导出任务，状态与结果保存在 Redis 中"""
+    AsyncJobManager.run(job_id)
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试基类：创建超级管理员并使用 Bearer Token 请求接口
+"""
+from django.core.cache import cache
+from django.test import Client, TestCase
+
+from common.fu_auth import create_token
+from core.user.user_model import User
+
+
+class ApiTestCase(TestCase):
+    """接口测试基类（超级管理员，跳过接口权限校验）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='admin', name='管理员', is_superuser=True)
+
+    def setUp(self):
+        cache.clear()
+        access_token = create_token({'id': str(self.user.id), 'username': self.user.username})[0]
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {access_token}')
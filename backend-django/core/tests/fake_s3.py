@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试用的 S3 兼容服务（只实现分块上传相关接口，不校验签名）
+
+在本进程的线程中监听 127.0.0.1 的随机端口，MinioStorageBackend 指向该地址即可：
+- GET    /{bucket}?location                       获取桶所在区域
+- POST   /{bucket}/{key}?uploads                  CreateMultipartUpload
+- PUT    /{bucket}/{key}?partNumber=&uploadId=    UploadPart（预签名URL直传）
+- GET    /{bucket}/{key}?uploadId=                ListParts（支持 max-parts / part-number-marker 分页）
+- POST   /{bucket}/{key}?uploadId=                CompleteMultipartUpload
+- DELETE /{bucket}/{key}?uploadId=                AbortMultipartUpload
+- GET    /{bucket}/{key}                          GetObject
+"""
+import hashlib
+import threading
+import uuid
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+S3_NAMESPACE = 'http://s3.amazonaws.com/doc/2006-03-01/'
+
+
+class FakeS3Server:
+    """
+    使用示例：
+        with FakeS3Server() as server:
+            MinioStorageBackend(server.endpoint, 'key', 'secret', 'bucket')
+            server.objects['file_manager/a.txt']
+    """
+
+    def __init__(self, bucket_name: str = 'test-bucket'):
+        self.bucket_name = bucket_name
+        self.objects: Dict[str, bytes] = {}
+        # {uploadId: {'key': 对象名, 'parts': {分块编号: 内容}}}
+        self.uploads: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self) -> 'FakeS3Server':
+        server = self
+
+        class Handler(_Handler):
+            s3 = server
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        return False
+
+
+def _xml(tag: str, children: dict) -> bytes:
+    root = ET.Element(tag, xmlns=S3_NAMESPACE)
+    for name, value in children.items():
+        ET.SubElement(root, name).text = str(value)
+    return ET.tostring(root)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    s3: FakeS3Server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        bucket, _, key = unquote(url.path).lstrip('/').partition('/')
+        query = {name: values[0] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+        return bucket, key, query
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _send(self, status: int, body: bytes = b'', headers: Optional[dict] = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self, code: str = 'NoSuchUpload'):
+        self._send(404, _xml('Error', {'Code': code, 'Message': code}), {'Content-Type': 'application/xml'})
+
+    def do_GET(self):
+        bucket, key, query = self._parse()
+        if not key and 'location' in query:
+            return self._send(200, _xml('LocationConstraint', {}), {'Content-Type': 'application/xml'})
+        if 'uploadId' in query:
+            return self._list_parts(bucket, key, query)
+        content = self.s3.objects.get(key)
+        if content is None:
+            return self._not_found('NoSuchKey')
+        self._send(200, content, {'Content-Type': 'application/octet-stream'})
+
+    def _list_parts(self, bucket, key, query):
+        upload = self.s3.uploads.get(query['uploadId'])
+        if upload is None:
+            return self._not_found()
+        marker = int(query.get('part-number-marker') or 0)
+        max_parts = int(query.get('max-parts') or 1000)
+        numbers = sorted(number for number in upload['parts'] if number > marker)
+        page, rest = numbers[:max_parts], numbers[max_parts:]
+
+        root = ET.Element('ListPartsResult', xmlns=S3_NAMESPACE)
+        ET.SubElement(root, 'Bucket').text = bucket
+        ET.SubElement(root, 'Key').text = key
+        ET.SubElement(root, 'UploadId').text = query['uploadId']
+        ET.SubElement(root, 'IsTruncated').text = 'true' if rest else 'false'
+        if page:
+            ET.SubElement(root, 'NextPartNumberMarker').text = str(page[-1])
+        for number in page:
+            content = upload['parts'][number]
+            part = ET.SubElement(root, 'Part')
+            ET.SubElement(part, 'PartNumber').text = str(number)
+            ET.SubElement(part, 'ETag').text = f'"{hashlib.md5(content).hexdigest()}"'
+            ET.SubElement(part, 'Size').text = str(len(content))
+        self._send(200, ET.tostring(root), {'Content-Type': 'application/xml'})
+
+    def do_POST(self):
+        bucket, key, query = self._parse()
+        body = self._body()
+        if 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            with self.s3.lock:
+                self.s3.uploads[upload_id] = {'key': key, 'parts': {}}
+            return self._send(200, _xml('InitiateMultipartUploadResult', {
+                'Bucket': bucket, 'Key': key, 'UploadId': upload_id,
+            }), {'Content-Type': 'application/xml'})
+
+        with self.s3.lock:
+            upload = self.s3.uploads.get(query.get('uploadId'))
+            if upload is None:
+                return self._not_found()
+            content = b''
+            for part in ET.fromstring(body).iter(f'{{{S3_NAMESPACE}}}Part'):
+                number = int(part.findtext(f'{{{S3_NAMESPACE}}}PartNumber'))
+                etag = part.findtext(f'{{{S3_NAMESPACE}}}ETag').strip('"')
+                data = upload['parts'].get(number)
+                if data is None or hashlib.md5(data).hexdigest() != etag:
+                    return self._send(400, _xml('Error', {'Code': 'InvalidPart'}), {'Content-Type': 'application/xml'})
+                content += data
+            self.s3.objects[key] = content
+            del self.s3.uploads[query['uploadId']]
+        self._send(200, _xml('CompleteMultipartUploadResult', {
+            'Bucket': bucket, 'Key': key, 'ETag': f'"{hashlib.md5(content).hexdigest()}-1"',
+        }), {'Content-Type': 'application/xml'})
+
+    def do_PUT(self):
+        _, _, query = self._parse()
+        body = self._body()
+        with self.s3.lock:
+            upload = self.s3.uploads.get(query.get('uploadId'))
+            if upload is None:
+                return self._not_found()
+            upload['parts'][int(query['partNumber'])] = body
+        self._send(200, headers={'ETag': f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def do_DELETE(self):
+        _, _, query = self._parse()
+        with self.s3.lock:
+            if self.s3.uploads.pop(query.get('uploadId'), None) is None:
+                return self._not_found()
+        self._send(204)
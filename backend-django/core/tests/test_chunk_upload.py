@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+分块上传测试（本地存储，分块临时目录与存储目录均指向临时目录）
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from common.utils.file_utils import tree_hash
+from core.file_manager.chunk_upload_api import get_chunk_dir
+from core.file_manager.file_manager_model import FileBlob, FileManager
+from core.tests.base import ApiTestCase
+
+CONTENT = b'0123456789' * 100
+CHUNK_SIZE = 400
+CONTENT_TREE_HASH = tree_hash(
+    [hashlib.md5(CONTENT[start:start + CHUNK_SIZE]).hexdigest() for start in range(0, len(CONTENT), CHUNK_SIZE)],
+    CHUNK_SIZE,
+)
+
+
+class ChunkUploadTestCase(ApiTestCase):
+    """分块临时目录、本地存储目录使用独立的临时目录"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.chunk_root = os.path.join(self.tmp_dir, 'chunk_uploads')
+        self.storage_root = os.path.join(self.tmp_dir, 'file_manager')
+        settings_override = override_settings(
+            FILE_UPLOAD_CHUNK_DIR=self.chunk_root,
+            FILE_STORAGE_LOCAL_PATH=self.storage_root,
+            FILE_STORAGE_TYPE='local',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def init_upload(self, content=CONTENT, **kwargs):
+        data = {'filename': 'report.txt', 'total_size': len(content), 'chunk_size': CHUNK_SIZE, **kwargs}
+        response = self.client.post('/api/core/file_manager/chunk/init', data, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def upload_chunk(self, upload_id, chunk_index, content=CONTENT):
+        data = content[chunk_index * CHUNK_SIZE:(chunk_index + 1) * CHUNK_SIZE]
+        return self.client.post('/api/core/file_manager/chunk/upload', {
+            'upload_id': upload_id,
+            'chunk_index': chunk_index,
+            'chunk': SimpleUploadedFile('blob', data),
+        })
+
+    def upload_all(self, content=CONTENT):
+        info = self.init_upload(content)
+        for chunk_index in range(info['total_chunks']):
+            response = self.upload_chunk(info['upload_id'], chunk_index, content)
+            self.assertEqual(response.status_code, 200, response.content)
+        response = self.client.post(
+            '/api/core/file_manager/chunk/merge', {'upload_id': info['upload_id']}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return FileManager.objects.get(id=response.json()['id'])
+
+    def read_stored(self, file_obj):
+        with open(os.path.join(self.storage_root, file_obj.storage_path), 'rb') as f:
+            return f.read()
+
+
+class ChunkUploadFlowTest(ChunkUploadTestCase):
+    """本地分块上传：初始化 → 上传分块 → 查询状态 → 合并"""
+
+    def test_upload_and_merge(self):
+        info = self.init_upload()
+        upload_id = info['upload_id']
+        self.assertEqual(info['total_chunks'], 3)
+
+        for chunk_index in range(info['total_chunks']):
+            response = self.upload_chunk(upload_id, chunk_index)
+            self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(os.path.isdir(os.path.join(self.chunk_root, upload_id)))
+
+        response = self.client.get('/api/core/file_manager/chunk/status', {'upload_id': upload_id})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['uploaded_chunks'], [0, 1, 2])
+        self.assertTrue(response.json()['completed'])
+
+        response = self.client.post(
+            '/api/core/file_manager/chunk/merge', {'upload_id': upload_id}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        file_obj = FileManager.objects.get(id=response.json()['id'])
+        self.assertEqual(file_obj.size, len(CONTENT))
+        self.assertEqual(self.read_stored(file_obj), CONTENT)
+        # 本地存储内核复制拼接，不计算整个文件的MD5，以分块摘要树哈希去重
+        self.assertIsNone(file_obj.blob.md5)
+        self.assertEqual(file_obj.blob.tree_hash, CONTENT_TREE_HASH)
+        self.assertFalse(os.path.exists(os.path.join(self.chunk_root, upload_id)))
+
+    def test_cancel_removes_chunks(self):
+        upload_id = self.init_upload()['upload_id']
+        self.upload_chunk(upload_id, 0)
+        chunk_dir = os.path.join(self.chunk_root, upload_id)
+        self.assertTrue(os.path.isdir(chunk_dir))
+
+        response = self.client.delete(f'/api/core/file_manager/chunk/cancel?upload_id={upload_id}')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(os.path.exists(chunk_dir))
+        response = self.client.get('/api/core/file_manager/chunk/status', {'upload_id': upload_id})
+        self.assertEqual(response.status_code, 404)
+
+
+class ChunkUploadTreeHashTest(ChunkUploadTestCase):
+    """按分块摘要树哈希秒传"""
+
+    def test_init_with_tree_hash(self):
+        first = self.upload_all()
+        info = self.init_upload(tree_hash=CONTENT_TREE_HASH)
+        self.assertTrue(info['file_exists'])
+        second = FileManager.objects.get(id=info['file_id'])
+        self.assertEqual(second.blob_id, first.blob_id)
+        self.assertEqual(FileBlob.objects.get(id=first.blob_id).ref_count, 2)
+
+    def test_tree_hash_depends_on_chunk_size(self):
+        self.upload_all()
+        chunk_size = CHUNK_SIZE * 2
+        other_tree_hash = tree_hash(
+            [hashlib.md5(CONTENT[start:start + chunk_size]).hexdigest() for start in range(0, len(CONTENT), chunk_size)],
+            chunk_size,
+        )
+        self.assertNotEqual(other_tree_hash, CONTENT_TREE_HASH)
+        info = self.init_upload(tree_hash=other_tree_hash, chunk_size=chunk_size)
+        self.assertFalse(info['file_exists'])
+
+    def test_merge_reuses_existing_content(self):
+        first = self.upload_all()
+        stored = os.listdir(self.storage_root)
+        second = self.upload_all()
+        self.assertEqual(second.blob_id, first.blob_id)
+        # 合并前命中已有内容，不再拼接分块
+        self.assertEqual(os.listdir(self.storage_root), stored)
+        self.assertEqual(FileBlob.objects.get(id=first.blob_id).ref_count, 2)
+
+
+class ChunkUploadIdValidationTest(ChunkUploadTestCase):
+    """upload_id 只接受 UUID，临时目录之外的路径不会被创建或删除"""
+
+    def setUp(self):
+        super().setUp()
+        # 与分块临时目录同级的目录，路径穿越的目标
+        self.victim_dir = os.path.join(self.tmp_dir, 'victim')
+        os.makedirs(self.victim_dir)
+
+    def test_cancel_rejects_path(self):
+        response = self.client.delete('/api/core/file_manager/chunk/cancel?upload_id=../victim')
+        self.assertEqual(response.status_code, 422)
+        self.assertTrue(os.path.isdir(self.victim_dir))
+
+    def test_cancel_unknown_session_keeps_files(self):
+        chunk_dir = get_chunk_dir(str(uuid.uuid4()), create=True)
+        upload_id = os.path.basename(chunk_dir)
+        response = self.client.delete(f'/api/core/file_manager/chunk/cancel?upload_id={upload_id}')
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(os.path.isdir(chunk_dir))
+
+    def test_status_and_merge_reject_path(self):
+        response = self.client.get('/api/core/file_manager/chunk/status', {'upload_id': '../victim'})
+        self.assertEqual(response.status_code, 422)
+        response = self.client.post(
+            '/api/core/file_manager/chunk/merge', {'upload_id': '../victim'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 422)
+
+    def test_upload_rejects_path(self):
+        response = self.upload_chunk('../victim', 0)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(os.listdir(self.victim_dir), [])
+
+    def test_chunk_dir_stays_under_root(self):
+        upload_id = str(uuid.uuid4())
+        self.assertEqual(get_chunk_dir(upload_id), os.path.join(os.path.realpath(self.chunk_root), upload_id))
+        with self.assertRaises(ValueError):
+            get_chunk_dir('../victim')
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+缩略图测试：上传图片 → 生成缩略图 → 文件列表返回的地址可以直接访问（需安装 Pillow）
+"""
+import io
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from common.utils.thumbnail_utils import can_render
+from core.file_manager.file_manager_model import FileManager
+from core.file_manager.file_thumbnail_service import FileThumbnailService
+from core.tests.base import ApiTestCase
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def make_png(width=800, height=600) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@skipUnless(can_render('image/png'), '未安装 Pillow')
+class FileThumbnailTest(ApiTestCase):
+    """本地存储的缩略图、预览图访问"""
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        settings_override = override_settings(
+            FILE_STORAGE_TYPE='local',
+            FILE_STORAGE_LOCAL_PATH=os.path.join(tmp_dir, 'file_manager'),
+            FILE_THUMBNAIL_SIZE=64,
+            FILE_PREVIEW_SIZE=200,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload_png(self):
+        response = self.client.post('/api/core/file_manager/upload', {
+            'file': SimpleUploadedFile('photo.png', make_png(), content_type='image/png'),
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        file_obj = FileManager.objects.get(id=response.json()['id'])
+        FileThumbnailService.generate(file_obj.blob_id, file_obj.mime_type)
+        return file_obj
+
+    def list_item(self, file_obj):
+        response = self.client.get('/api/core/file_manager')
+        self.assertEqual(response.status_code, 200, response.content)
+        return next(item for item in response.json()['items'] if item['id'] == str(file_obj.id))
+
+    def test_list_returns_fetchable_thumbnail(self):
+        file_obj = self.upload_png()
+        item = self.list_item(file_obj)
+        self.assertEqual(item['thumbnail_url'], f'/api/core/file_manager/thumbnail/{file_obj.id}')
+
+        for url, max_size in ((item['thumbnail_url'], 64), (item['preview_url'], 200)):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'image/jpeg')
+            image = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(max(image.size), max_size)
+
+    def test_thumbnail_not_modified(self):
+        file_obj = self.upload_png()
+        url = self.list_item(file_obj)['thumbnail_url']
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_thumbnail(self):
+        folder = FileManager.objects.create(name='docs', type='folder', path='/docs', storage_path='')
+        file_obj = FileManager.objects.create(
+            name='a.txt', type='file', parent=folder, path='/docs/a.txt', storage_path='a.txt'
+        )
+        response = self.client.get('/api/core/file_manager', {'parent_id': str(folder.id)})
+        self.assertIsNone(response.json()['items'][0]['thumbnail_url'])
+        response = self.client.get(f'/api/core/file_manager/thumbnail/{file_obj.id}')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+按路由锁定查询次数：每个 core 子路由选一个有代表性的 GET 接口
+
+种子数据每种至少 5 条，列表接口查询次数与行数无关（无 N+1）时才能通过。
+所有接口都包含 BearerAuth 读取当前用户的 1 次查询；同一查询默认最多执行 1 次。
+"""
+import uuid
+
+from common.fu_query_budget import assert_max_queries
+from core.dept.dept_model import Dept
+from core.dict.dict_model import Dict
+from core.dict_item.dict_item_model import DictItem
+from core.file_manager.file_manager_model import FileManager
+from core.login_log.login_log_model import LoginLog
+from core.menu.menu_model import Menu
+from core.permission.permission_model import Permission
+from core.post.post_model import Post
+from core.role.role_model import Role
+from core.tests.base import ApiTestCase
+from core.user.user_model import User
+
+ROWS = 5
+
+
+class QueryBudgetTest(ApiTestCase):
+    """各路由代表性 GET 接口的查询预算"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        root = Dept.objects.create(name='总部', code='hq')
+        branch = Dept.objects.create(name='华东分部', code='east', parent=root)
+        teams = [Dept.objects.create(name=f'小组{i}', code=f'team{i}', parent=branch) for i in range(ROWS)]
+
+        top_menu = Menu.objects.create(name='System', title='系统管理', path='/system')
+        sub_menu = Menu.objects.create(name='Org', title='组织管理', path='/system/org', parent=top_menu)
+        menus = [
+            Menu.objects.create(name=f'Page{i}', title=f'页面{i}', path=f'/system/org/page{i}', parent=sub_menu)
+            for i in range(ROWS)
+        ]
+        permissions = [
+            Permission.objects.create(name=f'查看{i}', code=f'page{i}:view', menu=menu)
+            for i, menu in enumerate(menus)
+        ]
+
+        posts = [Post.objects.create(name=f'岗位{i}', code=f'post{i}', dept=team) for i, team in enumerate(teams)]
+        roles = [Role.objects.create(name=f'角色{i}', code=f'role{i}') for i in range(ROWS)]
+        for i, role in enumerate(roles):
+            role.dept.set(teams[:i + 1])
+            role.menu.set(menus[:i + 1])
+            role.permission.set(permissions[:i + 1])
+
+        for i in range(ROWS):
+            user = User.objects.create(username=f'user{i}', name=f'用户{i}', dept=teams[i])
+            user.post.set(posts[:i + 1])
+            user.core_roles.set(roles[:i + 1])
+            LoginLog.objects.create(user_id=str(user.id), username=user.username, login_ip='127.0.0.1')
+
+        for i in range(ROWS):
+            dict_obj = Dict.objects.create(name=f'字典{i}', code=f'dict{i}')
+            DictItem.objects.create(label=f'选项{i}', value=str(i), dict=dict_obj)
+
+        folder = FileManager.objects.create(name='docs', type='folder', path='/docs', storage_path='')
+        for i in range(ROWS):
+            FileManager.objects.create(
+                name=f'file{i}.txt', type='file', parent=folder, path=f'/docs/file{i}.txt',
+                storage_path=f'files/file{i}.txt', size=i,
+            )
+
+    def _get(self, path, max_queries, params=None, status=200, max_repeats=1):
+        with assert_max_queries(max_queries, max_repeats=max_repeats):
+            response = self.client.get(path, params or {})
+        self.assertEqual(response.status_code, status, response.content)
+        return response
+
+    def test_auth(self):
+        self._get('/api/core/userinfo', 1)
+
+    def test_user(self):
+        self._get('/api/core/user', 5)
+
+    def test_role(self):
+        self._get('/api/core/role', 6)
+
+    def test_permission(self):
+        self._get('/api/core/permission', 3)
+
+    def test_dept(self):
+        # full_name 逐级读取祖先：select_related 只带出直接上级，第 3 层起每行多 1 次查询
+        self._get('/api/core/dept/list', 3 + ROWS, max_repeats=ROWS)
+
+    def test_post(self):
+        self._get('/api/core/post', 3)
+
+    def test_menu(self):
+        # level / full_path 逐级读取祖先：同 dept，第 3 层起每行多 1 次查询
+        self._get('/api/core/menu/list', 3 + ROWS, max_repeats=ROWS)
+
+    def test_dict(self):
+        self._get('/api/core/dict', 3)
+
+    def test_dict_item(self):
+        self._get('/api/core/dict_item', 3)
+
+    def test_login_log(self):
+        self._get('/api/core/login-log', 3)
+
+    def test_server_monitor(self):
+        self._get('/api/core/server_monitor/boot_time', 0)
+
+    def test_database_monitor(self):
+        self._get('/api/core/database_monitor/configs', 1)
+
+    def test_database_manager(self):
+        self._get('/api/core/database_manager/configs', 1)
+
+    def test_file_manager(self):
+        folder = FileManager.objects.get(name='docs')
+        self._get('/api/core/file_manager', 3, {'parent_id': str(folder.id)})
+
+    def test_chunk_upload(self):
+        self._get('/api/core/file_manager/chunk/status', 1, {'upload_id': str(uuid.uuid4())}, status=404)
+
+    def test_oauth(self):
+        self._get('/api/core/oauth/gitee/authorize', 0)
+
+    def test_async_job(self):
+        self._get('/api/core/async-job/missing', 1, status=404)
+
+    def test_search(self):
+        with self.settings(SEARCH_INDEX_ENABLE=True, SEARCH_BACKEND='ngram'):
+            self._get('/api/core/search', 3, {'keyword': '用户'})
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+搜索索引测试（ngram 后端，SQLite / MySQL 使用的二元组倒排表）
+"""
+from django.test import override_settings
+
+from common.utils.import_utils import post_bulk_import
+from core.menu.menu_model import Menu
+from core.post.post_model import Post
+from core.role.role_model import Role
+from core.search.search_model import SearchDocument, SearchGram
+from core.search.search_service import SearchService
+from core.tests.base import ApiTestCase
+from core.user.user_model import User
+
+
+@override_settings(SEARCH_INDEX_ENABLE=True, SEARCH_BACKEND='ngram')
+class SearchIndexSyncTest(ApiTestCase):
+    """增删改、批量导入时同步索引"""
+
+    def _document(self, entity_type, instance):
+        return SearchDocument.objects.filter(entity_type=entity_type, object_id=str(instance.pk)).first()
+
+    def test_save_indexes_object(self):
+        role = Role.objects.create(name='财务审核', code='finance_audit')
+        document = self._document('role', role)
+        self.assertIsNotNone(document)
+        self.assertEqual(document.title, '财务审核')
+        self.assertIn('finance_audit', document.content)
+        self.assertTrue(SearchGram.objects.filter(document=document, gram='财务').exists())
+
+    def test_update_replaces_grams(self):
+        role = Role.objects.create(name='财务审核', code='finance_audit')
+        role.name = '人事专员'
+        role.save()
+        document = self._document('role', role)
+        self.assertEqual(document.title, '人事专员')
+        grams = set(SearchGram.objects.filter(document=document).values_list('gram', flat=True))
+        self.assertIn('人事', grams)
+        self.assertNotIn('财务', grams)
+
+    def test_delete_removes_document(self):
+        role = Role.objects.create(name='财务审核', code='finance_audit')
+        document = self._document('role', role)
+        role.delete()
+        self.assertFalse(SearchDocument.objects.filter(pk=document.pk).exists())
+        self.assertFalse(SearchGram.objects.filter(document_id=document.pk).exists())
+
+    def test_bulk_import_indexes_ids(self):
+        posts = Post.objects.bulk_create([
+            Post(name='销售经理', code='sales_manager'),
+            Post(name='销售代表', code='sales_rep'),
+        ])
+        # bulk_create 不触发 post_save
+        self.assertFalse(SearchDocument.objects.filter(entity_type='post').exists())
+        post_bulk_import.send(sender=Post, ids=[str(post.pk) for post in posts])
+        self.assertEqual(SearchDocument.objects.filter(entity_type='post').count(), 2)
+        self.assertEqual(SearchService.search('销售', ['post']).count(), 2)
+
+
+@override_settings(SEARCH_INDEX_ENABLE=True, SEARCH_BACKEND='ngram')
+class SearchRankingTest(ApiTestCase):
+    """相关度排序：标题完全匹配 > 标题前缀 > 标题包含 > 其他字段包含"""
+
+    def test_ranking_order(self):
+        Role.objects.create(name='仓库管理员助理', code='r1')
+        Role.objects.create(name='普通员工', code='r2', description='协助管理员处理工单')
+        Role.objects.create(name='管理员', code='r3')
+        Role.objects.create(name='系统管理员', code='r4')
+        Role.objects.create(name='管理员组', code='r5')
+
+        titles = list(SearchService.search('管理员', ['role']).values_list('title', flat=True))
+        self.assertEqual(titles, ['管理员', '管理员组', '系统管理员', '仓库管理员助理', '普通员工'])
+
+    def test_keyword_is_normalized(self):
+        Role.objects.create(name='Finance', code='FIN')
+        self.assertEqual(list(SearchService.search('ＦＩＮ', ['role']).values_list('title', flat=True)), ['Finance'])
+
+    def test_single_character_keyword(self):
+        Role.objects.create(name='审计', code='audit')
+        self.assertEqual(SearchService.search('审', ['role']).count(), 1)
+
+
+@override_settings(SEARCH_BACKEND='ngram')
+class SearchFilterQuerysetTest(ApiTestCase):
+    """filter_queryset 在开启、关闭索引时的结果"""
+
+    def setUp(self):
+        super().setUp()
+        with self.settings(SEARCH_INDEX_ENABLE=True):
+            Role.objects.create(name='数据分析', code='data_analyst')
+        # bulk_create 不触发信号，只存在于业务表中，不在索引中
+        Role.objects.bulk_create([Role(name='数据录入', code='data_entry')])
+
+    def _names(self, keyword):
+        return sorted(SearchService.filter_queryset(Role.objects.all(), 'role', keyword).values_list('name', flat=True))
+
+    def test_index_disabled_uses_icontains(self):
+        with self.settings(SEARCH_INDEX_ENABLE=False):
+            self.assertEqual(self._names('数据'), ['数据分析', '数据录入'])
+            self.assertEqual(self._names('DATA_ENTRY'), ['数据录入'])
+
+    def test_index_enabled_uses_index(self):
+        with self.settings(SEARCH_INDEX_ENABLE=True):
+            self.assertEqual(self._names('数据'), ['数据分析'])
+            self.assertEqual(self._names('DATA_ANALYST'), ['数据分析'])
+
+    def test_empty_keyword_returns_queryset(self):
+        with self.settings(SEARCH_INDEX_ENABLE=True):
+            self.assertEqual(len(self._names('  ')), 2)
+
+
+@override_settings(SEARCH_BACKEND='ngram')
+class SearchApiTest(ApiTestCase):
+    """用户、菜单搜索接口"""
+
+    def setUp(self):
+        super().setUp()
+        with self.settings(SEARCH_INDEX_ENABLE=True):
+            User.objects.create(username='zhangsan', name='张三', email='zhangsan@example.com')
+            User.objects.create(username='lisi', name='李四')
+            parent = Menu.objects.create(name='System', title='系统管理', path='/system')
+            Menu.objects.create(name='UserManage', title='用户管理', path='/system/user', parent=parent)
+
+    def test_user_search(self):
+        for enabled in (True, False):
+            with self.settings(SEARCH_INDEX_ENABLE=enabled):
+                response = self.client.get('/api/core/user/search', {'keyword': 'zhangsan@'})
+                self.assertEqual(response.status_code, 200, response.content)
+                data = response.json()
+                self.assertEqual(data['total'], 1)
+                self.assertEqual(data['items'][0]['username'], 'zhangsan')
+
+    def test_menu_search_returns_ancestors(self):
+        for enabled in (True, False):
+            with self.settings(SEARCH_INDEX_ENABLE=enabled):
+                response = self.client.get('/api/core/menu/search', {'keyword': '用户管理'})
+                self.assertEqual(response.status_code, 200, response.content)
+                tree = response.json()
+                self.assertEqual([node['title'] for node in tree], ['系统管理'])
+                self.assertEqual([node['title'] for node in tree[0]['children']], ['用户管理'])
+
+    def test_unified_search(self):
+        with self.settings(SEARCH_INDEX_ENABLE=True):
+            response = self.client.get('/api/core/search', {'keyword': '张三', 'types': 'user,menu'})
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual([item['title'] for item in response.json()['items']], ['张三'])
@@ -4,20 +4,26 @@
 User API - 用户管理接口
 提供用户的 CRUD 操作和高级功能
 """
+from datetime import datetime
 from typing import List
 from django.contrib.auth.hashers import make_password
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
 from ninja import Router, Query
 from ninja.errors import HttpError
 from ninja.pagination import paginate
 
 from application.settings import DEFAULT_PASSWORD
-from common.fu_crud import create, retrieve, delete, batch_delete
+from common.fu_crud import (
+    create, retrieve, delete, batch_delete, batch_update, import_data, get_import_file_path, ImportSchema,
+)
+from common.fu_job import AsyncJobManager
 from common.fu_pagination import MyPagination
 from common.fu_schema import response_success
 from common.fu_user_query import get_manager_list
+from common.utils.export_utils import choices_formatter, streaming_export_response
+from core.async_job.async_job_schema import AsyncJobSchemaOut
 from core.user.user_model import User
+from core.search.search_service import SearchService
 from core.user.user_schema import (
     UserSchemaOut,
     UserSchemaIn,
@@ -83,6 +89,209 @@ def create_user(request, data: UserSchemaIn):
     return user
 
 
+# 导出字段与转换（同步导出和后台导出共用）
+USER_EXPORT_FIELDS = [
+    "username", "name", "email", "mobile", "gender", "user_type", "user_status",
+    "dept__name", "last_login", "sys_create_datetime",
+]
+USER_EXPORT_FORMATTERS = {
+    "gender": choices_formatter(User.GENDER_CHOICES),
+    "user_type": choices_formatter(User.USER_TYPE_CHOICES),
+    "user_status": choices_formatter(User.STATUS_CHOICES),
+}
+USER_IMPORT_FIELDS = ["username", "name", "email", "mobile", "gender", "user_type", "user_status", "dept"]
+
+
+def _user_import_options() -> dict:
+    """用户导入参数：部门按名称匹配，新用户使用默认密码（整批只计算一次哈希）"""
+    from core.dept.dept_model import Dept
+    
+    dept_map = {name: dept_id for dept_id, name in Dept.objects.values_list('id', 'name')}
+    default_password = make_password(DEFAULT_PASSWORD)
+    
+    def prepare(user, is_new):
+        if is_new:
+            user.password = default_password
+    
+    return {
+        "unique_field": "username",
+        "value_maps": {"dept_id": dept_map},
+        "prepare": prepare,
+        "header_aliases": {"部门名称": "dept"},
+    }
+
+
+@router.post("/user/export", summary="导出用户数据")
+def export_user(request, filters: UserFilters = Query(...), file_format: str = Query('xlsx')):
+    """
+    导出用户数据为 Excel / CSV
+    
+    用于数据备份和报表
+    
+    改进点：
+    - 支持与列表相同的过滤条件
+    - 流式输出，导出大量数据时内存占用恒定
+    """
+    query_set = retrieve(request, User, filters).order_by('username')
+    try:
+        return streaming_export_response(
+            query_set,
+            USER_EXPORT_FIELDS,
+            filename=f"用户数据_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            file_format=file_format,
+            formatters=USER_EXPORT_FORMATTERS,
+        )
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+
+@router.post("/user/export/async", response=AsyncJobSchemaOut, summary="后台导出用户数据")
+def export_user_async(request, filters: UserFilters = Query(...), file_format: str = Query('xlsx')):
+    """
+    提交后台导出任务
+    
+    数据量较大时使用，立即返回任务ID；
+    通过 /async-job/{job_id} 或通知 WebSocket 获取进度，完成后文件保存在文件管理中
+    """
+    query_set = retrieve(request, User, filters).order_by('username')
+    try:
+        return AsyncJobManager.submit_export(
+            request,
+            query_set,
+            USER_EXPORT_FIELDS,
+            filename=f"用户数据_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            file_format=file_format,
+            formatters=USER_EXPORT_FORMATTERS,
+        )
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+
+@router.post("/user/import", summary="导入用户数据")
+def import_user(request, data: ImportSchema, upsert: bool = Query(False)):
+    """
+    批量导入用户数据
+    
+    从Excel文件导入用户数据
+    
+    改进点：
+    - 分批校验、分批写入（每批一个事务）
+    - 以用户名为自然键，upsert=true 时更新已存在的用户
+    - 部门按名称匹配，新用户使用默认密码（整批只计算一次哈希）
+    - 返回逐行错误报告，单行出错不影响其他行
+    """
+    try:
+        return import_data(
+            request,
+            User,
+            UserSchemaIn,
+            data,
+            USER_IMPORT_FIELDS,
+            upsert=upsert,
+            **_user_import_options(),
+        )
+    except (ValueError, FileNotFoundError) as e:
+        raise HttpError(400, str(e))
+
+
+@router.post("/user/import/async", response=AsyncJobSchemaOut, summary="后台导入用户数据")
+def import_user_async(request, data: ImportSchema, upsert: bool = Query(False)):
+    """
+    提交后台导入任务
+    
+    导入规则与 /user/import 相同，任务完成后的导入统计与错误报告在任务结果中返回
+    """
+    try:
+        return AsyncJobManager.submit_import(
+            request,
+            User,
+            UserSchemaIn,
+            get_import_file_path(data.path),
+            USER_IMPORT_FIELDS,
+            title="导入用户数据",
+            upsert=upsert,
+            options=_user_import_options,
+        )
+    except FileNotFoundError as e:
+        raise HttpError(400, str(e))
+
+
+@router.get("/user/all", response=List[UserSchemaSimple], summary="获取所有用户（简化版）")
+def list_all_user(request):
+    """
+    获取所有正常状态的用户（不分页，简化版）
+    
+    用于用户选择器等场景
+    """
+    query_set = User.objects.filter(user_status=1).select_related('dept').order_by('name')
+    return query_set
+
+
+@router.post("/user/change-password", summary="修改密码")
+def change_password(request, data: UserPasswordResetIn):
+    """
+    用户修改自己的密码
+    
+    改进点：
+    - 验证旧密码
+    - 验证新密码不同于旧密码
+    - 记录密码修改日志
+    """
+    current_user = request.auth
+    user = get_object_or_404(User, id=current_user.id)
+    
+    # 验证旧密码
+    if not user.check_password(data.old_password):
+        raise HttpError(401, "旧密码不正确")
+    
+    # 验证新密码不同于旧密码
+    if user.check_password(data.new_password):
+        raise HttpError(400, "新密码不能与旧密码相同")
+    
+    # 设置新密码
+    user.set_password(data.new_password)
+    user.save()
+    
+    # TODO: 记录密码修改日志
+    
+    return response_success("密码修改成功")
+
+
+@router.get("/user/search", response=List[UserSchemaOut], summary="搜索用户")
+@paginate(MyPagination)
+def search_user(request, keyword: str = Query(None)):
+    """
+    搜索用户
+    
+    改进点：
+    - 支持关键词搜索（用户名、姓名、邮箱、手机号）
+    """
+    query_set = User.objects.all()
+    
+    query_set = SearchService.filter_queryset(query_set, 'user', keyword)
+    
+    query_set = query_set.select_related('dept', 'manager').prefetch_related('post', 'core_roles')
+    return query_set
+
+
+@router.post("/user/check-permission", response=UserPermissionCheckOut, summary="检查用户权限")
+def check_user_permission(request, data: UserPermissionCheckIn):
+    """
+    检查当前用户是否拥有指定的权限
+    
+    改进点：
+    - 批量检查多个权限
+    """
+    current_user = request.auth
+    user = get_object_or_404(User, id=current_user.id)
+    
+    result = {}
+    for permission_code in data.permission_codes:
+        result[permission_code] = user.has_permission(permission_code)
+    
+    return UserPermissionCheckOut(permissions=result)
+
+
 @router.delete("/user/{user_id}", response=UserSchemaOut, summary="删除用户")
 def delete_user(request, user_id: str):
     """
@@ -255,7 +464,7 @@ def patch_user(request, user_id: str, data: UserSchemaPatch):
 
 
 @router.get("/user", response=List[UserSchemaOut], summary="获取用户列表（分页）")
-@paginate(MyPagination)
+@paginate(MyPagination, projection=UserSchemaOut)
 def list_user(request, filters: UserFilters = Query(...)):
     """
     获取用户列表（分页）
@@ -270,17 +479,6 @@ def list_user(request, filters: UserFilters = Query(...)):
     return query_set
 
 
-@router.get("/user/all", response=List[UserSchemaSimple], summary="获取所有用户（简化版）")
-def list_all_user(request):
-    """
-    获取所有正常状态的用户（不分页，简化版）
-    
-    用于用户选择器等场景
-    """
-    query_set = User.objects.filter(user_status=1).select_related('dept').order_by('name')
-    return query_set
-
-
 @router.put("/user/reset/password/{user_id}", response=UserSchemaOut, summary="重置用户密码")
 def reset_password(request, user_id: str):
     """
@@ -334,36 +532,6 @@ def get_user_manager(request, data: UserSchemaGetNameIn):
     return get_manager_list(data)
 
 
-@router.post("/user/change-password", summary="修改密码")
-def change_password(request, data: UserPasswordResetIn):
-    """
-    用户修改自己的密码
-    
-    改进点：
-    - 验证旧密码
-    - 验证新密码不同于旧密码
-    - 记录密码修改日志
-    """
-    current_user = request.auth
-    user = get_object_or_404(User, id=current_user.id)
-    
-    # 验证旧密码
-    if not user.check_password(data.old_password):
-        raise HttpError(401, "旧密码不正确")
-    
-    # 验证新密码不同于旧密码
-    if user.check_password(data.new_password):
-        raise HttpError(400, "新密码不能与旧密码相同")
-    
-    # 设置新密码
-    user.set_password(data.new_password)
-    user.save()
-    
-    # TODO: 记录密码修改日志
-    
-    return response_success("密码修改成功")
-
-
 @router.get("/user/get/avatar/{user_id}", response=UserSchemaAvatarOut, summary="获取用户头像")
 def get_user_avatar(request, user_id: str):
     """获取用户头像信息"""
@@ -383,40 +551,23 @@ def batch_update_user_status(request, data: UserBatchUpdateStatusIn):
     """
     current_user_id = request.auth.id
     
-    # 过滤掉系统用户、超级管理员和当前用户
-    users = User.objects.filter(
-        id__in=data.ids,
-        user_type__ne=0,
-        is_superuser=False
-    ).exclude(id=current_user_id)
+    from common.fu_cache import PermissionCacheManager
     
-    count = users.update(user_status=data.user_status)
+    # 过滤掉系统用户、超级管理员和当前用户
+    users = User.objects.filter(is_superuser=False).exclude(user_type=0).exclude(id=current_user_id)
+    
+    # 状态变更后已缓存的权限判断需要失效，整批只递增一次全局权限版本号
+    count = batch_update(
+        request,
+        User,
+        data.ids,
+        {"user_status": data.user_status},
+        queryset=users,
+        on_updated=lambda _: PermissionCacheManager.invalidate_global_permissions(),
+    )
     return UserBatchUpdateStatusOut(count=count)
 
 
-@router.get("/user/search", response=List[UserSchemaOut], summary="搜索用户")
-@paginate(MyPagination)
-def search_user(request, keyword: str = Query(None)):
-    """
-    搜索用户
-    
-    改进点：
-    - 支持关键词搜索（用户名、姓名、邮箱、手机号）
-    """
-    query_set = User.objects.all()
-    
-    if keyword:
-        query_set = query_set.filter(
-            Q(username__icontains=keyword) |
-            Q(name__icontains=keyword) |
-            Q(email__icontains=keyword) |
-            Q(mobile__icontains=keyword)
-        )
-    
-    query_set = query_set.select_related('dept', 'manager').prefetch_related('post', 'core_roles')
-    return query_set
-
-
 @router.put("/profile", response=UserSchemaOut, summary="更新个人信息（完全替换）")
 def update_profile(request, data: UserProfileUpdateIn):
     """
@@ -482,24 +633,6 @@ def get_current_user_profile(request):
     return user
 
 
-@router.post("/user/check-permission", response=UserPermissionCheckOut, summary="检查用户权限")
-def check_user_permission(request, data: UserPermissionCheckIn):
-    """
-    检查当前用户是否拥有指定的权限
-    
-    改进点：
-    - 批量检查多个权限
-    """
-    current_user = request.auth
-    user = get_object_or_404(User, id=current_user.id)
-    
-    result = {}
-    for permission_code in data.permission_codes:
-        result[permission_code] = user.has_permission(permission_code)
-    
-    return UserPermissionCheckOut(permissions=result)
-
-
 @router.get("/user/subordinates/{user_id}", response=UserSubordinatesOut, summary="获取用户的下属列表")
 def get_user_subordinates(request, user_id: str, include_self: bool = Query(False)):
     """
@@ -543,24 +676,3 @@ def get_users_by_role(request, role_id: str):
     return users
 
 
-@router.post("/user/export", summary="导出用户数据")
-def export_user(request):
-    """
-    导出用户数据为Excel
-    
-    用于数据备份和报表
-    """
-    # TODO: 实现导出功能
-    return response_success("导出功能待实现")
-
-
-@router.post("/user/import", summary="导入用户数据")
-def import_user(request):
-    """
-    批量导入用户数据
-    
-    从Excel文件导入用户数据
-    """
-    # TODO: 实现导入功能
-    return response_success("导入功能待实现")
-
@@ -13,7 +13,7 @@ from ninja.errors import HttpError
 from ninja.pagination import paginate
 
 from common.fu_crud import create, retrieve, delete
-from common.fu_pagination import MyPagination
+from common.fu_pagination import MyPagination, CursorPagination
 from common.fu_schema import response_success
 from scheduler.models import SchedulerJob, SchedulerLog
 from scheduler.schema import (
@@ -67,6 +67,66 @@ def create_scheduler_job(request, data: SchedulerJobSchemaIn):
     return job
 
 
+@router.get("/job/all", response=List[SchedulerJobSimpleOut], summary="获取所有定时任务（简化版）")
+def list_all_scheduler_job(request):
+    """
+    获取所有定时任务（不分页，简化版）
+    
+    用于任务选择器等场景
+    """
+    query_set = SchedulerJob.objects.all().order_by('-priority', 'name')
+    return query_set
+
+
+@router.post("/job/execute", response=SchedulerJobExecuteOut, summary="立即执行任务")
+def execute_scheduler_job(request, data: SchedulerJobExecuteIn):
+    """
+    立即执行指定任务（不影响正常调度）
+    
+    改进点：
+    - 创建执行日志
+    """
+    job = get_object_or_404(SchedulerJob, id=data.job_id)
+    
+    if not scheduler_service.is_running():
+        raise HttpError(400, "调度器未运行")
+    
+    # 立即执行任务
+    success = scheduler_service.run_job_now(job.code)
+    
+    if success:
+        return SchedulerJobExecuteOut(
+            success=True,
+            message=f"任务 {job.name} 将立即执行"
+        )
+    else:
+        return SchedulerJobExecuteOut(
+            success=False,
+            message=f"任务 {job.name} 执行失败"
+        )
+
+
+@router.get("/job/search", response=List[SchedulerJobSchemaOut], summary="搜索定时任务")
+@paginate(MyPagination)
+def search_scheduler_job(request, keyword: str = Query(None)):
+    """
+    搜索定时任务
+    
+    改进点：
+    - 支持关键词搜索（名称、编码、描述）
+    """
+    query_set = SchedulerJob.objects.all()
+    
+    if keyword:
+        query_set = query_set.filter(
+            Q(name__icontains=keyword) |
+            Q(code__icontains=keyword) |
+            Q(description__icontains=keyword)
+        )
+    
+    return query_set
+
+
 @router.delete("/job/{job_id}", response=SchedulerJobSchemaOut, summary="删除定时任务")
 def delete_scheduler_job(request, job_id: str):
     """
@@ -188,17 +248,6 @@ def list_scheduler_job(request, filters: SchedulerJobFilters = Query(...)):
     return query_set
 
 
-@router.get("/job/all", response=List[SchedulerJobSimpleOut], summary="获取所有定时任务（简化版）")
-def list_all_scheduler_job(request):
-    """
-    获取所有定时任务（不分页，简化版）
-    
-    用于任务选择器等场景
-    """
-    query_set = SchedulerJob.objects.all().order_by('-priority', 'name')
-    return query_set
-
-
 @router.get("/job/{job_id}", response=SchedulerJobSchemaDetail, summary="获取定时任务详情")
 def get_scheduler_job(request, job_id: str):
     """
@@ -236,55 +285,6 @@ def batch_update_scheduler_job_status(request, data: SchedulerJobBatchUpdateStat
     return SchedulerJobBatchUpdateStatusOut(count=count)
 
 
-@router.post("/job/execute", response=SchedulerJobExecuteOut, summary="立即执行任务")
-def execute_scheduler_job(request, data: SchedulerJobExecuteIn):
-    """
-    立即执行指定任务（不影响正常调度）
-    
-    改进点：
-    - 创建执行日志
-    """
-    job = get_object_or_404(SchedulerJob, id=data.job_id)
-    
-    if not scheduler_service.is_running():
-        raise HttpError(400, "调度器未运行")
-    
-    # 立即执行任务
-    success = scheduler_service.run_job_now(job.code)
-    
-    if success:
-        return SchedulerJobExecuteOut(
-            success=True,
-            message=f"任务 {job.name} 将立即执行"
-        )
-    else:
-        return SchedulerJobExecuteOut(
-            success=False,
-            message=f"任务 {job.name} 执行失败"
-        )
-
-
-@router.get("/job/search", response=List[SchedulerJobSchemaOut], summary="搜索定时任务")
-@paginate(MyPagination)
-def search_scheduler_job(request, keyword: str = Query(None)):
-    """
-    搜索定时任务
-    
-    改进点：
-    - 支持关键词搜索（名称、编码、描述）
-    """
-    query_set = SchedulerJob.objects.all()
-    
-    if keyword:
-        query_set = query_set.filter(
-            Q(name__icontains=keyword) |
-            Q(code__icontains=keyword) |
-            Q(description__icontains=keyword)
-        )
-    
-    return query_set
-
-
 @router.get("/job/statistics/data", response=SchedulerJobStatisticsOut, summary="获取任务统计信息")
 def get_scheduler_job_statistics(request):
     """
@@ -341,25 +341,18 @@ def list_scheduler_log(request, filters: SchedulerLogFilters = Query(...)):
     return query_set
 
 
-@router.get("/log/{log_id}", response=SchedulerLogSchemaOut, summary="获取任务执行日志详情")
-def get_scheduler_log(request, log_id: str):
-    """获取单个任务执行日志的详细信息"""
-    log = get_object_or_404(SchedulerLog, id=log_id)
-    return log
-
-
-@router.delete("/log/{log_id}", response=SchedulerLogSchemaOut, summary="删除任务执行日志")
-def delete_scheduler_log(request, log_id: str):
-    """删除任务执行日志"""
-    instance = delete(log_id, SchedulerLog)
-    return instance
-
-
-@router.delete("/log/batch/delete", response=SchedulerLogBatchDeleteOut, summary="批量删除任务执行日志")
-def delete_batch_scheduler_log(request, data: SchedulerLogBatchDeleteIn):
-    """批量删除任务执行日志"""
-    count = SchedulerLog.objects.filter(id__in=data.ids).delete()[0]
-    return SchedulerLogBatchDeleteOut(count=count)
+@router.get("/log/cursor", response=List[SchedulerLogSchemaOut], summary="获取任务执行日志列表（游标分页）")
+@paginate(CursorPagination, ordering=('-start_time',))
+def list_scheduler_log_by_cursor(request, filters: SchedulerLogFilters = Query(...)):
+    """
+    获取任务执行日志列表（游标分页）
+    
+    改进点：
+    - 按 (开始时间, ID) 定位，深度翻页不再随页码变慢
+    - 支持前后翻页，可选统计总数
+    """
+    query_set = retrieve(request, SchedulerLog, filters)
+    return query_set
 
 
 @router.post("/log/clean", response=SchedulerLogCleanOut, summary="清理旧日志")
@@ -383,6 +376,27 @@ def clean_scheduler_log(request, data: SchedulerLogCleanIn):
     return SchedulerLogCleanOut(count=count)
 
 
+@router.get("/log/{log_id}", response=SchedulerLogSchemaOut, summary="获取任务执行日志详情")
+def get_scheduler_log(request, log_id: str):
+    """获取单个任务执行日志的详细信息"""
+    log = get_object_or_404(SchedulerLog, id=log_id)
+    return log
+
+
+@router.delete("/log/{log_id}", response=SchedulerLogSchemaOut, summary="删除任务执行日志")
+def delete_scheduler_log(request, log_id: str):
+    """删除任务执行日志"""
+    instance = delete(log_id, SchedulerLog)
+    return instance
+
+
+@router.delete("/log/batch/delete", response=SchedulerLogBatchDeleteOut, summary="批量删除任务执行日志")
+def delete_batch_scheduler_log(request, data: SchedulerLogBatchDeleteIn):
+    """批量删除任务执行日志"""
+    count = SchedulerLog.objects.filter(id__in=data.ids).delete()[0]
+    return SchedulerLogBatchDeleteOut(count=count)
+
+
 @router.get("/log/by/job/{job_id}", response=List[SchedulerLogSchemaOut], summary="获取指定任务的执行日志")
 @paginate(MyPagination)
 def list_scheduler_log_by_job(request, job_id: str):
@@ -398,6 +398,7 @@ class SchedulerLog(RootModel):
             models.Index(fields=['job', 'status']),
             models.Index(fields=['status', 'start_time']),
             models.Index(fields=['job_code', 'start_time']),
+            models.Index(fields=['start_time', 'id']),
         ]
     
     def __str__(self):
@@ -271,6 +271,26 @@ def update_job_statistics(**kwargs):
         raise
 
 
+@scheduler_task
+def cleanup_file_blobs(limit: int = 1000, **kwargs):
+    """
+    回收文件内容任务
+
+    删除没有文件记录引用（且超过 FILE_BLOB_GC_GRACE 保留时间）的文件内容及其存储文件
+    """
+    try:
+        from core.file_manager.file_blob_service import FileBlobService
+
+        collected = FileBlobService.collect_garbage(limit=limit)
+
+        logger.info(f"回收了 {collected} 个文件内容")
+        return f"回收了 {collected} 个文件内容"
+
+    except Exception as e:
+        logger.error(f"回收文件内容失败: {str(e)}")
+        raise
+
+
 @scheduler_task
 def database_backup():
     """